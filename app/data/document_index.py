@@ -0,0 +1,265 @@
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+import unicodedata
+from collections import Counter
+
+# Define explicitamente o diretório raiz do projeto
+sys.path.append('/workplace/')
+
+"""
+Document Index
+
+Índice invertido local, em um único arquivo, dos trechos de documentos indexados por
+`app/services/document_retrieval.py`, com pontuação BM25.
+
+Formato em disco:
+
+- Assinatura `BM25IDX2` (8 bytes) e o tamanho do cabeçalho (4 bytes, big-endian).
+- Cabeçalho JSON, pequeno e de tamanho independente do volume de texto: parâmetros do BM25, tamanho médio dos
+  trechos, a lista de documentos de origem, o número de trechos e de termos e o tamanho das seções seguintes.
+- Tabela de trechos: um registro de tamanho fixo por trecho (documento de origem, posição, número de termos e
+  localização do texto), acessado diretamente pelo número do trecho.
+- Léxico: um registro de tamanho fixo por termo (localização do termo, da sua lista de ocorrências e número de
+  trechos que contêm o termo), em ordem dos termos em UTF-8, seguido dos próprios termos.
+- Listas de ocorrências: para cada termo, pares (distância para o trecho anterior da lista, frequência do termo no
+  trecho), codificados como inteiros de tamanho variável (varint). É a parte que cresce com o volume de texto, e
+  ocupa tipicamente 2 bytes por ocorrência.
+- Textos dos trechos em UTF-8, lidos só para os trechos retornados pela busca.
+
+O arquivo é lido por memory-mapping e abri-lo lê apenas o cabeçalho: uma busca localiza os termos da consulta por
+busca binária no léxico, decodifica apenas as suas listas e lê apenas os registros dos trechos encontrados. O índice
+é imutável; `write_index` grava um arquivo novo e o troca atomicamente pelo anterior (`os.replace`), de modo que
+os leitores com o arquivo anterior aberto não são afetados.
+"""
+
+_MAGIC = b"BM25IDX2"
+_LENGTH = struct.Struct('>I')
+# Registro de trecho: documento de origem (posição na lista "sources"), posição, número de termos, início e
+# tamanho do texto.
+_CHUNK = struct.Struct('>IIIQI')
+# Registro de termo: início e tamanho do termo, início e tamanho da lista de ocorrências, número de trechos.
+_TERM = struct.Struct('>IIQII')
+_WORD = re.compile(r"\w+")
+
+# Palavras muito frequentes em português, que não ajudam a distinguir trechos (já sem acentos).
+STOPWORDS = frozenset("""
+a ao aos as ate com como da das de do dos e ela elas ele eles em entre era essa esse esta este eu foi for
+ha isso isto ja la lhe mais mas me mesmo meu minha muito na nas nem no nos nossa nosso num numa o os ou para
+pela pelas pelo pelos por qual quando que quem se sem ser seu seus sua suas so tambem te tem tu tua tuas teu
+teus um uma umas uns voce voces vos
+""".split())
+
+
+def tokenize(text: str) -> list:
+    """
+    Divide um texto em termos de busca: minúsculas, sem acentos, sem palavras de uma letra e sem `STOPWORDS`.
+
+    Exemplo de Uso:
+        tokenize("Ó Senhor, a tua misericórdia!")  # ['senhor', 'misericordia']
+    """
+    folded = unicodedata.normalize("NFKD", text.lower())
+    folded = "".join(char for char in folded if not unicodedata.combining(char))
+    return [term for term in _WORD.findall(folded) if len(term) > 1 and term not in STOPWORDS]
+
+
+def _write_varint(out: bytearray, value: int):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varints(data, start: int, end: int):
+    value = shift = 0
+    for position in range(start, end):
+        byte = data[position]
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            yield value
+            value = shift = 0
+
+
+def write_index(path: str, chunks, k1=1.2, b=0.75) -> int:
+    """
+    Grava o índice de um conjunto de trechos, substituindo atomicamente o arquivo existente.
+
+    Parâmetros:
+        path (str): O arquivo do índice.
+        chunks (Iterable[dict]): Os trechos, com "source" (documento de origem), "position" (ordem no documento)
+                                 e "text".
+        k1, b (float): Os parâmetros do BM25.
+
+    Retorna:
+        int: O número de trechos indexados.
+    """
+    postings = {}  # termo -> [(trecho, frequência)]
+    sources = {}  # documento -> posição na lista "sources"
+    table, texts, total_terms = bytearray(), bytearray(), 0
+    for chunk_id, chunk in enumerate(chunks):
+        terms = Counter(tokenize(chunk["text"]))
+        for term, frequency in terms.items():
+            postings.setdefault(term, []).append((chunk_id, frequency))
+        encoded = chunk["text"].encode("utf-8")
+        source_id = sources.setdefault(chunk["source"], len(sources))
+        length = sum(terms.values())
+        table += _CHUNK.pack(source_id, chunk["position"], length, len(texts), len(encoded))
+        texts += encoded
+        total_terms += length
+    count = len(table) // _CHUNK.size
+
+    lexicon, names, data = bytearray(), bytearray(), bytearray()
+    for name, term in sorted((term.encode("utf-8"), term) for term in postings):
+        start, previous = len(data), 0
+        for chunk_id, frequency in postings[term]:
+            _write_varint(data, chunk_id - previous)
+            _write_varint(data, frequency)
+            previous = chunk_id
+        lexicon += _TERM.pack(len(names), len(name), start, len(data) - start, len(postings[term]))
+        names += name
+
+    header = json.dumps({
+        "k1": k1,
+        "b": b,
+        "avgdl": total_terms / count if count else 0.0,
+        "sources": list(sources),
+        "chunk_count": count,
+        "term_count": len(postings),
+        "terms_size": len(names),
+        "postings_size": len(data),
+    }, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(_MAGIC + _LENGTH.pack(len(header)) + header)
+        for section in (table, lexicon, names, data, texts):
+            file.write(section)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+    return count
+
+
+class DocumentIndex:
+    """
+    Leitura e busca BM25 em um índice gravado por `write_index`.
+
+    Parâmetros:
+        path (str): O arquivo do índice.
+
+    Exemplo de Uso:
+        index = DocumentIndex("app/data/document_index.bin")
+        for hit in index.search("misericórdia do Senhor", top_k=3):
+            print(hit["score"], hit["source"], hit["text"][:80])
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as file:
+            self._data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._data[:len(_MAGIC)] != _MAGIC:
+            self._data.close()
+            raise ValueError(f"{path} não é um índice de documentos.")
+        header_start = len(_MAGIC) + _LENGTH.size
+        (header_size,) = _LENGTH.unpack_from(self._data, len(_MAGIC))
+        header = json.loads(self._data[header_start:header_start + header_size])
+        self.k1, self.b, self.avgdl = header["k1"], header["b"], header["avgdl"]
+        self._sources = header["sources"]
+        self._count, self._term_count = header["chunk_count"], header["term_count"]
+        self._chunks_start = header_start + header_size
+        self._lexicon_start = self._chunks_start + self._count * _CHUNK.size
+        self._names_start = self._lexicon_start + self._term_count * _TERM.size
+        self._postings_start = self._names_start + header["terms_size"]
+        self._texts_start = self._postings_start + header["postings_size"]
+
+    def __len__(self):
+        return self._count
+
+    def sources(self) -> list:
+        """
+        Retorna os documentos indexados, na ordem de indexação.
+        """
+        return list(self._sources)
+
+    def _chunk(self, chunk_id):
+        # (documento de origem, posição, número de termos, início e tamanho do texto) de um trecho.
+        return _CHUNK.unpack_from(self._data, self._chunks_start + chunk_id * _CHUNK.size)
+
+    def _text(self, chunk_id):
+        *_, offset, size = self._chunk(chunk_id)
+        start = self._texts_start + offset
+        return self._data[start:start + size].decode("utf-8")
+
+    def _lookup(self, term):
+        # Busca binária no léxico; retorna (início, tamanho da lista de ocorrências, número de trechos) ou None.
+        key = term.encode("utf-8")
+        low, high = 0, self._term_count
+        while low < high:
+            middle = (low + high) // 2
+            name_offset, name_size, *location = _TERM.unpack_from(self._data, self._lexicon_start + middle * _TERM.size)
+            start = self._names_start + name_offset
+            name = self._data[start:start + name_size]
+            if name == key:
+                return location
+            if name < key:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def chunks(self):
+        """
+        Percorre todos os trechos (dicts com "source", "position" e "text"), por exemplo para reindexar.
+        """
+        for chunk_id in range(self._count):
+            source_id, position, *_ = self._chunk(chunk_id)
+            yield {"source": self._sources[source_id], "position": position, "text": self._text(chunk_id)}
+
+    def search(self, query: str, top_k=3, min_score=0.0) -> list:
+        """
+        Retorna os trechos mais relevantes para a consulta, pela pontuação BM25.
+
+        Parâmetros:
+            query (str): A consulta, em texto livre.
+            top_k (int): O número máximo de trechos.
+            min_score (float): A pontuação mínima de um trecho.
+
+        Retorna:
+            list[dict]: "source", "position", "score" e "text" de cada trecho, da maior para a menor pontuação.
+        """
+        total = self._count
+        scores = {}
+        for term in set(tokenize(query)):
+            location = self._lookup(term)
+            if location is None:
+                continue
+            offset, size, document_frequency = location
+            idf = math.log(1 + (total - document_frequency + 0.5) / (document_frequency + 0.5))
+            start = self._postings_start + offset
+            values = _read_varints(self._data, start, start + size)
+            chunk_id = 0
+            for delta, frequency in zip(values, values):
+                chunk_id += delta
+                length_norm = 1 - self.b + self.b * self._chunk(chunk_id)[2] / (self.avgdl or 1)
+                score = idf * frequency * (self.k1 + 1) / (frequency + self.k1 * length_norm)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + score
+
+        # Em caso de empate, prevalece o trecho indexado primeiro.
+        best = heapq.nlargest(top_k, ((score, -chunk_id) for chunk_id, score in scores.items() if score >= min_score))
+        hits = []
+        for score, negated in best:
+            source_id, position, *_ = self._chunk(-negated)
+            hits.append({"source": self._sources[source_id], "position": position, "score": round(score, 4),
+                         "text": self._text(-negated)})
+        return hits
+
+    def close(self):
+        self._data.close()
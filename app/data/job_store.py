@@ -0,0 +1,224 @@
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+sys.path.append('/workplace/')
+
+from app.decorators.log_decorator import log_function_call
+from app.utils.openia_config import JobConfig
+
+"""
+Job Store
+
+Tabela persistente (SQLite) dos jobs de chat assíncronos: cada job guarda a mensagem recebida, o seu estado, o
+resultado (ou erro) e a situação da entrega do callback. Como a tabela fica em disco, os workers podem ser
+reiniciados sem perder trabalho: jobs pendentes continuam na fila, e jobs de um worker que parou no meio voltam
+a ser executados quando a sua concessão ("lease") expira.
+
+Estados de um job: "queued" -> "running" -> "succeeded" ou "failed". Um job que falha volta para "queued" até
+atingir o número máximo de tentativas.
+
+A tabela usa o modo WAL e transações `BEGIN IMMEDIATE` na reserva de jobs, de modo que vários processos
+(workers do gunicorn) podem consumir a mesma fila sem executar um job duas vezes ao mesmo tempo.
+"""
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    user_name TEXT NOT NULL,
+    message TEXT NOT NULL,
+    callback_url TEXT,
+    thread_id TEXT,
+    reply TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_until REAL,
+    callback_status TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+"""
+
+_FIELDS = ("id", "status", "user_name", "message", "callback_url", "thread_id", "reply", "error", "attempts",
+           "callback_status", "created_at", "updated_at", "finished_at")
+
+
+class JobStore:
+    """
+    Fila persistente de jobs de chat em SQLite.
+
+    Parâmetros:
+        path (str): O arquivo do banco (criado se não existir).
+
+    Exemplo de Uso:
+        store = JobStore("/tmp/jobs.sqlite3")
+        job_id = store.submit("Cícero", "Oi")
+        job = store.claim("worker-1", lease_seconds=900)
+        store.complete(job["id"], thread_id="thread_1", reply="Olá!")
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self):
+        # Uma conexão por thread: conexões sqlite3 não devem ser compartilhadas entre threads.
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    @contextmanager
+    def _transaction(self, immediate=False):
+        db = self._connection()
+        db.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    @staticmethod
+    def _as_dict(row):
+        return {field: row[field] for field in _FIELDS} if row is not None else None
+
+    @log_function_call
+    def submit(self, user_name: str, message: str, callback_url: str = None) -> str:
+        """
+        Enfileira um job e retorna o seu ID.
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._transaction() as db:
+            db.execute(
+                "INSERT INTO jobs (id, status, user_name, message, callback_url, created_at, updated_at) "
+                "VALUES (?, 'queued', ?, ?, ?, ?, ?)",
+                (job_id, user_name, message, callback_url, now, now),
+            )
+        return job_id
+
+    def get(self, job_id: str):
+        """
+        Retorna o job como dicionário, ou None se ele não existir.
+        """
+        row = self._connection().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._as_dict(row)
+
+    def claim(self, worker: str, lease_seconds: float):
+        """
+        Reserva o job mais antigo pendente (ou cuja concessão expirou) para `worker`, por `lease_seconds`.
+
+        Retorna:
+            dict or None: O job reservado, ou None se a fila estiver vazia.
+        """
+        now = time.time()
+        with self._transaction(immediate=True) as db:
+            row = db.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' OR (status = 'running' AND lease_until < ?) "
+                "ORDER BY created_at LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, worker = ?, lease_until = ?, "
+                "updated_at = ? WHERE id = ?",
+                (worker, now + lease_seconds, now, row["id"]),
+            )
+            job = self._as_dict(row)
+        job.update(status="running", attempts=job["attempts"] + 1, updated_at=now)
+        return job
+
+    def complete(self, job_id: str, thread_id: str, reply: str):
+        """
+        Marca o job como concluído com a resposta.
+        """
+        now = time.time()
+        with self._transaction() as db:
+            db.execute(
+                "UPDATE jobs SET status = 'succeeded', thread_id = ?, reply = ?, error = NULL, lease_until = NULL, "
+                "updated_at = ?, finished_at = ? WHERE id = ?",
+                (thread_id, reply, now, now, job_id),
+            )
+
+    def fail(self, job_id: str, error: str, max_attempts: int) -> bool:
+        """
+        Registra a falha de uma tentativa. O job volta para a fila enquanto houver tentativas.
+
+        Retorna:
+            bool: True se o job voltou para a fila; False se falhou definitivamente.
+        """
+        now = time.time()
+        with self._transaction() as db:
+            attempts = db.execute("SELECT attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()["attempts"]
+            retry = attempts < max_attempts
+            db.execute(
+                "UPDATE jobs SET status = ?, error = ?, lease_until = NULL, updated_at = ?, finished_at = ? "
+                "WHERE id = ?",
+                ("queued" if retry else "failed", error, now, None if retry else now, job_id),
+            )
+        return retry
+
+    def set_callback_status(self, job_id: str, callback_status: str):
+        with self._transaction() as db:
+            db.execute("UPDATE jobs SET callback_status = ?, updated_at = ? WHERE id = ?",
+                       (callback_status, time.time(), job_id))
+
+    def purge_finished(self, older_than_seconds: float) -> int:
+        """
+        Remove os jobs concluídos ou falhos há mais de `older_than_seconds`; retorna quantos foram removidos.
+        """
+        with self._transaction() as db:
+            cursor = db.execute("DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?",
+                                (time.time() - older_than_seconds,))
+        return cursor.rowcount
+
+    def counts(self) -> dict:
+        """
+        Retorna a quantidade de jobs em cada estado.
+        """
+        rows = self._connection().execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+
+_store_instance = None
+_store_guard = threading.Lock()
+
+
+def get_job_store():
+    """
+    Retorna o `JobStore` configurado em `JobConfig`, criando-o no primeiro uso.
+    """
+    global _store_instance
+    if _store_instance is None:
+        with _store_guard:
+            if _store_instance is None:
+                _store_instance = JobStore(JobConfig.DB_PATH)
+    return _store_instance
+
+
+def reset_job_store():
+    """
+    Descarta o `JobStore` em uso; o próximo acesso cria um novo. Usada após um `fork`: conexões SQLite não
+    devem ser usadas por outro processo.
+    """
+    global _store_instance
+    with _store_guard:
+        _store_instance = None
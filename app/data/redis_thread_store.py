@@ -0,0 +1,270 @@
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+sys.path.append('/workplace/')
+
+"""
+Redis Thread Store
+
+Backend do `threads_manager` para servidores compatíveis com o protocolo Redis, permitindo que vários nós
+atendam os mesmos usuários compartilhando o mapeamento usuário -> thread.
+
+Layout das chaves (com o prefixo configurado em `ThreadStoreConfig.REDIS_KEY_PREFIX`):
+
+- `{prefixo}:threads` (hash): user_name -> thread_id.
+- `{prefixo}:users` (hash): thread_id -> user_name, índice reverso que torna `retrieve_user_name` O(1).
+- `{prefixo}:activity` (sorted set): user_name com score igual ao timestamp da última atividade, o que
+  torna a busca por usuários ociosos um ZRANGEBYSCORE.
+- `{prefixo}:meta:{thread_id}` (hash): metadados do thread, como o assistente escolhido para ele.
+- `{prefixo}:runs` (sorted set): thread_id com score igual ao início do run em andamento gravado nos
+  metadados, o que torna a busca por runs presos um ZRANGEBYSCORE.
+- `{prefixo}:lock:{user_name}` (string com expiração): bloqueio distribuído de criação de thread.
+- `{prefixo}:sweep:{nome}` (string com expiração): reserva de uma varredura periódica pelo intervalo dela.
+
+As escritas que tocam os dois hashes são scripts Lua, portanto atômicas no servidor. As operações em lote
+enviam os comandos em pipelines de `BATCH_SIZE` itens, pagando um round-trip por lote em vez de um por
+registro. Cada processo mantém um pool de conexões próprio.
+
+Referências:
+- Documentação do redis-py: https://redis.readthedocs.io/
+- Comandos de hash do Redis: https://redis.io/commands/?group=hash
+"""
+
+BATCH_SIZE = 500
+
+# Grava o novo thread e mantém o índice reverso coerente, removendo a entrada do thread anterior.
+_UPSERT_SCRIPT = """
+local old = redis.call('HGET', KEYS[1], ARGV[1])
+if old then redis.call('HDEL', KEYS[2], old) end
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+redis.call('HSET', KEYS[2], ARGV[2], ARGV[1])
+redis.call('ZADD', KEYS[3], ARGV[3], ARGV[1])
+return old
+"""
+
+# Compare-and-set: grava apenas se o usuário ainda não possuir thread; retorna o thread vigente.
+_INSERT_IF_ABSENT_SCRIPT = """
+local old = redis.call('HGET', KEYS[1], ARGV[1])
+if old then return old end
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+redis.call('HSET', KEYS[2], ARGV[2], ARGV[1])
+redis.call('ZADD', KEYS[3], ARGV[3], ARGV[1])
+return ARGV[2]
+"""
+
+_DELETE_SCRIPT = """
+redis.call('ZREM', KEYS[3], ARGV[1])
+local old = redis.call('HGET', KEYS[1], ARGV[1])
+if not old then return 0 end
+redis.call('HDEL', KEYS[1], ARGV[1])
+redis.call('HDEL', KEYS[2], old)
+redis.call('DEL', ARGV[2] .. old)
+return 1
+"""
+
+# Remoção condicional: só expira o usuário se a última atividade ainda for anterior ao corte (ARGV[2]).
+_EXPIRE_IF_IDLE_SCRIPT = """
+local last = redis.call('ZSCORE', KEYS[3], ARGV[1])
+if (not last) or tonumber(last) >= tonumber(ARGV[2]) then return false end
+redis.call('ZREM', KEYS[3], ARGV[1])
+local old = redis.call('HGET', KEYS[1], ARGV[1])
+if not old then return false end
+redis.call('HDEL', KEYS[1], ARGV[1])
+redis.call('HDEL', KEYS[2], old)
+redis.call('DEL', ARGV[3] .. old)
+return old
+"""
+
+# Remoção condicional do run em andamento: só se o run gravado ainda for ARGV[1].
+_CLEAR_RUN_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'active_run_id') ~= ARGV[1] then return 0 end
+redis.call('HDEL', KEYS[1], 'active_run_id', 'active_run_started_at')
+redis.call('ZREM', KEYS[2], ARGV[2])
+return 1
+"""
+
+
+def _batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class RedisThreadStore:
+    """
+    Backend Redis do mapeamento usuário -> thread, com a mesma interface de `ShelveThreadStore`.
+
+    Parâmetros:
+        url (str): URL de conexão, por exemplo "redis://localhost:6379/0".
+        max_connections (int): Tamanho máximo do pool de conexões deste processo.
+        key_prefix (str): Prefixo aplicado a todas as chaves.
+        lock_timeout (float): Expiração, em segundos, do bloqueio de criação de thread. Garante que um
+            processo que morra segurando o bloqueio não trave o usuário indefinidamente.
+        socket_timeout (float, optional): Tempo limite das operações no Redis. Padrão: sem limite.
+
+    Exemplo de Uso:
+        store = RedisThreadStore("redis://localhost:6379/0")
+        store.set("Cícero", "thread_123")
+        store.get("Cícero")  # "thread_123"
+    """
+
+    def __init__(self, url, max_connections=20, key_prefix="interface_openai", lock_timeout=60.0, socket_timeout=None):
+        # Importado aqui para que o pacote `redis` só seja exigido quando este backend for selecionado.
+        import redis
+
+        self._pool = redis.ConnectionPool.from_url(url, max_connections=max_connections, decode_responses=True,
+                                                   socket_timeout=socket_timeout)
+        self._redis = redis.Redis(connection_pool=self._pool)
+        self._prefix = key_prefix
+        self._threads_key = f"{key_prefix}:threads"
+        self._users_key = f"{key_prefix}:users"
+        self._activity_key = f"{key_prefix}:activity"
+        self._meta_prefix = f"{key_prefix}:meta:"
+        self._runs_key = f"{key_prefix}:runs"
+        self._lock_timeout = lock_timeout
+        self._upsert = self._redis.register_script(_UPSERT_SCRIPT)
+        self._insert_if_absent = self._redis.register_script(_INSERT_IF_ABSENT_SCRIPT)
+        self._delete = self._redis.register_script(_DELETE_SCRIPT)
+        self._expire_if_idle = self._redis.register_script(_EXPIRE_IF_IDLE_SCRIPT)
+        self._clear_run = self._redis.register_script(_CLEAR_RUN_SCRIPT)
+
+    @property
+    def _keys(self):
+        return [self._threads_key, self._users_key, self._activity_key]
+
+    def get(self, user_name):
+        return self._redis.hget(self._threads_key, user_name)
+
+    def find_user(self, thread_id):
+        return self._redis.hget(self._users_key, thread_id)
+
+    def items(self):
+        # HSCAN percorre o hash em blocos no servidor, sem materializá-lo inteiro no cliente.
+        yield from self._redis.hscan_iter(self._threads_key, count=BATCH_SIZE)
+
+    def count(self):
+        return self._redis.hlen(self._threads_key)
+
+    def set(self, user_name, thread_id):
+        self._upsert(keys=self._keys, args=[user_name, thread_id, time.time()])
+
+    def set_if_absent(self, user_name, thread_id):
+        return self._insert_if_absent(keys=self._keys, args=[user_name, thread_id, time.time()])
+
+    def set_many(self, pairs):
+        count = 0
+        now = time.time()
+        for batch in _batches(pairs, BATCH_SIZE):
+            pipe = self._redis.pipeline(transaction=False)
+            for user_name, thread_id in batch:
+                self._upsert(keys=self._keys, args=[user_name, thread_id, now], client=pipe)
+            pipe.execute()
+            count += len(batch)
+        return count
+
+    def delete(self, user_name):
+        return self._delete(keys=self._keys, args=[user_name, self._meta_prefix]) == 1
+
+    def delete_many(self, user_names):
+        count = 0
+        for batch in _batches(user_names, BATCH_SIZE):
+            pipe = self._redis.pipeline(transaction=False)
+            for user_name in batch:
+                self._delete(keys=self._keys, args=[user_name, self._meta_prefix], client=pipe)
+            count += sum(pipe.execute())
+        return count
+
+    def clear(self):
+        self._redis.delete(*self._keys, self._runs_key)
+        for batch in _batches(self._redis.scan_iter(match=f"{self._meta_prefix}*", count=BATCH_SIZE), BATCH_SIZE):
+            self._redis.delete(*batch)
+
+    def get_metadata(self, thread_id):
+        return self._redis.hgetall(self._meta_prefix + thread_id)
+
+    def update_metadata(self, thread_id, fields):
+        pipe = self._redis.pipeline(transaction=True)
+        to_set = {name: value for name, value in fields.items() if value is not None}
+        to_delete = [name for name, value in fields.items() if value is None]
+        if to_set:
+            pipe.hset(self._meta_prefix + thread_id, mapping=to_set)
+        if to_delete:
+            pipe.hdel(self._meta_prefix + thread_id, *to_delete)
+        pipe.execute()
+
+    def set_active_run(self, thread_id, run_id, started_at):
+        pipe = self._redis.pipeline(transaction=True)
+        pipe.hset(self._meta_prefix + thread_id,
+                  mapping={"active_run_id": run_id, "active_run_started_at": str(started_at)})
+        pipe.zadd(self._runs_key, {thread_id: started_at})
+        pipe.execute()
+
+    def clear_active_run(self, thread_id, run_id):
+        return self._clear_run(keys=[self._meta_prefix + thread_id, self._runs_key], args=[run_id, thread_id]) == 1
+
+    def stale_runs(self, cutoff, limit):
+        thread_ids = self._redis.zrangebyscore(self._runs_key, "-inf", f"({cutoff}", start=0, num=limit)
+        if not thread_ids:
+            return []
+        pipe = self._redis.pipeline(transaction=False)
+        for thread_id in thread_ids:
+            pipe.hget(self._meta_prefix + thread_id, "active_run_id")
+        stale, gone = [], []
+        for thread_id, run_id in zip(thread_ids, pipe.execute()):
+            if run_id:
+                stale.append((thread_id, run_id))
+            else:
+                gone.append(thread_id)
+        if gone:
+            # Threads removidos ou expirados (com os metadados) deixam a entrada no índice; limpa aqui.
+            self._redis.zrem(self._runs_key, *gone)
+        return stale
+
+    def touch_many(self, last_activity):
+        for batch in _batches(last_activity.items(), BATCH_SIZE):
+            # GT: nunca retrocede a atividade gravada por outro nó com um timestamp mais recente.
+            self._redis.zadd(self._activity_key, dict(batch), gt=True)
+
+    def backfill_activity(self, timestamp):
+        count = 0
+        for batch in _batches(self._redis.hscan_iter(self._threads_key, count=BATCH_SIZE), BATCH_SIZE):
+            count += self._redis.zadd(self._activity_key, {user_name: timestamp for user_name, _ in batch}, nx=True)
+        return count
+
+    def idle_users(self, cutoff, limit):
+        return self._redis.zrangebyscore(self._activity_key, "-inf", f"({cutoff}", start=0, num=limit)
+
+    def expire_if_idle(self, user_name, cutoff):
+        return self._expire_if_idle(keys=self._keys, args=[user_name, cutoff, self._meta_prefix])
+
+    def claim_sweep(self, name, interval, now):
+        # SET NX com expiração: só o primeiro processo do intervalo cria a chave.
+        return bool(self._redis.set(f"{self._prefix}:sweep:{name}", now, nx=True, px=max(1, int(interval * 1000))))
+
+    def compact(self):
+        # O servidor libera a memória das chaves removidas; não há arquivo local a compactar.
+        pass
+
+    @contextmanager
+    def creation_lock(self, user_name):
+        lock = self._redis.lock(
+            f"{self._prefix}:lock:{user_name}",
+            timeout=self._lock_timeout,
+            blocking_timeout=self._lock_timeout,
+            thread_local=False,
+        )
+        if not lock.acquire(token=uuid.uuid4().hex):
+            raise TimeoutError(f"Não foi possível obter o bloqueio de criação de thread para {user_name}.")
+        try:
+            yield
+        finally:
+            lock.release()
+
+    def close(self):
+        self._pool.disconnect()
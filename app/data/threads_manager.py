@@ -1,12 +1,462 @@
 import shelve
+import dbm
+import json
 import os
 import sys
+import threading
+import time
+import zlib
+from contextlib import contextmanager, ExitStack
+try:
+    import fcntl
+except ImportError:  # Windows: sem bloqueio entre processos, apenas dentro do processo.
+    fcntl = None
 sys.path.append('/workplace/')
 from app.decorators.log_decorator import log_function_call
+from app.utils.openia_config import ThreadStoreConfig
+
+# Este módulo é a fachada de armazenamento do mapeamento usuário -> thread. As funções públicas mantêm
+# a mesma assinatura para qualquer backend; o backend é escolhido por `ThreadStoreConfig.BACKEND`:
+# "shelve" (padrão, arquivo local abaixo) ou "redis" (compartilhado entre nós, ver redis_thread_store.py).
 
 # Define o caminho para o arquivo do banco de dados threads.db
 DB_PATH = os.path.join(os.path.dirname(__file__), 'threads')
 
+# Arquivo auxiliar usado apenas para bloqueios entre processos (fcntl.lockf por faixa de bytes).
+# O byte 0 protege o próprio banco shelve; os demais bytes são "slots" por usuário, usados para
+# serializar a criação de threads de um mesmo usuário sem bloquear os demais.
+LOCK_PATH = DB_PATH + '.lock'
+USER_LOCK_SLOTS = 4096
+
+
+# Bloqueios do fcntl pertencem ao processo e são todos liberados quando *qualquer* descritor do arquivo
+# é fechado; por isso o arquivo de bloqueio é aberto uma única vez por processo, e cada slot também
+# possui um `_SlotLock` que coordena as threads do próprio processo.
+_lock_file = None
+_slot_locks = {}
+_slot_locks_guard = threading.Lock()
+
+
+class _SlotLock:
+    """
+    Bloqueio leitor-escritor de um slot dentro do processo, combinado com o bloqueio `fcntl` do mesmo byte.
+
+    Várias threads podem ler ao mesmo tempo: a primeira leitora adquire o `LOCK_SH` do processo e só a última o
+    libera, já que o bloqueio do `fcntl` pertence ao processo e não a cada thread. Uma escritora aguarda a saída das
+    leitoras e, enquanto espera, impede a entrada de novas, para não ser adiada indefinidamente.
+    """
+
+    def __init__(self, slot: int):
+        self.slot = slot
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writing = False
+        self._waiting_writers = 0
+
+    def _acquire_file(self, exclusive: bool):
+        if fcntl is not None:
+            fcntl.lockf(_lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH, 1, self.slot)
+
+    def _release_file(self):
+        if fcntl is not None:
+            fcntl.lockf(_lock_file, fcntl.LOCK_UN, 1, self.slot)
+
+    @contextmanager
+    def shared(self):
+        with self._cond:
+            while self._writing or self._waiting_writers:
+                self._cond.wait()
+            if not self._readers:
+                # Adquirido sob a condição: as demais leitoras só entram depois que o processo detém o byte.
+                self._acquire_file(exclusive=False)
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._release_file()
+                    self._cond.notify_all()
+
+    @contextmanager
+    def exclusive(self):
+        with self._cond:
+            self._waiting_writers += 1
+            try:
+                while self._writing or self._readers:
+                    self._cond.wait()
+            finally:
+                self._waiting_writers -= 1
+            self._writing = True
+        try:
+            self._acquire_file(exclusive=True)
+            try:
+                yield
+            finally:
+                self._release_file()
+        finally:
+            with self._cond:
+                self._writing = False
+                self._cond.notify_all()
+
+
+def _slot_lock(slot: int) -> _SlotLock:
+    with _slot_locks_guard:
+        lock = _slot_locks.get(slot)
+        if lock is None:
+            lock = _slot_locks[slot] = _SlotLock(slot)
+            global _lock_file
+            if _lock_file is None and fcntl is not None:
+                _lock_file = open(LOCK_PATH, 'a+')
+        return lock
+
+
+def _file_lock(slot: int, exclusive: bool = True):
+    """
+    Adquire um bloqueio entre processos sobre um byte do arquivo `LOCK_PATH`: exclusivo, ou compartilhado com as
+    demais leitoras deste e de outros processos.
+
+    Em plataformas sem `fcntl` apenas o bloqueio dentro do processo é aplicado.
+    """
+    lock = _slot_lock(slot)
+    return lock.exclusive() if exclusive else lock.shared()
+
+
+def _activity_path():
+    # Banco auxiliar com o instante da última atividade de cada usuário (user_name -> timestamp).
+    return DB_PATH + '_activity'
+
+
+def _metadata_path():
+    # Banco auxiliar com os metadados de cada thread (thread_id -> dict), como o assistente escolhido.
+    return DB_PATH + '_meta'
+
+
+def _sweeps_path():
+    # Instante da última execução de cada varredura periódica (nome -> timestamp), em JSON.
+    return DB_PATH + '_sweeps.json'
+
+
+@contextmanager
+def _open_db(flag: str = 'r', path: str = None):
+    """
+    Abre o banco shelve sob o bloqueio do banco: compartilhado para leitura ('r'), exclusivo para escrita.
+
+    Uma leitura de um banco ainda inexistente se comporta como um banco vazio, em vez de falhar.
+    O bloqueio é o mesmo para o banco principal e para o banco de atividade (`path`).
+    """
+    with _file_lock(0, exclusive=(flag != 'r')):
+        try:
+            db = shelve.open(path or DB_PATH, flag)
+        except dbm.error:
+            if flag != 'r':
+                raise
+            yield {}
+            return
+        with db:
+            yield db
+
+
+@contextmanager
+def _open_dbs(*extra_paths):
+    # Abre o banco principal, o de atividade e os `extra_paths` para escrita, sob um único bloqueio exclusivo.
+    with _file_lock(0), ExitStack() as stack:
+        yield [stack.enter_context(shelve.open(path, 'c')) for path in (DB_PATH, _activity_path()) + extra_paths]
+
+
+def _compact_shelve(path: str):
+    """
+    Reescreve um banco shelve contendo apenas os registros vivos, devolvendo ao disco o espaço ocupado
+    por registros removidos ou sobrescritos. Deve ser chamada sob o bloqueio exclusivo do banco.
+
+    O `dbm.gnu` faz isso nativamente (`reorganize`); para os demais backends os registros são copiados para
+    um banco novo, cujos arquivos substituem atomicamente (`os.replace`) os originais.
+    """
+    try:
+        db = shelve.open(path, 'w')
+    except dbm.error:
+        return
+    with db:
+        raw = getattr(db, 'dict', None)
+        if hasattr(raw, 'reorganize'):
+            raw.reorganize()
+            return
+        tmp_path = path + '.compact'
+        with shelve.open(tmp_path, 'n') as tmp:
+            for key in _iter_keys(db):
+                tmp[key] = db[key]
+    # Sufixos usados pelos backends dbm (gnu: nenhum; ndbm: .db; dumb: .dat/.dir/.bak).
+    for suffix in ('', '.db', '.dat', '.dir', '.bak'):
+        if os.path.exists(tmp_path + suffix):
+            os.replace(tmp_path + suffix, path + suffix)
+
+
+def _iter_keys(db):
+    """
+    Itera as chaves do banco shelve sem materializar a lista completa quando o dbm permite.
+
+    O `dbm.gnu` expõe `firstkey`/`nextkey`, que percorrem o arquivo sob demanda; para os demais
+    backends recorre-se a `keys()`.
+    """
+    raw = getattr(db, 'dict', None)
+    if raw is not None and hasattr(raw, 'firstkey'):
+        key = raw.firstkey()
+        while key is not None:
+            yield key.decode(db.keyencoding)
+            key = raw.nextkey(key)
+    else:
+        yield from db.keys()
+
+
+class ShelveThreadStore:
+    """
+    Backend local do mapeamento usuário -> thread, baseado em `shelve` no arquivo `DB_PATH`.
+
+    Cada operação abre o banco sob o bloqueio de arquivo (`_open_db`), o que o torna seguro entre processos
+    do mesmo host, mas não entre hosts diferentes. As operações em lote abrem o banco uma única vez e
+    dispensam o writeback, para que nenhum registro fique em cache na memória.
+    """
+
+    def get(self, user_name):
+        with _open_db('r') as db:
+            return db.get(user_name)
+
+    def find_user(self, thread_id):
+        with _open_db('r') as db:
+            for key, value in db.items():
+                if value == thread_id:
+                    return key
+        return None
+
+    def items(self):
+        with _open_db('r') as db:
+            for user_name in _iter_keys(db):
+                yield user_name, db[user_name]
+
+    def count(self):
+        with _open_db('r') as db:
+            return len(db)
+
+    def set(self, user_name, thread_id):
+        with _open_dbs() as (db, activity):
+            db[user_name] = thread_id
+            activity[user_name] = time.time()
+
+    def set_if_absent(self, user_name, thread_id):
+        with _open_dbs() as (db, activity):
+            existing = db.get(user_name)
+            if existing is not None:
+                return existing
+            db[user_name] = thread_id
+            activity[user_name] = time.time()
+            return thread_id
+
+    def set_many(self, pairs):
+        count = 0
+        now = time.time()
+        with _open_dbs() as (db, activity):
+            for user_name, thread_id in pairs:
+                db[user_name] = thread_id
+                activity[user_name] = now
+                count += 1
+        return count
+
+    def delete(self, user_name):
+        return self.delete_many([user_name]) == 1
+
+    def delete_many(self, user_names):
+        count = 0
+        with _open_dbs(_metadata_path()) as (db, activity, metadata):
+            for user_name in user_names:
+                if user_name in db:
+                    metadata.pop(db.pop(user_name), None)
+                    count += 1
+                if user_name in activity:
+                    del activity[user_name]
+        return count
+
+    def clear(self):
+        with _open_dbs(_metadata_path()) as (db, activity, metadata):
+            db.clear()
+            activity.clear()
+            metadata.clear()
+
+    def get_metadata(self, thread_id):
+        with _open_db('r', path=_metadata_path()) as metadata:
+            return dict(metadata.get(thread_id, {}))
+
+    def update_metadata(self, thread_id, fields):
+        with _open_db('c', path=_metadata_path()) as metadata:
+            current = metadata.get(thread_id, {})
+            for name, value in fields.items():
+                if value is None:
+                    current.pop(name, None)
+                else:
+                    current[name] = value
+            if current:
+                metadata[thread_id] = current
+            else:
+                metadata.pop(thread_id, None)
+
+    def set_active_run(self, thread_id, run_id, started_at):
+        self.update_metadata(thread_id, {"active_run_id": run_id, "active_run_started_at": str(started_at)})
+
+    def clear_active_run(self, thread_id, run_id):
+        # Condicional: um run mais novo do mesmo thread, gravado nesse meio-tempo, é preservado.
+        with _open_db('c', path=_metadata_path()) as metadata:
+            current = metadata.get(thread_id)
+            if current is None or current.get("active_run_id") != run_id:
+                return False
+            current.pop("active_run_id", None)
+            current.pop("active_run_started_at", None)
+            if current:
+                metadata[thread_id] = current
+            else:
+                del metadata[thread_id]
+            return True
+
+    def stale_runs(self, cutoff, limit):
+        stale = []
+        with _open_db('r', path=_metadata_path()) as metadata:
+            for thread_id in _iter_keys(metadata):
+                current = metadata[thread_id]
+                if "active_run_id" in current and float(current["active_run_started_at"]) < cutoff:
+                    stale.append((thread_id, current["active_run_id"]))
+                    if len(stale) >= limit:
+                        break
+        return stale
+
+    def touch_many(self, last_activity):
+        with _open_db('c', path=_activity_path()) as activity:
+            for user_name, timestamp in last_activity.items():
+                activity[user_name] = max(timestamp, activity.get(user_name, 0))
+
+    def backfill_activity(self, timestamp):
+        # Usuários gravados antes do registro de atividade passam a contar como ativos a partir de agora.
+        count = 0
+        with _open_dbs() as (db, activity):
+            for user_name in _iter_keys(db):
+                if user_name not in activity:
+                    activity[user_name] = timestamp
+                    count += 1
+        return count
+
+    def idle_users(self, cutoff, limit):
+        idle = []
+        with _open_db('r', path=_activity_path()) as activity:
+            for user_name in _iter_keys(activity):
+                if activity[user_name] < cutoff:
+                    idle.append(user_name)
+                    if len(idle) >= limit:
+                        break
+        return idle
+
+    def expire_if_idle(self, user_name, cutoff):
+        # Remoção condicional: se o usuário voltou a ter atividade desde a varredura, nada é removido.
+        with _open_dbs(_metadata_path()) as (db, activity, metadata):
+            if activity.get(user_name, cutoff) >= cutoff:
+                return None
+            del activity[user_name]
+            thread_id = db.pop(user_name, None)
+            if thread_id is not None:
+                metadata.pop(thread_id, None)
+            return thread_id
+
+    def claim_sweep(self, name, interval, now):
+        with _file_lock(0):
+            path = _sweeps_path()
+            try:
+                with open(path, encoding='utf-8') as sweeps_file:
+                    sweeps = json.load(sweeps_file)
+            except (FileNotFoundError, ValueError):
+                sweeps = {}
+            if now - sweeps.get(name, 0) < interval:
+                return False
+            sweeps[name] = now
+            with open(path + '.tmp', 'w', encoding='utf-8') as sweeps_file:
+                json.dump(sweeps, sweeps_file)
+            os.replace(path + '.tmp', path)
+            return True
+
+    def compact(self):
+        with _file_lock(0):
+            _compact_shelve(DB_PATH)
+            _compact_shelve(_activity_path())
+            _compact_shelve(_metadata_path())
+
+    @contextmanager
+    def creation_lock(self, user_name):
+        # Cada usuário é mapeado (por CRC32) para um slot de `USER_LOCK_SLOTS` bytes do arquivo de bloqueio,
+        # de modo que usuários diferentes raramente disputam o mesmo bloqueio.
+        slot = 1 + zlib.crc32(user_name.encode('utf-8')) % USER_LOCK_SLOTS
+        with _file_lock(slot):
+            yield
+
+
+_store_instance = None
+_store_guard = threading.Lock()
+
+
+def _store():
+    """
+    Retorna o backend configurado em `ThreadStoreConfig.BACKEND`, criando-o no primeiro uso.
+    """
+    global _store_instance
+    if _store_instance is None:
+        with _store_guard:
+            if _store_instance is None:
+                backend = ThreadStoreConfig.BACKEND.lower()
+                if backend == "shelve":
+                    _store_instance = ShelveThreadStore()
+                elif backend == "redis":
+                    from app.data.redis_thread_store import RedisThreadStore
+                    _store_instance = RedisThreadStore(
+                        url=ThreadStoreConfig.REDIS_URL,
+                        max_connections=ThreadStoreConfig.REDIS_MAX_CONNECTIONS,
+                        key_prefix=ThreadStoreConfig.REDIS_KEY_PREFIX,
+                        socket_timeout=ThreadStoreConfig.REDIS_SOCKET_TIMEOUT_SECONDS,
+                    )
+                else:
+                    raise ValueError(f"Backend de armazenamento de threads desconhecido: {ThreadStoreConfig.BACKEND}")
+    return _store_instance
+
+
+def reset_store():
+    """
+    Descarta o backend em uso, forçando sua recriação no próximo acesso.
+
+    Útil em testes e após um `fork`, quando conexões e descritores herdados do processo pai não devem ser
+    reutilizados.
+    """
+    global _store_instance, _lock_file
+    with _store_guard:
+        if _store_instance is not None and hasattr(_store_instance, "close"):
+            _store_instance.close()
+        _store_instance = None
+    with _slot_locks_guard:
+        _slot_locks.clear()
+        _lock_file = None
+
+
+@contextmanager
+def thread_creation_lock(user_name: str):
+    """
+    Serializa, entre processos, a criação do thread de um mesmo usuário.
+
+    No backend shelve o bloqueio é um `fcntl.lockf` por usuário no arquivo `LOCK_PATH` (mesmo host); no
+    backend Redis é um bloqueio distribuído com expiração (vários nós). Deve envolver todo o trecho
+    "verificar -> criar thread remoto -> armazenar", garantindo que apenas um processo chame
+    `create_thread` para o usuário.
+
+    Exemplo de Uso:
+        with thread_creation_lock("Cícero"):
+            if retrieve_thread_id("Cícero") is None:
+                upsert_thread("Cícero", create_thread().id)
+    """
+    with _store().creation_lock(user_name):
+        yield
+
 @log_function_call
 def retrieve_thread_id(user_name: str):
     """
@@ -29,8 +479,7 @@ def retrieve_thread_id(user_name: str):
         else:
             print("Nenhum thread encontrado para Cícero.")
     """
-    with shelve.open(DB_PATH, 'r') as db:
-        return db.get(user_name)
+    return _store().get(user_name)
 
 @log_function_call
 def retrieve_user_name(thread_id: str):
@@ -54,11 +503,7 @@ def retrieve_user_name(thread_id: str):
         else:
             print("Nenhum usuário encontrado para o ID do thread XYZ123.")
     """
-    with shelve.open(DB_PATH, 'r') as db:
-        for key, value in db.items():
-            if value == thread_id:
-                return key
-    return None
+    return _store().find_user(thread_id)
 
 # Exemplos de uso das funções
 # print("Buscando o ID do thread para o usuário 'Cícero':")
@@ -92,12 +537,12 @@ def print_shelve_contents():
         user_name: Joaquim -> Thread ID: XYZ123
         user_name: Boris -> Thread ID: ABC789
     """
-    with shelve.open(DB_PATH, flag='r') as db:
-        if len(db) == 0:
-            print("O banco de dados shelve está vazio.")
-        else:
-            for key, value in db.items():
-                print(f"user_name: {key} -> Thread ID: {value}")
+    store = _store()
+    if store.count() == 0:
+        print("O banco de dados shelve está vazio.")
+    else:
+        for key, value in store.items():
+            print(f"user_name: {key} -> Thread ID: {value}")
 
 @log_function_call
 def upsert_thread(user_name: str, thread_id: str):
@@ -115,9 +560,26 @@ def upsert_thread(user_name: str, thread_id: str):
 
     A função também imprime uma mensagem de sucesso para confirmar a operação realizada.
     """
-    with shelve.open(DB_PATH, writeback=True) as db:
-        db[user_name] = thread_id
-        return f"Thread_id {thread_id} : e user_name: {user_name} atualizado/inserido com sucesso."
+    _store().set(user_name, thread_id)
+    return f"Thread_id {thread_id} : e user_name: {user_name} atualizado/inserido com sucesso."
+
+@log_function_call
+def insert_thread_if_absent(user_name: str, thread_id: str):
+    """
+    Insere o registro de thread apenas se o usuário ainda não possuir um (compare-and-set).
+
+    Parâmetros:
+        user_name (str): O nome do usuário associado ao thread.
+        thread_id (str): O ID do thread candidato a ser armazenado.
+
+    Retorna:
+        str: O thread ID efetivamente associado ao usuário após a operação. Se outro processo tiver
+             armazenado um thread antes, o ID existente é retornado e o candidato é descartado.
+
+    Diferente de `upsert_thread`, esta função nunca sobrescreve um mapeamento existente, o que evita
+    que a última escrita concorrente "vença" e deixe órfão o histórico de conversa já criado.
+    """
+    return _store().set_if_absent(user_name, thread_id)
 
 @log_function_call
 def delete_thread(user_name: str):
@@ -134,12 +596,10 @@ def delete_thread(user_name: str):
     Esta função é útil para limpar threads antigos ou quando um usuário solicita a remoção
     de seus dados.
     """
-    with shelve.open(DB_PATH, writeback=True) as db:
-        if user_name in db:
-            del db[user_name]
-            print(f"Thread {user_name} removido com sucesso.")
-        else:
-            print(f"Thread com nome de usuário {user_name} não encontrado.")
+    if _store().delete(user_name):
+        print(f"Thread {user_name} removido com sucesso.")
+    else:
+        print(f"Thread com nome de usuário {user_name} não encontrado.")
 
 @log_function_call
 def clear_all_threads():
@@ -153,10 +613,344 @@ def clear_all_threads():
     Após a execução desta função, uma mensagem de confirmação é impressa para indicar que todos
     os dados foram removidos com sucesso.
     """
-    with shelve.open(DB_PATH, writeback=True) as db:
-        db.clear()
-        print("Todos os threads foram removidos com sucesso.")
+    _store().clear()
+    print("Todos os threads foram removidos com sucesso.")
+
+
+@log_function_call
+def retrieve_thread_metadata(thread_id: str) -> dict:
+    """
+    Recupera os metadados associados a um thread, como o assistente escolhido para ele.
+
+    Os metadados são removidos junto com o mapeamento do usuário (remoção ou expiração).
+
+    Parâmetros:
+        thread_id (str): O ID do thread.
 
+    Retorna:
+        dict: Os metadados do thread; um dicionário vazio se não houver nenhum.
+
+    Exemplo de Uso:
+        assistant_id = retrieve_thread_metadata("thread_123").get("assistant_id")
+    """
+    return _store().get_metadata(thread_id)
+
+
+@log_function_call
+def update_thread_metadata(thread_id: str, **fields):
+    """
+    Grava (ou, com valor None, remove) campos de metadados de um thread, preservando os demais campos.
 
-# Exemplo de uso: Imprimindo o conteúdo do threads.db para verificar os dados atuais.
+    Parâmetros:
+        thread_id (str): O ID do thread.
+        **fields: Os campos a gravar, com valores do tipo str.
+
+    Exemplo de Uso:
+        update_thread_metadata("thread_123", assistant_id="asst_abc")
+    """
+    _store().update_metadata(thread_id, fields)
+
+
+# **SEÇÃO: Runs ativos**
 #
+# O run em andamento de cada thread é gravado nos metadados (`active_run_id` e `active_run_started_at`)
+# enquanto o turno o acompanha, e removido ao seu fim. Um run que continua gravado muito depois do
+# prazo do turno pertence a um processo que parou no meio dele; a varredura de runs presos
+# (app/services/run_recovery.py) o cancela, liberando o thread para novas mensagens.
+
+@log_function_call
+def mark_active_run(thread_id: str, run_id: str):
+    """
+    Grava o run em andamento do thread, com o instante atual.
+
+    Parâmetros:
+        thread_id (str): O ID do thread.
+        run_id (str): O ID do run criado.
+    """
+    _store().set_active_run(thread_id, run_id, time.time())
+
+
+@log_function_call
+def clear_active_run(thread_id: str, run_id: str) -> bool:
+    """
+    Remove o registro do run em andamento do thread, se ainda for `run_id`.
+
+    Retorna:
+        bool: True se o registro foi removido.
+    """
+    return _store().clear_active_run(thread_id, run_id)
+
+
+@log_function_call
+def retrieve_active_run(thread_id: str):
+    """
+    Retorna o run em andamento gravado para o thread.
+
+    Retorna:
+        tuple or None: (run_id, início em segundos desde a época), ou None se não houver run gravado.
+    """
+    metadata = _store().get_metadata(thread_id)
+    if not metadata.get("active_run_id"):
+        return None
+    return metadata["active_run_id"], float(metadata["active_run_started_at"])
+
+
+@log_function_call
+def find_stale_runs(age_seconds: float, limit: int = 1000):
+    """
+    Lista os runs gravados como em andamento há mais de `age_seconds` segundos.
+
+    Parâmetros:
+        age_seconds (float): A duração a partir da qual um run é considerado preso.
+        limit (int): A quantidade máxima de runs retornados por chamada.
+
+    Retorna:
+        list[tuple]: Pares (thread_id, run_id).
+    """
+    return _store().stale_runs(time.time() - age_seconds, limit)
+
+
+# **SEÇÃO: Atividade e expiração**
+#
+# A última atividade de cada usuário é acumulada em memória por `touch_thread` e gravada em lote no
+# backend a cada `ThreadStoreConfig.ACTIVITY_FLUSH_INTERVAL_SECONDS`, evitando uma escrita por mensagem.
+# A varredura de expiração (app/services/thread_expiry.py) sempre grava o acumulado antes de procurar
+# usuários ociosos.
+
+_pending_activity = {}
+_pending_activity_guard = threading.Lock()
+_last_activity_flush = time.monotonic()
+
+
+@log_function_call
+def touch_thread(user_name: str):
+    """
+    Registra que o usuário acabou de interagir com seu thread.
+
+    O registro é mantido em memória e gravado em lote; se o intervalo de gravação já tiver passado,
+    a própria chamada dispara a gravação.
+
+    Parâmetros:
+        user_name (str): O nome do usuário que interagiu.
+    """
+    global _last_activity_flush
+    now = time.time()
+    with _pending_activity_guard:
+        _pending_activity[user_name] = now
+        due = time.monotonic() - _last_activity_flush >= ThreadStoreConfig.ACTIVITY_FLUSH_INTERVAL_SECONDS
+    if due:
+        flush_activity()
+
+
+@log_function_call
+def flush_activity() -> int:
+    """
+    Grava no backend a atividade acumulada em memória por `touch_thread`.
+
+    Retorna:
+        int: A quantidade de usuários cuja atividade foi gravada.
+    """
+    global _last_activity_flush
+    with _pending_activity_guard:
+        pending = dict(_pending_activity)
+        _pending_activity.clear()
+        _last_activity_flush = time.monotonic()
+    if pending:
+        _store().touch_many(pending)
+    return len(pending)
+
+
+@log_function_call
+def find_idle_threads(idle_seconds: float, limit: int = 1000):
+    """
+    Lista os usuários sem atividade há mais de `idle_seconds` segundos.
+
+    Parâmetros:
+        idle_seconds (float): O tempo máximo de ociosidade tolerado.
+        limit (int): A quantidade máxima de usuários retornados por chamada.
+
+    Retorna:
+        list[str]: Os nomes dos usuários ociosos.
+    """
+    flush_activity()
+    return _store().idle_users(time.time() - idle_seconds, limit)
+
+
+@log_function_call
+def expire_thread_if_idle(user_name: str, idle_seconds: float):
+    """
+    Remove o mapeamento do usuário se ele continuar ocioso há mais de `idle_seconds` segundos.
+
+    A verificação e a remoção são atômicas no backend, de modo que um usuário que voltou a interagir
+    entre a varredura e a remoção mantém o seu thread.
+
+    Retorna:
+        str or None: O thread ID removido, ou None se o usuário não estava mais ocioso (ou não existia).
+    """
+    return _store().expire_if_idle(user_name, time.time() - idle_seconds)
+
+
+@log_function_call
+def backfill_activity() -> int:
+    """
+    Atribui a atividade "agora" aos usuários que ainda não possuem registro de atividade.
+
+    Necessária uma única vez para bancos criados antes do registro de atividade, evitando que esses
+    usuários sejam tratados como ociosos (ou nunca expirados).
+
+    Retorna:
+        int: A quantidade de usuários atualizados.
+    """
+    return _store().backfill_activity(time.time())
+
+
+@log_function_call
+def claim_sweep(name: str, interval: float) -> bool:
+    """
+    Reserva para o processo atual a execução da varredura periódica `name`, no máximo uma vez a cada `interval`
+    segundos em toda a implantação (todos os workers e, no Redis, todos os nós).
+
+    Parâmetros:
+        name (str): O nome da varredura.
+        interval (float): O intervalo mínimo entre duas execuções, em segundos.
+
+    Retorna:
+        bool: True se o processo deve executar a varredura agora; False se outro processo já a executou (ou a
+              está executando) neste intervalo.
+
+    Exemplo de Uso:
+        if claim_sweep("thread_expiry", 3600):
+            sweep_idle_threads()
+    """
+    return _store().claim_sweep(name, interval, time.time())
+
+
+@log_function_call
+def compact_store():
+    """
+    Compacta o armazenamento local, devolvendo ao disco o espaço de registros removidos.
+
+    No backend shelve o arquivo é reescrito apenas com os registros vivos; no Redis não há nada a fazer,
+    pois a memória das chaves removidas é liberada pelo próprio servidor.
+    """
+    _store().compact()
+
+
+# **SEÇÃO: Operações em lote, exportação e importação**
+#
+# As funções abaixo fazem uma única abertura do banco (shelve) ou usam pipelines (Redis) por chamada,
+# independentemente da quantidade de registros. São as indicadas para migrações e cargas iniciais,
+# onde abrir e fechar o banco por usuário domina o tempo total.
+
+def _pairs(mappings):
+    return mappings.items() if hasattr(mappings, 'items') else mappings
+
+
+@log_function_call
+def upsert_threads(mappings) -> int:
+    """
+    Insere ou atualiza vários registros de thread em uma única abertura do banco (ou em pipelines, no Redis).
+
+    Parâmetros:
+        mappings (dict or Iterable[tuple[str, str]]): Um dicionário {user_name: thread_id} ou um iterável
+            de pares (user_name, thread_id). Geradores são consumidos sob demanda.
+
+    Retorna:
+        int: A quantidade de registros gravados.
+
+    Exemplo de Uso:
+        upsert_threads({"Cícero": "thread_1", "Severino": "thread_2"})
+    """
+    return _store().set_many(_pairs(mappings))
+
+
+@log_function_call
+def delete_threads(user_names) -> int:
+    """
+    Remove vários registros de thread em uma única abertura do banco (ou em pipelines, no Redis).
+
+    Parâmetros:
+        user_names (Iterable[str]): Os nomes de usuário cujos registros serão removidos. Nomes inexistentes
+            são ignorados.
+
+    Retorna:
+        int: A quantidade de registros efetivamente removidos.
+    """
+    return _store().delete_many(user_names)
+
+
+@log_function_call
+def export_threads(path: str) -> int:
+    """
+    Exporta todos os registros para um arquivo JSONL, uma linha {"user_name", "thread_id"} por registro.
+
+    Os registros são lidos e escritos um a um, de forma que o consumo de memória não depende do tamanho
+    do banco.
+
+    Parâmetros:
+        path (str): O caminho do arquivo JSONL de destino (sobrescrito se existir).
+
+    Retorna:
+        int: A quantidade de registros exportados.
+
+    Exemplo de Uso:
+        export_threads("/tmp/threads.jsonl")
+    """
+    count = 0
+    with open(path, 'w', encoding='utf-8') as out:
+        for user_name, thread_id in _store().items():
+            record = {"user_name": user_name, "thread_id": thread_id}
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+
+def _read_jsonl(path: str):
+    with open(path, 'r', encoding='utf-8') as source:
+        for line_number, line in enumerate(source, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+                yield record["user_name"], record["thread_id"]
+            except (ValueError, KeyError) as e:
+                raise ValueError(f"Linha {line_number} inválida em {path}: {e}")
+
+
+@log_function_call
+def import_threads(path: str) -> int:
+    """
+    Importa registros de um arquivo JSONL gerado por `export_threads`, com semântica de upsert.
+
+    O arquivo é lido linha a linha e gravado em uma única abertura do banco, sem carregá-lo inteiro
+    na memória.
+
+    Parâmetros:
+        path (str): O caminho do arquivo JSONL de origem.
+
+    Retorna:
+        int: A quantidade de registros importados.
+
+    Exceções:
+        ValueError: Se alguma linha não for um JSON com as chaves "user_name" e "thread_id".
+    """
+    return upsert_threads(_read_jsonl(path))
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Gerencia o banco de mapeamento usuário -> thread.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("print", help="Imprime todos os registros.")
+    subparsers.add_parser("export", help="Exporta os registros para JSONL.").add_argument("path")
+    subparsers.add_parser("import", help="Importa registros de um JSONL.").add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "print":
+        print_shelve_contents()
+    elif args.command == "export":
+        print(f"{export_threads(args.path)} registros exportados para {args.path}.")
+    else:
+        print(f"{import_threads(args.path)} registros importados de {args.path}.")
@@ -0,0 +1,339 @@
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import zlib
+from contextlib import contextmanager
+try:
+    import fcntl
+except ImportError:  # Windows: sem bloqueio entre processos, apenas dentro do processo.
+    fcntl = None
+sys.path.append('/workplace/')
+
+from app.decorators.log_decorator import log_function_call, logger
+from app.utils.openia_config import TranscriptConfig
+
+"""
+Transcript Store
+
+Registro local, somente de acréscimo (append-only), de cada turno de conversa: pergunta do usuário, resposta
+do assistente, ID do run, tempos e consumo de tokens. Com ele o histórico de um thread é lido do disco local,
+sem paginar `messages.list` na API, e a aplicação mantém um registro durável das conversas.
+
+Formato em disco (diretório `TranscriptConfig.DIR`):
+
+- `segment-000001.log`, `segment-000002.log`, ...: segmentos de registros. Cada registro é um cabeçalho de
+  8 bytes (tamanho e CRC32 do corpo, big-endian) seguido do corpo em JSON UTF-8. Ao atingir
+  `TranscriptConfig.SEGMENT_MAX_BYTES` um novo segmento é iniciado; segmentos antigos nunca são alterados.
+- `index.log`: índice append-only com uma linha "thread_id<TAB>segmento<TAB>offset<TAB>tamanho" por registro.
+  É carregado em memória (thread_id -> posições) e relido incrementalmente, para enxergar os turnos gravados
+  por outros processos.
+
+Cada turno é gravado (com fsync) primeiro no segmento e depois no índice. Se uma escrita for interrompida (queda
+do processo ou do sistema), a próxima abertura e a próxima escrita reparam o fim dos arquivos: a linha incompleta
+do índice e o registro incompleto do último segmento são descartados, e os registros completos dos segmentos que
+ficaram sem linha no índice são indexados.
+
+As leituras usam memory-mapping dos segmentos: ler o histórico de um thread é um acesso direto às posições do
+índice, sem varrer os arquivos. As escritas de todos os processos são serializadas por um bloqueio de arquivo.
+"""
+
+_HEADER = struct.Struct('>II')
+_SEGMENT_NAME = 'segment-{:06d}.log'
+
+
+def _parse_entry(line: bytes):
+    # "thread_id<TAB>segmento<TAB>offset<TAB>tamanho"; None se a linha estiver corrompida.
+    try:
+        thread_id, segment, offset, length = line.decode('utf-8').rstrip('\n').split('\t')
+        return thread_id, int(segment), int(offset), int(length)
+    except ValueError:
+        return None
+
+
+class TranscriptStore:
+    """
+    Armazena e lê os turnos de conversa em segmentos append-only com índice por thread.
+
+    Parâmetros:
+        directory (str): O diretório dos segmentos e do índice (criado se não existir).
+        segment_max_bytes (int): O tamanho a partir do qual um novo segmento é iniciado.
+
+    Exemplo de Uso:
+        store = TranscriptStore("/tmp/transcripts")
+        store.append({"thread_id": "thread_1", "question": "Oi", "reply": "Olá!"})
+        store.history("thread_1")  # [{"thread_id": "thread_1", "question": "Oi", "reply": "Olá!"}]
+    """
+
+    def __init__(self, directory, segment_max_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._index_path = os.path.join(directory, 'index.log')
+        self._lock_path = os.path.join(directory, '.lock')
+        self._lock = threading.RLock()
+        self._index = {}
+        self._index_offset = 0
+        self._maps = {}
+        with self._write_lock():
+            self._repair()
+        self._refresh_index()
+
+    def _segment_path(self, segment):
+        return os.path.join(self.directory, _SEGMENT_NAME.format(segment))
+
+    def _segments(self):
+        return sorted(int(name[8:14]) for name in os.listdir(self.directory)
+                      if name.startswith('segment-') and name.endswith('.log'))
+
+    @contextmanager
+    def _write_lock(self):
+        with self._lock, open(self._lock_path, 'a+') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def _refresh_index(self):
+        # Lê apenas as linhas do índice acrescentadas desde a última leitura (inclusive por outros processos).
+        with self._lock:
+            if not os.path.exists(self._index_path):
+                return
+            with open(self._index_path, 'rb') as index_file:
+                index_file.seek(self._index_offset)
+                for line in index_file:
+                    if not line.endswith(b'\n'):
+                        break  # linha ainda sendo escrita por outro processo
+                    self._index_offset += len(line)
+                    entry = _parse_entry(line)
+                    if entry is None:
+                        logger.warning(f"Linha inválida no índice do registro local: {line!r}")
+                        continue
+                    thread_id, segment, offset, length = entry
+                    self._index.setdefault(thread_id, []).append((segment, offset, length))
+
+    def _last_entry(self, index_file):
+        # Remove a linha incompleta do fim do índice e retorna a última linha completa: None se o índice estiver
+        # vazio, False se ela estiver corrompida.
+        size = index_file.seek(0, os.SEEK_END)
+        tail, start = b'', size
+        while start > 0 and tail[:tail.rfind(b'\n')].count(b'\n') < 1:
+            step = min(4096, start)
+            start -= step
+            index_file.seek(start)
+            tail = index_file.read(step) + tail
+        end = tail.rfind(b'\n') + 1
+        if end < len(tail):
+            logger.warning(f"Descartando a linha incompleta do fim do índice do registro local: {tail[end:]!r}")
+            index_file.truncate(start + end)
+        lines = tail[:end].splitlines()
+        if not lines:
+            return None
+        return _parse_entry(lines[-1]) or False
+
+    def _repair(self):
+        # Chamada com o bloqueio de escrita: indexa os registros completos que ficaram sem linha no índice e
+        # descarta o registro incompleto do fim do último segmento.
+        segments = self._segments()
+        with open(self._index_path, 'a+b') as index_file:
+            last = self._last_entry(index_file)
+            if last is False:
+                self._rebuild_index(index_file, segments)
+                return
+            if last is None:
+                resume_segment, resume_offset = (segments[0] if segments else 0), 0
+            else:
+                _, resume_segment, offset, length = last
+                resume_offset = offset + length
+            missing = []
+            for segment in segments:
+                if segment < resume_segment:
+                    continue
+                start = resume_offset if segment == resume_segment else 0
+                size = os.path.getsize(self._segment_path(segment))
+                if start > size:
+                    # O índice aponta além do fim do segmento: não é mais confiável.
+                    self._rebuild_index(index_file, segments)
+                    return
+                end = start
+                for offset, length, record in self._scan(segment, start):
+                    missing.append(f"{record['thread_id']}\t{segment}\t{offset}\t{length}\n")
+                    end = offset + length
+                if end < size and segment == segments[-1]:
+                    logger.warning(f"Descartando o registro incompleto do fim de {_SEGMENT_NAME.format(segment)}.")
+                    with open(self._segment_path(segment), 'r+b') as segment_file:
+                        segment_file.truncate(end)
+            if missing:
+                logger.warning(f"Indexando {len(missing)} registros gravados sem linha no índice do registro local.")
+                index_file.seek(0, os.SEEK_END)
+                index_file.write("".join(missing).encode('utf-8'))
+                index_file.flush()
+                os.fsync(index_file.fileno())
+
+    def _rebuild_index(self, index_file, segments):
+        # Recria o índice inteiro a partir dos segmentos.
+        logger.warning("Recriando o índice do registro local a partir dos segmentos.")
+        index_file.truncate(0)
+        for segment in segments:
+            for offset, length, record in self._scan(segment):
+                index_file.write(f"{record['thread_id']}\t{segment}\t{offset}\t{length}\n".encode('utf-8'))
+        index_file.flush()
+        os.fsync(index_file.fileno())
+        with self._lock:
+            self._index, self._index_offset = {}, 0
+
+    def _scan(self, segment, start=0):
+        with open(self._segment_path(segment), 'rb') as segment_file:
+            segment_file.seek(start)
+            offset = start
+            while True:
+                header = segment_file.read(_HEADER.size)
+                if len(header) < _HEADER.size:
+                    return
+                length, crc = _HEADER.unpack(header)
+                body = segment_file.read(length)
+                if len(body) < length or zlib.crc32(body) != crc:
+                    return  # registro incompleto no fim do segmento (escrita interrompida)
+                yield offset, _HEADER.size + length, json.loads(body)
+                offset += _HEADER.size + length
+
+    @log_function_call
+    def append(self, record: dict):
+        """
+        Acrescenta um turno ao registro.
+
+        Parâmetros:
+            record (dict): O turno a gravar; deve conter a chave "thread_id".
+
+        Retorna:
+            tuple: O segmento e o offset em que o turno foi gravado.
+        """
+        body = json.dumps(record, ensure_ascii=False).encode('utf-8')
+        data = _HEADER.pack(len(body), zlib.crc32(body)) + body
+        with self._write_lock():
+            self._repair()
+            segments = self._segments()
+            segment = segments[-1] if segments else 1
+            path = self._segment_path(segment)
+            if os.path.exists(path) and os.path.getsize(path) + len(data) > self.segment_max_bytes:
+                segment += 1
+                path = self._segment_path(segment)
+            with open(path, 'ab') as segment_file:
+                offset = segment_file.tell()
+                segment_file.write(data)
+                segment_file.flush()
+                os.fsync(segment_file.fileno())
+            with open(self._index_path, 'a', encoding='utf-8') as index_file:
+                index_file.write(f"{record['thread_id']}\t{segment}\t{offset}\t{len(data)}\n")
+                index_file.flush()
+                os.fsync(index_file.fileno())
+        return segment, offset
+
+    def _map(self, segment, end):
+        # Segmentos são mapeados uma vez; o segmento ativo é remapeado quando cresce além do mapeamento.
+        current = self._maps.get(segment)
+        if current is None or len(current) < end:
+            if current is not None:
+                current.close()
+            with open(self._segment_path(segment), 'rb') as segment_file:
+                current = self._maps[segment] = mmap.mmap(segment_file.fileno(), 0, access=mmap.ACCESS_READ)
+        return current
+
+    @log_function_call
+    def history(self, thread_id: str, limit: int = None):
+        """
+        Retorna os turnos gravados de um thread, do mais antigo para o mais recente.
+
+        Parâmetros:
+            thread_id (str): O ID do thread.
+            limit (int, optional): Se informado, retorna apenas os `limit` turnos mais recentes.
+
+        Retorna:
+            list[dict]: Os turnos do thread.
+        """
+        self._refresh_index()
+        with self._lock:
+            positions = list(self._index.get(thread_id, ()))
+            if limit is not None:
+                positions = positions[-limit:] if limit > 0 else []
+            turns = []
+            for segment, offset, length in positions:
+                view = self._map(segment, offset + length)
+                turns.append(json.loads(view[offset + _HEADER.size:offset + length]))
+        return turns
+
+    def threads(self):
+        """
+        Retorna os IDs de todos os threads com turnos gravados.
+        """
+        self._refresh_index()
+        with self._lock:
+            return list(self._index)
+
+    def close(self):
+        with self._lock:
+            for view in self._maps.values():
+                view.close()
+            self._maps.clear()
+
+
+_store_instance = None
+_store_guard = threading.Lock()
+
+
+def get_transcript_store():
+    """
+    Retorna o `TranscriptStore` configurado em `TranscriptConfig`, criando-o no primeiro uso.
+    """
+    global _store_instance
+    if _store_instance is None:
+        with _store_guard:
+            if _store_instance is None:
+                _store_instance = TranscriptStore(TranscriptConfig.DIR, TranscriptConfig.SEGMENT_MAX_BYTES)
+    return _store_instance
+
+
+def reset_transcript_store():
+    """
+    Descarta o `TranscriptStore` em uso; o próximo acesso cria um novo. Usada após um `fork`.
+    """
+    global _store_instance
+    with _store_guard:
+        if _store_instance is not None:
+            _store_instance.close()
+        _store_instance = None
+
+
+@log_function_call
+def record_turn(**turn):
+    """
+    Grava um turno de conversa no registro local, se `TranscriptConfig.ENABLED`.
+
+    Falhas de gravação são registradas no log e não interrompem a conversa: a resposta já foi obtida e
+    deve ser entregue ao usuário de qualquer forma.
+
+    Exemplo de Uso:
+        record_turn(thread_id="thread_1", user_name="Cícero", question="Oi", reply="Olá!", run_id="run_1")
+    """
+    if not TranscriptConfig.ENABLED:
+        return None
+    try:
+        return get_transcript_store().append(turn)
+    except Exception as e:
+        logger.error(f"Falha ao gravar o turno do thread {turn.get('thread_id')} no registro local: {e}")
+        return None
+
+
+@log_function_call
+def thread_history(thread_id: str, limit: int = None):
+    """
+    Retorna o histórico local de um thread (ver `TranscriptStore.history`).
+    """
+    return get_transcript_store().history(thread_id, limit)
+
+
+if __name__ == '__main__':
+    for turn in thread_history(sys.argv[1]):
+        print(f"[{turn.get('user_name')}] {turn.get('question')}")
+        print(f"[assistente] {turn.get('reply')}\n")
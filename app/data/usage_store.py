@@ -0,0 +1,178 @@
+import os
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+
+sys.path.append('/workplace/')
+
+from app.utils.openia_config import UsageConfig
+
+"""
+Usage Store
+
+Tabela persistente (SQLite) do consumo de tokens dos runs, agregado por intervalo de tempo, usuário, thread e
+assistente. Cada linha soma os runs e os tokens (de entrada, de saída e totais) de um intervalo de
+`UsageConfig.BUCKET_SECONDS`; as somas de vários processos são acumuladas na mesma linha (`INSERT ... ON CONFLICT
+DO UPDATE`), de modo que a tabela cresce com o número de intervalos e usuários ativos, e não com o de runs.
+
+A agregação em memória e os orçamentos ficam em `app/services/usage_accounting.py`.
+"""
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS usage (
+    bucket_start REAL NOT NULL,
+    user_name TEXT NOT NULL,
+    thread_id TEXT NOT NULL,
+    assistant_id TEXT NOT NULL,
+    runs INTEGER NOT NULL,
+    prompt_tokens INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    total_tokens INTEGER NOT NULL,
+    PRIMARY KEY (bucket_start, user_name, thread_id, assistant_id)
+);
+CREATE INDEX IF NOT EXISTS usage_user_bucket ON usage (user_name, bucket_start);
+"""
+
+COUNTERS = ("runs", "prompt_tokens", "completion_tokens", "total_tokens")
+GROUPS = ("user_name", "thread_id", "assistant_id")
+
+
+class UsageStore:
+    """
+    Consumo de tokens agregado em SQLite.
+
+    Parâmetros:
+        path (str): O arquivo do banco (criado se não existir).
+
+    Exemplo de Uso:
+        store = UsageStore("/tmp/usage.sqlite3")
+        store.add({(1700000000.0, "Cícero", "thread_1", "asst_1"): [1, 120, 30, 150]})
+        store.used_tokens("Cícero", since=0)  # 150
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self):
+        # Uma conexão por thread: conexões sqlite3 não devem ser compartilhadas entre threads.
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    @contextmanager
+    def _transaction(self):
+        db = self._connection()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def add(self, totals: dict):
+        """
+        Soma os contadores às linhas correspondentes, em uma única transação.
+
+        Parâmetros:
+            totals (dict): (início do intervalo, usuário, thread, assistente) -> [runs, tokens de entrada,
+                           tokens de saída, tokens totais].
+        """
+        with self._transaction() as db:
+            db.executemany(
+                "INSERT INTO usage (bucket_start, user_name, thread_id, assistant_id, runs, prompt_tokens, "
+                "completion_tokens, total_tokens) VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (bucket_start, user_name, thread_id, assistant_id) DO UPDATE SET "
+                "runs = runs + excluded.runs, prompt_tokens = prompt_tokens + excluded.prompt_tokens, "
+                "completion_tokens = completion_tokens + excluded.completion_tokens, "
+                "total_tokens = total_tokens + excluded.total_tokens",
+                [(*key, *values) for key, values in totals.items()],
+            )
+
+    def used_tokens(self, user_name: str, since: float) -> int:
+        """
+        Retorna os tokens consumidos pelo usuário nos intervalos iniciados a partir de `since`.
+        """
+        row = self._connection().execute(
+            "SELECT COALESCE(SUM(total_tokens), 0) AS used FROM usage WHERE user_name = ? AND bucket_start >= ?",
+            (user_name, since),
+        ).fetchone()
+        return row["used"]
+
+    def first_bucket(self, user_name: str, since: float):
+        """
+        Retorna o início do intervalo mais antigo do usuário a partir de `since`, ou None se não houver.
+        """
+        row = self._connection().execute(
+            "SELECT MIN(bucket_start) AS first FROM usage WHERE user_name = ? AND bucket_start >= ?",
+            (user_name, since),
+        ).fetchone()
+        return row["first"]
+
+    def top(self, since: float, by: str = "user_name", limit: int = 10) -> list:
+        """
+        Retorna os maiores consumidores desde `since`.
+
+        Parâmetros:
+            since (float): O início do período (timestamp).
+            by (str): O agrupamento: "user_name", "thread_id" ou "assistant_id".
+            limit (int): O número máximo de linhas.
+
+        Retorna:
+            list[dict]: `by`, "runs", "prompt_tokens", "completion_tokens" e "total_tokens", do maior para o menor
+                        consumo total.
+        """
+        if by not in GROUPS:
+            raise ValueError(f"Agrupamento desconhecido: {by!r} (use {', '.join(GROUPS)}).")
+        sums = ", ".join(f"SUM({counter}) AS {counter}" for counter in COUNTERS)
+        rows = self._connection().execute(
+            f"SELECT {by}, {sums} FROM usage WHERE bucket_start >= ? GROUP BY {by} "
+            f"ORDER BY total_tokens DESC, {by} LIMIT ?",
+            (since, limit),
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def purge(self, before: float) -> int:
+        """
+        Remove os intervalos iniciados antes de `before`; retorna quantas linhas foram removidas.
+        """
+        with self._transaction() as db:
+            cursor = db.execute("DELETE FROM usage WHERE bucket_start < ?", (before,))
+        return cursor.rowcount
+
+
+_store_instance = None
+_store_guard = threading.Lock()
+
+
+def get_usage_store():
+    """
+    Retorna o `UsageStore` configurado em `UsageConfig`, criando-o no primeiro uso.
+    """
+    global _store_instance
+    if _store_instance is None:
+        with _store_guard:
+            if _store_instance is None:
+                _store_instance = UsageStore(UsageConfig.DB_PATH)
+    return _store_instance
+
+
+def reset_usage_store():
+    """
+    Descarta o `UsageStore` em uso; o próximo acesso cria um novo. Usada após um `fork`: conexões SQLite não
+    devem ser usadas por outro processo.
+    """
+    global _store_instance
+    with _store_guard:
+        _store_instance = None
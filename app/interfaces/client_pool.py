@@ -0,0 +1,282 @@
+import random
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# Define explicitamente o diretório raiz do projeto
+sys.path.append('/workplace/')
+
+from app.data.threads_manager import retrieve_thread_metadata
+from app.decorators.log_decorator import log_function_call, logger
+from app.utils.openia_config import ClientPoolConfig, OpenAIConfig, ThreadStoreConfig
+
+"""
+Client Pool
+
+Pool de clientes da OpenAI sobre várias chaves de API (ou organizações), configuradas em
+`ClientPoolConfig.API_KEYS`. Com ele a vazão deixa de ser limitada pelos limites de uso de uma única chave,
+e uma chave revogada ou com problemas deixa de derrubar a aplicação inteira.
+
+- **Seleção:** cada novo thread é criado na chave com menos chamadas em andamento, proporcionalmente ao seu
+  peso ("least_loaded"), ou por sorteio ponderado ("weighted"). Chaves em pausa são evitadas enquanto houver
+  alternativa.
+- **Saúde:** um erro 429, 5xx ou de conexão coloca a chave em pausa pelo "Retry-After" da resposta ou por
+  `COOLDOWN_SECONDS`, dobrando a cada falha consecutiva até `MAX_COOLDOWN_SECONDS`. Chaves rejeitadas
+  (401/403) ficam em pausa pelo máximo. Um sucesso restabelece a chave.
+- **Afinidade:** o nome da chave em que o thread foi criado é gravado nos metadados do thread ("client_key"),
+  e todas as operações seguintes do thread usam essa chave, pois um thread só é visível para a organização
+  que o criou. Threads sem esse registro (anteriores ao pool) usam a primeira chave da lista.
+
+O SDK da OpenAI só é importado quando o primeiro cliente é criado (`get_client_pool()`), e não na importação
+deste módulo.
+"""
+
+_COOLDOWN_ERRORS = ("RateLimitError", "InternalServerError", "APIConnectionError")
+_REJECTED_ERRORS = ("AuthenticationError", "PermissionDeniedError")
+
+
+class PooledClient:
+    """
+    Um cliente da OpenAI do pool e o estado de saúde e carga da sua chave.
+
+    Atributos:
+        name (str): O rótulo da chave (gravado nos metadados dos threads).
+        client (OpenAI): O cliente configurado com a chave.
+        weight (float): O peso da chave na seleção.
+    """
+
+    def __init__(self, name, client, weight=1.0):
+        self.name = name
+        self.client = client
+        self.weight = float(weight)
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+
+    def cooling_down(self, now=None):
+        return self.cooldown_until > (time.monotonic() if now is None else now)
+
+
+def _openai_client(entry, http_client=None, max_retries=None):
+    from openai import OpenAI
+
+    return OpenAI(api_key=entry["api_key"], organization=entry.get("organization"),
+                  timeout=OpenAIConfig.REQUEST_TIMEOUT_SECONDS,
+                  max_retries=OpenAIConfig.MAX_RETRIES if max_retries is None else max_retries,
+                  http_client=http_client)
+
+
+def _is_openai_error(error, names):
+    # Sem o SDK carregado, o erro não pode ser dele; assim a classificação não força a importação.
+    openai = sys.modules.get("openai")
+    return openai is not None and isinstance(error, tuple(getattr(openai, name) for name in names))
+
+
+def _retry_after(error):
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class ClientPool:
+    """
+    Seleciona, entre várias chaves de API, o cliente de cada chamada e acompanha a saúde de cada chave.
+
+    Parâmetros:
+        entries (list[dict]): As chaves, no formato de `ClientPoolConfig.API_KEYS`. A primeira é a padrão.
+        selection (str): "least_loaded" ou "weighted".
+        cooldown_seconds (float): A pausa após a primeira falha de uma chave.
+        max_cooldown_seconds (float): A pausa máxima.
+        client_factory (callable, optional): Cria o cliente de uma chave. Padrão: `OpenAI(api_key, organization)`.
+
+    Exemplo de Uso:
+        pool = ClientPool([{"name": "a", "api_key": "sk-A"}, {"name": "b", "api_key": "sk-B", "weight": 2}])
+        with pool.acquire() as pooled:
+            thread = pooled.client.beta.threads.create()
+    """
+
+    def __init__(self, entries, selection="least_loaded", cooldown_seconds=30.0, max_cooldown_seconds=600.0,
+                 client_factory=None):
+        if not entries:
+            raise ValueError("O pool de clientes precisa de pelo menos uma chave.")
+        if selection not in ("least_loaded", "weighted"):
+            raise ValueError(f"Estratégia de seleção desconhecida: {selection}")
+        client_factory = client_factory or _openai_client
+        self.selection = selection
+        self.cooldown_seconds = cooldown_seconds
+        self.max_cooldown_seconds = max_cooldown_seconds
+        self._clients = OrderedDict(
+            (entry["name"], PooledClient(entry["name"], client_factory(entry), entry.get("weight", 1)))
+            for entry in entries
+        )
+        self._lock = threading.Lock()
+
+    @property
+    def default(self) -> PooledClient:
+        return next(iter(self._clients.values()))
+
+    def get(self, name) -> PooledClient:
+        try:
+            return self._clients[name]
+        except KeyError:
+            raise KeyError(f"A chave '{name}' não está configurada no pool de clientes.") from None
+
+    def _select(self):
+        now = time.monotonic()
+        candidates = [pooled for pooled in self._clients.values() if not pooled.cooling_down(now)]
+        if not candidates:
+            # Todas em pausa: usa a que volta primeiro, em vez de falhar sem tentar.
+            return min(self._clients.values(), key=lambda pooled: pooled.cooldown_until)
+        if self.selection == "weighted":
+            return random.choices(candidates, weights=[pooled.weight for pooled in candidates])[0]
+        return min(candidates, key=lambda pooled: (pooled.in_flight + 1) / pooled.weight)
+
+    @contextmanager
+    def acquire(self, name=None):
+        """
+        Reserva um cliente durante uma chamada (ou sequência de chamadas) à API e registra o resultado.
+
+        Parâmetros:
+            name (str, optional): A chave a usar (afinidade de thread). Se omitido, a chave é selecionada.
+
+        Retorna:
+            PooledClient: O cliente reservado; a exceção da chamada, se houver, é propagada.
+        """
+        with self._lock:
+            pooled = self.get(name) if name is not None else self._select()
+            pooled.in_flight += 1
+            pooled.requests += 1
+        try:
+            yield pooled
+        except Exception as e:
+            self._record_failure(pooled, e)
+            raise
+        else:
+            with self._lock:
+                pooled.consecutive_failures = 0
+        finally:
+            with self._lock:
+                pooled.in_flight -= 1
+
+    def _record_failure(self, pooled, error):
+        if _is_openai_error(error, _REJECTED_ERRORS):
+            cooldown = self.max_cooldown_seconds
+        elif _is_openai_error(error, _COOLDOWN_ERRORS):
+            cooldown = _retry_after(error) or min(
+                self.cooldown_seconds * 2 ** pooled.consecutive_failures, self.max_cooldown_seconds)
+        else:
+            return  # Erros da requisição em si (400, 404...) não dizem nada sobre a saúde da chave.
+        with self._lock:
+            pooled.failures += 1
+            pooled.consecutive_failures += 1
+            pooled.cooldown_until = max(pooled.cooldown_until, time.monotonic() + cooldown)
+        logger.warning(f"Chave '{pooled.name}' em pausa por {cooldown:.0f}s após {type(error).__name__}: {error}")
+
+    def health(self) -> list:
+        """
+        Retorna um retrato do estado de cada chave: chamadas em andamento, totais, falhas e pausa restante.
+        """
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "name": pooled.name,
+                    "weight": pooled.weight,
+                    "in_flight": pooled.in_flight,
+                    "requests": pooled.requests,
+                    "failures": pooled.failures,
+                    "cooldown_remaining_s": round(max(0.0, pooled.cooldown_until - now), 1),
+                }
+                for pooled in self._clients.values()
+            ]
+
+
+_pool = None
+_pool_guard = threading.Lock()
+_client_factory = None
+
+# Cache limitado (LRU, `ThreadStoreConfig.METADATA_CACHE_SIZE`) de thread_id -> nome da chave; a chave de um thread
+# nunca muda.
+_thread_keys = OrderedDict()
+_thread_keys_guard = threading.Lock()
+
+
+def get_client_pool() -> ClientPool:
+    """
+    Retorna o `ClientPool` configurado em `ClientPoolConfig`, criando-o no primeiro uso.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_guard:
+            if _pool is None:
+                _pool = ClientPool(
+                    ClientPoolConfig.API_KEYS,
+                    selection=ClientPoolConfig.SELECTION,
+                    cooldown_seconds=ClientPoolConfig.COOLDOWN_SECONDS,
+                    max_cooldown_seconds=ClientPoolConfig.MAX_COOLDOWN_SECONDS,
+                    client_factory=_client_factory,
+                )
+    return _pool
+
+
+def set_client_factory(client_factory=None):
+    """
+    Define a função que cria os clientes dos próximos pools (None restaura a padrão) e descarta o pool atual.
+
+    Usada para trocar o transporte HTTP dos clientes, por exemplo pela gravação e reprodução de
+    `app/interfaces/http_cassette.py`.
+
+    Parâmetros:
+        client_factory (Callable[[dict], OpenAI], optional): Recebe a entrada de `ClientPoolConfig.API_KEYS`.
+    """
+    global _client_factory
+    _client_factory = client_factory
+    reset_client_pool()
+
+
+def reset_client_pool():
+    """
+    Descarta o pool atual (e o cache de chaves dos threads); o próximo uso cria um novo a partir da configuração.
+    """
+    global _pool
+    with _pool_guard:
+        _pool = None
+    with _thread_keys_guard:
+        _thread_keys.clear()
+
+
+@log_function_call
+def client_key_for_thread(thread_id: str) -> str:
+    """
+    Retorna o nome da chave em que um thread foi criado (afinidade de thread).
+
+    Parâmetros:
+        thread_id (str): O ID do thread.
+
+    Retorna:
+        str: O nome gravado nos metadados do thread ou, sem registro, o da chave padrão do pool.
+
+    Exemplo de Uso:
+        with get_client_pool().acquire(client_key_for_thread("thread_123")) as pooled:
+            pooled.client.beta.threads.retrieve("thread_123")
+    """
+    with _thread_keys_guard:
+        if thread_id in _thread_keys:
+            _thread_keys.move_to_end(thread_id)
+            return _thread_keys[thread_id]
+
+    name = retrieve_thread_metadata(thread_id).get("client_key")
+    if name is None:
+        return get_client_pool().default.name
+
+    with _thread_keys_guard:
+        _thread_keys[thread_id] = name
+        if len(_thread_keys) > ThreadStoreConfig.METADATA_CACHE_SIZE:
+            _thread_keys.popitem(last=False)
+    return name
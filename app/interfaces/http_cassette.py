@@ -0,0 +1,246 @@
+import base64
+import json
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from urllib.parse import parse_qsl, urlsplit
+
+import httpx
+
+# Define explicitamente o diretório raiz do projeto
+sys.path.append('/workplace/')
+
+from app.decorators.log_decorator import logger
+from app.interfaces.client_pool import _openai_client, set_client_factory
+
+"""
+HTTP Cassette
+
+Gravação e reprodução das chamadas HTTP dos clientes da OpenAI, no transporte do `httpx` usado pelo SDK. As
+interações (pedido e resposta) são gravadas uma vez em um arquivo JSON (a "fita") e depois reproduzidas sem
+rede, de forma determinística: os testes que usam a API rodam offline, em milissegundos e sem custo.
+
+- **Modos:** "record" envia tudo à API e grava a fita do zero; "replay" responde só com a fita; "auto" reproduz
+  se a fita existe e grava se não existe.
+- **Correspondência:** cada pedido é comparado às interações gravadas pelas regras de `match_on` (padrão: método,
+  caminho, parâmetros da URL e corpo). O corpo é comparado como JSON (sem depender da ordem das chaves), e o
+  separador aleatório dos uploads multipart é ignorado. Regras próprias são funções que recebem o pedido gravado
+  (dict com "method", "url", "headers" e "body") e retornam o valor a comparar. Cada interação é reproduzida uma
+  única vez, na ordem gravada, de modo que chamadas repetidas (como a consulta do status de um run) recebem as
+  respostas na mesma sequência.
+- **Modo estrito:** com `strict` (padrão), um pedido sem interação correspondente falha com `CassetteError`;
+  sem ele, o pedido é enviado à API e acrescentado à fita.
+- **Segredos:** os cabeçalhos de autenticação ("Authorization", "OpenAI-Organization", cookies) não são gravados.
+
+Exemplo de Uso:
+
+    with use_cassette("tests/cassettes/upload.json"):
+        upload_file_to_openai("tests/oracao.pdf")
+
+Para regravar as fitas dos testes, rode-os com `OPENAI_CASSETTE_MODE=record` e uma chave de API válida.
+"""
+
+MODES = ("record", "replay", "auto")
+DEFAULT_MATCH_ON = ("method", "path", "query", "body")
+SENSITIVE_HEADERS = {"authorization", "openai-organization", "cookie", "set-cookie", "api-key"}
+# Cabeçalhos que deixam de valer quando o corpo é gravado já decodificado e completo.
+_DROPPED_RESPONSE_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+
+class CassetteError(Exception):
+    """
+    Levantada quando um pedido não tem interação gravada correspondente (modo estrito) ou a fita é inválida.
+    """
+
+
+def _encode_body(content: bytes) -> dict:
+    try:
+        return {"text": content.decode("utf-8")}
+    except UnicodeDecodeError:
+        return {"base64": base64.b64encode(content).decode("ascii")}
+
+
+def _decode_body(body: dict) -> bytes:
+    if "base64" in body:
+        return base64.b64decode(body["base64"])
+    return body.get("text", "").encode("utf-8")
+
+
+def _normalized_body(request: dict):
+    content = _decode_body(request["body"])
+    content_type = request["headers"].get("content-type", "")
+    if content_type.startswith("multipart/") and "boundary=" in content_type:
+        boundary = content_type.split("boundary=", 1)[1].split(";")[0].strip('"').encode()
+        return content.replace(boundary, b"BOUNDARY")
+    if "json" in content_type and content:
+        try:
+            return json.dumps(json.loads(content), sort_keys=True)
+        except ValueError:
+            pass
+    return content
+
+
+MATCHERS = {
+    "method": lambda request: request["method"].upper(),
+    "host": lambda request: urlsplit(request["url"]).netloc,
+    "path": lambda request: urlsplit(request["url"]).path,
+    "query": lambda request: sorted(parse_qsl(urlsplit(request["url"]).query, keep_blank_values=True)),
+    "body": _normalized_body,
+}
+
+
+def _request_record(request: httpx.Request) -> dict:
+    return {
+        "method": request.method,
+        "url": str(request.url),
+        "headers": {name: value for name, value in request.headers.items() if name not in SENSITIVE_HEADERS},
+        "body": _encode_body(request.read()),
+    }
+
+
+class Cassette(httpx.BaseTransport):
+    """
+    Transporte HTTP que grava ou reproduz as interações de uma fita.
+
+    Parâmetros:
+        path (str): O arquivo JSON da fita.
+        mode (str): "record", "replay" ou "auto" (ver o módulo).
+        strict (bool): Se um pedido sem interação correspondente deve falhar, em vez de ir à API.
+        match_on (tuple): As regras de correspondência: nomes de `MATCHERS` ou funções.
+        transport (httpx.BaseTransport, optional): O transporte real, usado ao gravar. Padrão: `httpx.HTTPTransport`.
+
+    Atributos:
+        unmatched (list[str]): Os pedidos sem correspondência, no modo estrito.
+
+    Exemplo de Uso:
+        cassette = Cassette("tests/cassettes/threads.json", mode="replay")
+        client = OpenAI(api_key="sk-test", http_client=httpx.Client(transport=cassette), max_retries=0)
+    """
+
+    def __init__(self, path, mode="auto", strict=True, match_on=DEFAULT_MATCH_ON, transport=None):
+        if mode not in MODES:
+            raise CassetteError(f"Modo de fita desconhecido: {mode!r} (use {', '.join(MODES)}).")
+        self.path = path
+        self.recording = mode == "record" or (mode == "auto" and not os.path.exists(path))
+        self.strict = strict
+        self.match_on = tuple(MATCHERS[rule] if isinstance(rule, str) else rule for rule in match_on)
+        self.unmatched = []
+        self._transport = transport
+        self._guard = threading.Lock()
+        self._dirty = False
+        self.interactions = [] if self.recording else self._load()
+        self._played = [False] * len(self.interactions)
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as file:
+                return json.load(file)["interactions"]
+        except FileNotFoundError:
+            raise CassetteError(f"Fita não encontrada: {self.path} (grave-a com o modo 'record').") from None
+        except (ValueError, KeyError) as e:
+            raise CassetteError(f"Fita inválida em {self.path}: {e!r}") from None
+
+    def _key(self, request):
+        return [rule(request) for rule in self.match_on]
+
+    def _forward(self, request):
+        if self._transport is None:
+            self._transport = httpx.HTTPTransport()
+        response = self._transport.handle_request(request)
+        try:
+            content = response.read()
+        finally:
+            response.close()
+        headers = {name: value for name, value in response.headers.items()
+                   if name not in SENSITIVE_HEADERS and name not in _DROPPED_RESPONSE_HEADERS}
+        return {"status_code": response.status_code, "headers": headers, "body": _encode_body(content)}
+
+    def _find(self, record):
+        key = self._key(record)
+        for index, interaction in enumerate(self.interactions):
+            if not self._played[index] and self._key(interaction["request"]) == key:
+                self._played[index] = True
+                return interaction["response"]
+        return None
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        record = _request_record(request)
+        with self._guard:
+            response = None if self.recording else self._find(record)
+        if response is None:
+            if not self.recording and self.strict:
+                description = f"{record['method']} {record['url']}"
+                self.unmatched.append(description)
+                raise CassetteError(f"Pedido sem interação gravada em {self.path}: {description}")
+            response = self._forward(request)
+            with self._guard:
+                self.interactions.append({"request": record, "response": response})
+                self._played.append(True)
+                self._dirty = True
+        return httpx.Response(response["status_code"], headers=response["headers"],
+                              content=_decode_body(response["body"]), request=request)
+
+    def client_factory(self, entry):
+        """
+        Cria um cliente da OpenAI para uma entrada de `ClientPoolConfig.API_KEYS` que usa esta fita.
+
+        Ao reproduzir, o cliente não repete pedidos que falharam: a repetição também teria de estar gravada.
+        """
+        return _openai_client(entry, http_client=httpx.Client(transport=self),
+                              max_retries=None if self.recording else 0)
+
+    def unplayed(self) -> list:
+        """
+        Retorna os pedidos gravados que ainda não foram reproduzidos ("MÉTODO URL").
+        """
+        with self._guard:
+            return [f"{i['request']['method']} {i['request']['url']}"
+                    for i, played in zip(self.interactions, self._played) if not played]
+
+    def save(self):
+        """
+        Grava a fita, se houver interações novas.
+        """
+        with self._guard:
+            if not self._dirty:
+                return
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "w", encoding="utf-8") as file:
+                json.dump({"version": 1, "interactions": self.interactions}, file, ensure_ascii=False, indent=2)
+            self._dirty = False
+        logger.info(f"Fita gravada: {self.path} ({len(self.interactions)} interações).")
+
+
+@contextmanager
+def use_cassette(path, mode=None, strict=True, match_on=DEFAULT_MATCH_ON):
+    """
+    Faz os clientes da OpenAI da aplicação (`OpenAIClientSingleton` e o pool de clientes) usarem uma fita.
+
+    Parâmetros:
+        path (str): O arquivo JSON da fita.
+        mode (str, optional): "record", "replay" ou "auto". Padrão: a variável de ambiente `OPENAI_CASSETTE_MODE`,
+                              ou "replay".
+        strict (bool): Ver `Cassette`.
+        match_on (tuple): Ver `Cassette`.
+
+    Retorna:
+        Cassette: A fita em uso. Ao sair, as interações novas são gravadas e os clientes padrão restaurados.
+
+    Exceções:
+        CassetteError: Ao sair, se algum pedido não teve correspondência no modo estrito (mesmo que o erro
+                       original tenha sido tratado pelo código testado).
+    """
+    from app.interfaces.interface_openai import reset_client
+
+    cassette = Cassette(path, mode or os.getenv("OPENAI_CASSETTE_MODE") or "replay", strict, match_on)
+    set_client_factory(cassette.client_factory)
+    reset_client()
+    try:
+        yield cassette
+    finally:
+        set_client_factory(None)
+        reset_client()
+        cassette.save()
+    if cassette.unmatched:
+        raise CassetteError(f"Pedidos sem interação gravada em {path}: {', '.join(cassette.unmatched)}")
@@ -1,12 +1,45 @@
+import threading
 import time
-from openai import OpenAI
 import sys
 
 # Define explicitamente o diretório raiz do projeto
 sys.path.append('/workplace/')
 
-from app.decorators.log_decorator import log_function_call
-from app.utils.openia_config import OpenAIConfig, OpenAIAssistantConfig
+from app.decorators.log_decorator import log_function_call, logger
+from app.utils.openia_config import OpenAIConfig, OpenAIAssistantConfig, CoalescingConfig, RetrievalConfig
+from app.utils.metrics import ASSISTANT_RUNS
+from app.data.transcript_store import record_turn
+from app.services.assistant_config import current_assistant_settings
+from app.services.assistant_sharding import assistant_for_thread
+from app.services.document_retrieval import grounding_instructions
+from app.services.question_coalescing import coalesce_question
+from app.services.usage_accounting import enforce_budget, record_usage
+from app.services.user_naming import MESSAGE_PREAMBLE, naming_mode, record_avoided_preamble, run_instructions
+from app.interfaces.client_pool import (_COOLDOWN_ERRORS, _is_openai_error, client_key_for_thread, get_client_pool,
+                                        reset_client_pool)
+from app.data.threads_manager import clear_active_run, mark_active_run, retrieve_active_run, update_thread_metadata
+from app.utils.resilience import CircuitOpenError, guarded_call, hedged_read
+
+# Estados de um run que ainda impedem novas mensagens no thread, e estados finais sem resposta.
+ACTIVE_RUN_STATUSES = ("queued", "in_progress", "requires_action", "cancelling")
+FAILED_RUN_STATUSES = ("failed", "cancelled", "expired")
+
+
+
+class RunTimeoutError(TimeoutError):
+    """
+    Levantada quando um turno excede `OpenAIAssistantConfig.RUN_TIMEOUT_SECONDS`; o run remoto é cancelado.
+
+    Atributos:
+        thread_id (str): O thread do run.
+        run_id (str): O run cancelado.
+    """
+
+    def __init__(self, thread_id, run_id, timeout):
+        super().__init__(f"O run {run_id} do thread {thread_id} excedeu o prazo de {timeout}s e foi cancelado.")
+        self.thread_id = thread_id
+        self.run_id = run_id
+
 
 class OpenAIClientSingleton:
     """
@@ -41,6 +74,8 @@ class OpenAIClientSingleton:
         instância.
 
     Notas:
+        - O cliente retornado é o da chave padrão do pool (`app/interfaces/client_pool.py`), usado nas operações
+          de arquivos e assistentes. As operações de threads usam o cliente da chave do thread, via pool.
         - Lembre-se de que o uso do padrão Singleton pode impactar a testabilidade do código
           e o isolamento de estados entre diferentes partes da aplicação. Use com cuidado e
           apenas quando necessário.
@@ -59,12 +94,26 @@ class OpenAIClientSingleton:
         if cls._instance is None:
             cls._instance = super(OpenAIClientSingleton, cls).__new__(cls)
             # Inicializa o cliente OpenAI aqui
-            cls._instance.client = OpenAI(api_key=OpenAIConfig.OPENAI_API_KEY)
+            cls._instance.client = get_client_pool().default.client
         return cls._instance.client
 
-# Instancia uma unica vez o client da OpenAI usando as configurações definidas em config.py
-# Uso do Singleton
-client = OpenAIClientSingleton()
+def __getattr__(name):
+    # O cliente padrão (`interface_openai.client`) é criado no primeiro acesso, e não na importação do módulo:
+    # quem só precisa dos threads ou da CLI não paga a importação do SDK da OpenAI nem a criação do cliente.
+    if name == "client":
+        return OpenAIClientSingleton()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def reset_client():
+    """
+    Descarta o pool de clientes e o cliente padrão do módulo; o próximo uso cria novos.
+
+    Usada após um `fork` (ver `gunicorn.conf.py`): as conexões HTTP do cliente do processo pai não devem ser
+    compartilhadas com os processos filhos.
+    """
+    reset_client_pool()
+    OpenAIClientSingleton._instance = None
 
 @log_function_call
 def upload_file_to_openai(path):
@@ -89,7 +138,7 @@ def upload_file_to_openai(path):
         de um bloco try-except para lidar com possíveis exceções.
     """
     with open(path, "rb") as file_to_upload:
-        file = client.files.create(file=file_to_upload, purpose="assistants")
+        file = OpenAIClientSingleton().files.create(file=file_to_upload, purpose="assistants")
     return file
 
 @log_function_call
@@ -145,7 +194,8 @@ def create_assistant(**kwargs):
 
     1. A função utiliza `kwargs` para extrair os parâmetros passados para a função.
     2. Se um parâmetro não for especificado em `kwargs`, o valor padrão da variável
-        correspondente na classe `OpenAIAssistantConfig` será usado.
+        correspondente na configuração do assistente em uso (`current_assistant_settings()`, com os padrões
+        de `OpenAIAssistantConfig` e o arquivo recarregável de `app/services/assistant_config.py`) será usado.
     3. A função utiliza o cliente OpenAI para criar um novo assistente, definindo as
         configurações de acordo com os valores em `kwargs`.
     4. A função retorna o objeto de assistente criado pela API da OpenAI.
@@ -156,7 +206,7 @@ def create_assistant(**kwargs):
         os parâmetros e o objeto de resposta da API `create_assistant`.
     * A função trata exceções do tipo `OpenAIError` que podem ser levantadas durante a
         requisição à API da OpenAI.
-    * A função utiliza variáveis da classe `OpenAIAssistantConfig` para definir as
+    * A função utiliza a configuração do assistente em uso para definir as
         configurações do assistente.
 
     **Exemplos de Uso:**
@@ -180,13 +230,15 @@ def create_assistant(**kwargs):
      try:
         # Extrai os parâmetros de kwargs
         file_id = kwargs.get("file_id")
-        name = kwargs.get("name", OpenAIAssistantConfig.ASSISTANT_NAME)
-        instructions = kwargs.get("instructions", OpenAIAssistantConfig.INSTRUCTIONS)
-        tools = kwargs.get("tools", OpenAIAssistantConfig.TOOLS)
-        model = kwargs.get("model", OpenAIAssistantConfig.AI_ASSISTANT_MODEL)
+        # Padrões da configuração em uso (app/services/assistant_config.py)
+        settings = current_assistant_settings()
+        name = kwargs.get("name", settings.name)
+        instructions = kwargs.get("instructions", settings.instructions)
+        tools = kwargs.get("tools", list(settings.tools))
+        model = kwargs.get("model", settings.model)
 
         file_ids = [file_id] if file_id else []
-        assistant = client.beta.assistants.create(
+        assistant = OpenAIClientSingleton().beta.assistants.create(
             name=name,
             instructions=instructions,
             tools=tools,
@@ -237,7 +289,7 @@ def retrieve_assistant(assistant_id: str) -> any:
     """    
     
     try:
-        assistant = client.beta.assistants.retrieve(assistant_id)
+        assistant = OpenAIClientSingleton().beta.assistants.retrieve(assistant_id)
         return assistant
     except Exception as e:
         raise Exception(f"Erro ao recuperar assistente com ID {assistant_id}: {e}")
@@ -268,6 +320,8 @@ def create_thread() -> any:
     Notas:
         - A criação de um novo thread não requer parâmetros adicionais, simplificando o processo de
           início de uma nova conversa.
+        - O thread é criado na chave selecionada pelo pool de clientes, e o nome dessa chave é gravado nos
+          metadados do thread ("client_key") para que as operações seguintes usem a mesma chave.
         - Cada thread é identificado unicamente por um ID, que deve ser utilizado em todas as mensagens
           subsequentes para garantir a continuidade do contexto.
 
@@ -275,8 +329,10 @@ def create_thread() -> any:
         - Documentação da API OpenAI sobre gerenciamento de threads: https://beta.openai.com/docs/api-reference/threads
     """
     try:
-            thread = client.beta.threads.create()
-            return thread
+        with get_client_pool().acquire() as pooled:
+            thread = pooled.client.beta.threads.create()
+        update_thread_metadata(thread.id, client_key=pooled.name)
+        return thread
     except Exception as e:
         raise Exception(f"Erro ao criar thread: {e}")
 
@@ -316,11 +372,176 @@ def retrieve_thread(thread_id: str) -> any:
     """
 
     try:
-        thread = client.beta.threads.retrieve(thread_id)
+        with get_client_pool().acquire(client_key_for_thread(thread_id)) as pooled:
+            thread = pooled.client.beta.threads.retrieve(thread_id)
         return thread
     except Exception as e:
         raise Exception(f"Erro ao recuperar thread com ID {thread_id}: {e}")
 
+@log_function_call
+def delete_remote_thread(thread_id: str, client_key: str = None) -> bool:
+    """
+    Remove um thread, e todo o seu histórico de mensagens, da API da OpenAI.
+
+    Usada pela expiração de threads ociosos (`app/services/thread_expiry.py`) para que threads de usuários
+    inativos não se acumulem indefinidamente na conta.
+
+    Parâmetros:
+        thread_id (str): O identificador único do thread a ser removido.
+        client_key (str, optional): A chave em que o thread foi criado, quando os seus metadados já foram
+            removidos. Padrão: a chave registrada nos metadados do thread.
+
+    Retorna:
+        bool: True se a API confirmou a remoção.
+
+    Referências:
+        - Documentação da API OpenAI sobre remoção de threads: https://platform.openai.com/docs/api-reference/threads/deleteThread
+    """
+    try:
+        with get_client_pool().acquire(client_key or client_key_for_thread(thread_id)) as pooled:
+            return pooled.client.beta.threads.delete(thread_id).deleted
+    except Exception as e:
+        raise Exception(f"Erro ao remover thread com ID {thread_id}: {e}")
+
+@log_function_call
+def cancel_run(thread_id: str, run_id: str = None, wait: bool = False):
+    """
+    Cancela o run em andamento de um thread, liberando-o para novas mensagens.
+
+    Sem `run_id`, cancela o run gravado como em andamento nos metadados do thread ou, na falta dele, o run mais
+    recente do thread, se ainda estiver ativo na API. O registro do run em andamento é removido dos metadados.
+
+    Parâmetros:
+        thread_id (str): O ID do thread.
+        run_id (str, optional): O run a cancelar. Padrão: o run em andamento do thread.
+        wait (bool): Se aguarda, por até `OpenAIAssistantConfig.RUN_CANCEL_WAIT_SECONDS`, o run deixar de bloquear o thread (a API
+            cancela de forma assíncrona, passando por "cancelling").
+
+    Retorna:
+        str or None: O ID do run cancelado, ou None se não havia run ativo (ou ele terminou antes do pedido).
+
+    Exceções:
+        Exception: Se o pedido de cancelamento falhar por outro motivo.
+
+    Exemplo de Uso:
+        if cancel_run("thread_123"):
+            print("Run cancelado.")
+
+    Referências:
+        - Documentação da API OpenAI sobre cancelamento de runs: https://platform.openai.com/docs/api-reference/runs/cancelRun
+    """
+    try:
+        with get_client_pool().acquire(client_key_for_thread(thread_id)) as pooled:
+            runs = pooled.client.beta.threads.runs
+            if run_id is None:
+                active = retrieve_active_run(thread_id)
+                run_id = active[0] if active else None
+            if run_id is None:
+                latest = runs.list(thread_id=thread_id, limit=1).data
+                run_id = latest[0].id if latest and latest[0].status in ACTIVE_RUN_STATUSES else None
+            if run_id is None:
+                return None
+            try:
+                run = runs.cancel(thread_id=thread_id, run_id=run_id)
+            except Exception as e:
+                if not _is_openai_error(e, ("BadRequestError",)):
+                    raise
+                # O run já terminou (a API recusa cancelar runs em estado final).
+                clear_active_run(thread_id, run_id)
+                return None
+            deadline = time.monotonic() + OpenAIAssistantConfig.RUN_CANCEL_WAIT_SECONDS
+            while wait and run.status in ACTIVE_RUN_STATUSES and time.monotonic() < deadline:
+                time.sleep(OpenAIAssistantConfig.RUN_POLL_INTERVAL_SECONDS)
+                run = runs.retrieve(thread_id=thread_id, run_id=run_id)
+    except Exception as e:
+        raise Exception(f"Erro ao cancelar o run {run_id} do thread {thread_id}: {e}")
+    clear_active_run(thread_id, run_id)
+    return run_id
+
+def recover_stale_run(thread_id: str):
+    """
+    Cancela o run gravado como em andamento no thread se ele passou do prazo do turno
+    (`OpenAIAssistantConfig.RUN_TIMEOUT_SECONDS` mais `RUN_STALE_MARGIN_SECONDS`): o processo que o acompanhava
+    parou no meio do turno, e o run ainda ativo faria a nova mensagem do usuário falhar.
+
+    Retorna:
+        str or None: O ID do run cancelado, ou None.
+    """
+    active = retrieve_active_run(thread_id)
+    stale_after = OpenAIAssistantConfig.RUN_TIMEOUT_SECONDS + OpenAIAssistantConfig.RUN_STALE_MARGIN_SECONDS
+    if active is None or time.time() - active[1] < stale_after:
+        return None
+    logger.warning(f"Run {active[0]} do thread {thread_id} preso desde {active[1]}; cancelando.")
+    try:
+        return cancel_run(thread_id, active[0], wait=True)
+    except Exception as e:
+        logger.error(f"Falha ao recuperar o thread {thread_id}: {e}")
+        return None
+
+@log_function_call
+def _format_user_question(user_name=None, question_prompt=None):
+    """
+    ## Motivação
+
+    Esta função foi criada para diferenciar várias conversas dentro de uma mesma thread em um sistema de chat. Ao prefixar cada pergunta com o nome do usuário, o modelo de IA pode:
+
+    * Manter o contexto de quem está fazendo a pergunta, especialmente útil em chats com múltiplos usuários.
+    * Fornecer respostas mais direcionadas e personalizadas para cada usuário.
+
+    Essa abordagem também é útil em grupos do WhatsApp, onde a quantidade de mensagens pode ser alta e o contexto pode ser facilmente perdido.
+
+
+    ## Funcão
+
+    Prepara uma pergunta para ser enviada ao ChatGPT, prefixando-a com o nome do usuário e formatando-a de acordo com as melhores práticas.
+
+    Essa abordagem oferece diversos benefícios:
+
+    * **Contextualização:** Permite ao modelo de IA manter o contexto de quem está fazendo a pergunta, especialmente útil em chats com múltiplos usuários.
+    * **Personalização:** Melhora a experiência de interação, tornando as respostas do modelo mais direcionadas e relevantes para cada usuário.
+    * **Usabilidade:** Facilita a leitura e compreensão das perguntas em interfaces conversacionais.
+
+    A função formata a pergunta da seguinte maneira:
+
+    * **Nome do usuário:** "Usuário {nome}"
+    * **Pergunta:** "{pergunta}"
+
+    Exemplo:
+
+    --- format_user_question("Alice", "O que é inteligência artificial?")
+    'Usuário Alice pergunta: O que é inteligência artificial?'
+
+    **Observações:**
+
+    * A formatação pode ser facilmente adaptada para atender às necessidades específicas do seu aplicativo.
+    * Com `OpenAIAssistantConfig.USER_NAMING_MODE` igual a "run", a pergunta é retornada sem o preâmbulo: a
+      identificação vai nas instruções adicionais do run, sem crescer o contexto do thread (`app/services/user_naming.py`).
+    * Ao utilizar esta função em um sistema real, considere as implicações de segurança e privacidade relacionadas ao uso de nomes de usuários e perguntas que podem conter informações confidenciais.
+
+    **Referências:**
+
+    * Documentação da OpenAI sobre threads e gestão de contexto em conversas: https://openai.com/api/
+    * Práticas recomendadas para interação com modelos de IA e gestão de estado de conversa em chatbots e assistentes virtuais.
+    * Considerações sobre usabilidade e experiência do usuário em interfaces conversacionais.
+
+    """
+    if user_name is None:
+        return question_prompt
+
+    # Verifica se o prompt de pergunta foi fornecido
+    if question_prompt is None:
+        raise ValueError("Por favor, insira uma pergunta.")
+    
+    #formatted_question = f"Meu nome é: {user_name}, e te faço uma pergunta: {question_prompt}"
+    
+    # No modo "run" (app/services/user_naming.py) a identificação vai nas instruções do run, e não na mensagem.
+    if naming_mode() == "run":
+        return question_prompt
+
+    formatted_question = MESSAGE_PREAMBLE.format(user_name=user_name) + question_prompt
+    
+    return formatted_question
+
 @log_function_call
 def generate_response(question_prompt: str, **kwargs):
     """
@@ -337,15 +558,24 @@ def generate_response(question_prompt: str, **kwargs):
             thread_id (str, optional): ID de uma thread existente para manter o contexto das conversas.
                 Se não fornecido, utiliza-se um valor padrão.
             assistant_id (str, optional): ID do assistente a ser utilizado.
-                Se não fornecido, utiliza-se um valor padrão.
+                Se não fornecido, utiliza-se o assistente atribuído ao thread (`assistant_for_thread`).
             user_name (str, optional): Nome do usuário que faz a pergunta.
                 Se não fornecido, considera-se None.
+            coalesce (bool, optional): Se perguntas idênticas em andamento no mesmo assistente compartilham
+                um único run. Se não fornecido, utiliza-se `CoalescingConfig.ENABLED`.
+            grounding (bool, optional): Se os trechos mais relevantes dos documentos indexados localmente são
+                passados ao run, nas instruções adicionais (`app/services/document_retrieval.py`). Se não
+                fornecido, utiliza-se `RetrievalConfig.ENABLED`.
 
     Returns:
         str: A resposta gerada pela API da OpenAI.
 
     Raises:
         ValueError: Se `question_prompt` for None ou uma string vazia.
+        BudgetExceededError: Se o usuário atingiu o seu orçamento de tokens (`app/services/usage_accounting.py`);
+            nenhuma mensagem é enviada ao thread.
+        RunTimeoutError: Se o run excedeu `OpenAIAssistantConfig.RUN_TIMEOUT_SECONDS`; o run remoto é cancelado.
+        CircuitOpenError: Se o disjuntor das chamadas à API estiver aberto (`app/utils/resilience.py`).
 
     Exemplos de Uso:
         generate_response("Qual é o sentido da vida?", user_name="Alice")
@@ -372,65 +602,7 @@ def generate_response(question_prompt: str, **kwargs):
         
     # !!! ATENÇÃO: Esse trecho define funções auxiliares para o funcionamento da generate_response.
     @log_function_call
-    def _format_user_question(user_name=None, question_prompt=None):
-        """
-        ## Motivação
-
-        Esta função foi criada para diferenciar várias conversas dentro de uma mesma thread em um sistema de chat. Ao prefixar cada pergunta com o nome do usuário, o modelo de IA pode:
-
-        * Manter o contexto de quem está fazendo a pergunta, especialmente útil em chats com múltiplos usuários.
-        * Fornecer respostas mais direcionadas e personalizadas para cada usuário.
-
-        Essa abordagem também é útil em grupos do WhatsApp, onde a quantidade de mensagens pode ser alta e o contexto pode ser facilmente perdido.
-
-
-        ## Funcão
-
-        Prepara uma pergunta para ser enviada ao ChatGPT, prefixando-a com o nome do usuário e formatando-a de acordo com as melhores práticas.
-
-        Essa abordagem oferece diversos benefícios:
-
-        * **Contextualização:** Permite ao modelo de IA manter o contexto de quem está fazendo a pergunta, especialmente útil em chats com múltiplos usuários.
-        * **Personalização:** Melhora a experiência de interação, tornando as respostas do modelo mais direcionadas e relevantes para cada usuário.
-        * **Usabilidade:** Facilita a leitura e compreensão das perguntas em interfaces conversacionais.
-
-        A função formata a pergunta da seguinte maneira:
-
-        * **Nome do usuário:** "Usuário {nome}"
-        * **Pergunta:** "{pergunta}"
-
-        Exemplo:
-
-        --- format_user_question("Alice", "O que é inteligência artificial?")
-        'Usuário Alice pergunta: O que é inteligência artificial?'
-
-        **Observações:**
-
-        * A formatação pode ser facilmente adaptada para atender às necessidades específicas do seu aplicativo.
-        * Ao utilizar esta função em um sistema real, considere as implicações de segurança e privacidade relacionadas ao uso de nomes de usuários e perguntas que podem conter informações confidenciais.
-
-        **Referências:**
-
-        * Documentação da OpenAI sobre threads e gestão de contexto em conversas: https://openai.com/api/
-        * Práticas recomendadas para interação com modelos de IA e gestão de estado de conversa em chatbots e assistentes virtuais.
-        * Considerações sobre usabilidade e experiência do usuário em interfaces conversacionais.
-
-        """
-        if user_name is None:
-            return question_prompt
-
-        # Verifica se o prompt de pergunta foi fornecido
-        if question_prompt is None:
-            raise ValueError("Por favor, insira uma pergunta.")
-        
-        #formatted_question = f"Meu nome é: {user_name}, e te faço uma pergunta: {question_prompt}"
-        
-        formatted_question = f"Meu nome é: {user_name}, e use esse nome para distinguir entre as perguntas. Não precisa ficar dizendo meu nome, nem o que vai fazer, apenas faça. Te faço uma pergunta: {question_prompt}"
-        
-        return formatted_question
-
-    @log_function_call
-    def _run_assistant(thread_id: str, assistant_id: str):
+    def _run_assistant(pooled, thread_id: str, assistant_id: str, settings):
         """
     Executa um assistente conversacional da OpenAI em uma thread específica, gerando uma resposta personalizada.
 
@@ -442,11 +614,15 @@ def generate_response(question_prompt: str, **kwargs):
     4. **Extrair a resposta:** Extrai a última mensagem gerada pelo assistente a partir das mensagens da thread.
 
     Args:
+            pooled (PooledClient): O cliente do pool da chave em que o thread foi criado.
             thread_id (str): O ID do thread que será utilizado na conversa.
             assistant_id (str): O ID do assistente que será utilizado para gerar respostas.
+            settings (AssistantSettings): A versão da configuração do assistente do turno; as
+                instruções, ferramentas e modelo definidos nela substituem os do assistente neste run.
 
         Returns:
-            str: A resposta gerada pelo assistente na thread fornecida.
+            tuple: A resposta gerada pelo assistente na thread fornecida e o objeto do run concluído
+                   (com seu ID e o consumo de tokens em `run.usage`).
 
     Referências:
         * Documentação da API OpenAI - Assistentes: https://beta.openai.com/docs/api-reference/assistants
@@ -455,42 +631,306 @@ def generate_response(question_prompt: str, **kwargs):
         """
     
         # Run the assistant (https://beta.openai.com/docs/api-reference/threads/runs/create)
-        run = client.beta.threads.runs.create(thread_id=thread_id, assistant_id=assistant_id)
-
-        # Wait for completion (https://beta.openai.com/docs/api-reference/threads/runs/retrieve)
-        while run.status != "completed":
-            # Be nice to the API
-            time.sleep(0.5)
-            run = client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run.id)
-
-        # Retrieve the Messages (https://beta.openai.com/docs/api-reference/threads/messages/list)
-        messages = client.beta.threads.messages.list(thread_id=thread_id)
+        # Criar um run não é idempotente: só o disjuntor; as leituras seguintes também podem ter cópia
+        # (app/utils/resilience.py).
+        breaker = _breaker_name(pooled)
+        run = _guarded(breaker, pooled.client.beta.threads.runs.create, thread_id=thread_id,
+                       assistant_id=assistant_id, **_run_options(settings, user_name, passages))
+        ASSISTANT_RUNS.labels(assistant_id=assistant_id).inc()
+        # O run fica gravado como em andamento até terminar; se o processo parar antes, a varredura o cancela.
+        mark_active_run(thread_id, run.id)
+        deadline = time.monotonic() + OpenAIAssistantConfig.RUN_TIMEOUT_SECONDS
+
+        try:
+            # Wait for completion (https://beta.openai.com/docs/api-reference/threads/runs/retrieve)
+            while run.status != "completed" and run.status not in FAILED_RUN_STATUSES:
+                if time.monotonic() >= deadline:
+                    # Se o cancelamento falhar, o registro fica para a varredura de runs presos.
+                    _cancel_run(thread_id, run.id)
+                    raise RunTimeoutError(thread_id, run.id, OpenAIAssistantConfig.RUN_TIMEOUT_SECONDS)
+                # Be nice to the API
+                time.sleep(OpenAIAssistantConfig.RUN_POLL_INTERVAL_SECONDS)
+                run = _hedged(breaker, "runs.retrieve", pooled.client.beta.threads.runs.retrieve,
+                              thread_id=thread_id, run_id=run.id)
+
+            # Retrieve the Messages (https://beta.openai.com/docs/api-reference/threads/messages/list)
+            if run.status == "completed":
+                messages = _hedged(breaker, "messages.list", pooled.client.beta.threads.messages.list,
+                                   thread_id=thread_id, limit=1)
+        except RunTimeoutError:
+            raise
+        except Exception:
+            # O turno desistiu de um run que pode continuar ativo: cancela-o, liberando o thread já.
+            _cancel_run(thread_id, run.id)
+            raise
+        clear_active_run(thread_id, run.id)
+        if run.status != "completed":
+            raise RuntimeError(f"run {run.id} terminou com status {run.status}")
         new_message = messages.data[0].content[0].text.value
-        return new_message
+        return new_message, run
  
 
     if not question_prompt:
         raise ValueError("Por favor, insira uma pergunta.")
 
     # Retrieve the Assistant and thread_id (https://beta.openai.com/docs/api-reference/assistants/retrieve)
-    assistant_id = kwargs.get('assistant_id', OpenAIAssistantConfig.AI_ASSISTANT_ID)  # Usa o assistant_id padrão se não for especificado.
     thread_id = kwargs.get('thread_id', OpenAIConfig.AI_THREAD_ID)  # Usa o thread_id padrão se não for especificado.
     user_name = kwargs.get('user_name', None)  # Assume None para user_name se não for especificado.
+    # A versão da configuração é lida uma única vez: o turno termina com ela mesmo se houver uma recarga.
+    settings = current_assistant_settings()
+    # Sem assistant_id explícito, usa o assistente atribuído ao thread (app/services/assistant_sharding.py).
+    assistant_id = kwargs.get('assistant_id') or assistant_for_thread(thread_id, user_name)
+    # Orçamento de tokens do usuário, antes de enviar a mensagem e criar o run (app/services/usage_accounting.py)
+    enforce_budget(user_name)
 
    # PREPARAR PERGUNTA COM NOME DE USUÁRIO
     formated_question = _format_user_question(user_name=user_name, question_prompt=question_prompt)
+    # Trechos dos documentos indexados localmente, só para este run (app/services/document_retrieval.py)
+    passages = grounding_instructions(question_prompt) if kwargs.get('grounding', RetrievalConfig.ENABLED) else None
+
+    def _answer():
+        try:
+            started_at = time.time()
+            # O turno inteiro usa o cliente da chave em que o thread foi criado (app/interfaces/client_pool.py)
+            # Um run deixado ativo por um processo que parou impediria a nova mensagem.
+            recover_stale_run(thread_id)
+            with get_client_pool().acquire(client_key_for_thread(thread_id)) as pooled:
+                #Cria a mensagem para ser enviada à API da OpenAI
+                _guarded(_breaker_name(pooled), pooled.client.beta.threads.messages.create,
+                         thread_id=thread_id, role="user", content=formated_question, **_message_options(user_name))
+                message_created_at = time.time()
+
+                # Roda o assistant da OpenIA, aguarda e retorna a resposta utilizando a thread especificada. E, se for o caso, 
+                # apropriada para cada usuário de uma thread       
+                response, run = _run_assistant(pooled, thread_id, assistant_id, settings)
+
+        except (CircuitOpenError, RunTimeoutError):
+            raise
+
+        except Exception as e:
+
+            raise Exception(f"Erro durante execução: {e}")
+
+        # Grava o turno no registro local de conversas (app/data/transcript_store.py)
+        finished_at = time.time()
+        record_turn(
+            thread_id=thread_id,
+            user_name=user_name,
+            assistant_id=assistant_id,
+            run_id=run.id,
+            config_version=settings.version,
+            question=question_prompt,
+            reply=response,
+            created_at=started_at,
+            timings={
+                "message_create_s": round(message_created_at - started_at, 3),
+                "run_s": round(finished_at - message_created_at, 3),
+                "total_s": round(finished_at - started_at, 3),
+            },
+            usage=run.usage.model_dump() if getattr(run, "usage", None) else None,
+        )
+        record_usage(user_name, thread_id, assistant_id, getattr(run, "usage", None))
+        record_avoided_preamble(user_name)
+        return response, run
+
+    if not kwargs.get('coalesce', CoalescingConfig.ENABLED):
+        response, _ = _answer()
+        return response
+
+    # Perguntas idênticas em andamento no mesmo assistente compartilham um único run (app/services/question_coalescing.py)
+    (response, run), shared = coalesce_question(assistant_id, question_prompt, _answer, user_name,
+                                           config_version=settings.version, passages=passages)
+    if shared:
+        record_turn(
+            thread_id=thread_id,
+            user_name=user_name,
+            assistant_id=assistant_id,
+            run_id=run.id,
+            config_version=settings.version,
+            question=question_prompt,
+            reply=response,
+            created_at=time.time(),
+            coalesced=True,
+        )
+    return response
 
-    try:
-        #Cria a mensagem para ser enviada à API da OpenAI
-        client.beta.threads.messages.create(thread_id=thread_id, role="user", content=formated_question)
+@log_function_call
+def stream_response(question_prompt: str, **kwargs):
+    """
+    Variante de `generate_response` que entrega a resposta em partes, à medida que o assistente a gera.
 
-        # Roda o assistant da OpenIA, aguarda e retorna a resposta utilizando a thread especificada. E, se for o caso, 
-        # apropriada para cada usuário de uma thread       
-        response = _run_assistant(thread_id, assistant_id) 
+    Usa o streaming de runs da API de Assistentes (`runs.create_and_stream`): cada parte de texto é entregue assim
+    que chega, em vez de aguardar o run terminar. Ao final, o turno é gravado no registro local de conversas, como
+    em `generate_response`.
 
+    Se o iterador for fechado antes do fim (por exemplo, quando o cliente desconecta), o run remoto é cancelado
+    e o turno não é gravado.
+
+    Args:
+        question_prompt (str): Texto do prompt de pergunta para o qual a resposta é gerada.
+        **kwargs: Os mesmos argumentos opcionais de `generate_response` (thread_id, assistant_id, user_name,
+                  grounding), e
+                  `on_status` (Callable[[str], None], opcional): chamada com o status do run ("queued",
+                  "in_progress", "completed"...) a cada mudança, na thread que consome o iterador.
+
+    Returns:
+        Iterator[str]: As partes da resposta, na ordem em que são geradas.
+
+    Raises:
+        ValueError: Se `question_prompt` for None ou uma string vazia (levantada já na chamada).
+        BudgetExceededError: Se o usuário atingiu o seu orçamento de tokens (levantada já na chamada).
+        RunTimeoutError: Se o run excedeu `OpenAIAssistantConfig.RUN_TIMEOUT_SECONDS` (levantada durante a
+            iteração); o run remoto é cancelado.
+
+    Exemplo de Uso:
+        for text in stream_response("Conte-me uma piada.", thread_id="thread_123", user_name="Alice"):
+            print(text, end="", flush=True)
+    """
+    if not question_prompt:
+        raise ValueError("Por favor, insira uma pergunta.")
+
+    thread_id = kwargs.get('thread_id', OpenAIConfig.AI_THREAD_ID)
+    user_name = kwargs.get('user_name', None)
+    settings = current_assistant_settings()
+    assistant_id = kwargs.get('assistant_id') or assistant_for_thread(thread_id, user_name)
+    enforce_budget(user_name)
+    formated_question = _format_user_question(user_name=user_name, question_prompt=question_prompt)
+    passages = grounding_instructions(question_prompt) if kwargs.get('grounding', RetrievalConfig.ENABLED) else None
+    return _stream_turn(thread_id, user_name, assistant_id, question_prompt, formated_question, settings,
+                        kwargs.get('on_status'), passages)
+
+
+def _run_options(settings, user_name=None, passages=None):
+    # Substituições da configuração recarregável e a versão usada, gravada nos metadados do run. O nome do
+    # usuário (no modo "run" de identificação) e os trechos da busca local vão nas instruções adicionais, que não
+    # ficam no thread.
+    options = {**settings.run_overrides(), "metadata": {"config_version": str(settings.version)}}
+    instructions = "\n\n".join(part for part in (run_instructions(user_name), passages) if part)
+    if instructions:
+        options["additional_instructions"] = instructions
+    return options
+
+
+def _message_options(user_name):
+    # No modo "run", o nome do usuário fica nos metadados da mensagem, que leva apenas a pergunta.
+    return {"metadata": {"user_name": user_name}} if naming_mode() == "run" and user_name else {}
+
+
+def _breaker_name(pooled):
+    return f"openai:{pooled.name}"
+
+
+def _is_api_failure(error):
+    # Só falhas da API (limite de taxa, 5xx, conexão) abrem o disjuntor; erros do pedido (400, 404) não.
+    return _is_openai_error(error, _COOLDOWN_ERRORS)
+
+
+def _guarded(breaker, fn, **kwargs):
+    return guarded_call(breaker, fn, is_failure=_is_api_failure, **kwargs)
+
+
+def _hedged(breaker, operation, fn, **kwargs):
+    return hedged_read(breaker, operation, fn, is_failure=_is_api_failure, **kwargs)
+
+
+def _cancel_run(thread_id, run_id):
+    try:
+        cancel_run(thread_id, run_id)
     except Exception as e:
+        # O run pode já ter terminado; não há o que cancelar.
+        logger.warning(f"Não foi possível cancelar o run {run_id} do thread {thread_id}: {e}")
+
+
+def _stream_turn(thread_id, user_name, assistant_id, question_prompt, formated_question, settings, on_status=None,
+                 passages=None):
+    parts = []
+    run = None
+    stream = None
+    timed_out = threading.Event()
+
+    def _expire():
+        # Prazo do turno: vale também para um streaming parado, sem eventos. Cancelar o run e fechar a resposta
+        # desbloqueia a leitura em andamento.
+        timed_out.set()
+        _cancel_run(thread_id, run.id if run is not None else None)
+        if stream is not None:
+            stream.close()
+
+    deadline = threading.Timer(OpenAIAssistantConfig.RUN_TIMEOUT_SECONDS, _expire)
+    deadline.daemon = True
+    try:
+        started_at = time.time()
+        recover_stale_run(thread_id)
+        with get_client_pool().acquire(client_key_for_thread(thread_id)) as pooled:
+            _guarded(_breaker_name(pooled), pooled.client.beta.threads.messages.create,
+                     thread_id=thread_id, role="user", content=formated_question, **_message_options(user_name))
+            message_created_at = time.time()
+
+            # Stream the run (https://platform.openai.com/docs/api-reference/assistants-streaming)
+            with pooled.client.beta.threads.runs.create_and_stream(
+                    thread_id=thread_id, assistant_id=assistant_id,
+                    **_run_options(settings, user_name, passages)) as stream:
+                ASSISTANT_RUNS.labels(assistant_id=assistant_id).inc()
+                deadline.start()
+                for event in stream:
+                    if event.event == "thread.run.created":
+                        run = event.data
+                        mark_active_run(thread_id, run.id)
+                    if on_status is not None and event.event.startswith("thread.run.") \
+                            and not event.event.startswith("thread.run.step."):
+                        on_status(event.data.status)
+                    if event.event != "thread.message.delta":
+                        continue
+                    for content in event.data.delta.content or ():
+                        if content.type == "text" and content.text and content.text.value:
+                            parts.append(content.text.value)
+                            yield content.text.value
+                if timed_out.is_set():
+                    raise RunTimeoutError(thread_id, getattr(run, "id", None), OpenAIAssistantConfig.RUN_TIMEOUT_SECONDS)
+                run = stream.get_final_run()
+
+    except GeneratorExit:
+        # O consumidor desistiu da resposta: cancela o run para não consumir tokens à toa.
+        if run is not None and not timed_out.is_set():
+            _cancel_run(thread_id, run.id)
+        raise
+
+    except (CircuitOpenError, RunTimeoutError):
+        raise
 
+    except Exception as e:
+        if timed_out.is_set():
+            # A leitura interrompida pelo prazo; o run já foi cancelado.
+            raise RunTimeoutError(thread_id, getattr(run, "id", None),
+                                  OpenAIAssistantConfig.RUN_TIMEOUT_SECONDS) from e
+        # O turno desistiu de um run que pode continuar ativo: cancela-o, liberando o thread já.
+        if run is not None:
+            _cancel_run(thread_id, run.id)
         raise Exception(f"Erro durante execução: {e}")
-     
-    return response
 
+    finally:
+        deadline.cancel()
+
+    clear_active_run(thread_id, run.id)
+    if run.status != "completed":
+        raise RuntimeError(f"run {run.id} terminou com status {run.status}")
+
+    finished_at = time.time()
+    record_turn(
+        thread_id=thread_id,
+        user_name=user_name,
+        assistant_id=assistant_id,
+        run_id=run.id,
+        config_version=settings.version,
+        question=question_prompt,
+        reply="".join(parts),
+        created_at=started_at,
+        timings={
+            "message_create_s": round(message_created_at - started_at, 3),
+            "run_s": round(finished_at - message_created_at, 3),
+            "total_s": round(finished_at - started_at, 3),
+        },
+        usage=run.usage.model_dump() if getattr(run, "usage", None) else None,
+    )
+    record_usage(user_name, thread_id, assistant_id, getattr(run, "usage", None))
+    record_avoided_preamble(user_name)
@@ -0,0 +1,242 @@
+import json
+import os
+import sys
+import threading
+import time
+
+# Define explicitamente o diretório raiz do projeto
+sys.path.append('/workplace/')
+
+from app.decorators.log_decorator import log_function_call, logger
+from app.utils.metrics import ASSISTANT_CONFIG_RELOADS, ASSISTANT_CONFIG_VERSION
+from app.utils.openia_config import AssistantReloadConfig, OpenAIAssistantConfig
+
+"""
+Assistant Config
+
+Configuração do assistente (ID, lista de assistentes, nome, instruções, ferramentas e modelo) recarregável sem
+reiniciar o processo. Os padrões vêm de `OpenAIAssistantConfig`; os campos presentes no arquivo JSON
+`AssistantReloadConfig.PATH` os substituem.
+
+- **Vigilância:** a data de modificação e o tamanho do arquivo são verificados no máximo a cada
+  `AssistantReloadConfig.POLL_SECONDS`, no próprio acesso à configuração; não há thread em segundo plano, e cada
+  worker do gunicorn recarrega o arquivo por conta própria.
+- **Troca atômica:** cada versão é um `AssistantSettings` imutável, construído e validado por completo antes de
+  substituir a versão atual. Cada turno de conversa lê a versão uma única vez no início, de modo que os runs em
+  andamento terminam com a versão em que começaram e as novas requisições usam a nova.
+- **Aplicação:** "instructions", "tools" e "model" definidos no arquivo são enviados como substituições em cada
+  novo run (`run_overrides`), sem alterar o assistente remoto; "assistant_id" e "assistant_ids" valem para os
+  threads novos (ver `app/services/assistant_sharding.py`).
+- **Erros:** um arquivo inválido é registrado no log e ignorado; a versão atual continua em uso.
+
+A versão em uso é exposta na métrica `interface_openai_assistant_config_version` e gravada nos metadados de cada
+run ("config_version") e no registro local de conversas.
+"""
+
+FIELDS = ("assistant_id", "assistant_ids", "name", "instructions", "tools", "model")
+RUN_OVERRIDE_FIELDS = ("instructions", "tools", "model")
+
+
+class AssistantSettings:
+    """
+    Uma versão imutável da configuração do assistente.
+
+    Atributos:
+        version (int): O número da versão no processo (1 na primeira carga, incrementado a cada recarga).
+        assistant_id (str): O assistente padrão.
+        assistant_ids (tuple[str]): Os assistentes entre os quais os usuários são distribuídos.
+        name, instructions, model (str) e tools (tuple[dict]): Os atributos do assistente.
+        overrides (frozenset[str]): Os campos definidos no arquivo.
+    """
+
+    __slots__ = ("version", "overrides") + FIELDS
+
+    def __init__(self, version, values, overrides=()):
+        object.__setattr__(self, "version", version)
+        object.__setattr__(self, "overrides", frozenset(overrides))
+        for field in FIELDS:
+            value = values[field]
+            object.__setattr__(self, field, tuple(value) if isinstance(value, list) else value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("AssistantSettings é imutável; use reload_assistant_settings().")
+
+    def run_overrides(self) -> dict:
+        """
+        Retorna os argumentos de `runs.create` que substituem a configuração do assistente remoto nesta versão.
+        """
+        return {
+            field: list(getattr(self, field)) if field == "tools" else getattr(self, field)
+            for field in RUN_OVERRIDE_FIELDS if field in self.overrides
+        }
+
+
+def _defaults() -> dict:
+    return {
+        "assistant_id": OpenAIAssistantConfig.AI_ASSISTANT_ID,
+        "assistant_ids": list(OpenAIAssistantConfig.AI_ASSISTANT_IDS),
+        "name": OpenAIAssistantConfig.ASSISTANT_NAME,
+        "instructions": OpenAIAssistantConfig.INSTRUCTIONS,
+        "tools": OpenAIAssistantConfig.TOOLS,
+        "model": OpenAIAssistantConfig.AI_ASSISTANT_MODEL,
+    }
+
+
+def parse_settings_file(path: str) -> dict:
+    """
+    Lê e valida o arquivo de configuração do assistente.
+
+    Parâmetros:
+        path (str): O arquivo JSON.
+
+    Retorna:
+        dict: Os campos definidos no arquivo.
+
+    Exceções:
+        ValueError: Se o arquivo não for um objeto JSON válido, tiver campos desconhecidos ou valores inválidos.
+    """
+    with open(path, encoding="utf-8") as file:
+        try:
+            values = json.load(file)
+        except ValueError as e:
+            raise ValueError(f"JSON inválido em {path}: {e}") from None
+    if not isinstance(values, dict):
+        raise ValueError(f"{path} deve conter um objeto JSON.")
+    unknown = set(values) - set(FIELDS)
+    if unknown:
+        raise ValueError(f"Campos desconhecidos em {path}: {', '.join(sorted(unknown))}")
+
+    for field in ("assistant_id", "name", "instructions", "model"):
+        if field in values and not (isinstance(values[field], str) and values[field].strip()):
+            raise ValueError(f"'{field}' deve ser um texto não vazio.")
+    if "assistant_ids" in values:
+        ids = values["assistant_ids"]
+        if not (isinstance(ids, list) and ids and all(isinstance(i, str) and i.strip() for i in ids)):
+            raise ValueError("'assistant_ids' deve ser uma lista não vazia de IDs.")
+    if "tools" in values:
+        tools = values["tools"]
+        if not (isinstance(tools, list) and all(isinstance(tool, dict) and "type" in tool for tool in tools)):
+            raise ValueError("'tools' deve ser uma lista de objetos com a chave \"type\".")
+    return values
+
+
+class AssistantConfigSource:
+    """
+    Mantém a versão atual da configuração do assistente e a recarrega quando o arquivo muda.
+
+    Parâmetros:
+        path (str, optional): O arquivo JSON. Sem arquivo, vale apenas a configuração padrão.
+        poll_seconds (float): O intervalo mínimo entre duas verificações do arquivo.
+
+    Exemplo de Uso:
+        source = AssistantConfigSource("/etc/interface_openai/assistant.json")
+        settings = source.current()
+        client.beta.threads.runs.create(thread_id=..., assistant_id=settings.assistant_id, **settings.run_overrides())
+    """
+
+    def __init__(self, path=None, poll_seconds=5.0):
+        self.path = path
+        self.poll_seconds = poll_seconds
+        self._guard = threading.Lock()
+        self._settings = None
+        self._stamp = None
+        self._next_check = 0.0
+        self.reload(force=True)
+
+    def _file_stamp(self):
+        if not self.path:
+            return None
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def current(self) -> AssistantSettings:
+        """
+        Retorna a versão atual, verificando antes se o arquivo mudou (no máximo a cada `poll_seconds`).
+        """
+        if time.monotonic() >= self._next_check:
+            self.reload()
+        return self._settings
+
+    def reload(self, force=False) -> AssistantSettings:
+        """
+        Recarrega a configuração se o arquivo mudou (ou sempre, com `force`) e retorna a versão em uso.
+        """
+        with self._guard:
+            self._next_check = time.monotonic() + self.poll_seconds
+            stamp = self._file_stamp()
+            if stamp == self._stamp and not force:
+                return self._settings
+            try:
+                overrides = parse_settings_file(self.path) if stamp is not None else {}
+            except (OSError, ValueError) as e:
+                ASSISTANT_CONFIG_RELOADS.labels(result="error").inc()
+                self._stamp = stamp  # Não tenta de novo até o arquivo mudar.
+                if self._settings is not None:
+                    logger.error(f"Configuração do assistente não recarregada; a versão {self._settings.version} "
+                                 f"continua em uso: {e}")
+                    return self._settings
+                logger.error(f"Configuração do assistente inválida; usando a configuração padrão: {e}")
+                overrides = {}
+
+            version = self._settings.version + 1 if self._settings else 1
+            self._settings = AssistantSettings(version, {**_defaults(), **overrides}, overrides)
+            self._stamp = stamp
+        ASSISTANT_CONFIG_RELOADS.labels(result="ok").inc()
+        ASSISTANT_CONFIG_VERSION.set(version)
+        if version > 1:
+            logger.info(f"Configuração do assistente recarregada: versão {version} "
+                        f"(campos do arquivo: {', '.join(sorted(overrides)) or 'nenhum'}).")
+        return self._settings
+
+
+_source = None
+_source_guard = threading.Lock()
+
+
+def get_assistant_config_source() -> AssistantConfigSource:
+    """
+    Retorna a `AssistantConfigSource` configurada em `AssistantReloadConfig`, criando-a no primeiro uso.
+    """
+    global _source
+    if _source is None:
+        with _source_guard:
+            if _source is None:
+                _source = AssistantConfigSource(AssistantReloadConfig.PATH, AssistantReloadConfig.POLL_SECONDS)
+    return _source
+
+
+def reset_assistant_config():
+    """
+    Descarta a fonte de configuração atual; o próximo acesso a recria e relê o arquivo.
+    """
+    global _source
+    with _source_guard:
+        _source = None
+
+
+@log_function_call
+def current_assistant_settings() -> AssistantSettings:
+    """
+    Retorna a versão atual da configuração do assistente, recarregando o arquivo se ele mudou.
+
+    Deve ser lida uma única vez por turno de conversa, para que o turno inteiro use a mesma versão.
+
+    Retorna:
+        AssistantSettings: A versão em uso.
+
+    Exemplo de Uso:
+        settings = current_assistant_settings()
+        print(settings.version, settings.assistant_id)
+    """
+    return get_assistant_config_source().current()
+
+
+@log_function_call
+def reload_assistant_settings() -> AssistantSettings:
+    """
+    Relê o arquivo de configuração imediatamente, sem aguardar o intervalo de verificação.
+    """
+    return get_assistant_config_source().reload(force=True)
@@ -0,0 +1,130 @@
+import bisect
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+
+# Define explicitamente o diretório raiz do projeto
+sys.path.append('/workplace/')
+
+from app.data.threads_manager import retrieve_thread_metadata
+from app.decorators.log_decorator import log_function_call
+from app.services.assistant_config import current_assistant_settings
+from app.utils.openia_config import ThreadStoreConfig
+
+"""
+Assistant Sharding
+
+Distribui os usuários entre vários assistentes equivalentes (`assistant_ids` da configuração em uso, ver
+`app/services/assistant_config.py`) por hashing consistente do nome do usuário, dividindo a carga e os limites de
+uso entre eles. Uma recarga da configuração que altera a lista reconstrói o anel.
+
+- O anel usa nós virtuais para uma distribuição uniforme: ao acrescentar ou remover um assistente, apenas
+  a fração de usuários que cabia a ele muda de assistente.
+- A atribuição é fixa por thread: o assistente escolhido é gravado nos metadados do thread na sua criação
+  (`get_or_create_thread`), e `generate_response` usa sempre o assistente gravado, mesmo que a lista mude.
+- Threads antigos, sem metadados, usam o assistente indicado pelo anel para o usuário ou, sem usuário,
+  o assistente padrão (`assistant_id`).
+"""
+
+VIRTUAL_NODES = 100
+
+
+class ConsistentHashRing:
+    """
+    Anel de hashing consistente com nós virtuais.
+
+    Parâmetros:
+        nodes (list[str]): Os nós do anel (IDs de assistentes).
+        virtual_nodes (int): Quantos pontos cada nó ocupa no anel.
+
+    Exemplo de Uso:
+        ring = ConsistentHashRing(["asst_a", "asst_b"])
+        ring.node_for("Cícero")  # "asst_a" ou "asst_b", sempre o mesmo para "Cícero"
+    """
+
+    def __init__(self, nodes, virtual_nodes=VIRTUAL_NODES):
+        if not nodes:
+            raise ValueError("O anel precisa de pelo menos um nó.")
+        points = sorted((self._hash(f"{node}#{i}"), node) for node in nodes for i in range(virtual_nodes))
+        self._hashes = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    @staticmethod
+    def _hash(key):
+        return int.from_bytes(hashlib.md5(key.encode('utf-8')).digest()[:8], 'big')
+
+    def node_for(self, key):
+        index = bisect.bisect(self._hashes, self._hash(key)) % len(self._hashes)
+        return self._nodes[index]
+
+
+_ring = None
+_ring_nodes = None
+_ring_guard = threading.Lock()
+
+# Cache limitado (LRU, `ThreadStoreConfig.METADATA_CACHE_SIZE`) de thread_id -> assistant_id; a atribuição de um
+# thread nunca muda.
+_thread_assistants = OrderedDict()
+_thread_assistants_guard = threading.Lock()
+
+
+def _current_ring():
+    global _ring, _ring_nodes
+    nodes = tuple(current_assistant_settings().assistant_ids)
+    with _ring_guard:
+        if nodes != _ring_nodes:
+            _ring, _ring_nodes = ConsistentHashRing(nodes), nodes
+        return _ring
+
+
+@log_function_call
+def assign_assistant(user_name: str) -> str:
+    """
+    Retorna o assistente atribuído a um usuário pelo anel de hashing consistente.
+
+    Parâmetros:
+        user_name (str): O nome do usuário.
+
+    Retorna:
+        str: O ID do assistente.
+
+    Exemplo de Uso:
+        assistant_id = assign_assistant("Cícero")
+    """
+    return _current_ring().node_for(user_name)
+
+
+@log_function_call
+def assistant_for_thread(thread_id: str, user_name: str = None) -> str:
+    """
+    Retorna o assistente que deve responder em um thread.
+
+    Usa o assistente gravado nos metadados do thread; sem metadados (threads antigos), usa o anel pelo
+    nome do usuário ou, sem usuário, o assistente padrão.
+
+    Parâmetros:
+        thread_id (str): O ID do thread.
+        user_name (str, optional): O nome do usuário dono do thread.
+
+    Retorna:
+        str: O ID do assistente.
+
+    Exemplo de Uso:
+        assistant_id = assistant_for_thread("thread_123", "Cícero")
+    """
+    with _thread_assistants_guard:
+        if thread_id in _thread_assistants:
+            _thread_assistants.move_to_end(thread_id)
+            return _thread_assistants[thread_id]
+
+    assistant_id = retrieve_thread_metadata(thread_id).get("assistant_id")
+    if assistant_id is None:
+        # Sem atribuição gravada: não armazena em cache, pois ela pode ser gravada depois.
+        return assign_assistant(user_name) if user_name else current_assistant_settings().assistant_id
+
+    with _thread_assistants_guard:
+        _thread_assistants[thread_id] = assistant_id
+        if len(_thread_assistants) > ThreadStoreConfig.METADATA_CACHE_SIZE:
+            _thread_assistants.popitem(last=False)
+    return assistant_id
@@ -0,0 +1,125 @@
+import queue
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Define explicitamente o diretório raiz do projeto
+sys.path.append('/workplace/')
+
+from app.decorators.log_decorator import logger
+from app.utils.metrics import ACTIVE_CHATS, REJECTED_CHATS
+
+"""
+Chat Dispatcher
+
+Executa os turnos de conversa do serviço HTTP em um pool de threads limitado, separado das threads que atendem
+as conexões, para que o servidor possa:
+
+- **Aplicar contrapressão:** no máximo `max_concurrent` turnos em andamento por processo; acima disso a
+  requisição é recusada na hora (`ServerBusyError` -> 503), em vez de ocupar uma conexão aguardando a API.
+- **Limitar o tempo de resposta:** a requisição aguarda o resultado por um tempo limitado; ao expirar, o turno
+  continua em segundo plano (a mensagem já foi enviada ao thread) e a sua vaga só é liberada quando ele termina.
+- **Transmitir respostas em partes:** `stream` consome um iterador em uma thread do pool e entrega as partes
+  ao chamador por uma fila, com tempo limite entre as partes. Se o chamador desistir (fechando o iterador
+  retornado, por exemplo quando o cliente desconecta), o iterador de origem é fechado na parte seguinte,
+  o que cancela o run remoto (`stream_response`).
+"""
+
+_END = object()
+
+
+class ServerBusyError(Exception):
+    """
+    Levantada quando todos os turnos simultâneos do processo estão ocupados.
+    """
+
+
+class ChatDispatcher:
+    """
+    Pool limitado de execução de turnos de conversa.
+
+    Parâmetros:
+        max_concurrent (int): O número máximo de turnos em andamento.
+
+    Exemplo de Uso:
+        dispatcher = ChatDispatcher(16)
+        reply = dispatcher.submit(generate_response, "Oi", thread_id="thread_1").result(timeout=120)
+    """
+
+    def __init__(self, max_concurrent):
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="chat")
+
+    def _reserve(self):
+        if not self._slots.acquire(blocking=False):
+            REJECTED_CHATS.inc()
+            raise ServerBusyError("Todos os turnos simultâneos estão ocupados.")
+        ACTIVE_CHATS.inc()
+
+    def _release(self, _=None):
+        ACTIVE_CHATS.dec()
+        self._slots.release()
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Agenda `fn(*args, **kwargs)` e retorna o seu `Future`; levanta `ServerBusyError` se não houver vaga.
+        """
+        self._reserve()
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def stream(self, make_iterator, timeout):
+        """
+        Consome, em uma thread do pool, o iterador criado por `make_iterator` e repassa as suas partes.
+
+        Parâmetros:
+            make_iterator (Callable[[], Iterator]): Cria o iterador; chamada já dentro da thread do pool.
+            timeout (float): O tempo máximo de espera por cada parte.
+
+        Retorna:
+            Iterator: As partes, na ordem. Levanta a exceção do iterador, se houver, e `TimeoutError` se uma
+                      parte demorar mais que `timeout`. Levanta `ServerBusyError` já na chamada, se não houver vaga.
+                      Fechar este iterador (ou abandoná-lo após um `TimeoutError`) fecha o iterador de origem.
+        """
+        parts = queue.Queue()
+        abandoned = threading.Event()
+
+        def pump():
+            iterator = None
+            try:
+                iterator = make_iterator()
+                for part in iterator:
+                    if abandoned.is_set():
+                        break
+                    parts.put(part)
+                parts.put(_END)
+            except BaseException as e:
+                parts.put(e)
+            finally:
+                if iterator is not None and hasattr(iterator, "close"):
+                    iterator.close()
+
+        self.submit(pump)
+        return self._drain(parts, timeout, abandoned)
+
+    @staticmethod
+    def _drain(parts, timeout, abandoned):
+        try:
+            while True:
+                try:
+                    part = parts.get(timeout=timeout)
+                except queue.Empty:
+                    logger.warning(f"Nenhuma parte da resposta em {timeout}s; encerrando o streaming.")
+                    raise TimeoutError(f"Nenhuma parte da resposta em {timeout}s.") from None
+                if part is _END:
+                    return
+                if isinstance(part, BaseException):
+                    raise part
+                yield part
+        finally:
+            abandoned.set()
@@ -0,0 +1,241 @@
+import argparse
+import os
+import sys
+import threading
+from contextlib import contextmanager
+
+# Define explicitamente o diretório raiz do projeto
+sys.path.append('/workplace/')
+
+from app.data.document_index import DocumentIndex, write_index
+from app.decorators.log_decorator import log_function_call, logger
+from app.utils.openia_config import RetrievalConfig
+
+"""
+Document Retrieval
+
+Busca local nos documentos de referência do assistente, sem a ferramenta remota "retrieval".
+
+Os documentos enviados com `upload_file_to_openai` só são consultados pela ferramenta "retrieval" do assistente,
+o que acrescenta chamadas de ferramenta (e o seu tempo) a cada run. Com a busca local:
+
+- **Indexação:** `ingest_documents` extrai o texto dos documentos (PDF, com o pacote opcional `pypdf`, ou texto
+  puro), divide-o em trechos de `RetrievalConfig.CHUNK_WORDS` palavras e grava o índice invertido com pontuação
+  BM25 em `RetrievalConfig.INDEX_PATH` (ver `app/data/document_index.py`). Reindexar um documento substitui os
+  seus trechos anteriores.
+- **Uso:** com `RetrievalConfig.ENABLED`, `generate_response` e `stream_response` passam ao run os trechos mais
+  relevantes para a pergunta (`grounding_instructions`), nas instruções adicionais. Elas valem só para aquele run e
+  não são gravadas no thread: os trechos não se acumulam no histórico, que a API reenvia ao modelo a cada turno.
+  Em troca, um turno seguinte que dependa de trechos de uma pergunta anterior só os recebe se a busca os trouxer
+  de novo.
+
+Assistentes sensíveis a latência podem então dispensar a ferramenta "retrieval" (retirando-a de `TOOLS` ou do
+arquivo de configuração do assistente).
+
+Uso pela linha de comando:
+
+    python app/services/document_retrieval.py ingest tests/oracao.pdf
+    python app/services/document_retrieval.py search "misericórdia do Senhor"
+"""
+
+TEXT_EXTENSIONS = (".txt", ".md", ".text")
+
+_index = None
+_index_stamp = None
+_index_readers = {}  # Índice -> buscas em andamento nele.
+_index_guard = threading.Lock()
+
+
+def extract_text(path: str) -> str:
+    """
+    Extrai o texto de um documento.
+
+    Parâmetros:
+        path (str): Um arquivo PDF ou de texto (.txt, .md).
+
+    Retorna:
+        str: O texto do documento.
+
+    Exceções:
+        ValueError: Se o tipo do arquivo não for suportado.
+        RuntimeError: Se o arquivo for PDF e o pacote `pypdf` não estiver instalado.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in TEXT_EXTENSIONS:
+        with open(path, encoding="utf-8") as file:
+            return file.read()
+    if extension != ".pdf":
+        raise ValueError(f"Tipo de documento não suportado: {path} (use PDF ou {', '.join(TEXT_EXTENSIONS)}).")
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise RuntimeError("A indexação de PDFs requer o pacote 'pypdf' (pip install pypdf).") from None
+    return "\n".join(page.extract_text() or "" for page in PdfReader(path).pages)
+
+
+def chunk_text(text: str, chunk_words: int, overlap_words: int = 0) -> list:
+    """
+    Divide um texto em trechos de `chunk_words` palavras; cada trecho repete as `overlap_words` últimas palavras
+    do anterior, para que uma passagem na fronteira entre dois trechos não se perca.
+
+    Exemplo de Uso:
+        chunk_text("a b c d e", chunk_words=3, overlap_words=1)  # ['a b c', 'c d e']
+    """
+    words = text.split()
+    step = max(1, chunk_words - min(overlap_words, chunk_words - 1))
+    chunks = []
+    for start in range(0, len(words), step):
+        chunks.append(" ".join(words[start:start + chunk_words]))
+        if start + chunk_words >= len(words):
+            break
+    return chunks
+
+
+def _retire(index):
+    # Chamada com `_index_guard`: fecha o índice substituído (o mmap e o descritor do arquivo) se nenhuma busca o
+    # estiver usando; do contrário, a última busca o fecha ao terminar.
+    if index is not None and not _index_readers.get(index):
+        index.close()
+
+
+@contextmanager
+def _opened_index(path):
+    # Reabre o índice quando o arquivo muda (foi reindexado por este ou outro processo).
+    global _index, _index_stamp
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        yield None
+        return
+    stamp = (path, stat.st_mtime_ns, stat.st_size, stat.st_ino)
+    with _index_guard:
+        if stamp != _index_stamp:
+            _retire(_index)
+            _index, _index_stamp = DocumentIndex(path), stamp
+        index = _index
+        _index_readers[index] = _index_readers.get(index, 0) + 1
+    try:
+        yield index
+    finally:
+        with _index_guard:
+            _index_readers[index] -= 1
+            if not _index_readers[index]:
+                del _index_readers[index]
+                if index is not _index:
+                    index.close()
+
+
+def reset_document_index():
+    """
+    Descarta o índice aberto; o próximo acesso o reabre.
+    """
+    global _index, _index_stamp
+    with _index_guard:
+        _retire(_index)
+        _index = _index_stamp = None
+
+
+@log_function_call
+def ingest_documents(paths, index_path: str = None) -> int:
+    """
+    Indexa documentos, substituindo os trechos anteriores dos mesmos documentos e mantendo os demais.
+
+    Parâmetros:
+        paths (Iterable[str]): Os documentos. Cada um é identificado pelo nome do arquivo.
+        index_path (str, optional): O arquivo do índice. Padrão: `RetrievalConfig.INDEX_PATH`.
+
+    Retorna:
+        int: O número total de trechos no índice.
+
+    Exemplo de Uso:
+        ingest_documents(["tests/oracao.pdf"])
+    """
+    index_path = index_path or RetrievalConfig.INDEX_PATH
+    new_chunks = []
+    for path in paths:
+        source = os.path.basename(path)
+        texts = chunk_text(extract_text(path), RetrievalConfig.CHUNK_WORDS, RetrievalConfig.CHUNK_OVERLAP_WORDS)
+        new_chunks.extend({"source": source, "position": position, "text": text} for position, text in enumerate(texts))
+        logger.info(f"Documento {source}: {len(texts)} trechos.")
+
+    replaced = {chunk["source"] for chunk in new_chunks}
+    with _opened_index(index_path) as current:
+        kept = [chunk for chunk in current.chunks() if chunk["source"] not in replaced] if current else []
+    return write_index(index_path, kept + new_chunks)
+
+
+@log_function_call
+def search_documents(query: str, top_k: int = None, index_path: str = None) -> list:
+    """
+    Retorna os trechos indexados mais relevantes para a consulta.
+
+    Parâmetros:
+        query (str): A consulta.
+        top_k (int, optional): O número máximo de trechos. Padrão: `RetrievalConfig.TOP_K`.
+        index_path (str, optional): O arquivo do índice. Padrão: `RetrievalConfig.INDEX_PATH`.
+
+    Retorna:
+        list[dict]: "source", "position", "score" e "text" de cada trecho, do mais para o menos relevante; vazia
+                    se não houver índice.
+    """
+    with _opened_index(index_path or RetrievalConfig.INDEX_PATH) as index:
+        if index is None:
+            return []
+        return index.search(query, top_k=top_k or RetrievalConfig.TOP_K, min_score=RetrievalConfig.MIN_SCORE)
+
+
+def format_passages(passages, max_chars: int) -> str:
+    """
+    Formata os trechos para as instruções do run, sem ultrapassar `max_chars` caracteres.
+    """
+    lines, used = [], 0
+    for number, passage in enumerate(passages, start=1):
+        line = f"[{number}] {passage['source']}, trecho {passage['position'] + 1}: {passage['text']}"
+        if used + len(line) > max_chars:
+            if not lines:
+                lines.append(line[:max_chars])
+            break
+        lines.append(line)
+        used += len(line)
+    return "\n".join(lines)
+
+
+def grounding_instructions(question_prompt: str):
+    """
+    Retorna as instruções adicionais do run com os trechos dos documentos indexados mais relevantes para a
+    pergunta.
+
+    Parâmetros:
+        question_prompt (str): A pergunta original, usada na busca.
+
+    Retorna:
+        str: As instruções com os trechos, ou None se não houver índice, trechos relevantes ou se a busca falhar (a
+             conversa nunca é interrompida pela busca local).
+    """
+    try:
+        passages = search_documents(question_prompt)
+    except Exception as e:
+        logger.error(f"Busca local nos documentos falhou; a pergunta segue sem trechos: {e}")
+        return None
+    if not passages:
+        return None
+    context = format_passages(passages, RetrievalConfig.MAX_CONTEXT_CHARS)
+    return (f"Trechos dos documentos de referência (use-os se forem relevantes para a pergunta do usuário):\n"
+            f"{context}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Busca local nos documentos de referência do assistente.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    ingest = commands.add_parser("ingest", help="Indexa documentos (PDF ou texto).")
+    ingest.add_argument("paths", nargs="+")
+    search = commands.add_parser("search", help="Mostra os trechos mais relevantes para uma consulta.")
+    search.add_argument("query")
+    search.add_argument("--top", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.command == "ingest":
+        print(f"{ingest_documents(args.paths)} trechos em {RetrievalConfig.INDEX_PATH}")
+    else:
+        for hit in search_documents(args.query, top_k=args.top):
+            print(f"{hit['score']:8.3f}  {hit['source']} #{hit['position'] + 1}: {hit['text'][:120]}")
@@ -0,0 +1,144 @@
+import os
+import socket
+import sys
+import threading
+import time
+
+import requests
+
+# Define explicitamente o diretório raiz do projeto
+sys.path.append('/workplace/')
+
+from app.data.job_store import get_job_store
+from app.decorators.log_decorator import log_function_call, logger
+from app.interfaces.interface_openai import generate_response
+from app.services.message_routing_manager import get_or_create_thread
+from app.services.usage_accounting import BudgetExceededError
+from app.utils.openia_config import JobConfig
+
+"""
+Job Worker
+
+Executa os jobs de chat assíncronos da tabela persistente (`app/data/job_store.py`) em um pool de threads:
+o cliente envia a mensagem, recebe o ID do job na hora e depois consulta o resultado pelo ID ou o recebe na
+URL de callback, sem manter uma conexão aberta durante todo o run.
+
+Cada thread do pool repete: reserva o job pendente mais antigo, resolve o thread do usuário
+(`get_or_create_thread`), gera a resposta (`generate_response`), grava o resultado e, se houver, envia o job
+concluído (ou falho) por POST à URL de callback, com novas tentativas.
+
+A execução é "pelo menos uma vez": se o processo parar no meio de um job, ele é executado de novo quando a
+concessão expira, e a mensagem pode ser enviada ao thread duas vezes.
+"""
+
+
+@log_function_call
+def deliver_callback(job: dict, timeout=None, retries=None) -> bool:
+    """
+    Envia o job por POST (JSON) à sua URL de callback, com novas tentativas e espera crescente entre elas.
+
+    Parâmetros:
+        job (dict): O job concluído ou falho, com a chave "callback_url".
+        timeout (float, optional): O tempo limite de cada tentativa. Padrão: `JobConfig.CALLBACK_TIMEOUT_SECONDS`.
+        retries (int, optional): O número de tentativas. Padrão: `JobConfig.CALLBACK_RETRIES`.
+
+    Retorna:
+        bool: True se o destino respondeu com sucesso (2xx).
+    """
+    timeout = timeout or JobConfig.CALLBACK_TIMEOUT_SECONDS
+    retries = retries or JobConfig.CALLBACK_RETRIES
+    payload = {field: job[field] for field in ("id", "status", "user_name", "thread_id", "reply", "error")}
+    for attempt in range(retries):
+        try:
+            response = requests.post(job["callback_url"], json=payload, timeout=timeout)
+            if response.ok:
+                return True
+            logger.warning(f"Callback do job {job['id']} respondeu {response.status_code}.")
+        except requests.RequestException as e:
+            logger.warning(f"Falha no callback do job {job['id']}: {e}")
+        if attempt + 1 < retries:
+            time.sleep(2 ** attempt)
+    return False
+
+
+class JobWorker:
+    """
+    Pool de threads que consome a fila de jobs de chat.
+
+    Parâmetros:
+        store (JobStore, optional): A tabela de jobs. Padrão: `get_job_store()`.
+        workers (int, optional): O número de threads. Padrão: `JobConfig.WORKERS`.
+        poll_interval (float, optional): A espera de uma thread ociosa. Padrão: `JobConfig.POLL_INTERVAL_SECONDS`.
+
+    Exemplo de Uso:
+        worker = JobWorker().start()
+        ...
+        worker.stop()
+    """
+
+    PURGE_INTERVAL_SECONDS = 3600
+
+    def __init__(self, store=None, workers=None, poll_interval=None):
+        self.store = store or get_job_store()
+        self.workers = JobConfig.WORKERS if workers is None else workers
+        self.poll_interval = JobConfig.POLL_INTERVAL_SECONDS if poll_interval is None else poll_interval
+        self._stop = threading.Event()
+        self._threads = []
+        self._last_purge = 0.0
+        self._purge_guard = threading.Lock()
+
+    def start(self):
+        for n in range(self.workers):
+            name = f"job-worker-{socket.gethostname()}-{os.getpid()}-{n}"
+            thread = threading.Thread(target=self._run, args=(name,), name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _run(self, name):
+        while not self._stop.is_set():
+            try:
+                job = self.store.claim(name, JobConfig.LEASE_SECONDS)
+            except Exception as e:
+                logger.error(f"Erro ao reservar job: {e}")
+                job = None
+            if job is None:
+                self._purge_if_due()
+                self._stop.wait(self.poll_interval)
+                continue
+            self.process(job)
+
+    def process(self, job: dict):
+        """
+        Executa um job reservado, grava o resultado e entrega o callback, se houver.
+        """
+        try:
+            thread_id = get_or_create_thread(job["user_name"])
+            reply = generate_response(question_prompt=job["message"], thread_id=thread_id, user_name=job["user_name"])
+        except Exception as e:
+            logger.error(f"Erro no job {job['id']} (tentativa {job['attempts']}): {e}")
+            # Com o orçamento de tokens esgotado, novas tentativas imediatas seriam recusadas do mesmo modo.
+            max_attempts = 1 if isinstance(e, BudgetExceededError) else JobConfig.MAX_ATTEMPTS
+            if self.store.fail(job["id"], str(e), max_attempts):
+                return
+        else:
+            self.store.complete(job["id"], thread_id=thread_id, reply=reply)
+
+        if job["callback_url"]:
+            delivered = deliver_callback(self.store.get(job["id"]))
+            self.store.set_callback_status(job["id"], "delivered" if delivered else "failed")
+
+    def _purge_if_due(self):
+        with self._purge_guard:
+            if time.monotonic() - self._last_purge < self.PURGE_INTERVAL_SECONDS:
+                return
+            self._last_purge = time.monotonic()
+        try:
+            self.store.purge_finished(JobConfig.RETENTION_SECONDS)
+        except Exception as e:
+            logger.error(f"Erro ao remover jobs antigos: {e}")
@@ -0,0 +1,172 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Define explicitamente o diretório raiz do projeto
+sys.path.append('/workplace/')
+
+from app.decorators.log_decorator import log_function_call, logger
+from app.interfaces.interface_openai import OpenAIClientSingleton
+from app.utils.openia_config import KnowledgeBaseConfig
+
+"""
+Knowledge Base
+
+Anexação em lote de arquivos aos assistentes, para consulta pela ferramenta "retrieval".
+
+Anexar arquivo por arquivo (`upload_file_to_openai` seguido de uma atualização do assistente para cada um) soma a
+latência de cada upload e deixa o assistente consultando arquivos que a OpenAI ainda está processando. Com
+`attach_files`:
+
+- **Upload:** os arquivos são enviados em paralelo, até `KnowledgeBaseConfig.MAX_CONCURRENT_UPLOADS` de cada vez.
+- **Processamento:** o status dos arquivos enviados é consultado até todos chegarem a "processed" ou "error", com
+  espera crescente entre as consultas (de `POLL_INITIAL_SECONDS`, dobrando a cada consulta sem novidades, até
+  `POLL_MAX_SECONDS`) e limite de `TIMEOUT_SECONDS`.
+- **Assistente:** uma única atualização acrescenta ao assistente os arquivos processados (e a ferramenta
+  "retrieval", se faltar).
+- **Limpeza:** os arquivos enviados que terminaram em "error" ou não terminaram no prazo são removidos da OpenAI.
+- **Relatório:** cada arquivo é informado com o seu resultado; a falha de um não interrompe os demais.
+
+A versão da biblioteca `openai` usada pelo projeto (API de assistentes v1) anexa os arquivos diretamente ao
+assistente (`file_ids`, até `MAX_ASSISTANT_FILES`), sem vector stores.
+
+Uso pela linha de comando:
+
+    python app/services/knowledge_base.py asst_abc123 docs/*.pdf
+"""
+
+# Limite de arquivos por assistente da API de assistentes v1.
+MAX_ASSISTANT_FILES = 20
+FINAL_STATUSES = ("processed", "error")
+
+
+def _upload(client, path):
+    try:
+        with open(path, "rb") as file_to_upload:
+            uploaded = client.files.create(file=file_to_upload, purpose="assistants")
+    except Exception as e:
+        logger.error(f"Upload de {path} falhou: {e}")
+        return {"path": path, "file_id": None, "status": "failed", "error": str(e)}
+    return {"path": path, "file_id": uploaded.id, "status": getattr(uploaded, "status", None) or "uploaded",
+            "error": None}
+
+
+def _wait_processed(client, results, started_at):
+    # Consulta o status dos arquivos pendentes até o processamento terminar ou o tempo acabar.
+    pending = [result for result in results if result["file_id"] and result["status"] not in FINAL_STATUSES]
+    delay = KnowledgeBaseConfig.POLL_INITIAL_SECONDS
+    while pending:
+        remaining = KnowledgeBaseConfig.TIMEOUT_SECONDS - (time.monotonic() - started_at)
+        if remaining <= 0:
+            break
+        time.sleep(min(delay, remaining))
+        changed = False
+        for result in list(pending):
+            try:
+                file = client.files.retrieve(result["file_id"])
+            except Exception as e:
+                logger.warning(f"Consulta do arquivo {result['file_id']} falhou; nova tentativa na próxima: {e}")
+                continue
+            if file.status in FINAL_STATUSES:
+                result["status"] = file.status
+                if file.status == "error":
+                    result["error"] = getattr(file, "status_details", None) or "erro no processamento"
+                pending.remove(result)
+                changed = True
+        # Sem novidades, espera mais antes da próxima consulta.
+        delay = KnowledgeBaseConfig.POLL_INITIAL_SECONDS if changed else min(
+            delay * 2, KnowledgeBaseConfig.POLL_MAX_SECONDS)
+    for result in pending:
+        result["status"], result["error"] = "timeout", "processamento não terminou no prazo"
+
+
+def _delete_unused(client, results):
+    # Os arquivos que não serão anexados ocupariam a cota de armazenamento da organização sem uso.
+    for result in results:
+        if result["file_id"] and result["status"] in ("error", "timeout"):
+            try:
+                client.files.delete(result["file_id"])
+            except Exception as e:
+                logger.warning(f"Remoção do arquivo não anexado {result['file_id']} falhou: {e}")
+
+
+def _tool_dict(tool):
+    if isinstance(tool, dict):
+        return tool
+    return tool.model_dump(exclude_none=True)
+
+
+@log_function_call
+def attach_files(assistant_id: str, paths, replace: bool = False) -> dict:
+    """
+    Envia arquivos em lote, aguarda o processamento e os anexa ao assistente em uma única atualização.
+
+    Parâmetros:
+        assistant_id (str): O ID do assistente.
+        paths (Iterable[str]): Os arquivos.
+        replace (bool): Se os arquivos processados substituem os já anexados, em vez de somar-se a eles. Se
+            nenhum arquivo for processado, os anexos atuais são mantidos.
+
+    Retorna:
+        dict: "assistant_id", "file_ids" (os arquivos do assistente após a atualização), "files" (para cada
+              arquivo: "path", "file_id", "status" - "processed", "error", "failed" ou "timeout" - e "error") e
+              "elapsed_s".
+
+    Exceções:
+        ValueError: Se o assistente ficaria com mais de `MAX_ASSISTANT_FILES` arquivos (verificado antes dos
+                    uploads).
+
+    Exemplo de Uso:
+        report = attach_files("asst_abc123", ["manual.pdf", "faq.md"])
+        for item in report["files"]:
+            print(item["path"], item["status"], item["error"] or "")
+    """
+    started_at = time.monotonic()
+    paths = list(paths)
+    client = OpenAIClientSingleton()
+    assistant = client.beta.assistants.retrieve(assistant_id)
+    current = [] if replace else list(assistant.file_ids or [])
+    if len(current) + len(paths) > MAX_ASSISTANT_FILES:
+        raise ValueError(f"O assistente ficaria com {len(current) + len(paths)} arquivos; o limite é "
+                         f"{MAX_ASSISTANT_FILES}.")
+
+    workers = max(1, min(KnowledgeBaseConfig.MAX_CONCURRENT_UPLOADS, len(paths)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="upload") as executor:
+        results = list(executor.map(lambda path: _upload(client, path), paths))
+    _wait_processed(client, results, started_at)
+    _delete_unused(client, results)
+
+    processed = [result["file_id"] for result in results if result["status"] == "processed"]
+    file_ids = list(assistant.file_ids or [])
+    # Sem nenhum arquivo processado, o assistente fica como estava, mesmo com `replace`.
+    if processed:
+        file_ids = list(dict.fromkeys(current + processed))
+        tools = [_tool_dict(tool) for tool in assistant.tools or []]
+        if not any(tool.get("type") == "retrieval" for tool in tools):
+            tools.append({"type": "retrieval"})
+        client.beta.assistants.update(assistant_id, file_ids=file_ids, tools=tools)
+
+    failed = len(results) - len(processed)
+    logger.info(f"Assistente {assistant_id}: {len(processed)} arquivos anexados, {failed} com falha.")
+    return {
+        "assistant_id": assistant_id,
+        "file_ids": file_ids,
+        "files": results,
+        "elapsed_s": round(time.monotonic() - started_at, 3),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Anexa arquivos em lote a um assistente.")
+    parser.add_argument("assistant_id")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--substituir", action="store_true", help="Substitui os arquivos já anexados.")
+    args = parser.parse_args()
+
+    report = attach_files(args.assistant_id, args.paths, replace=args.substituir)
+    for item in report["files"]:
+        print(f"{item['status']:10} {item['file_id'] or '-':32} {os.path.basename(item['path'])}"
+              f"{'  ' + str(item['error']) if item['error'] else ''}")
+    print(f"{len(report['file_ids'])} arquivos no assistente ({report['elapsed_s']:.1f}s)")
@@ -5,8 +5,10 @@ import os
 sys.path.append('/workplace/')
 
 from app.interfaces.interface_openai import create_thread
-from app.data.threads_manager import retrieve_user_name, retrieve_thread_id, upsert_thread
+from app.data.threads_manager import retrieve_user_name, retrieve_thread_id, upsert_thread, insert_thread_if_absent, thread_creation_lock, touch_thread, update_thread_metadata
 from app.decorators.log_decorator import log_function_call
+from app.services.assistant_sharding import assign_assistant
+from app.utils.single_flight import SingleFlight
 
 """
 Message Routing Manager
@@ -21,19 +23,58 @@ Referências:
 """
 
 
+# Deduplica, dentro do processo, as criações de thread concorrentes para um mesmo usuário.
+_thread_creation_flight = SingleFlight()
+
+
 @log_function_call
 def get_or_create_thread(user_name):
-    # Verificar se o nome de usuário já possui um thread_id
+    """
+    Retorna o thread ID do usuário, criando um novo thread na OpenAI apenas se ele ainda não existir.
+
+    A operação é atômica: não importa quantas primeiras mensagens do mesmo usuário cheguem ao mesmo tempo,
+    exatamente uma chamada a `create_thread` é feita.
+
+    - Dentro do processo, as chamadas concorrentes para o mesmo usuário são agrupadas (single-flight):
+      a primeira cria o thread e as demais aguardam e recebem o mesmo ID.
+    - Entre processos, a criação ocorre sob `thread_creation_lock`, e o mapeamento é gravado com
+      `insert_thread_if_absent` (compare-and-set), nunca sobrescrevendo um thread já armazenado.
+    - O assistente do usuário (`assign_assistant`) é gravado nos metadados do novo thread antes de ele se
+      tornar visível, e passa a ser usado por `generate_response` em todas as mensagens desse thread.
+
+    Parâmetros:
+        user_name (str): O nome do usuário cujo thread está sendo buscado ou criado.
+
+    Retorna:
+        str: O ID do thread associado ao usuário.
+
+    Exemplo de Uso:
+        thread_id = get_or_create_thread("Cícero")
+    """
+    # Registra a atividade do usuário (acumulada em memória), usada na expiração de threads ociosos.
+    touch_thread(user_name)
+
+    # Caminho rápido: usuário já possui um thread_id, sem nenhum bloqueio.
     thread_id = check_if_thread_exists(user_name)
-    if thread_id is None:
-        # Se não possuir, criar um novo thread_id
-        thread = create_thread()  # Recebendo o objeto diretamente
-        thread_id = thread.id  # Acessando o id do objeto thread
-        # Armazenar o novo thread_id com o nome de usuário no banco de dados
-        store_thread(user_name, thread_id)
+    if thread_id is not None:
+        return thread_id
+
+    thread_id, _ = _thread_creation_flight.do(user_name, lambda: _create_thread_once(user_name))
     return thread_id
 
 
+def _create_thread_once(user_name: str):
+    with thread_creation_lock(user_name):
+        # Outro processo pode ter criado o thread enquanto aguardávamos o bloqueio.
+        thread_id = check_if_thread_exists(user_name)
+        if thread_id is not None:
+            return thread_id
+        thread = create_thread()  # Recebendo o objeto diretamente
+        update_thread_metadata(thread.id, assistant_id=assign_assistant(user_name))
+        # Armazenar o novo thread_id com o nome de usuário no banco de dados, sem sobrescrever
+        return insert_thread_if_absent(user_name, thread.id)
+
+
 @log_function_call
 def check_if_thread_exists(user_name: str):
     """
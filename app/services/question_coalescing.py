@@ -0,0 +1,68 @@
+import sys
+import unicodedata
+
+# Define explicitamente o diretório raiz do projeto
+sys.path.append('/workplace/')
+
+from app.decorators.log_decorator import log_function_call
+from app.utils.metrics import COALESCED_QUESTIONS
+from app.utils.single_flight import SingleFlight
+
+"""
+Question Coalescing
+
+Agrupa perguntas idênticas feitas ao mesmo assistente ao mesmo tempo (um prompt enviado em massa, uma pergunta
+frequente em alta): a primeira pergunta (a "líder") executa o run normalmente, e as demais que chegam enquanto
+ela está em andamento (as "seguidoras") aguardam e recebem a mesma resposta, sem iniciar runs próprios.
+
+O modo é opcional (`CoalescingConfig.ENABLED`) e indicado apenas para assistentes sem estado, cujas respostas não
+dependem do histórico de cada thread: a pergunta e a resposta não são acrescentadas aos threads das seguidoras. Nada
+é guardado após o run: só perguntas simultâneas são agrupadas.
+
+Só são agrupadas perguntas cujo run seria o mesmo: além do assistente e da pergunta normalizada, a chave inclui o
+nome de quem pergunta (que vai na mensagem ou nas instruções do run, conforme o modo de
+`app/services/user_naming.py`, e a resposta é escrita para essa pessoa), a versão da configuração do assistente e
+os trechos da busca local passados ao run.
+
+A métrica `interface_openai_coalesced_questions_total` conta as perguntas seguidoras, ou seja, os runs economizados.
+"""
+
+_flight = SingleFlight()
+
+
+def normalize_question(question: str) -> str:
+    """
+    Normaliza uma pergunta para comparação: forma Unicode NFC, sem diferença de maiúsculas e espaços colapsados.
+
+    Exemplo de Uso:
+        normalize_question("  Qual é o  horário? ") == normalize_question("qual é o horário?")  # True
+    """
+    return " ".join(unicodedata.normalize("NFC", question).casefold().split())
+
+
+@log_function_call
+def coalesce_question(assistant_id: str, question: str, answer, user_name: str = None, config_version=None,
+                      passages: str = None):
+    """
+    Executa `answer` uma única vez para as perguntas idênticas em andamento no mesmo assistente.
+
+    Parâmetros:
+        assistant_id (str): O ID do assistente que responde à pergunta.
+        question (str): A pergunta original do usuário (sem o nome do usuário).
+        answer (Callable[[], Any]): Executa o run e retorna o seu resultado; chamada apenas pela líder.
+        user_name (str, optional): Quem pergunta.
+        config_version (optional): A versão da configuração do assistente usada no run.
+        passages (str, optional): Os trechos da busca local passados ao run.
+
+    Retorna:
+        tuple: O resultado de `answer` e um booleano indicando se ele veio do run de outra pergunta.
+
+    Exemplo de Uso:
+        (response, run), shared = coalesce_question("asst_abc", "Qual é o horário?", lambda: executar_run())
+    """
+    # Em qualquer modo de identificação, o run leva o nome de quem pergunta: a resposta não serve a outro usuário.
+    key = (assistant_id, user_name, config_version, passages, normalize_question(question))
+    result, shared = _flight.do(key, answer)
+    if shared:
+        COALESCED_QUESTIONS.labels(assistant_id=assistant_id).inc()
+    return result, shared
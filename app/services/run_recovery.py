@@ -0,0 +1,115 @@
+import sys
+import threading
+
+# Define explicitamente o diretório raiz do projeto
+sys.path.append('/workplace/')
+
+from app.data.threads_manager import find_stale_runs
+from app.decorators.log_decorator import log_function_call, logger
+from app.interfaces.interface_openai import cancel_run
+from app.utils.openia_config import OpenAIAssistantConfig
+
+"""
+Run Recovery
+
+Cancela os runs deixados ativos por um processo que parou no meio de um turno.
+
+Enquanto acompanha um run, o turno o grava nos metadados do thread (`mark_active_run`) e remove o registro
+quando o run termina. Se o processo parar antes disso, o run continua ativo na API e a próxima mensagem do
+usuário falharia ("não é possível adicionar mensagens com um run ativo"). Um registro mais antigo que o prazo do
+turno (`OpenAIAssistantConfig.RUN_TIMEOUT_SECONDS`) mais `OpenAIAssistantConfig.RUN_STALE_MARGIN_SECONDS` só
+pode ser de um run assim, e é cancelado:
+
+- antes de cada nova mensagem do thread (`recover_stale_run`, em `interface_openai`);
+- por `sweep_stale_runs`, ao iniciar o serviço e a cada `OpenAIAssistantConfig.RUN_SWEEP_INTERVAL_SECONDS`,
+  para que os threads já estejam livres quando os usuários voltarem.
+
+Varredura avulsa pela linha de comando:
+
+    python app/services/run_recovery.py
+"""
+
+
+def stale_run_age() -> float:
+    """
+    Retorna a idade, em segundos, a partir da qual um run gravado como em andamento é considerado preso.
+    """
+    return OpenAIAssistantConfig.RUN_TIMEOUT_SECONDS + OpenAIAssistantConfig.RUN_STALE_MARGIN_SECONDS
+
+
+@log_function_call
+def sweep_stale_runs(age_seconds=None, batch_size=100) -> dict:
+    """
+    Executa uma varredura completa de runs presos, cancelando-os na API.
+
+    Parâmetros:
+        age_seconds (float, optional): A idade a partir da qual um run é considerado preso. Padrão:
+            `stale_run_age()`.
+        batch_size (int): Runs buscados por lote.
+
+    Retorna:
+        dict: Contadores da varredura: "cancelled" (runs cancelados), "finished" (runs que já tinham terminado;
+              apenas o registro foi removido) e "failed" (cancelamentos que falharam e ficam para a próxima
+              varredura).
+    """
+    age_seconds = stale_run_age() if age_seconds is None else age_seconds
+    stats = {"cancelled": 0, "finished": 0, "failed": 0}
+    failed = set()
+    while True:
+        stale = [item for item in find_stale_runs(age_seconds, limit=batch_size + len(failed)) if item not in failed]
+        if not stale:
+            break
+        for thread_id, run_id in stale:
+            try:
+                if cancel_run(thread_id, run_id):
+                    stats["cancelled"] += 1
+                else:
+                    stats["finished"] += 1
+            except Exception as e:
+                logger.warning(f"Falha ao cancelar o run preso {run_id} do thread {thread_id}: {e}")
+                stats["failed"] += 1
+                failed.add((thread_id, run_id))
+    return stats
+
+
+class RunRecoverySweeper:
+    """
+    Executa `sweep_stale_runs` ao iniciar e depois periodicamente, em uma thread daemon.
+
+    Exemplo de Uso:
+        sweeper = RunRecoverySweeper().start()
+        ...
+        sweeper.stop()
+    """
+
+    def __init__(self, interval=None):
+        self.interval = OpenAIAssistantConfig.RUN_SWEEP_INTERVAL_SECONDS if interval is None else interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.interval <= 0:
+            logger.info("Varredura de runs presos desativada (RUN_SWEEP_INTERVAL_SECONDS=0).")
+            return self
+        self._thread = threading.Thread(target=self._run, name="run-recovery-sweeper", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                stats = sweep_stale_runs()
+                if any(stats.values()):
+                    logger.info(f"Varredura de runs presos concluída: {stats}")
+            except Exception as e:
+                logger.error(f"Erro na varredura de runs presos: {e}")
+            self._stop.wait(self.interval)
+
+
+if __name__ == '__main__':
+    print(sweep_stale_runs())
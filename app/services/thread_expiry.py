@@ -0,0 +1,145 @@
+import sys
+import threading
+import time
+
+# Define explicitamente o diretório raiz do projeto
+sys.path.append('/workplace/')
+
+from app.data.threads_manager import (backfill_activity, claim_sweep, compact_store, expire_thread_if_idle,
+                                      find_idle_threads, retrieve_thread_id)
+from app.interfaces.client_pool import client_key_for_thread
+from app.decorators.log_decorator import log_function_call, logger
+from app.interfaces.interface_openai import delete_remote_thread
+from app.utils.openia_config import ThreadStoreConfig
+
+"""
+Thread Expiry
+
+Expira os mapeamentos usuário -> thread sem atividade há mais de `ThreadStoreConfig.IDLE_TTL_SECONDS`,
+remove os threads remotos correspondentes na OpenAI e compacta o armazenamento local, mantendo as buscas
+rápidas e o espaço em disco limitado.
+
+Cada varredura:
+
+1. Grava a atividade acumulada em memória e busca usuários ociosos em lotes.
+2. Remove cada mapeamento de forma condicional (se o usuário voltou a interagir, ele é preservado).
+3. Remove os threads remotos com limite de taxa: no máximo `REMOTE_DELETE_BATCH_SIZE` remoções a cada
+   `REMOTE_DELETE_INTERVAL_SECONDS`, para não disputar o limite da API com as conversas em andamento.
+4. Compacta o armazenamento local se algum mapeamento foi removido.
+
+A remoção local acontece antes da remota: a partir dela, uma nova mensagem do usuário cria um thread novo,
+e o antigo deixa de ser referenciado antes de ser apagado.
+
+A expiração apaga o histórico das conversas na OpenAI e por isso vem desativada (`IDLE_TTL_SECONDS` = 0): cada
+implantação a ativa explicitamente. Todos os workers iniciam o `ThreadExpirySweeper`, mas a cada intervalo só um
+deles, em toda a implantação, executa a varredura (`claim_sweep`).
+"""
+
+SWEEP_NAME = "thread_expiry"
+
+
+@log_function_call
+def sweep_idle_threads(idle_seconds=None, batch_size=None, delete_interval=None) -> dict:
+    """
+    Executa uma varredura completa de expiração de threads ociosos.
+
+    Parâmetros:
+        idle_seconds (float, optional): Tempo de ociosidade para expirar. Padrão: `IDLE_TTL_SECONDS`.
+        batch_size (int, optional): Remoções remotas por janela. Padrão: `REMOTE_DELETE_BATCH_SIZE`.
+        delete_interval (float, optional): Duração da janela, em segundos. Padrão: `REMOTE_DELETE_INTERVAL_SECONDS`.
+
+    Retorna:
+        dict: Contadores da varredura: "expired" (mapeamentos removidos), "remote_deleted" (threads remotos
+              removidos) e "remote_failed" (threads remotos cuja remoção falhou e foram apenas desvinculados).
+    """
+    idle_seconds = ThreadStoreConfig.IDLE_TTL_SECONDS if idle_seconds is None else idle_seconds
+    batch_size = batch_size or ThreadStoreConfig.REMOTE_DELETE_BATCH_SIZE
+    delete_interval = ThreadStoreConfig.REMOTE_DELETE_INTERVAL_SECONDS if delete_interval is None else delete_interval
+
+    stats = {"expired": 0, "remote_deleted": 0, "remote_failed": 0}
+    while True:
+        idle_users = find_idle_threads(idle_seconds, limit=batch_size)
+        if not idle_users:
+            break
+
+        window_start = time.monotonic()
+        for user_name in idle_users:
+            # A chave do thread é lida antes da expiração, que remove os metadados do thread.
+            current_thread_id = retrieve_thread_id(user_name)
+            client_key = client_key_for_thread(current_thread_id) if current_thread_id else None
+            thread_id = expire_thread_if_idle(user_name, idle_seconds)
+            if thread_id is None:
+                continue
+            stats["expired"] += 1
+            try:
+                delete_remote_thread(thread_id, client_key if thread_id == current_thread_id else None)
+                stats["remote_deleted"] += 1
+            except Exception as e:
+                # O thread remoto pode já ter sido removido; o mapeamento local já não o referencia.
+                logger.warning(f"Falha ao remover o thread remoto {thread_id} de {user_name}: {e}")
+                stats["remote_failed"] += 1
+
+        # Limite de taxa: cada lote ocupa, no mínimo, uma janela de `delete_interval` segundos.
+        remaining = delete_interval - (time.monotonic() - window_start)
+        if remaining > 0:
+            time.sleep(remaining)
+
+    if stats["expired"]:
+        compact_store()
+    return stats
+
+
+class ThreadExpirySweeper:
+    """
+    Executa `sweep_idle_threads` periodicamente em uma thread daemon.
+
+    A cada `interval`, só o processo que reservar a varredura (`claim_sweep`) a executa. Antes da primeira
+    varredura do processo, atribui atividade "agora" aos usuários que ainda não a possuem (`backfill_activity`),
+    de modo que bancos antigos não sejam expirados de uma só vez.
+
+    Exemplo de Uso:
+        sweeper = ThreadExpirySweeper()
+        sweeper.start()
+        ...
+        sweeper.stop()
+    """
+
+    def __init__(self, interval=None, idle_seconds=None):
+        self.interval = interval or ThreadStoreConfig.SWEEP_INTERVAL_SECONDS
+        self.idle_seconds = ThreadStoreConfig.IDLE_TTL_SECONDS if idle_seconds is None else idle_seconds
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.idle_seconds <= 0:
+            logger.info("Expiração de threads desativada (IDLE_TTL_SECONDS=0).")
+            return self
+        self._thread = threading.Thread(target=self._run, name="thread-expiry-sweeper", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        backfilled = False
+        while not self._stop.is_set():
+            try:
+                # A reserva vale um pouco menos que o intervalo, para que o processo que varreu por último não perca
+                # a vez por alguns milissegundos de atraso.
+                if claim_sweep(SWEEP_NAME, self.interval * 0.9):
+                    if not backfilled:
+                        backfill_activity()
+                        backfilled = True
+                    stats = sweep_idle_threads(self.idle_seconds)
+                    logger.info(f"Varredura de threads ociosos concluída: {stats}")
+            except Exception as e:
+                logger.error(f"Erro na varredura de threads ociosos: {e}")
+            self._stop.wait(self.interval)
+
+
+if __name__ == '__main__':
+    backfill_activity()
+    print(sweep_idle_threads())
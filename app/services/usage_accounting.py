@@ -0,0 +1,223 @@
+import argparse
+import atexit
+import sys
+import threading
+import time
+
+# Define explicitamente o diretório raiz do projeto
+sys.path.append('/workplace/')
+
+from app.data.usage_store import GROUPS, get_usage_store
+from app.decorators.log_decorator import log_function_call, logger
+from app.utils.metrics import BUDGET_DECISIONS, TOKENS_USED
+from app.utils.openia_config import UsageConfig
+
+"""
+Usage Accounting
+
+Contabilidade do consumo de tokens por usuário, thread e assistente, e orçamentos de tokens por usuário.
+
+- **Registro:** ao fim de cada run, `record_usage` soma o `usage` do run (tokens de entrada, de saída e totais) a
+  um acumulado em memória, por intervalo de `UsageConfig.BUCKET_SECONDS`, usuário, thread e assistente. O
+  acumulado é gravado em lote no `UsageStore` (`app/data/usage_store.py`) a cada
+  `UsageConfig.FLUSH_INTERVAL_SECONDS` (pela própria chamada que encontra o intervalo vencido) e ao fim do
+  processo, evitando uma escrita por run.
+- **Orçamentos:** antes de enviar a mensagem e criar o run, `enforce_budget` soma o consumo do usuário na janela
+  móvel de `UsageConfig.BUDGET_WINDOW_SECONDS` (gravado e ainda em memória). A partir de `THROTTLE_RATIO` do
+  orçamento o pedido aguarda `THROTTLE_SECONDS`; ao atingir o orçamento é recusado com `BudgetExceededError`
+  (HTTP 429 no serviço). O orçamento é de `UsageConfig.USER_BUDGETS` ou, na falta dele, `BUDGET_TOKENS`.
+
+Um run em andamento não é interrompido pelo orçamento: o consumo só é conhecido ao seu fim.
+
+Relatório dos maiores consumidores pela linha de comando:
+
+    python app/services/usage_accounting.py --horas 24 --por user_name --limite 10
+"""
+
+_pending = {}  # (início do intervalo, usuário, thread, assistente) -> [runs, entrada, saída, total]
+_pending_guard = threading.Lock()
+_last_flush = time.monotonic()
+
+
+class BudgetExceededError(Exception):
+    """
+    Levantada quando o usuário atingiu o seu orçamento de tokens na janela.
+
+    Atributos:
+        user_name (str): O usuário.
+        used (int): Os tokens consumidos na janela.
+        budget (int): O orçamento.
+        retry_after (float): Segundos até o intervalo mais antigo sair da janela.
+    """
+
+    def __init__(self, user_name, used, budget, retry_after):
+        super().__init__(f"Orçamento de tokens de {user_name} esgotado ({used} de {budget}).")
+        self.user_name = user_name
+        self.used = used
+        self.budget = budget
+        self.retry_after = retry_after
+
+
+def _user_key(user_name):
+    return user_name or ""
+
+
+def _bucket(timestamp):
+    return timestamp - timestamp % UsageConfig.BUCKET_SECONDS
+
+
+def _usage_values(usage):
+    if usage is None:
+        return None
+    if not isinstance(usage, dict):
+        usage = usage.model_dump()
+    prompt, completion = usage.get("prompt_tokens") or 0, usage.get("completion_tokens") or 0
+    return [1, prompt, completion, usage.get("total_tokens") or prompt + completion]
+
+
+@log_function_call
+def record_usage(user_name: str, thread_id: str, assistant_id: str, usage):
+    """
+    Acumula em memória o consumo de tokens de um run concluído.
+
+    Parâmetros:
+        user_name (str): O usuário (None é contabilizado como "").
+        thread_id (str): O thread do run.
+        assistant_id (str): O assistente do run.
+        usage (CompletionUsage or dict): O `run.usage`; None (runs sem consumo informado) é ignorado.
+    """
+    global _last_flush
+    values = _usage_values(usage)
+    if not UsageConfig.ENABLED or values is None:
+        return
+    TOKENS_USED.labels(assistant_id=assistant_id, kind="prompt").inc(values[1])
+    TOKENS_USED.labels(assistant_id=assistant_id, kind="completion").inc(values[2])
+    key = (_bucket(time.time()), _user_key(user_name), thread_id or "", assistant_id or "")
+    with _pending_guard:
+        totals = _pending.setdefault(key, [0, 0, 0, 0])
+        for index, value in enumerate(values):
+            totals[index] += value
+        due = time.monotonic() - _last_flush >= UsageConfig.FLUSH_INTERVAL_SECONDS
+    if due:
+        flush_usage()
+
+
+@log_function_call
+def flush_usage() -> int:
+    """
+    Grava no `UsageStore` o consumo acumulado em memória.
+
+    Retorna:
+        int: A quantidade de linhas (intervalo, usuário, thread, assistente) gravadas.
+    """
+    global _last_flush
+    with _pending_guard:
+        pending = dict(_pending)
+        _pending.clear()
+        _last_flush = time.monotonic()
+    if not pending:
+        return 0
+    try:
+        get_usage_store().add(pending)
+    except Exception as e:
+        # Devolve o acumulado, para a próxima gravação.
+        logger.error(f"Falha ao gravar o consumo de tokens; nova tentativa na próxima gravação: {e}")
+        with _pending_guard:
+            for key, values in pending.items():
+                totals = _pending.setdefault(key, [0, 0, 0, 0])
+                for index, value in enumerate(values):
+                    totals[index] += value
+        return 0
+    return len(pending)
+
+
+def reset_usage_accounting():
+    """
+    Descarta o consumo acumulado em memória sem gravá-lo. Usada após um `fork`: o acumulado herdado pertence ao
+    processo mestre.
+    """
+    global _last_flush
+    with _pending_guard:
+        _pending.clear()
+        _last_flush = time.monotonic()
+
+
+def budget_for(user_name: str) -> int:
+    """
+    Retorna o orçamento de tokens do usuário na janela (0: sem orçamento).
+    """
+    return UsageConfig.USER_BUDGETS.get(_user_key(user_name), UsageConfig.BUDGET_TOKENS)
+
+
+def used_tokens(user_name: str) -> int:
+    """
+    Retorna os tokens consumidos pelo usuário na janela móvel, gravados e ainda em memória.
+    """
+    since = _bucket(time.time() - UsageConfig.BUDGET_WINDOW_SECONDS)
+    user = _user_key(user_name)
+    with _pending_guard:
+        pending = sum(values[3] for key, values in _pending.items() if key[1] == user and key[0] >= since)
+    return get_usage_store().used_tokens(user, since) + pending
+
+
+@log_function_call
+def enforce_budget(user_name: str):
+    """
+    Aplica o orçamento de tokens do usuário antes de um novo run: aguarda `UsageConfig.THROTTLE_SECONDS` se o
+    consumo na janela passou de `THROTTLE_RATIO` do orçamento, e recusa o pedido se o atingiu.
+
+    Parâmetros:
+        user_name (str): O usuário.
+
+    Exceções:
+        BudgetExceededError: Se o usuário atingiu o orçamento.
+    """
+    budget = budget_for(user_name)
+    if not UsageConfig.ENABLED or budget <= 0:
+        return
+    used = used_tokens(user_name)
+    if used >= budget:
+        BUDGET_DECISIONS.labels(action="rejected").inc()
+        # O intervalo mais antigo da janela sai dela quando a janela avança além do seu fim.
+        now = time.time()
+        window_start = _bucket(now - UsageConfig.BUDGET_WINDOW_SECONDS)
+        first = get_usage_store().first_bucket(_user_key(user_name), window_start) or _bucket(now)
+        retry_after = max(first + UsageConfig.BUCKET_SECONDS + UsageConfig.BUDGET_WINDOW_SECONDS - now, 1.0)
+        raise BudgetExceededError(_user_key(user_name), used, budget, retry_after)
+    if used >= budget * UsageConfig.THROTTLE_RATIO and UsageConfig.THROTTLE_RATIO < 1:
+        BUDGET_DECISIONS.labels(action="throttled").inc()
+        logger.info(f"{user_name} usou {used} de {budget} tokens; pedido aguardando {UsageConfig.THROTTLE_SECONDS}s.")
+        time.sleep(UsageConfig.THROTTLE_SECONDS)
+
+
+@log_function_call
+def top_consumers(hours: float = 24, by: str = "user_name", limit: int = 10) -> list:
+    """
+    Retorna os maiores consumidores de tokens nas últimas `hours` horas (o acumulado em memória é gravado antes).
+
+    Parâmetros:
+        hours (float): O período.
+        by (str): O agrupamento: "user_name", "thread_id" ou "assistant_id".
+        limit (int): O número máximo de linhas.
+
+    Retorna:
+        list[dict]: Ver `UsageStore.top`.
+    """
+    flush_usage()
+    return get_usage_store().top(_bucket(time.time() - hours * 3600), by=by, limit=limit)
+
+
+atexit.register(flush_usage)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Maiores consumidores de tokens.")
+    parser.add_argument("--horas", type=float, default=24)
+    parser.add_argument("--por", choices=GROUPS, default="user_name")
+    parser.add_argument("--limite", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{args.por:32} {'runs':>7} {'entrada':>11} {'saída':>11} {'total':>11}")
+    for row in top_consumers(args.horas, args.por, args.limite):
+        print(f"{row[args.por] or '-':32} {row['runs']:>7} {row['prompt_tokens']:>11} "
+              f"{row['completion_tokens']:>11} {row['total_tokens']:>11}")
@@ -0,0 +1,127 @@
+import argparse
+import math
+import sys
+
+# Define explicitamente o diretório raiz do projeto
+sys.path.append('/workplace/')
+
+from app.utils.metrics import NAMING_TOKENS_AVOIDED
+from app.utils.openia_config import OpenAIAssistantConfig
+
+"""
+User Naming
+
+Como o assistente fica sabendo quem faz cada pergunta (`OpenAIAssistantConfig.USER_NAMING_MODE`):
+
+- **"message"** (padrão, o comportamento original): `_format_user_question` acrescenta a cada mensagem o preâmbulo
+  `MESSAGE_PREAMBLE` ("Meu nome é: ..., e use esse nome..."). O preâmbulo fica gravado no thread e volta a ser
+  enviado ao modelo, como contexto, em todos os runs seguintes.
+- **"run"**: a mensagem leva apenas a pergunta (com o nome do usuário nos metadados da mensagem), e a identificação
+  vai uma única vez por run, em `additional_instructions` (`RUN_INSTRUCTIONS`), que não é gravada no thread.
+
+No modo "message", o turno N de um thread envia ao modelo N preâmbulos; no modo "run", apenas as instruções do run
+atual. `naming_savings` estima a diferença turno a turno, e a métrica `interface_openai_naming_tokens_avoided_total`
+soma os tokens de preâmbulo que deixaram de ser gravados nos threads.
+
+A contagem usa o pacote opcional `tiktoken`, se instalado; sem ele, a estimativa é de 4 caracteres por token.
+
+Estimativa pela linha de comando:
+
+    python app/services/user_naming.py --usuario Alice --pergunta "Qual é o horário da missa?" --turnos 20
+"""
+
+NAMING_MODES = ("message", "run")
+
+MESSAGE_PREAMBLE = ("Meu nome é: {user_name}, e use esse nome para distinguir entre as perguntas. Não precisa ficar "
+                    "dizendo meu nome, nem o que vai fazer, apenas faça. Te faço uma pergunta: ")
+
+RUN_INSTRUCTIONS = ("A mensagem a seguir é de {user_name}; use esse nome para distinguir entre as perguntas. Não "
+                    "precisa ficar dizendo o nome, nem o que vai fazer, apenas faça.")
+
+_encoding = None
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estima o número de tokens de um texto: exato com o pacote `tiktoken` (codificação "cl100k_base"), ou 4
+    caracteres por token sem ele.
+    """
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text))
+    return math.ceil(len(text) / 4)
+
+
+def naming_mode() -> str:
+    """
+    Retorna o modo de identificação do usuário em uso ("message" ou "run").
+    """
+    return OpenAIAssistantConfig.USER_NAMING_MODE
+
+
+def run_instructions(user_name: str):
+    """
+    Retorna as instruções de identificação do usuário para `additional_instructions`, ou None se o modo não for
+    "run" ou não houver usuário.
+    """
+    if naming_mode() != "run" or not user_name:
+        return None
+    return RUN_INSTRUCTIONS.format(user_name=user_name)
+
+
+def record_avoided_preamble(user_name: str):
+    """
+    Soma à métrica os tokens do preâmbulo que o modo "run" deixou de gravar no thread neste turno.
+    """
+    if naming_mode() == "run" and user_name:
+        NAMING_TOKENS_AVOIDED.inc(estimate_tokens(MESSAGE_PREAMBLE.format(user_name=user_name)))
+
+
+def naming_savings(user_name: str, question: str, turns: int = 10) -> list:
+    """
+    Estima, turno a turno, os tokens de entrada de um thread com uma pergunta de `question` por turno, nos dois
+    modos (sem contar as respostas, iguais nos dois).
+
+    Parâmetros:
+        user_name (str): O nome do usuário.
+        question (str): Uma pergunta típica.
+        turns (int): O número de turnos do thread.
+
+    Retorna:
+        list[dict]: Para cada turno: "turn", "message_tokens" e "run_tokens" (os tokens de perguntas e identificação
+                    enviados ao modelo no turno, em cada modo) e "saved" (a diferença).
+
+    Exemplo de Uso:
+        naming_savings("Alice", "Qual é o horário da missa?", turns=3)[-1]["saved"]
+    """
+    question_tokens = estimate_tokens(question)
+    preamble_tokens = estimate_tokens(MESSAGE_PREAMBLE.format(user_name=user_name))
+    instructions_tokens = estimate_tokens(RUN_INSTRUCTIONS.format(user_name=user_name))
+    rows = []
+    for turn in range(1, turns + 1):
+        message_tokens = turn * (question_tokens + preamble_tokens)
+        run_tokens = turn * question_tokens + instructions_tokens
+        rows.append({"turn": turn, "message_tokens": message_tokens, "run_tokens": run_tokens,
+                     "saved": message_tokens - run_tokens})
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Tokens economizados pelo modo 'run' de identificação do usuário.")
+    parser.add_argument("--usuario", default="Alice")
+    parser.add_argument("--pergunta", default="Qual é o horário da missa de domingo?")
+    parser.add_argument("--turnos", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = naming_savings(args.usuario, args.pergunta, args.turnos)
+    if not _encoding:
+        print("(tiktoken não instalado: estimativa de 4 caracteres por token)")
+    print(f"{'turno':>5} {'message':>9} {'run':>9} {'economia':>9}")
+    for row in rows:
+        print(f"{row['turn']:>5} {row['message_tokens']:>9} {row['run_tokens']:>9} {row['saved']:>9}")
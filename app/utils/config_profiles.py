@@ -0,0 +1,397 @@
+import json
+import os
+import sys
+from typing import Dict, List, Literal, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, field_validator, model_validator
+
+# Define explicitamente o diretório raiz do projeto
+sys.path.append('/workplace/')
+
+from app.utils import openia_config
+from app.utils.openia_config import ConfigurationError
+
+"""
+Config Profiles
+
+Esquema tipado e validado (pydantic) de todas as configurações do projeto, com perfis por ambiente.
+
+Cada seção (`OpenAISection`, `ServerSection`...) corresponde a uma classe de `app/utils/openia_config.py` (as
+classes continuam sendo a forma de ler a configuração: `ServerConfig.MAX_CONCURRENT_CHATS`). O nome de cada campo
+é o atributo da classe, e o seu "alias" é a variável de ambiente que o substitui.
+
+O valor efetivo de cada configuração é, em ordem de prioridade:
+
+1. A variável de ambiente (ou do arquivo .env);
+2. O valor do perfil selecionado por APP_ENV ("dev", "staging" ou "prod", ver `PROFILES`);
+3. O padrão do campo.
+
+Valores inválidos (tipo errado, fora dos limites, opção desconhecida, combinação incoerente entre variáveis)
+interrompem a inicialização com um
+`ConfigurationError` que lista todas as variáveis com problema, em vez de falhar no meio de uma conversa.
+"""
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+
+
+class _Section(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="forbid", populate_by_name=True)
+
+
+def _json_value(value):
+    # Listas e objetos vindos de variáveis de ambiente são escritos em JSON; texto vazio equivale a ausente.
+    if isinstance(value, str):
+        return json.loads(value) if value.strip() else None
+    return value
+
+
+class ApiKeyEntry(_Section):
+    name: str = Field(min_length=1)
+    api_key: Optional[str] = None
+    organization: Optional[str] = None
+    weight: float = Field(1.0, gt=0)
+
+
+class OpenAISection(_Section):
+    OPENAI_API_KEY: Optional[str] = Field(None, alias="OPENAI_API_KEY")
+    AI_MODEL: str = Field(openia_config.AI_MODEL, alias="AI_MODEL")
+    AI_THREAD_ID: str = Field(openia_config.THREAD_ID, alias="THREAD_ID")
+    REQUEST_TIMEOUT_SECONDS: float = Field(600.0, gt=0, alias="OPENAI_TIMEOUT_SECONDS")
+    MAX_RETRIES: int = Field(2, ge=0, alias="OPENAI_MAX_RETRIES")
+
+
+class AssistantSection(_Section):
+    ASSISTANT_NAME: str = Field(openia_config.ASSISTANT_NAME, min_length=1, max_length=256, alias="ASSISTANT_NAME")
+    INSTRUCTIONS: str = Field(openia_config.INSTRUCTIONS, alias="ASSISTANT_INSTRUCTIONS")
+    TOOLS: List[dict] = Field(json.loads(openia_config.TOOLS), max_length=128, alias="ASSISTANT_TOOLS")
+    AI_ASSISTANT_MODEL: str = Field(openia_config.AI_ASSISTANT_MODEL, min_length=1, alias="ASSISTANT_MODEL")
+    AI_ASSISTANT_ID: str = Field(openia_config.ASSISTANT_ID, min_length=1, alias="ASSISTANT_ID")
+    # Sem ASSISTANT_IDS, apenas o assistente padrão (ver `build_config`).
+    AI_ASSISTANT_IDS: Optional[List[str]] = Field(None, min_length=1, alias="ASSISTANT_IDS")
+    RUN_POLL_INTERVAL_SECONDS: float = Field(0.5, gt=0, alias="RUN_POLL_INTERVAL_SECONDS")
+    RUN_TIMEOUT_SECONDS: float = Field(110.0, gt=0, alias="RUN_TIMEOUT_SECONDS")
+    RUN_STALE_MARGIN_SECONDS: float = Field(60.0, ge=0, alias="RUN_STALE_MARGIN_SECONDS")
+    RUN_CANCEL_WAIT_SECONDS: float = Field(10.0, ge=0, alias="RUN_CANCEL_WAIT_SECONDS")
+    RUN_SWEEP_INTERVAL_SECONDS: float = Field(60.0, ge=0, alias="RUN_SWEEP_INTERVAL_SECONDS")
+    USER_NAMING_MODE: Literal["message", "run"] = Field("message", alias="USER_NAMING_MODE")
+
+    _tools = field_validator("TOOLS", mode="before")(_json_value)
+
+    @field_validator("AI_ASSISTANT_IDS", mode="before")
+    @classmethod
+    def _split_ids(cls, value):
+        if isinstance(value, str):
+            return [assistant_id.strip() for assistant_id in value.split(",") if assistant_id.strip()] or None
+        return value
+
+    @field_validator("TOOLS")
+    @classmethod
+    def _check_tools(cls, value):
+        if not all("type" in tool for tool in value):
+            raise ValueError('cada ferramenta precisa da chave "type"')
+        return value
+
+
+class ThreadStoreSection(_Section):
+    BACKEND: Literal["shelve", "redis"] = Field("shelve", alias="THREAD_STORE_BACKEND")
+    REDIS_URL: str = Field("redis://localhost:6379/0", alias="REDIS_URL")
+    REDIS_MAX_CONNECTIONS: int = Field(20, ge=1, alias="REDIS_MAX_CONNECTIONS")
+    REDIS_SOCKET_TIMEOUT_SECONDS: Optional[float] = Field(None, gt=0, alias="REDIS_SOCKET_TIMEOUT_SECONDS")
+    REDIS_KEY_PREFIX: str = Field("interface_openai", min_length=1, alias="REDIS_KEY_PREFIX")
+    METADATA_CACHE_SIZE: int = Field(10000, ge=0, alias="THREAD_METADATA_CACHE_SIZE")
+    ACTIVITY_FLUSH_INTERVAL_SECONDS: float = Field(30.0, ge=0, alias="ACTIVITY_FLUSH_INTERVAL_SECONDS")
+    IDLE_TTL_SECONDS: float = Field(0.0, ge=0, alias="IDLE_TTL_SECONDS")
+    SWEEP_INTERVAL_SECONDS: float = Field(3600.0, gt=0, alias="SWEEP_INTERVAL_SECONDS")
+    REMOTE_DELETE_BATCH_SIZE: int = Field(20, ge=1, alias="REMOTE_DELETE_BATCH_SIZE")
+    REMOTE_DELETE_INTERVAL_SECONDS: float = Field(1.0, ge=0, alias="REMOTE_DELETE_INTERVAL_SECONDS")
+
+    @field_validator("BACKEND", mode="before")
+    @classmethod
+    def _lower(cls, value):
+        return value.lower() if isinstance(value, str) else value
+
+
+class TranscriptSection(_Section):
+    ENABLED: bool = Field(True, alias="TRANSCRIPTS_ENABLED")
+    DIR: str = Field(os.path.join(DATA_DIR, 'transcripts'), alias="TRANSCRIPTS_DIR")
+    SEGMENT_MAX_BYTES: int = Field(64 * 1024 * 1024, ge=1024, alias="TRANSCRIPTS_SEGMENT_MAX_BYTES")
+
+
+class ClientPoolSection(_Section):
+    # Sem OPENAI_API_KEYS, o pool tem apenas a chave OPENAI_API_KEY (ver `build_config`).
+    API_KEYS: Optional[List[ApiKeyEntry]] = Field(None, min_length=1, alias="OPENAI_API_KEYS")
+    SELECTION: Literal["least_loaded", "weighted"] = Field("least_loaded", alias="CLIENT_POOL_SELECTION")
+    COOLDOWN_SECONDS: float = Field(30.0, ge=0, alias="CLIENT_POOL_COOLDOWN_SECONDS")
+    MAX_COOLDOWN_SECONDS: float = Field(600.0, ge=0, alias="CLIENT_POOL_MAX_COOLDOWN_SECONDS")
+
+    _api_keys = field_validator("API_KEYS", mode="before")(_json_value)
+
+    @field_validator("API_KEYS")
+    @classmethod
+    def _unique_names(cls, value):
+        names = [entry.name for entry in value or ()]
+        if len(names) != len(set(names)):
+            raise ValueError("os nomes das chaves devem ser únicos")
+        return value
+
+    @model_validator(mode="after")
+    def _cooldown_range(self):
+        if self.MAX_COOLDOWN_SECONDS < self.COOLDOWN_SECONDS:
+            raise ValueError(f"CLIENT_POOL_MAX_COOLDOWN_SECONDS ({self.MAX_COOLDOWN_SECONDS:g}) deve ser maior ou "
+                             f"igual a CLIENT_POOL_COOLDOWN_SECONDS ({self.COOLDOWN_SECONDS:g})")
+        return self
+
+
+class AssistantReloadSection(_Section):
+    PATH: Optional[str] = Field(None, alias="ASSISTANT_CONFIG_PATH")
+    POLL_SECONDS: float = Field(5.0, ge=0, alias="ASSISTANT_CONFIG_POLL_SECONDS")
+
+
+class CoalescingSection(_Section):
+    ENABLED: bool = Field(False, alias="COALESCE_IDENTICAL_QUESTIONS")
+
+
+class ServerSection(_Section):
+    BIND: str = Field("0.0.0.0:5000", alias="SERVER_BIND")
+    WORKERS: int = Field(os.cpu_count() or 1, ge=1, alias="SERVER_WORKERS")
+    PRELOAD: bool = Field(True, alias="SERVER_PRELOAD")
+    THREADS: int = Field(32, ge=1, alias="SERVER_THREADS")
+    MAX_CONCURRENT_CHATS: int = Field(16, ge=1, alias="MAX_CONCURRENT_CHATS")
+    REQUEST_TIMEOUT_SECONDS: float = Field(120.0, gt=0, alias="REQUEST_TIMEOUT_SECONDS")
+    WS_IDLE_TIMEOUT_SECONDS: float = Field(600.0, gt=0, alias="WS_IDLE_TIMEOUT_SECONDS")
+
+
+class JobSection(_Section):
+    DB_PATH: str = Field(os.path.join(DATA_DIR, 'jobs.sqlite3'), alias="JOBS_DB_PATH")
+    WORKERS: int = Field(4, ge=0, alias="JOB_WORKERS")
+    POLL_INTERVAL_SECONDS: float = Field(1.0, gt=0, alias="JOB_POLL_INTERVAL_SECONDS")
+    LEASE_SECONDS: float = Field(900.0, gt=0, alias="JOB_LEASE_SECONDS")
+    MAX_ATTEMPTS: int = Field(3, ge=1, alias="JOB_MAX_ATTEMPTS")
+    CALLBACK_TIMEOUT_SECONDS: float = Field(10.0, gt=0, alias="JOB_CALLBACK_TIMEOUT_SECONDS")
+    CALLBACK_RETRIES: int = Field(3, ge=1, alias="JOB_CALLBACK_RETRIES")
+    RETENTION_SECONDS: float = Field(604800.0, ge=0, alias="JOB_RETENTION_SECONDS")
+
+
+class RetrievalSection(_Section):
+    ENABLED: bool = Field(False, alias="LOCAL_RETRIEVAL_ENABLED")
+    INDEX_PATH: str = Field(os.path.join(DATA_DIR, 'document_index.bin'), alias="LOCAL_RETRIEVAL_INDEX_PATH")
+    TOP_K: int = Field(3, ge=1, alias="LOCAL_RETRIEVAL_TOP_K")
+    MIN_SCORE: float = Field(0.0, ge=0, alias="LOCAL_RETRIEVAL_MIN_SCORE")
+    MAX_CONTEXT_CHARS: int = Field(2000, ge=100, alias="LOCAL_RETRIEVAL_MAX_CONTEXT_CHARS")
+    CHUNK_WORDS: int = Field(120, ge=10, alias="LOCAL_RETRIEVAL_CHUNK_WORDS")
+    CHUNK_OVERLAP_WORDS: int = Field(30, ge=0, alias="LOCAL_RETRIEVAL_CHUNK_OVERLAP_WORDS")
+
+
+class KnowledgeBaseSection(_Section):
+    MAX_CONCURRENT_UPLOADS: int = Field(8, ge=1, alias="KNOWLEDGE_MAX_CONCURRENT_UPLOADS")
+    POLL_INITIAL_SECONDS: float = Field(1.0, gt=0, alias="KNOWLEDGE_POLL_INITIAL_SECONDS")
+    POLL_MAX_SECONDS: float = Field(30.0, gt=0, alias="KNOWLEDGE_POLL_MAX_SECONDS")
+    TIMEOUT_SECONDS: float = Field(1800.0, gt=0, alias="KNOWLEDGE_TIMEOUT_SECONDS")
+
+
+class UsageSection(_Section):
+    ENABLED: bool = Field(True, alias="USAGE_ACCOUNTING_ENABLED")
+    DB_PATH: str = Field(os.path.join(DATA_DIR, 'usage.sqlite3'), alias="USAGE_DB_PATH")
+    FLUSH_INTERVAL_SECONDS: float = Field(10.0, ge=0, alias="USAGE_FLUSH_INTERVAL_SECONDS")
+    BUCKET_SECONDS: float = Field(300.0, ge=1, alias="USAGE_BUCKET_SECONDS")
+    BUDGET_TOKENS: int = Field(0, ge=0, alias="USAGE_BUDGET_TOKENS")
+    USER_BUDGETS: Dict[str, int] = Field({}, alias="USAGE_USER_BUDGETS")
+    BUDGET_WINDOW_SECONDS: float = Field(86400.0, gt=0, alias="USAGE_BUDGET_WINDOW_SECONDS")
+    THROTTLE_RATIO: float = Field(0.8, gt=0, le=1, alias="USAGE_THROTTLE_RATIO")
+    THROTTLE_SECONDS: float = Field(2.0, ge=0, alias="USAGE_THROTTLE_SECONDS")
+
+    @field_validator("USER_BUDGETS", mode="before")
+    @classmethod
+    def _parse_budgets(cls, value):
+        return _json_value(value) or {}
+
+    @field_validator("USER_BUDGETS")
+    @classmethod
+    def _check_budgets(cls, value):
+        if any(budget < 0 for budget in value.values()):
+            raise ValueError("os orçamentos não podem ser negativos")
+        return value
+
+
+class ResilienceSection(_Section):
+    HEDGING_ENABLED: bool = Field(True, alias="HEDGING_ENABLED")
+    HEDGE_PERCENTILE: float = Field(95.0, gt=0, le=100, alias="HEDGE_PERCENTILE")
+    HEDGE_MIN_DELAY_SECONDS: float = Field(0.05, ge=0, alias="HEDGE_MIN_DELAY_SECONDS")
+    HEDGE_MIN_SAMPLES: int = Field(20, ge=1, alias="HEDGE_MIN_SAMPLES")
+    HEDGE_MAX_RATIO: float = Field(0.1, ge=0, le=1, alias="HEDGE_MAX_RATIO")
+    HEDGE_WINDOW: int = Field(200, ge=1, alias="HEDGE_WINDOW")
+    HEDGE_MAX_WORKERS: int = Field(32, ge=1, alias="HEDGE_MAX_WORKERS")
+    BREAKER_ENABLED: bool = Field(True, alias="BREAKER_ENABLED")
+    BREAKER_FAILURE_RATE: float = Field(0.5, gt=0, le=1, alias="BREAKER_FAILURE_RATE")
+    BREAKER_MIN_CALLS: int = Field(20, ge=1, alias="BREAKER_MIN_CALLS")
+    BREAKER_WINDOW: int = Field(50, ge=1, alias="BREAKER_WINDOW")
+    BREAKER_OPEN_SECONDS: float = Field(30.0, gt=0, alias="BREAKER_OPEN_SECONDS")
+
+
+# Seção -> (esquema, classe correspondente em openia_config)
+SECTIONS = {
+    "openai": (OpenAISection, "OpenAIConfig"),
+    "assistant": (AssistantSection, "OpenAIAssistantConfig"),
+    "thread_store": (ThreadStoreSection, "ThreadStoreConfig"),
+    "transcripts": (TranscriptSection, "TranscriptConfig"),
+    "client_pool": (ClientPoolSection, "ClientPoolConfig"),
+    "assistant_reload": (AssistantReloadSection, "AssistantReloadConfig"),
+    "coalescing": (CoalescingSection, "CoalescingConfig"),
+    "server": (ServerSection, "ServerConfig"),
+    "jobs": (JobSection, "JobConfig"),
+    "retrieval": (RetrievalSection, "RetrievalConfig"),
+    "knowledge_base": (KnowledgeBaseSection, "KnowledgeBaseConfig"),
+    "usage": (UsageSection, "UsageConfig"),
+    "resilience": (ResilienceSection, "ResilienceConfig"),
+}
+
+# Valores de cada perfil, por seção e campo; o que não está aqui usa o padrão do campo. "prod" mantém os padrões.
+PROFILES = {
+    "dev": {
+        "openai": {"MAX_RETRIES": 0},
+        "assistant_reload": {"POLL_SECONDS": 1.0},
+        "client_pool": {"COOLDOWN_SECONDS": 5.0, "MAX_COOLDOWN_SECONDS": 60.0},
+        "server": {"WORKERS": 1, "THREADS": 8, "PRELOAD": False, "MAX_CONCURRENT_CHATS": 4},
+        "jobs": {"WORKERS": 1},
+    },
+    "staging": {
+        "server": {"WORKERS": 2},
+        "jobs": {"WORKERS": 2, "RETENTION_SECONDS": 86400.0},
+    },
+    "prod": {},
+}
+
+SECRET_FIELDS = {"OPENAI_API_KEY", "api_key"}
+
+
+class EffectiveConfig(_Section):
+    """
+    A configuração efetiva: o perfil selecionado e o valor validado de cada seção.
+    """
+
+    profile: str
+    openai: OpenAISection
+    assistant: AssistantSection
+    thread_store: ThreadStoreSection
+    transcripts: TranscriptSection
+    client_pool: ClientPoolSection
+    assistant_reload: AssistantReloadSection
+    coalescing: CoalescingSection
+    server: ServerSection
+    jobs: JobSection
+    retrieval: RetrievalSection
+    knowledge_base: KnowledgeBaseSection
+    usage: UsageSection
+    resilience: ResilienceSection
+
+    @model_validator(mode="after")
+    def _run_within_request(self):
+        # O run precisa ser cancelado antes de o serviço desistir da requisição (504); do contrário continuaria
+        # consumindo tokens para uma resposta que ninguém vai receber.
+        if self.assistant.RUN_TIMEOUT_SECONDS >= self.server.REQUEST_TIMEOUT_SECONDS:
+            raise ValueError(f"RUN_TIMEOUT_SECONDS ({self.assistant.RUN_TIMEOUT_SECONDS:g}) deve ser menor que "
+                             f"REQUEST_TIMEOUT_SECONDS ({self.server.REQUEST_TIMEOUT_SECONDS:g})")
+        return self
+
+
+def _format_errors(error: ValidationError) -> str:
+    lines = []
+    for item in error.errors():
+        if len(item["loc"]) < 2:
+            # Validação entre campos (de uma seção ou entre seções): a mensagem já cita as variáveis.
+            lines.append(f"  {item['msg']}")
+            continue
+        section, *path = item["loc"]
+        field = SECTIONS[section][0].model_fields.get(path[0])
+        variable = field.alias if field is not None and field.alias else ".".join(str(part) for part in path)
+        lines.append(f"  {variable}: {item['msg']}")
+    return "\n".join(lines)
+
+
+def build_config(profile: str, environ=None) -> EffectiveConfig:
+    """
+    Monta e valida a configuração efetiva de um perfil.
+
+    Parâmetros:
+        profile (str): O perfil ("dev", "staging" ou "prod").
+        environ (dict, optional): As variáveis de ambiente. Padrão: `os.environ`.
+
+    Retorna:
+        EffectiveConfig: A configuração validada.
+
+    Exceções:
+        ConfigurationError: Se o perfil for desconhecido ou algum valor for inválido.
+
+    Exemplo de Uso:
+        config = build_config("staging", {"SERVER_WORKERS": "4"})
+        config.server.WORKERS  # 4
+    """
+    environ = os.environ if environ is None else environ
+    if profile not in PROFILES:
+        raise ConfigurationError(f"APP_ENV desconhecido: {profile!r} (use {', '.join(PROFILES)}).")
+
+    data = {"profile": profile}
+    for section, (schema, _) in SECTIONS.items():
+        values = dict(PROFILES[profile].get(section, {}))
+        for name, field in schema.model_fields.items():
+            if field.alias in environ:
+                values[name] = environ[field.alias]
+        data[section] = values
+
+    try:
+        config = EffectiveConfig.model_validate(data)
+    except ValidationError as e:
+        raise ConfigurationError(f"Configuração inválida (APP_ENV={profile}):\n{_format_errors(e)}") from None
+
+    # Padrões que dependem de outras configurações.
+    if config.assistant.AI_ASSISTANT_IDS is None:
+        assistant = config.assistant.model_copy(update={"AI_ASSISTANT_IDS": [config.assistant.AI_ASSISTANT_ID]})
+        config = config.model_copy(update={"assistant": assistant})
+    if config.client_pool.API_KEYS is None:
+        default_key = ApiKeyEntry(name="default", api_key=config.openai.OPENAI_API_KEY)
+        client_pool = config.client_pool.model_copy(update={"API_KEYS": [default_key]})
+        config = config.model_copy(update={"client_pool": client_pool})
+    return config
+
+
+def _mask(name, value):
+    if value is None:
+        return None
+    if name in SECRET_FIELDS:
+        return value[:3] + "..." + value[-4:] if len(value) > 12 else "***"
+    if isinstance(value, str) and "://" in value:
+        parts = urlsplit(value)
+        if parts.password:
+            netloc = parts.netloc.replace(f":{parts.password}@", ":***@")
+            return urlunsplit(parts._replace(netloc=netloc))
+    if isinstance(value, list):
+        return [_mask(name, item) for item in value]
+    if isinstance(value, dict):
+        return {key: _mask(key, item) for key, item in value.items()}
+    return value
+
+
+def describe_config(config: EffectiveConfig, environ=None) -> list:
+    """
+    Lista cada configuração efetiva com a sua origem, mascarando chaves de API e senhas.
+
+    Retorna:
+        list[dict]: Um item por configuração, com "setting" (ex.: "ServerConfig.WORKERS"), "env" (a variável de
+                    ambiente), "value" e "source" ("env", "profile" ou "default").
+    """
+    environ = os.environ if environ is None else environ
+    rows = []
+    for section, (schema, class_name) in SECTIONS.items():
+        values = getattr(config, section).model_dump()
+        profile_values = PROFILES[config.profile].get(section, {})
+        for name, field in schema.model_fields.items():
+            if field.alias in environ:
+                source = "env"
+            elif name in profile_values:
+                source = "profile"
+            else:
+                source = "default"
+            rows.append({"setting": f"{class_name}.{name}", "env": field.alias, "value": _mask(name, values[name]),
+                         "source": source})
+    return rows
@@ -0,0 +1,88 @@
+from prometheus_client import Counter, Gauge
+
+"""
+Métricas da aplicação no formato Prometheus (`prometheus_client`).
+
+As métricas são registradas no registro padrão do `prometheus_client` e podem ser expostas por qualquer
+servidor HTTP com `prometheus_client.generate_latest()` ou `prometheus_client.start_http_server(porta)`.
+
+Com vários processos (gunicorn), a variável PROMETHEUS_MULTIPROC_DIR deve estar definida antes da importação
+deste módulo; cada processo grava as suas métricas nesse diretório e a rota `/metrics` as agrega.
+"""
+
+ASSISTANT_RUNS = Counter(
+    "interface_openai_assistant_runs_total",
+    "Runs de assistentes iniciados na API da OpenAI.",
+    ["assistant_id"],
+)
+
+COALESCED_QUESTIONS = Counter(
+    "interface_openai_coalesced_questions_total",
+    "Perguntas respondidas pelo run de uma pergunta idêntica já em andamento (runs economizados).",
+    ["assistant_id"],
+)
+
+ACTIVE_CHATS = Gauge(
+    "interface_openai_active_chats",
+    "Turnos de conversa em andamento.",
+    multiprocess_mode="livesum",
+)
+
+REJECTED_CHATS = Counter(
+    "interface_openai_rejected_chats_total",
+    "Requisições de chat recusadas com 503 por excesso de turnos simultâneos.",
+)
+
+TIMED_OUT_CHATS = Counter(
+    "interface_openai_timed_out_chats_total",
+    "Requisições de chat encerradas com 504 por exceder REQUEST_TIMEOUT_SECONDS.",
+)
+
+ASSISTANT_CONFIG_VERSION = Gauge(
+    "interface_openai_assistant_config_version",
+    "Versão da configuração do assistente em uso pelo processo (incrementada a cada recarga).",
+    multiprocess_mode="liveall",
+)
+
+ASSISTANT_CONFIG_RELOADS = Counter(
+    "interface_openai_assistant_config_reloads_total",
+    "Recargas da configuração do assistente, por resultado (\"ok\" ou \"error\").",
+    ["result"],
+)
+
+TOKENS_USED = Counter(
+    "interface_openai_tokens_total",
+    "Tokens consumidos pelos runs, por assistente e tipo (\"prompt\" ou \"completion\").",
+    ["assistant_id", "kind"],
+)
+
+BUDGET_DECISIONS = Counter(
+    "interface_openai_budget_decisions_total",
+    "Pedidos de usuários próximos ou acima do orçamento de tokens, por ação (\"throttled\" ou \"rejected\").",
+    ["action"],
+)
+
+NAMING_TOKENS_AVOIDED = Counter(
+    "interface_openai_naming_tokens_avoided_total",
+    "Tokens (estimados) do preâmbulo de identificação do usuário que o modo \"run\" deixou de gravar nos threads.",
+)
+
+HEDGES_FIRED = Counter(
+    "interface_openai_hedges_total",
+    "Cópias enviadas de leituras lentas à API, por operação e pela chamada que respondeu primeiro "
+    "(\"primary\", \"hedge\" ou \"none\" se as duas falharam).",
+    ["operation", "winner"],
+)
+
+CIRCUIT_STATE = Gauge(
+    "interface_openai_circuit_state",
+    "Estado de cada disjuntor das chamadas à API (0 fechado, 1 em teste, 2 aberto).",
+    ["name"],
+    multiprocess_mode="liveall",
+)
+
+CIRCUIT_REJECTIONS = Counter(
+    "interface_openai_circuit_rejections_total",
+    "Chamadas à API recusadas na hora por um disjuntor aberto.",
+    ["name"],
+)
@@ -17,15 +17,127 @@ configurações necessárias para a operação do projeto.
 
 Variáveis sensíveis e específicas do ambiente está no arquivo `.env`
 usaremos este módulo para carregá-las de forma segura, garantindo que não sejam expostas ou hardcoded no código-fonte.
+
+Perfis e validação: os valores são tipados e validados (pydantic) em `app/utils/config_profiles.py`, que também
+define os perfis "dev", "staging" e "prod" (variável APP_ENV, padrão "prod"). Cada atributo vem, em ordem, da
+variável de ambiente, do perfil ou do padrão. Para ver a configuração efetiva:
+
+    APP_ENV=staging python -m app.utils.openia_config
 """
 
 # Importa as bibliotecas necessárias para carregar variáveis de ambiente
-from dotenv import load_dotenv
 import os
 import json
+import threading
+
+_environment_loaded = False
+_environment_guard = threading.Lock()
+
+
+def load_environment():
+    """
+    Carrega as variáveis de ambiente do arquivo .env, uma única vez por processo.
+
+    É chamada no primeiro acesso a uma configuração (ver `LazySetting`), e não na importação deste módulo:
+    módulos e ferramentas que não leem nenhuma configuração não pagam a leitura do .env.
+    """
+    global _environment_loaded
+    if not _environment_loaded:
+        with _environment_guard:
+            if not _environment_loaded:
+                from dotenv import load_dotenv
+
+                # Carrega variáveis de ambiente
+                load_dotenv()   # Isto irá carregar as variáveis do arquivo .env, que contém secrets.
+                _environment_loaded = True
+
+
+class ConfigurationError(ValueError):
+    """
+    Configuração inválida: perfil desconhecido ou valores fora do tipo ou dos limites esperados.
+    """
+
+
+_effective_config = None
+_effective_config_guard = threading.Lock()
 
-# Carrega variáveis de ambiente
-load_dotenv()   # Isto irá carregar as variáveis do arquivo .env, que contém secrets.
+
+def effective_config():
+    """
+    Retorna a configuração efetiva, validada, do perfil selecionado pela variável de ambiente APP_ENV
+    ("dev", "staging" ou "prod"; padrão "prod"), montada no primeiro acesso.
+
+    Cada valor vem da variável de ambiente correspondente, do perfil ou do padrão, nessa ordem (ver
+    `app/utils/config_profiles.py`, onde estão o esquema tipado e os perfis).
+
+    Retorna:
+        EffectiveConfig: A configuração de todas as seções (`effective_config().server.WORKERS`).
+
+    Exceções:
+        ConfigurationError: Se o perfil for desconhecido ou algum valor for inválido.
+    """
+    global _effective_config
+    if _effective_config is None:
+        with _effective_config_guard:
+            if _effective_config is None:
+                load_environment()
+                # Importado aqui: o pydantic só é carregado quando alguma configuração é lida.
+                from app.utils.config_profiles import build_config
+                _effective_config = build_config(os.getenv("APP_ENV", "prod").strip().lower())
+    return _effective_config
+
+
+def format_effective_config() -> str:
+    """
+    Retorna um relatório legível da configuração efetiva: perfil, e cada configuração com a sua variável de
+    ambiente, valor (chaves de API e senhas mascaradas) e origem ("env", "profile" ou "default").
+
+    Exemplo de Uso:
+        logger.info(format_effective_config())
+    """
+    from app.utils.config_profiles import describe_config
+
+    config = effective_config()
+    lines = [f"Configuração efetiva (APP_ENV={config.profile}):"]
+    for row in describe_config(config):
+        value = json.dumps(row["value"], ensure_ascii=False)
+        if len(value) > 80:
+            value = value[:77] + "..."
+        lines.append(f"  {row['setting']:50} {value:60} [{row['source']}: {row['env']}]")
+    return "\n".join(lines)
+
+
+def _setting(section, name):
+    # Atributo de classe lido da seção correspondente da configuração efetiva.
+    return LazySetting(lambda: getattr(getattr(effective_config(), section), name))
+
+
+class LazySetting:
+    """
+    Atributo de classe de configuração resolvido no primeiro acesso, e não na importação do módulo.
+
+    Parâmetros:
+        resolve (callable): Calcula o valor (lendo as variáveis de ambiente); chamada uma única vez, após
+            `load_environment()`.
+
+    Exemplo de Uso:
+        class ExemploConfig:
+            TIMEOUT = LazySetting(lambda: float(os.getenv("TIMEOUT", "30")))
+
+        ExemploConfig.TIMEOUT  # 30.0, lido neste momento
+    """
+
+    _UNSET = object()
+
+    def __init__(self, resolve):
+        self._resolve = resolve
+        self._value = self._UNSET
+
+    def __get__(self, instance, owner):
+        if self._value is self._UNSET:
+            load_environment()
+            self._value = self._resolve()
+        return self._value
 
 
 # **SEÇÃO: Configurações do Modelo Padrão**
@@ -93,16 +205,32 @@ class OpenAIConfig:
             * Lista de Modelos OpenAI: https://platform.openai.com/docs/models
             * Tutoriais OpenAI Assistant: https://www.youtube.com/watch?v=0h1ry-SqINc
 
+    * **REQUEST_TIMEOUT_SECONDS (float):**
+
+        * **Descrição:** Tempo limite de cada requisição HTTP do cliente da OpenAI.
+        * **Origem:** Variável de ambiente OPENAI_TIMEOUT_SECONDS.
+        * **Padrão:** 600 (o padrão do SDK).
+
+    * **MAX_RETRIES (int):**
+
+        * **Descrição:** Novas tentativas automáticas do cliente da OpenAI em erros de conexão, 408, 409, 429 e 5xx.
+        * **Origem:** Variável de ambiente OPENAI_MAX_RETRIES.
+        * **Padrão:** 2 (o padrão do SDK); 0 no perfil "dev".
+
     """
 
     # Carrega a chave da API do OpenAI do arquivo .env
-    OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+    OPENAI_API_KEY = _setting("openai", "OPENAI_API_KEY")
 
     # Define o modelo de inteligência artificial a ser usado
-    AI_MODEL = AI_MODEL
+    AI_MODEL = _setting("openai", "AI_MODEL")
 
     # Define uma thread padrão
-    AI_THREAD_ID = THREAD_ID
+    AI_THREAD_ID = _setting("openai", "AI_THREAD_ID")
+
+    REQUEST_TIMEOUT_SECONDS = _setting("openai", "REQUEST_TIMEOUT_SECONDS")
+
+    MAX_RETRIES = _setting("openai", "MAX_RETRIES")
 
 
 class OpenAIAssistantConfig:
@@ -181,7 +309,7 @@ class OpenAIAssistantConfig:
             * "gpt-
 
     """
-    ASSISTANT_NAME = ASSISTANT_NAME
+    ASSISTANT_NAME = _setting("assistant", "ASSISTANT_NAME")
     """
     O nome que o assistente usará para se identificar com os usuários.
 
@@ -189,7 +317,7 @@ class OpenAIAssistantConfig:
     Exemplo: "Seu Manoel" #Meu Assistente português 
     """
 
-    INSTRUCTIONS = INSTRUCTIONS
+    INSTRUCTIONS = _setting("assistant", "INSTRUCTIONS")
     """
     Instruções iniciais que moldam a personalidade e tom de voz do assistente.
 
@@ -197,7 +325,7 @@ class OpenAIAssistantConfig:
     Exemplo: "Sou um assistente amigável que te ajuda."
     """
 
-    TOOLS = json.loads(TOOLS)
+    TOOLS = _setting("assistant", "TOOLS")
     """
     Uma lista de ferramentas e recursos que o assistente pode acessar para responder às perguntas.
 
@@ -206,7 +334,7 @@ class OpenAIAssistantConfig:
     Exemplo: [{'type': 'retrieval'}, {'type': 'translation', 'languages': ['pt', 'en']}]
     """
 
-    AI_ASSISTANT_MODEL = AI_ASSISTANT_MODEL
+    AI_ASSISTANT_MODEL = _setting("assistant", "AI_ASSISTANT_MODEL")
     """
     O modelo específico da OpenAI que será usado para gerar as respostas do assistente. 
     Modelos diferentes impactam significativamente na geração de linguagem, compreensão de contexto e na qualidade das respostas.
@@ -222,7 +350,7 @@ class OpenAIAssistantConfig:
     # * TOOLS: Preencha a lista com as ferramentas e recursos realmente necessários.
     # * AI_ASSISTANT_MODEL: Defina o modelo de IA que melhor atende às suas necessidades.
 
-    AI_ASSISTANT_ID = ASSISTANT_ID
+    AI_ASSISTANT_ID = _setting("assistant", "AI_ASSISTANT_ID")
 
     """
     Identificador único do assistente na plataforma OpenAI.
@@ -257,6 +385,216 @@ class OpenAIAssistantConfig:
     print(assistant_info)
     """
 
+    AI_ASSISTANT_IDS = _setting("assistant", "AI_ASSISTANT_IDS")
+
+    """
+    Assistentes entre os quais os usuários são distribuídos (`app/services/assistant_sharding.py`).
+
+    **Características:**
+    - **Origem:** Variável de ambiente ASSISTANT_IDS, com os IDs separados por vírgula.
+    - **Padrão:** Apenas `ASSISTANT_ID`.
+
+    **Observações:**
+    - Cada usuário é atribuído a um assistente por hashing consistente do seu nome: acrescentar ou remover um
+      assistente da lista redistribui apenas a fração de usuários correspondente.
+    - A atribuição é gravada nos metadados do thread no momento da criação, e as conversas existentes continuam
+      com o assistente original mesmo se a lista mudar.
+    """
+
+    RUN_POLL_INTERVAL_SECONDS = _setting("assistant", "RUN_POLL_INTERVAL_SECONDS")
+    """
+    Intervalo entre duas consultas ao estado de um run em andamento (`generate_response`).
+
+    **Características:**
+    - **Origem:** Variável de ambiente RUN_POLL_INTERVAL_SECONDS.
+    - **Padrão:** 0.5.
+
+    **Observações:**
+    - Valores menores reduzem a latência percebida ao custo de mais requisições à API por turno.
+    """
+
+    RUN_TIMEOUT_SECONDS = _setting("assistant", "RUN_TIMEOUT_SECONDS")
+    """
+    Prazo de cada turno: um run que não termina nesse tempo é cancelado na API (`RunTimeoutError`).
+
+    **Características:**
+    - **Origem:** Variável de ambiente RUN_TIMEOUT_SECONDS.
+    - **Padrão:** 110.
+
+    **Observações:**
+    - Deve ser menor que `ServerConfig.REQUEST_TIMEOUT_SECONDS` (verificado ao iniciar): o run é cancelado antes
+      de o serviço responder 504, em vez de continuar consumindo tokens para uma resposta que ninguém vai receber.
+    - Um run gravado como em andamento há mais que este prazo mais `RUN_STALE_MARGIN_SECONDS` é considerado preso
+      e cancelado antes da próxima mensagem do thread e pela varredura de `RUN_SWEEP_INTERVAL_SECONDS`.
+    """
+
+    RUN_STALE_MARGIN_SECONDS = _setting("assistant", "RUN_STALE_MARGIN_SECONDS")
+    """
+    Margem, além de `RUN_TIMEOUT_SECONDS`, a partir da qual um run gravado como em andamento é considerado preso
+    (o processo que o acompanhava parou no meio do turno).
+
+    **Características:**
+    - **Origem:** Variável de ambiente RUN_STALE_MARGIN_SECONDS.
+    - **Padrão:** 60.
+    """
+
+    RUN_CANCEL_WAIT_SECONDS = _setting("assistant", "RUN_CANCEL_WAIT_SECONDS")
+    """
+    Espera máxima, após o pedido de cancelamento de um run preso, até ele deixar de bloquear o thread (a API
+    cancela de forma assíncrona, passando por "cancelling").
+
+    **Características:**
+    - **Origem:** Variável de ambiente RUN_CANCEL_WAIT_SECONDS.
+    - **Padrão:** 10.
+    """
+
+    RUN_SWEEP_INTERVAL_SECONDS = _setting("assistant", "RUN_SWEEP_INTERVAL_SECONDS")
+    """
+    Intervalo entre duas varreduras de runs presos (`app/services/run_recovery.py`).
+
+    **Características:**
+    - **Origem:** Variável de ambiente RUN_SWEEP_INTERVAL_SECONDS.
+    - **Padrão:** 60 (0 desativa a varredura).
+
+    **Observações:**
+    - A primeira varredura acontece quando o serviço inicia, recuperando os threads deixados com runs ativos por
+      um processo que parou no meio de um turno.
+    """
+
+    USER_NAMING_MODE = _setting("assistant", "USER_NAMING_MODE")
+    """
+    Como o assistente fica sabendo quem faz cada pergunta (`app/services/user_naming.py`).
+
+    **Características:**
+    - **Origem:** Variável de ambiente USER_NAMING_MODE.
+    - **Padrão:** "message".
+
+    **Observações:**
+    - "message": cada mensagem leva o preâmbulo "Meu nome é: ...", gravado no thread e reenviado ao modelo em
+      todos os runs seguintes.
+    - "run": a mensagem leva apenas a pergunta, e a identificação vai nas instruções adicionais de cada run, sem
+      crescer o contexto do thread.
+    """
+
+
+class ThreadStoreConfig:
+    """
+    Esta classe armazena as configurações do armazenamento do mapeamento usuário -> thread (`threads_manager`).
+
+    Atributos:
+
+    * **BACKEND (str):**
+
+        * **Descrição:** O backend de armazenamento utilizado.
+        * **Origem:** Variável de ambiente THREAD_STORE_BACKEND.
+        * **Padrão:** "shelve".
+        * **Opções:**
+            * **shelve:** Arquivo local em `app/data/threads`. Adequado para um único host.
+            * **redis:** Servidor compatível com o protocolo Redis, compartilhado entre vários nós.
+
+    * **REDIS_URL (str):**
+
+        * **Descrição:** URL de conexão do servidor Redis, usada apenas quando BACKEND="redis".
+        * **Padrão:** "redis://localhost:6379/0".
+
+    * **REDIS_MAX_CONNECTIONS (int):**
+
+        * **Descrição:** Tamanho máximo do pool de conexões com o Redis por processo.
+        * **Padrão:** 20.
+
+    * **REDIS_SOCKET_TIMEOUT_SECONDS (float):**
+
+        * **Descrição:** Tempo limite das operações no Redis; sem ele, um servidor travado bloqueia as requisições.
+        * **Padrão:** None (sem limite).
+
+    * **REDIS_KEY_PREFIX (str):**
+
+        * **Descrição:** Prefixo das chaves no Redis, permitindo que vários ambientes compartilhem o mesmo servidor.
+        * **Padrão:** "interface_openai".
+
+    * **METADATA_CACHE_SIZE (int):**
+
+        * **Descrição:** Quantos threads têm a sua chave de API e o seu assistente guardados em memória (caches LRU
+          de `client_pool` e `assistant_sharding`), evitando uma leitura dos metadados por mensagem.
+        * **Padrão:** 10000.
+
+    * **ACTIVITY_FLUSH_INTERVAL_SECONDS (float):**
+
+        * **Descrição:** Intervalo máximo em que a última atividade dos usuários fica acumulada em memória antes
+          de ser gravada no backend.
+        * **Padrão:** 30.
+
+    * **IDLE_TTL_SECONDS (float):**
+
+        * **Descrição:** Tempo sem atividade após o qual o mapeamento do usuário expira e seu thread remoto é removido.
+          O valor 0 desativa a expiração.
+        * **Padrão:** 0 (desativada). A remoção apaga o histórico da conversa na OpenAI; ative-a explicitamente, por
+          exemplo com 2592000 (30 dias). A varredura roda uma vez por intervalo em toda a implantação.
+
+    * **SWEEP_INTERVAL_SECONDS (float):**
+
+        * **Descrição:** Intervalo entre as varreduras de expiração em segundo plano.
+        * **Padrão:** 3600.
+
+    * **REMOTE_DELETE_BATCH_SIZE (int) e REMOTE_DELETE_INTERVAL_SECONDS (float):**
+
+        * **Descrição:** Limite de taxa da remoção de threads remotos: no máximo REMOTE_DELETE_BATCH_SIZE remoções
+          a cada REMOTE_DELETE_INTERVAL_SECONDS, para não competir com o tráfego de conversas pelo limite da API.
+        * **Padrão:** 20 remoções a cada 1 segundo.
+    """
+
+    BACKEND = _setting("thread_store", "BACKEND")
+
+    REDIS_URL = _setting("thread_store", "REDIS_URL")
+
+    REDIS_MAX_CONNECTIONS = _setting("thread_store", "REDIS_MAX_CONNECTIONS")
+
+    REDIS_SOCKET_TIMEOUT_SECONDS = _setting("thread_store", "REDIS_SOCKET_TIMEOUT_SECONDS")
+
+    REDIS_KEY_PREFIX = _setting("thread_store", "REDIS_KEY_PREFIX")
+
+    METADATA_CACHE_SIZE = _setting("thread_store", "METADATA_CACHE_SIZE")
+
+    ACTIVITY_FLUSH_INTERVAL_SECONDS = _setting("thread_store", "ACTIVITY_FLUSH_INTERVAL_SECONDS")
+
+    IDLE_TTL_SECONDS = _setting("thread_store", "IDLE_TTL_SECONDS")
+
+    SWEEP_INTERVAL_SECONDS = _setting("thread_store", "SWEEP_INTERVAL_SECONDS")
+
+    REMOTE_DELETE_BATCH_SIZE = _setting("thread_store", "REMOTE_DELETE_BATCH_SIZE")
+
+    REMOTE_DELETE_INTERVAL_SECONDS = _setting("thread_store", "REMOTE_DELETE_INTERVAL_SECONDS")
+
+
+class TranscriptConfig:
+    """
+    Esta classe armazena as configurações do registro local de conversas (`app/data/transcript_store.py`).
+
+    Atributos:
+
+    * **ENABLED (bool):**
+
+        * **Descrição:** Se cada turno de conversa (pergunta, resposta, run, tempos e tokens) deve ser gravado localmente.
+        * **Origem:** Variável de ambiente TRANSCRIPTS_ENABLED ("true"/"false").
+        * **Padrão:** True.
+
+    * **DIR (str):**
+
+        * **Descrição:** Diretório dos segmentos e do índice do registro.
+        * **Padrão:** "app/data/transcripts".
+
+    * **SEGMENT_MAX_BYTES (int):**
+
+        * **Descrição:** Tamanho a partir do qual um novo segmento é iniciado.
+        * **Padrão:** 67108864 (64 MiB).
+    """
+
+    ENABLED = _setting("transcripts", "ENABLED")
+
+    DIR = _setting("transcripts", "DIR")
+
+    SEGMENT_MAX_BYTES = _setting("transcripts", "SEGMENT_MAX_BYTES")
+
 
 
 
@@ -392,3 +730,376 @@ class OpenAIAssistantConfig:
 
 
 
+
+
+class ClientPoolConfig:
+    """
+    Esta classe armazena as configurações do pool de clientes da OpenAI (`app/interfaces/client_pool.py`).
+
+    Atributos:
+
+    * **API_KEYS (list[dict]):**
+
+        * **Descrição:** As chaves de API do pool. Cada item tem "name" (rótulo gravado nos metadados dos threads,
+          nunca a chave em si), "api_key" e, opcionalmente, "organization" e "weight".
+        * **Origem:** Variável de ambiente OPENAI_API_KEYS, em JSON.
+        * **Padrão:** Apenas `OPENAI_API_KEY`, com o nome "default".
+        * **Observação:** Todas as chaves devem ter acesso aos assistentes configurados. Os threads ficam presos à
+          chave em que foram criados, portanto uma chave não deve ser removida da lista enquanto houver threads dela.
+
+    * **SELECTION (str):**
+
+        * **Descrição:** A estratégia de escolha da chave para novos threads.
+        * **Padrão:** "least_loaded".
+        * **Opções:**
+            * **least_loaded:** A chave com menos chamadas em andamento, proporcionalmente ao seu peso.
+            * **weighted:** Sorteio proporcional ao peso de cada chave.
+
+    * **COOLDOWN_SECONDS / MAX_COOLDOWN_SECONDS (float):**
+
+        * **Descrição:** Pausa de uma chave após um erro 429/5xx (ou o "Retry-After" da resposta), dobrando a cada
+          falha consecutiva até o máximo, que não pode ser menor que a pausa inicial. Chaves rejeitadas (401/403)
+          ficam em pausa pelo máximo.
+        * **Padrão:** 30 / 600.
+    """
+
+    API_KEYS = LazySetting(lambda: [entry.model_dump() for entry in effective_config().client_pool.API_KEYS])
+
+    SELECTION = _setting("client_pool", "SELECTION")
+
+    COOLDOWN_SECONDS = _setting("client_pool", "COOLDOWN_SECONDS")
+
+    MAX_COOLDOWN_SECONDS = _setting("client_pool", "MAX_COOLDOWN_SECONDS")
+
+
+class AssistantReloadConfig:
+    """
+    Esta classe armazena as configurações da recarga a quente da configuração do assistente
+    (`app/services/assistant_config.py`).
+
+    Atributos:
+
+    * **PATH (str):**
+
+        * **Descrição:** Arquivo JSON com a configuração do assistente ("assistant_id", "assistant_ids", "name",
+          "instructions", "tools", "model"). Os campos presentes substituem os padrões de `OpenAIAssistantConfig`;
+          alterações no arquivo valem para as novas conversas sem reiniciar o processo.
+        * **Origem:** Variável de ambiente ASSISTANT_CONFIG_PATH.
+        * **Padrão:** None (sem arquivo: valem os padrões de `OpenAIAssistantConfig`).
+
+    * **POLL_SECONDS (float):**
+
+        * **Descrição:** Intervalo mínimo entre duas verificações de alteração do arquivo.
+        * **Padrão:** 5.
+    """
+
+    PATH = _setting("assistant_reload", "PATH")
+
+    POLL_SECONDS = _setting("assistant_reload", "POLL_SECONDS")
+
+
+class CoalescingConfig:
+    """
+    Esta classe armazena as configurações do agrupamento de perguntas idênticas (`app/services/question_coalescing.py`).
+
+    Atributos:
+
+    * **ENABLED (bool):**
+
+        * **Descrição:** Se perguntas idênticas, do mesmo usuário, ao mesmo assistente e ao mesmo tempo,
+          compartilham um único run.
+        * **Origem:** Variável de ambiente COALESCE_IDENTICAL_QUESTIONS ("true"/"false").
+        * **Padrão:** False.
+        * **Observação:** Ative apenas para assistentes sem estado: as seguidoras recebem a resposta da líder, e a
+          conversa não é acrescentada aos seus threads. Pode ser sobrescrito por chamada (`generate_response(..., coalesce=True)`).
+    """
+
+    ENABLED = _setting("coalescing", "ENABLED")
+
+
+class ServerConfig:
+    """
+    Esta classe armazena as configurações do serviço HTTP de chat (`run.py`, servido pelo gunicorn).
+
+    Atributos:
+
+    * **BIND (str):** Endereço e porta do servidor. Padrão: "0.0.0.0:5000".
+
+    * **WORKERS (int):** Processos workers do gunicorn. Padrão: o número de CPUs.
+
+    * **PRELOAD (bool):**
+
+        * **Descrição:** Se o processo mestre importa a aplicação (configuração, SDK, rotas) uma única vez antes do
+          fork, para que os workers iniciem já carregados. Cada worker recria os seus clientes e conexões após o fork.
+        * **Origem:** Variável de ambiente SERVER_PRELOAD ("true"/"false").
+        * **Padrão:** True.
+        * **Observação:** Com o preload, o sinal HUP reinicia os workers sem recarregar o código; para publicar código
+          novo sem derrubar conversas use USR2 (novo mestre) seguido de TERM no mestre antigo, ou SERVER_PRELOAD=false.
+
+    * **THREADS (int):** Threads por processo (worker "gthread"), ou seja, requisições HTTP simultâneas por processo.
+      Cada sessão WebSocket aberta ocupa uma thread. Padrão: 32.
+
+    * **MAX_CONCURRENT_CHATS (int):**
+
+        * **Descrição:** Turnos de conversa simultâneos por processo. Acima desse limite as novas requisições recebem
+          503 com "Retry-After", em vez de se acumularem aguardando a API.
+        * **Padrão:** 16.
+
+    * **REQUEST_TIMEOUT_SECONDS (float):**
+
+        * **Descrição:** Tempo máximo de espera pela resposta (ou, no streaming, entre duas partes da resposta).
+          Ao expirar a requisição recebe 504 e o turno continua em segundo plano, sendo gravado normalmente; no
+          streaming (SSE e WebSocket) o run é cancelado.
+
+    * **WS_IDLE_TIMEOUT_SECONDS (float):**
+
+        * **Descrição:** Tempo sem mensagens após o qual uma sessão WebSocket (`/chat/ws`) é encerrada.
+        * **Padrão:** 600.
+        * **Padrão:** 120.
+    """
+
+    BIND = _setting("server", "BIND")
+
+    WORKERS = _setting("server", "WORKERS")
+
+    PRELOAD = _setting("server", "PRELOAD")
+
+    THREADS = _setting("server", "THREADS")
+
+    MAX_CONCURRENT_CHATS = _setting("server", "MAX_CONCURRENT_CHATS")
+
+    REQUEST_TIMEOUT_SECONDS = _setting("server", "REQUEST_TIMEOUT_SECONDS")
+
+    WS_IDLE_TIMEOUT_SECONDS = _setting("server", "WS_IDLE_TIMEOUT_SECONDS")
+
+
+class JobConfig:
+    """
+    Esta classe armazena as configurações dos jobs de chat assíncronos (`app/data/job_store.py` e
+    `app/services/job_worker.py`).
+
+    Atributos:
+
+    * **DB_PATH (str):** Arquivo SQLite da tabela de jobs. Padrão: "app/data/jobs.sqlite3".
+
+    * **WORKERS (int):** Threads que executam jobs, por processo (0 desativa a execução). Padrão: 4.
+
+    * **POLL_INTERVAL_SECONDS (float):** Espera de um worker ocioso antes de consultar a fila de novo. Padrão: 1.
+
+    * **LEASE_SECONDS (float):**
+
+        * **Descrição:** Tempo de concessão de um job ao worker que o reservou. Se o worker parar sem concluir o job,
+          ele volta a ser executado após esse tempo; deve ser maior que a duração de qualquer run.
+        * **Padrão:** 900.
+
+    * **MAX_ATTEMPTS (int):** Tentativas de um job antes de ser marcado como falho. Padrão: 3.
+
+    * **CALLBACK_TIMEOUT_SECONDS / CALLBACK_RETRIES (float / int):** Tempo limite e tentativas da entrega do
+      resultado à URL de callback. Padrão: 10 / 3.
+
+    * **RETENTION_SECONDS (float):** Tempo que jobs concluídos ou falhos permanecem na tabela. Padrão: 604800 (7 dias).
+    """
+
+    DB_PATH = _setting("jobs", "DB_PATH")
+
+    WORKERS = _setting("jobs", "WORKERS")
+
+    POLL_INTERVAL_SECONDS = _setting("jobs", "POLL_INTERVAL_SECONDS")
+
+    LEASE_SECONDS = _setting("jobs", "LEASE_SECONDS")
+
+    MAX_ATTEMPTS = _setting("jobs", "MAX_ATTEMPTS")
+
+    CALLBACK_TIMEOUT_SECONDS = _setting("jobs", "CALLBACK_TIMEOUT_SECONDS")
+
+    CALLBACK_RETRIES = _setting("jobs", "CALLBACK_RETRIES")
+
+    RETENTION_SECONDS = _setting("jobs", "RETENTION_SECONDS")
+
+
+class RetrievalConfig:
+    """
+    Esta classe armazena as configurações da busca local em documentos (`app/data/document_index.py` e
+    `app/services/document_retrieval.py`).
+
+    Atributos:
+
+    * **ENABLED (bool):**
+
+        * **Descrição:** Se os trechos mais relevantes dos documentos indexados são passados ao run (nas
+          instruções adicionais, que não ficam no thread) em `generate_response` e `stream_response`. Com a
+          busca local, a ferramenta "retrieval" pode ser retirada das ferramentas do assistente, eliminando o tempo
+          das chamadas de ferramenta em cada run.
+        * **Padrão:** False.
+
+    * **INDEX_PATH (str):** Arquivo do índice invertido. Padrão: "app/data/document_index.bin".
+
+    * **TOP_K (int):** Número máximo de trechos passados ao run. Padrão: 3.
+
+    * **MIN_SCORE (float):** Pontuação BM25 mínima de um trecho para ser usado. Padrão: 0.
+
+    * **MAX_CONTEXT_CHARS (int):** Tamanho máximo, em caracteres, do conjunto de trechos. Padrão: 2000.
+
+    * **CHUNK_WORDS / CHUNK_OVERLAP_WORDS (int):** Tamanho dos trechos em que os documentos são divididos na
+      indexação, em palavras, e quantas palavras cada trecho repete do anterior. Padrão: 120 / 30.
+    """
+
+    ENABLED = _setting("retrieval", "ENABLED")
+
+    INDEX_PATH = _setting("retrieval", "INDEX_PATH")
+
+    TOP_K = _setting("retrieval", "TOP_K")
+
+    MIN_SCORE = _setting("retrieval", "MIN_SCORE")
+
+    MAX_CONTEXT_CHARS = _setting("retrieval", "MAX_CONTEXT_CHARS")
+
+    CHUNK_WORDS = _setting("retrieval", "CHUNK_WORDS")
+
+    CHUNK_OVERLAP_WORDS = _setting("retrieval", "CHUNK_OVERLAP_WORDS")
+
+
+class KnowledgeBaseConfig:
+    """
+    Esta classe armazena as configurações da anexação de arquivos em lote aos assistentes
+    (`app/services/knowledge_base.py`).
+
+    Atributos:
+
+    * **MAX_CONCURRENT_UPLOADS (int):** Uploads simultâneos de arquivos. Padrão: 8.
+
+    * **POLL_INITIAL_SECONDS / POLL_MAX_SECONDS (float):**
+
+        * **Descrição:** Espera inicial entre duas consultas do processamento dos arquivos, dobrada a cada consulta
+          sem novidades até o máximo.
+        * **Padrão:** 1 / 30.
+
+    * **TIMEOUT_SECONDS (float):** Tempo máximo de espera pelo processamento; os arquivos ainda pendentes são
+      informados como falhos. Padrão: 1800.
+    """
+
+    MAX_CONCURRENT_UPLOADS = _setting("knowledge_base", "MAX_CONCURRENT_UPLOADS")
+
+    POLL_INITIAL_SECONDS = _setting("knowledge_base", "POLL_INITIAL_SECONDS")
+
+    POLL_MAX_SECONDS = _setting("knowledge_base", "POLL_MAX_SECONDS")
+
+    TIMEOUT_SECONDS = _setting("knowledge_base", "TIMEOUT_SECONDS")
+
+
+class UsageConfig:
+    """
+    Esta classe armazena as configurações da contabilidade de tokens e dos orçamentos por usuário
+    (`app/data/usage_store.py` e `app/services/usage_accounting.py`).
+
+    Atributos:
+
+    * **ENABLED (bool):** Se o consumo de tokens de cada run é registrado. Padrão: True.
+
+    * **DB_PATH (str):** Arquivo SQLite do consumo agregado. Padrão: "app/data/usage.sqlite3".
+
+    * **FLUSH_INTERVAL_SECONDS (float):** Intervalo entre as gravações em lote do consumo acumulado em memória
+      (0 grava a cada run). Padrão: 10.
+
+    * **BUCKET_SECONDS (float):** Duração de cada intervalo de agregação na tabela. Padrão: 300.
+
+    * **BUDGET_TOKENS (int):** Orçamento de tokens de cada usuário na janela (0 desativa). Padrão: 0.
+
+    * **USER_BUDGETS (dict):**
+
+        * **Descrição:** Orçamentos por usuário, que substituem `BUDGET_TOKENS` (0 desativa o orçamento do
+          usuário). Ex.: {"Cícero": 200000}.
+        * **Padrão:** {}.
+
+    * **BUDGET_WINDOW_SECONDS (float):** A janela móvel dos orçamentos, arredondada para intervalos de
+      `BUCKET_SECONDS`. Padrão: 86400 (1 dia).
+
+    * **THROTTLE_RATIO / THROTTLE_SECONDS (float):**
+
+        * **Descrição:** A partir desta fração do orçamento, cada pedido do usuário aguarda `THROTTLE_SECONDS`
+          antes do run; ao atingir o orçamento, os pedidos são recusados. Com 1, não há espera.
+        * **Padrão:** 0.8 / 2.
+    """
+
+    ENABLED = _setting("usage", "ENABLED")
+
+    DB_PATH = _setting("usage", "DB_PATH")
+
+    FLUSH_INTERVAL_SECONDS = _setting("usage", "FLUSH_INTERVAL_SECONDS")
+
+    BUCKET_SECONDS = _setting("usage", "BUCKET_SECONDS")
+
+    BUDGET_TOKENS = _setting("usage", "BUDGET_TOKENS")
+
+    USER_BUDGETS = _setting("usage", "USER_BUDGETS")
+
+    BUDGET_WINDOW_SECONDS = _setting("usage", "BUDGET_WINDOW_SECONDS")
+
+    THROTTLE_RATIO = _setting("usage", "THROTTLE_RATIO")
+
+    THROTTLE_SECONDS = _setting("usage", "THROTTLE_SECONDS")
+
+
+
+class ResilienceConfig:
+    """
+    Esta classe armazena as configurações do hedging das leituras e dos disjuntores das chamadas à API
+    (`app/utils/resilience.py`).
+
+    Atributos:
+
+    * **HEDGING_ENABLED (bool):** Se as leituras idempotentes lentas recebem uma cópia. Padrão: True.
+
+    * **HEDGE_PERCENTILE (float):** O percentil das latências recentes da operação após o qual a cópia é
+      enviada. Padrão: 95.
+
+    * **HEDGE_MIN_DELAY_SECONDS (float):** A espera mínima antes da cópia. Padrão: 0.05.
+
+    * **HEDGE_MIN_SAMPLES (int):** Latências medidas de uma operação antes de enviar cópias dela. Padrão: 20.
+
+    * **HEDGE_MAX_RATIO (float):** A fração máxima das chamadas recentes de uma operação com cópia. Padrão: 0.1.
+
+    * **HEDGE_WINDOW (int):** As chamadas recentes consideradas, por operação. Padrão: 200.
+
+    * **HEDGE_MAX_WORKERS (int):** As threads que executam as cópias; com todas ocupadas, a leitura segue sem
+      cópia. A chamada original roda sempre em uma thread própria. Padrão: 32.
+
+    * **BREAKER_ENABLED (bool):** Se as chamadas à API passam por um disjuntor por cliente. Padrão: True.
+
+    * **BREAKER_FAILURE_RATE / BREAKER_MIN_CALLS / BREAKER_WINDOW:**
+
+        * **Descrição:** O disjuntor abre quando a fração de falhas (limite de taxa, erro 5xx ou de conexão) entre
+          as últimas `BREAKER_WINDOW` chamadas atinge `BREAKER_FAILURE_RATE`, com ao menos `BREAKER_MIN_CALLS`
+          chamadas na janela.
+        * **Padrão:** 0.5 / 20 / 50.
+
+    * **BREAKER_OPEN_SECONDS (float):** O tempo aberto, falhando na hora, antes de uma chamada de teste.
+      Padrão: 30.
+    """
+
+    HEDGING_ENABLED = _setting("resilience", "HEDGING_ENABLED")
+
+    HEDGE_PERCENTILE = _setting("resilience", "HEDGE_PERCENTILE")
+
+    HEDGE_MIN_DELAY_SECONDS = _setting("resilience", "HEDGE_MIN_DELAY_SECONDS")
+
+    HEDGE_MIN_SAMPLES = _setting("resilience", "HEDGE_MIN_SAMPLES")
+
+    HEDGE_MAX_RATIO = _setting("resilience", "HEDGE_MAX_RATIO")
+
+    HEDGE_WINDOW = _setting("resilience", "HEDGE_WINDOW")
+
+    HEDGE_MAX_WORKERS = _setting("resilience", "HEDGE_MAX_WORKERS")
+
+    BREAKER_ENABLED = _setting("resilience", "BREAKER_ENABLED")
+
+    BREAKER_FAILURE_RATE = _setting("resilience", "BREAKER_FAILURE_RATE")
+
+    BREAKER_MIN_CALLS = _setting("resilience", "BREAKER_MIN_CALLS")
+
+    BREAKER_WINDOW = _setting("resilience", "BREAKER_WINDOW")
+
+    BREAKER_OPEN_SECONDS = _setting("resilience", "BREAKER_OPEN_SECONDS")
+
+if __name__ == '__main__':
+    print(format_effective_config())
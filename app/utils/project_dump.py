@@ -0,0 +1,263 @@
+import argparse
+import ast
+import hashlib
+import io
+import json
+import os
+import sys
+import tokenize
+from concurrent.futures import ProcessPoolExecutor
+
+# Define explicitamente o diretório raiz do projeto
+sys.path.append('/workplace/')
+
+from app.decorators.log_decorator import log_function_call, logger
+
+"""
+Project Dump
+
+Gera um arquivo de texto com a estrutura do projeto e o conteúdo dos arquivos Python sem docstrings e comentários,
+para leitura ou revisão do código de uma vez só.
+
+- **Estrutura:** a árvore é percorrida uma única vez, ignorando `EXCLUDED_DIRS` e `EXCLUDED_FILES`; a listagem
+  traz todos os caminhos, e o conteúdo, os arquivos `.py`.
+- **Limpeza:** `strip_source` remove os comentários (pelo `tokenize`) e as strings soltas usadas como documentação
+  (pelo `ast`: docstrings de módulos, classes e funções, e as descrições de módulo colocadas após os imports).
+  Arquivos com erro de sintaxe são mantidos como estão.
+- **Paralelismo:** os arquivos são limpos em um pool de processos, e o resultado é escrito à medida que fica
+  pronto, na ordem da listagem.
+- **Cache:** o resultado de cada arquivo fica em um arquivo JSON, indexado pela data de modificação e pelo tamanho;
+  se eles mudaram mas o conteúdo (SHA-256) não, o resultado anterior é reaproveitado. Em um novo dump de uma árvore
+  grande, só os arquivos alterados são reprocessados.
+
+Uso pela linha de comando:
+
+    python app/utils/project_dump.py                     # grava estrutura_e_conteudo.txt na raiz do projeto
+    python app/utils/project_dump.py --saida - | less    # escreve na saída padrão
+"""
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+DEFAULT_OUTPUT = "estrutura_e_conteudo.txt"
+DEFAULT_CACHE = ".project_dump_cache.json"
+EXCLUDED_DIRS = {"__pycache__", ".git", "  PROJETO ANTIGO"}
+EXCLUDED_FILES = {"__init__.py"}
+# Muda quando `strip_source` muda, invalidando o cache.
+STRIP_VERSION = 1
+# Abaixo deste número de arquivos a processar, iniciar o pool de processos custa mais do que economiza.
+MIN_FILES_FOR_POOL = 8
+SEPARATOR = "=" * 40
+
+
+def _is_docstring(stmt) -> bool:
+    return isinstance(stmt, ast.Expr) and isinstance(stmt.value, ast.Constant) and isinstance(stmt.value.value, str)
+
+
+def _owns_lines(stmt, lines) -> bool:
+    # A string só pode ser removida com as suas linhas se não as dividir com outro comando.
+    before = lines[stmt.lineno - 1][:stmt.col_offset]
+    after = lines[stmt.end_lineno - 1][stmt.end_col_offset:].strip()
+    return not before.strip() and (not after or after.startswith("#"))
+
+
+def _docstring_lines(tree, lines):
+    # Linhas das strings soltas a remover, e linhas onde inserir "pass" nos blocos que ficariam vazios.
+    removed, placeholders = set(), {}
+    for node in ast.walk(tree):
+        for field in ("body", "orelse", "finalbody"):
+            body = getattr(node, field, None)
+            if not isinstance(body, list) or not body or not isinstance(body[0], ast.stmt):
+                continue
+            strings = [stmt for stmt in body if _is_docstring(stmt) and _owns_lines(stmt, lines)]
+            for stmt in strings:
+                removed.update(range(stmt.lineno, stmt.end_lineno + 1))
+            if strings and len(strings) == len(body) and not isinstance(node, ast.Module):
+                placeholders[body[0].lineno] = body[0].col_offset
+    return removed, placeholders
+
+
+def strip_source(source: str) -> str:
+    """
+    Remove os comentários e as strings de documentação de um código Python.
+
+    Parâmetros:
+        source (str): O código.
+
+    Retorna:
+        str: O código sem comentários, docstrings e linhas em branco repetidas; um bloco que só tinha a docstring
+             recebe `pass`. Se o código (ou o resultado) tiver erro de sintaxe, é retornado sem alterações.
+
+    Exemplo de Uso:
+        strip_source("def f():\\n    'Doc.'\\n    return 1  # um\\n")  # 'def f():\\n    return 1\\n'
+    """
+    try:
+        tree = ast.parse(source)
+        comments = [token for token in tokenize.generate_tokens(io.StringIO(source).readline)
+                    if token.type == tokenize.COMMENT]
+    except (SyntaxError, tokenize.TokenError, ValueError):
+        return source
+    # Apenas "\n" separa linhas, como na numeração do ast e do tokenize: `splitlines` também quebraria em
+    # "\f", "\v", "\x1c"-"\x1e", "\x85" e "\u2028", deslocando as linhas a remover.
+    lines = [line[:-1] if line.endswith("\r") else line for line in source.split("\n")]
+    removed, placeholders = _docstring_lines(tree, lines)
+    for token in comments:
+        row, column = token.start
+        lines[row - 1] = lines[row - 1][:column].rstrip()
+
+    output, blank = [], True
+    for number, line in enumerate(lines, start=1):
+        if number in placeholders:
+            output.append(" " * placeholders[number] + "pass")
+            blank = False
+            continue
+        if number in removed:
+            continue
+        if not line.strip():
+            if not blank:
+                output.append("")
+            blank = True
+            continue
+        output.append(line)
+        blank = False
+    while output and not output[-1]:
+        output.pop()
+    stripped = "\n".join(output) + "\n" if output else ""
+    try:
+        ast.parse(stripped)
+    except SyntaxError:
+        # Salvaguarda: um resultado inválido nunca substitui o código original.
+        return source
+    return stripped
+
+
+def _strip_file(path, cached_hash):
+    # Executada nos processos do pool: retorna (hash, texto), com texto None se o conteúdo não mudou.
+    with open(path, "rb") as file:
+        content = file.read()
+    digest = hashlib.sha256(content).hexdigest()
+    if digest == cached_hash:
+        return digest, None
+    return digest, strip_source(content.decode("utf-8", errors="replace"))
+
+
+def walk_project(root: str) -> list:
+    """
+    Lista os caminhos do projeto, relativos à raiz ("./app/..."), em ordem alfabética por diretório.
+    """
+    paths = []
+    for directory, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(name for name in dirnames if name not in EXCLUDED_DIRS)
+        relative = os.path.relpath(directory, root)
+        prefix = "." if relative == "." else "./" + relative.replace(os.sep, "/")
+        for name in sorted(dirnames + [f for f in filenames if f not in EXCLUDED_FILES and not f.endswith(".pyc")]):
+            paths.append(f"{prefix}/{name}")
+    return paths
+
+
+def _load_cache(path):
+    try:
+        with open(path, encoding="utf-8") as file:
+            cache = json.load(file)
+    except (FileNotFoundError, ValueError):
+        return {}
+    return cache.get("files", {}) if cache.get("version") == STRIP_VERSION else {}
+
+
+def _save_cache(path, entries):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump({"version": STRIP_VERSION, "files": entries}, file, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+@log_function_call
+def dump_project(root: str = PROJECT_ROOT, out=None, cache_path: str = None, workers: int = None) -> dict:
+    """
+    Escreve a estrutura do projeto e o conteúdo limpo dos seus arquivos Python.
+
+    Parâmetros:
+        root (str): A raiz do projeto. Padrão: a raiz deste repositório.
+        out (TextIO, optional): Onde escrever. Padrão: a saída padrão.
+        cache_path (str, optional): O arquivo de cache; sem ele, todos os arquivos são processados.
+        workers (int, optional): O número de processos do pool. Padrão: o número de CPUs.
+
+    Retorna:
+        dict: "files" (arquivos Python), "processed" (limpos nesta execução) e "cached" (reaproveitados do cache).
+
+    Exemplo de Uso:
+        with open("estrutura_e_conteudo.txt", "w", encoding="utf-8") as out:
+            dump_project(out=out, cache_path=".project_dump_cache.json")
+    """
+    out = out or sys.stdout
+    excluded = {os.path.abspath(cache_path)} if cache_path else set()
+    if getattr(out, "name", None) and isinstance(out.name, str):
+        excluded.add(os.path.abspath(out.name))
+    paths = [path for path in walk_project(root) if os.path.abspath(os.path.join(root, path)) not in excluded]
+    out.write("\n".join(paths) + "\n")
+    out.write(f"{SEPARATOR}\nConteúdo dos arquivos Python (.py):\n{SEPARATOR}\n")
+
+    cache = _load_cache(cache_path) if cache_path else {}
+    entries, hits, misses = {}, {}, []
+    for path in paths:
+        full_path = os.path.join(root, path)
+        if not path.endswith(".py") or not os.path.isfile(full_path):
+            continue
+        stat = os.stat(full_path)
+        stamp = [stat.st_mtime_ns, stat.st_size]
+        entry = cache.get(path)
+        if entry and entry["stamp"] == stamp:
+            hits[path] = entry
+        else:
+            misses.append((path, stamp, entry["sha256"] if entry else None))
+        entries[path] = entry
+
+    def processed():
+        if len(misses) >= MIN_FILES_FOR_POOL and workers != 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                yield from zip(misses, executor.map(_strip_file, [os.path.join(root, m[0]) for m in misses],
+                                                    [m[2] for m in misses], chunksize=4))
+        else:
+            for miss in misses:
+                yield miss, _strip_file(os.path.join(root, miss[0]), miss[2])
+
+    results = processed()
+    reprocessed = 0
+    for path in entries:
+        if path not in hits:
+            (_, stamp, _), (digest, text) = next(results)
+            if text is None:
+                text = entries[path]["text"]
+            else:
+                reprocessed += 1
+            entries[path] = {"stamp": stamp, "sha256": digest, "text": text}
+        out.write(f"---------- Início de {path} ----------\n{entries[path]['text'].rstrip()}\n"
+                  f"----------- Fim de {path} -----------\n\n")
+        out.flush()
+
+    if cache_path:
+        _save_cache(cache_path, entries)
+    stats = {"files": len(entries), "processed": reprocessed, "cached": len(entries) - reprocessed}
+    logger.info(f"Dump de {root}: {stats['files']} arquivos Python, {stats['processed']} processados.")
+    return stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Estrutura do projeto e conteúdo dos arquivos Python, sem "
+                                                 "docstrings e comentários.")
+    parser.add_argument("raiz", nargs="?", default=PROJECT_ROOT)
+    parser.add_argument("--saida", default=None, help=f"Arquivo de saída ('-' para a saída padrão). "
+                                                      f"Padrão: {DEFAULT_OUTPUT} na raiz.")
+    parser.add_argument("--cache", default=None, help=f"Arquivo de cache. Padrão: {DEFAULT_CACHE} na raiz.")
+    parser.add_argument("--sem-cache", action="store_true", help="Processa todos os arquivos.")
+    parser.add_argument("--processos", type=int, default=None, help="Processos do pool. Padrão: CPUs.")
+    args = parser.parse_args()
+
+    root = os.path.abspath(args.raiz)
+    cache_path = None if args.sem_cache else (args.cache or os.path.join(root, DEFAULT_CACHE))
+    if args.saida == "-":
+        stats = dump_project(root, sys.stdout, cache_path, args.processos)
+    else:
+        output = args.saida or os.path.join(root, DEFAULT_OUTPUT)
+        with open(output, "w", encoding="utf-8") as out:
+            stats = dump_project(root, out, cache_path, args.processos)
+        print(f"{output}: {stats['files']} arquivos Python ({stats['processed']} processados, "
+              f"{stats['cached']} do cache)", file=sys.stderr)
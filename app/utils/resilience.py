@@ -0,0 +1,357 @@
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+# Define explicitamente o diretório raiz do projeto
+sys.path.append('/workplace/')
+
+from app.decorators.log_decorator import logger
+from app.utils.metrics import CIRCUIT_REJECTIONS, CIRCUIT_STATE, HEDGES_FIRED
+from app.utils.openia_config import ResilienceConfig
+
+"""
+Resilience
+
+Controle da latência de cauda e das falhas em série nas chamadas à API da OpenAI.
+
+- **Hedging:** em uma leitura idempotente (`runs.retrieve`, `messages.list`), se a resposta não chega no percentil
+  `ResilienceConfig.HEDGE_PERCENTILE` das latências recentes da mesma operação, uma cópia da chamada é enviada, e
+  vale a primeira resposta. Uma chamada lenta por acaso (uma conexão ruim, um servidor sobrecarregado) deixa de
+  atrasar o turno inteiro. As cópias são limitadas a `HEDGE_MAX_RATIO` das chamadas recentes, para não
+  multiplicar a carga justamente quando a API está lenta, e só começam após `HEDGE_MIN_SAMPLES` latências
+  medidas. A chamada original roda em uma thread própria, sem fila; só as cópias ocupam o pool de
+  `HEDGE_MAX_WORKERS` threads, e não há cópia quando ele está cheio (uma cópia na fila chegaria tarde).
+- **Disjuntor (circuit breaker):** quando a fração de falhas entre as últimas chamadas passa de
+  `BREAKER_FAILURE_RATE` (com ao menos `BREAKER_MIN_CALLS` chamadas), o disjuntor abre e as chamadas seguintes
+  falham na hora com `CircuitOpenError`, em vez de cada uma esperar o tempo limite da API durante um incidente.
+  Após `BREAKER_OPEN_SECONDS`, uma única chamada de teste é liberada ("half_open"): se der certo o disjuntor
+  fecha, se falhar volta a abrir.
+
+Métricas: `interface_openai_hedges_total` (cópias enviadas, por operação e vencedora) e
+`interface_openai_circuit_state` (0 fechado, 1 em teste, 2 aberto), com as recusas em
+`interface_openai_circuit_rejections_total`.
+"""
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """
+    Levantada quando o disjuntor está aberto e a chamada não é feita.
+    """
+
+
+def _percentile(values, p):
+    # Percentil pelo método do posto mais próximo.
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * p // 100))
+    return ordered[int(rank) - 1]
+
+
+class CircuitBreaker:
+    """
+    Disjuntor por taxa de falhas em uma janela das últimas chamadas.
+
+    Parâmetros:
+        name (str): O nome do disjuntor (rótulo das métricas).
+        failure_rate (float): A fração de falhas que abre o disjuntor.
+        min_calls (int): O número mínimo de chamadas na janela para avaliar a fração.
+        window (int): O número de chamadas recentes consideradas.
+        open_seconds (float): O tempo aberto antes da chamada de teste.
+        is_failure (Callable[[Exception], bool], optional): Quais exceções contam como falha. Padrão: todas.
+            Erros do próprio pedido (400, 404...) não devem contar.
+
+    Exemplo de Uso:
+        breaker = CircuitBreaker("openai", failure_rate=0.5, min_calls=20, window=50, open_seconds=30)
+        run = breaker.call(client.beta.threads.runs.retrieve, thread_id=thread_id, run_id=run_id)
+    """
+
+    def __init__(self, name, failure_rate=0.5, min_calls=20, window=50, open_seconds=30.0, is_failure=None):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.is_failure = is_failure or (lambda error: True)
+        self._outcomes = deque(maxlen=window)  # True para falha
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        CIRCUIT_STATE.labels(name=name).set(0)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                return HALF_OPEN
+            return self._state
+
+    def _set_state(self, state):
+        if state != self._state:
+            logger.warning(f"Disjuntor '{self.name}': {self._state} -> {state}")
+        self._state = state
+        CIRCUIT_STATE.labels(name=self.name).set(_STATE_VALUES[state])
+
+    def _before_call(self):
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                self._set_state(HALF_OPEN)
+            if self._state == CLOSED:
+                return
+            if self._state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+        CIRCUIT_REJECTIONS.labels(name=self.name).inc()
+        raise CircuitOpenError(f"Disjuntor '{self.name}' aberto: a API está falhando; tente novamente em instantes.")
+
+    def _after_call(self, failed):
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probing = False
+                if failed:
+                    self._opened_at = time.monotonic()
+                    self._set_state(OPEN)
+                else:
+                    self._outcomes.clear()
+                    self._set_state(CLOSED)
+                return
+            self._outcomes.append(failed)
+            failures = sum(self._outcomes)
+            if (self._state == CLOSED and len(self._outcomes) >= self.min_calls
+                    and failures / len(self._outcomes) >= self.failure_rate):
+                self._opened_at = time.monotonic()
+                self._set_state(OPEN)
+
+    def call(self, fn, *args, **kwargs):
+        """
+        Executa `fn(*args, **kwargs)` se o disjuntor permitir, e registra o resultado.
+
+        Exceções:
+            CircuitOpenError: Se o disjuntor estiver aberto (ou já houver uma chamada de teste em andamento).
+        """
+        self._before_call()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self._after_call(isinstance(e, Exception) and self.is_failure(e))
+            raise
+        self._after_call(False)
+        return result
+
+
+class Hedger:
+    """
+    Envia uma cópia de uma chamada idempotente que demora mais que o percentil das latências recentes.
+
+    Parâmetros:
+        percentile (float): O percentil das latências recentes após o qual a cópia é enviada.
+        min_delay (float): A espera mínima antes da cópia, em segundos.
+        min_samples (int): O número de latências medidas de uma operação antes de enviar cópias dela.
+        max_ratio (float): A fração máxima de chamadas recentes com cópia.
+        window (int): O número de chamadas recentes consideradas, por operação.
+        max_workers (int): As threads que executam as cópias; com todas ocupadas, não são enviadas novas cópias.
+
+    Exemplo de Uso:
+        hedger = Hedger()
+        messages = hedger.call("messages.list", client.beta.threads.messages.list, thread_id=thread_id, limit=1)
+    """
+
+    def __init__(self, percentile=95, min_delay=0.05, min_samples=20, max_ratio=0.1, window=200, max_workers=32):
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.max_ratio = max_ratio
+        self.window = window
+        self.max_workers = max_workers
+        self._latencies = {}  # operação -> deque de latências (s)
+        self._hedged = {}  # operação -> deque com True para as chamadas com cópia
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._executor = None
+
+    def _history(self, operation):
+        if operation not in self._latencies:
+            self._latencies[operation] = deque(maxlen=self.window)
+            self._hedged[operation] = deque(maxlen=self.window)
+        return self._latencies[operation], self._hedged[operation]
+
+    def delay(self, operation):
+        """
+        Retorna a espera antes da cópia de uma chamada da operação, ou None se ainda não há latências suficientes.
+        """
+        with self._lock:
+            latencies, _ = self._history(operation)
+            if len(latencies) < self.min_samples:
+                return None
+            return max(_percentile(latencies, self.percentile), self.min_delay)
+
+    def _record_latency(self, operation, latency):
+        with self._lock:
+            self._history(operation)[0].append(latency)
+
+    def _record_unhedged(self, operation):
+        with self._lock:
+            self._history(operation)[1].append(False)
+
+    def _reserve_hedge(self, operation):
+        # Verifica a fração de cópias e reserva a cópia (e uma thread livre do pool) sob o mesmo bloqueio, para que
+        # chamadas simultâneas não ultrapassem `max_ratio`.
+        with self._lock:
+            _, hedges = self._history(operation)
+            if sum(hedges) >= self.max_ratio * max(len(hedges), 1) or not self._slots.acquire(blocking=False):
+                return False
+            hedges.append(True)
+            return True
+
+    def _timed(self, operation, fn, args, kwargs):
+        # A latência registrada é a da chamada à API, sem a espera por uma thread.
+        started_at = time.monotonic()
+        result = fn(*args, **kwargs)
+        self._record_latency(operation, time.monotonic() - started_at)
+        return result
+
+    def _start_primary(self, operation, fn, args, kwargs):
+        future = Future()
+
+        def run():
+            try:
+                future.set_result(self._timed(operation, fn, args, kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+
+        threading.Thread(target=run, name="hedge-primary", daemon=True).start()
+        return future
+
+    def _run_hedge(self, fn, args, kwargs):
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self._slots.release()
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="hedge")
+            return self._executor
+
+    def call(self, operation, fn, *args, **kwargs):
+        """
+        Executa `fn(*args, **kwargs)`, enviando uma cópia se a resposta demorar; retorna a primeira resposta.
+
+        Se a primeira chamada a terminar falhar, aguarda a outra; a exceção só é levantada se as duas falharem.
+        """
+        delay = self.delay(operation)
+        if delay is None:
+            result = self._timed(operation, fn, args, kwargs)
+            self._record_unhedged(operation)
+            return result
+
+        primary = self._start_primary(operation, fn, args, kwargs)
+        done, _ = wait([primary], timeout=delay)
+        if done or not self._reserve_hedge(operation):
+            self._record_unhedged(operation)
+            return primary.result()
+
+        try:
+            hedge = self._pool().submit(self._run_hedge, fn, args, kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    HEDGES_FIRED.labels(operation=operation, winner="hedge" if future is hedge else "primary").inc()
+                    return future.result()
+                error = future.exception()
+        HEDGES_FIRED.labels(operation=operation, winner="none").inc()
+        raise error
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+
+_breakers = {}
+_hedger = None
+_guard = threading.Lock()
+
+
+def get_breaker(name: str, is_failure=None) -> CircuitBreaker:
+    """
+    Retorna o disjuntor `name` do processo, configurado em `ResilienceConfig`, criando-o no primeiro uso.
+    """
+    with _guard:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(
+                name,
+                failure_rate=ResilienceConfig.BREAKER_FAILURE_RATE,
+                min_calls=ResilienceConfig.BREAKER_MIN_CALLS,
+                window=ResilienceConfig.BREAKER_WINDOW,
+                open_seconds=ResilienceConfig.BREAKER_OPEN_SECONDS,
+                is_failure=is_failure,
+            )
+        return breaker
+
+
+def get_hedger() -> Hedger:
+    """
+    Retorna o `Hedger` do processo, configurado em `ResilienceConfig`, criando-o no primeiro uso.
+    """
+    global _hedger
+    with _guard:
+        if _hedger is None:
+            _hedger = Hedger(
+                percentile=ResilienceConfig.HEDGE_PERCENTILE,
+                min_delay=ResilienceConfig.HEDGE_MIN_DELAY_SECONDS,
+                min_samples=ResilienceConfig.HEDGE_MIN_SAMPLES,
+                max_ratio=ResilienceConfig.HEDGE_MAX_RATIO,
+                window=ResilienceConfig.HEDGE_WINDOW,
+                max_workers=ResilienceConfig.HEDGE_MAX_WORKERS,
+            )
+        return _hedger
+
+
+def guarded_call(breaker_name: str, fn, *args, is_failure=None, **kwargs):
+    """
+    Executa uma chamada pelo disjuntor `breaker_name` (se `ResilienceConfig.BREAKER_ENABLED`).
+    """
+    if not ResilienceConfig.BREAKER_ENABLED:
+        return fn(*args, **kwargs)
+    return get_breaker(breaker_name, is_failure).call(fn, *args, **kwargs)
+
+
+def hedged_read(breaker_name: str, operation: str, fn, *args, is_failure=None, **kwargs):
+    """
+    Executa uma leitura idempotente pelo disjuntor `breaker_name` e com cópia após o percentil das latências
+    recentes de `operation` (se `ResilienceConfig.HEDGING_ENABLED`). Uma leitura com cópia conta uma única vez
+    no disjuntor.
+
+    Exemplo de Uso:
+        run = hedged_read("openai:default", "runs.retrieve", client.beta.threads.runs.retrieve,
+                          thread_id=thread_id, run_id=run_id)
+    """
+    if ResilienceConfig.HEDGING_ENABLED:
+        return guarded_call(breaker_name, get_hedger().call, operation, fn, *args, is_failure=is_failure, **kwargs)
+    return guarded_call(breaker_name, fn, *args, is_failure=is_failure, **kwargs)
+
+
+def reset_resilience():
+    """
+    Descarta os disjuntores e o `Hedger` do processo. Usada após um `fork`: as threads do pool de cópias não
+    existem no processo filho.
+    """
+    global _hedger
+    with _guard:
+        _breakers.clear()
+        hedger, _hedger = _hedger, None
+    if hedger is not None:
+        hedger.shutdown()
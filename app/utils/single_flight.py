@@ -0,0 +1,75 @@
+import threading
+
+
+class SingleFlight:
+    """
+    Garante que, para uma mesma chave, apenas uma execução de uma função esteja em andamento por vez
+    dentro do processo.
+
+    A primeira chamada para uma chave (a "líder") executa a função; as chamadas concorrentes para a mesma
+    chave (as "seguidoras") aguardam a líder terminar e recebem o mesmo resultado ou a mesma exceção,
+    sem executar a função novamente. Assim que a execução termina a chave é liberada, e uma chamada
+    posterior volta a executar a função normalmente.
+
+    Esse padrão evita trabalho duplicado quando várias requisições simultâneas precisam do mesmo recurso
+    ainda inexistente, como a criação do thread de um usuário na primeira mensagem.
+
+    Exemplo de Uso:
+        flight = SingleFlight()
+        thread_id, shared = flight.do("Cícero", lambda: criar_thread("Cícero"))
+    """
+
+    class _Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """
+        Executa `fn` uma única vez para as chamadas concorrentes com a mesma `key`.
+
+        Parâmetros:
+            key (hashable): A chave que identifica o trabalho a ser deduplicado.
+            fn (Callable[[], Any]): A função sem argumentos a ser executada pela chamada líder.
+
+        Retorna:
+            tuple: O resultado de `fn` e um booleano indicando se o resultado foi compartilhado
+                   (True para as seguidoras, False para a líder).
+
+        Exceções:
+            Propaga para a líder e para todas as seguidoras a exceção levantada por `fn`.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = SingleFlight._Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self):
+        """
+        Retorna o número de chaves com execução em andamento.
+        """
+        with self._lock:
+            return len(self._calls)
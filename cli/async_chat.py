@@ -0,0 +1,351 @@
+import asyncio
+import signal
+import sys
+import threading
+import time
+from collections import deque
+
+from colorama import Fore, Style
+
+# Define explicitamente o diretório raiz do projeto
+sys.path.append('/workplace/')
+
+from cli.cli_layout import draw_chat_frame, mensagem_despedida, prompt_user_name
+
+"""
+Chat assíncrono no terminal
+
+Variante do simulador de chat (`tests/simulation/chat_simulator.py`) que não congela o terminal enquanto o
+assistente responde. Roda em um laço `asyncio`:
+
+- **Entrada:** as linhas do teclado são lidas por uma thread à parte e entregues ao laço por uma fila, de modo que
+  o usuário pode digitar a qualquer momento, inclusive durante uma resposta.
+- **Resposta:** o turno usa `stream_response` em uma thread à parte; enquanto o primeiro trecho não chega, uma linha
+  de status mostra um indicador animado, o tempo decorrido e o status do run ("na fila", "em andamento"...). Os
+  trechos da resposta são exibidos assim que chegam.
+- **Comandos durante uma resposta:** `/cancelar` (ou Ctrl+C) interrompe a resposta e cancela o run remoto na
+  hora, sem esperar o próximo trecho (`cancel_run`, em uma thread à parte); `/sair` interrompe e encerra;
+  qualquer outra linha entra na fila e é enviada quando a resposta atual terminar.
+- **Latência:** ao fim de cada turno é exibido o tempo até o primeiro trecho e o tempo total.
+
+Uso:
+
+    python cli/async_chat.py
+"""
+
+CANCEL_COMMAND = '/cancelar'
+EXIT_COMMAND = '/sair'
+
+SPINNER_FRAMES = "⠋⠙⠹⠸⠼⠴⠦⠧⠇⠏"
+
+# Rótulos dos status de run da API de Assistentes (https://platform.openai.com/docs/api-reference/runs/object).
+STATUS_LABELS = {
+    "enviando": "enviando a mensagem",
+    "queued": "na fila",
+    "in_progress": "em andamento",
+    "requires_action": "aguardando ação",
+    "cancelling": "cancelando",
+    "cancelled": "cancelado",
+    "failed": "falhou",
+    "completed": "concluído",
+    "expired": "expirado",
+}
+
+_END = object()
+
+
+class TurnStats:
+    """
+    Estado e tempos de um turno de conversa, atualizados enquanto a resposta chega.
+
+    Atributos:
+        message (str): A mensagem enviada.
+        status (str): O último status do run informado por `stream_response`.
+        started_at, first_part_at, finished_at (float): Instantes (`time.monotonic`) do envio, do primeiro trecho
+                                                        e do fim do turno.
+        outcome (str): "concluída", "cancelada" ou "erro", ao fim do turno.
+        parts (list[str]): Os trechos recebidos.
+    """
+
+    def __init__(self, message):
+        self.message = message
+        self.status = "enviando"
+        self.started_at = time.monotonic()
+        self.first_part_at = None
+        self.finished_at = None
+        self.outcome = None
+        self.parts = []
+
+    def elapsed(self) -> float:
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    def time_to_first_part(self):
+        return None if self.first_part_at is None else self.first_part_at - self.started_at
+
+    def summary(self) -> str:
+        """
+        Retorna a linha de latência exibida ao fim do turno.
+        """
+        details = []
+        if self.time_to_first_part() is not None:
+            details.append(f"primeiro trecho em {self.time_to_first_part():.1f}s")
+        details.append(f"total {self.elapsed():.1f}s")
+        return f"[{self.outcome} · {' · '.join(details)}]"
+
+
+def _read_stdin(loop, inputs):
+    # Executada em uma thread daemon: `input()` bloqueia, o laço asyncio não.
+    try:
+        for line in sys.stdin:
+            loop.call_soon_threadsafe(inputs.put_nowait, line.strip())
+    except (RuntimeError, ValueError):
+        return  # O laço (ou a entrada) já foi encerrado.
+    try:
+        loop.call_soon_threadsafe(inputs.put_nowait, None)
+    except RuntimeError:
+        pass
+
+
+def _cancel_remote(cancel, thread_id):
+    # Executada em uma thread daemon: a chamada à API não bloqueia o laço asyncio.
+    try:
+        cancel(thread_id)
+    except Exception:
+        pass  # O iterador ainda cancela o run ao ser fechado por `_pump`.
+
+
+def _pump(loop, parts, make_iterator, stop):
+    # Executada em uma thread daemon: consome o iterador bloqueante e repassa os trechos ao laço asyncio.
+    # Com `stop` definido, o iterador é fechado no trecho seguinte, o que cancela o run remoto.
+    iterator = None
+    try:
+        iterator = make_iterator()
+        for part in iterator:
+            if stop.is_set():
+                break
+            loop.call_soon_threadsafe(parts.put_nowait, part)
+        item = _END
+    except BaseException as e:
+        item = e
+    finally:
+        if iterator is not None and hasattr(iterator, "close"):
+            iterator.close()
+    try:
+        loop.call_soon_threadsafe(parts.put_nowait, item)
+    except RuntimeError:
+        pass  # O laço já foi encerrado (o usuário saiu).
+
+
+class AsyncChat:
+    """
+    Sessão de chat assíncrona no terminal para um usuário e o seu thread.
+
+    Parâmetros:
+        user_name (str): O nome do usuário.
+        thread_id (str): O thread do usuário.
+        stream (Callable[[str, Callable[[str], None]], Iterator[str]], optional): Cria o iterador de trechos da
+            resposta a partir da mensagem e de uma função que recebe o status do run. Padrão: `stream_response`.
+        reader (Callable[[AbstractEventLoop, asyncio.Queue], None], optional): Lê as linhas digitadas e as coloca
+            na fila (None ao fim da entrada); executada em uma thread daemon. Padrão: leitura de `sys.stdin`.
+        out (TextIO, optional): Onde a conversa é exibida. Padrão: `sys.stdout`. O indicador animado só é exibido
+            em terminais.
+        spinner_interval (float): O intervalo de atualização da linha de status, em segundos.
+        cancel (Callable[[str], object], optional): Cancela o run em andamento do thread quando uma resposta é
+            interrompida. Padrão: `cancel_run`.
+
+    Exemplo de Uso:
+        asyncio.run(AsyncChat("Alice", get_or_create_thread("Alice")).run())
+    """
+
+    def __init__(self, user_name, thread_id, stream=None, reader=None, out=None, spinner_interval=0.1, cancel=None):
+        self.user_name = user_name
+        self.thread_id = thread_id
+        self.stream = stream or self._stream_response
+        self.reader = reader or _read_stdin
+        self.out = out or sys.stdout
+        self.spinner_interval = spinner_interval
+        self.cancel = cancel or self._cancel_run
+        self.turns = []
+        self.pending = deque()  # Mensagens digitadas durante uma resposta, enviadas em seguida.
+        self._current = None
+
+    def _stream_response(self, message, on_status):
+        from app.interfaces.interface_openai import stream_response
+
+        return stream_response(question_prompt=message, thread_id=self.thread_id, user_name=self.user_name,
+                               on_status=on_status)
+
+    @staticmethod
+    def _cancel_run(thread_id):
+        from app.interfaces.interface_openai import cancel_run
+
+        return cancel_run(thread_id)
+
+    def _write(self, text):
+        self.out.write(text)
+        self.out.flush()
+
+    def _clear_status_line(self):
+        if self.out.isatty():
+            self._write("\r\033[2K")
+
+    def _prompt(self):
+        self._write(Fore.GREEN + f"{self.user_name}, digite sua mensagem ('{CANCEL_COMMAND}' interrompe a resposta, "
+                    f"'{EXIT_COMMAND}' encerra): " + Style.RESET_ALL)
+
+    async def _spin(self, turn):
+        if not self.out.isatty():
+            return
+        frame = 0
+        while turn.first_part_at is None:
+            label = STATUS_LABELS.get(turn.status, turn.status)
+            self._write(f"\r\033[2K{Fore.CYAN}{SPINNER_FRAMES[frame % len(SPINNER_FRAMES)]} "
+                        f"{turn.elapsed():.1f}s · {label}{Style.RESET_ALL}")
+            frame += 1
+            await asyncio.sleep(self.spinner_interval)
+
+    async def _turn(self, turn):
+        loop = asyncio.get_running_loop()
+        parts = asyncio.Queue()
+        stop = threading.Event()
+
+        def on_status(status):
+            turn.status = status
+
+        threading.Thread(target=_pump, args=(loop, parts, lambda: self.stream(turn.message, on_status), stop),
+                         name="chat-turn", daemon=True).start()
+        spinner = asyncio.create_task(self._spin(turn))
+        try:
+            while True:
+                part = await parts.get()
+                if part is _END:
+                    break
+                if isinstance(part, BaseException):
+                    raise part
+                if turn.first_part_at is None:
+                    turn.first_part_at = time.monotonic()
+                    spinner.cancel()
+                    self._clear_status_line()
+                    self._write(Fore.BLUE + "ChatGPT: ")
+                turn.parts.append(part)
+                self._write(Fore.BLUE + part)
+            turn.outcome = "concluída"
+        except asyncio.CancelledError:
+            turn.outcome = "cancelada"
+            # O iterador só é fechado no próximo trecho, que pode demorar; o run remoto é cancelado já.
+            threading.Thread(target=_cancel_remote, args=(self.cancel, self.thread_id), name="chat-cancel",
+                             daemon=True).start()
+            raise
+        except Exception as e:
+            turn.outcome = "erro"
+            self._clear_status_line()
+            self._write(Fore.RED + f"Erro ao gerar a resposta: {e}")
+        finally:
+            stop.set()
+            spinner.cancel()
+            turn.finished_at = time.monotonic()
+            if turn.first_part_at is None:
+                self._clear_status_line()
+            else:
+                self._write(Style.RESET_ALL + "\n")
+            self._write(Fore.MAGENTA + turn.summary() + Style.RESET_ALL + "\n")
+
+    def cancel_current(self) -> bool:
+        """
+        Interrompe a resposta em andamento, se houver. Retorna True se havia uma resposta a interromper.
+        """
+        if self._current is None or self._current.done():
+            return False
+        self._current.cancel()
+        return True
+
+    async def run(self):
+        """
+        Conduz a sessão até o usuário digitar `/sair` ou a entrada terminar (neste caso, após responder as
+        mensagens já digitadas).
+
+        Retorna:
+            list[TurnStats]: Os turnos da sessão, na ordem.
+        """
+        loop = asyncio.get_running_loop()
+        inputs = asyncio.Queue()
+        threading.Thread(target=self.reader, args=(loop, inputs), name="chat-input", daemon=True).start()
+        input_closed = False
+
+        while True:
+            if self.pending:
+                message = self.pending.popleft()
+                self._write(Fore.GREEN + f"{self.user_name}: {message}" + Style.RESET_ALL + "\n")
+            elif input_closed:
+                break
+            else:
+                self._prompt()
+                line = await inputs.get()
+                if line is None or line.lower() == EXIT_COMMAND:
+                    break
+                if not line or line.lower() == CANCEL_COMMAND:
+                    continue
+                message = line
+
+            turn = TurnStats(message)
+            self.turns.append(turn)
+            self._current = asyncio.create_task(self._turn(turn))
+            leaving = False
+            while not self._current.done():
+                getter = asyncio.ensure_future(inputs.get())
+                done, _ = await asyncio.wait({self._current, getter}, return_when=asyncio.FIRST_COMPLETED)
+                if getter not in done:
+                    getter.cancel()
+                    continue
+                line = getter.result()
+                if line is None:
+                    # Fim da entrada (por exemplo, mensagens redirecionadas de um arquivo): termina o que já foi pedido.
+                    input_closed = True
+                    break
+                if line.lower() == EXIT_COMMAND:
+                    self.cancel_current()
+                    leaving = True
+                elif line.lower() == CANCEL_COMMAND:
+                    self.cancel_current()
+                elif line:
+                    self.pending.append(line)
+            try:
+                await self._current
+            except asyncio.CancelledError:
+                pass
+            if leaving:
+                break
+        return self.turns
+
+
+def main():
+    """
+    Pede o nome do usuário, associa-o ao seu thread e inicia a sessão de chat assíncrona.
+    """
+    from app.services.message_routing_manager import get_or_create_thread
+
+    draw_chat_frame()
+    user_name = prompt_user_name()
+    session = AsyncChat(user_name, get_or_create_thread(user_name))
+
+    async def _run():
+        loop = asyncio.get_running_loop()
+        try:
+            # Ctrl+C interrompe a resposta em andamento; sem resposta em andamento, encerra.
+            loop.add_signal_handler(signal.SIGINT, lambda: session.cancel_current() or _interrupt())
+        except (NotImplementedError, RuntimeError):
+            pass  # Windows: Ctrl+C encerra o programa.
+        await session.run()
+
+    def _interrupt():
+        raise KeyboardInterrupt
+
+    try:
+        asyncio.run(_run())
+    except KeyboardInterrupt:
+        print()
+    mensagem_despedida()
+
+
+if __name__ == '__main__':
+    main()
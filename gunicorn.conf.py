@@ -0,0 +1,81 @@
+import os
+import sys
+import tempfile
+
+# Define explicitamente o diretório raiz do projeto
+sys.path.append('/workplace/')
+
+from app.utils.openia_config import ServerConfig, format_effective_config
+
+"""
+Configuração do gunicorn para o serviço HTTP de chat (`run.py`).
+
+    gunicorn --config gunicorn.conf.py run:app
+
+Modelo pre-fork: o processo mestre carrega a configuração e importa a aplicação uma única vez (`preload_app`) e
+cria `ServerConfig.WORKERS` processos workers. Após o fork, cada worker recria o seu próprio estado
+(`run.reset_process_state`: clientes da OpenAI, armazenamentos, pools de threads) e inicia o pool de jobs.
+
+Workers "gthread": cada processo atende `ServerConfig.THREADS` conexões simultâneas com threads, adequado a um
+serviço que passa a maior parte do tempo aguardando a API da OpenAI. O `timeout` do gunicorn fica acima do
+`REQUEST_TIMEOUT_SECONDS` da aplicação, para que as respostas 504 da própria aplicação cheguem ao cliente.
+
+Recarga graciosa:
+
+- `kill -HUP <mestre>`: novos workers são criados e os antigos param de aceitar conexões, terminando as conversas
+  em andamento por até `graceful_timeout` segundos (acima de REQUEST_TIMEOUT_SECONDS). Com o preload o código não
+  é recarregado.
+- `kill -USR2 <mestre>` e, quando o novo mestre estiver no ar, `kill -TERM <mestre antigo>`: publica código novo
+  da mesma forma graciosa.
+"""
+
+# Métricas agregadas entre os workers (ver app/utils/metrics.py): definido antes da importação da aplicação, e
+# mantido na releitura desta configuração (HUP).
+if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="interface_openai_metrics_")
+
+bind = ServerConfig.BIND
+workers = ServerConfig.WORKERS
+worker_class = "gthread"
+threads = ServerConfig.THREADS
+preload_app = ServerConfig.PRELOAD
+timeout = int(ServerConfig.REQUEST_TIMEOUT_SECONDS) + 30
+graceful_timeout = int(ServerConfig.REQUEST_TIMEOUT_SECONDS) + 30
+keepalive = 5
+accesslog = "-"
+
+
+def on_starting(server):
+    # A configuração já foi validada ao ler ServerConfig acima; registra os valores efetivos no log do gunicorn.
+    server.log.info(format_effective_config())
+
+
+def when_ready(server):
+    # Com o preload, o SDK da OpenAI (carregado sob demanda pela aplicação) é importado antes do primeiro fork.
+    if preload_app:
+        import run
+        run.warm_up()
+
+
+def post_fork(server, worker):
+    # Conexões, descritores e bloqueios do mestre não devem ser compartilhados: cada worker recria os seus.
+    if preload_app:
+        import run
+        run.reset_process_state()
+
+
+def post_worker_init(worker):
+    # Threads não sobrevivem ao fork: o pool de jobs assíncronos é iniciado em cada worker já carregado.
+    import run
+    run.start_background_workers()
+
+
+def worker_exit(server, worker):
+    # Parada graciosa: os jobs em execução terminam antes de o worker sair.
+    import run
+    run.stop_background_workers(timeout=graceful_timeout)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
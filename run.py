@@ -1,9 +1,412 @@
-from flask import Flask
+import importlib
+import json
+import os
+import sys
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+
+from flask import Flask, Response, jsonify, request, stream_with_context
+from flask_sock import Sock
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, generate_latest, multiprocess
+from simple_websocket import ConnectionClosed
+
+# Define explicitamente o diretório raiz do projeto
+sys.path.append('/workplace/')
+
+from app.data.job_store import get_job_store, reset_job_store
+from app.data.threads_manager import reset_store, touch_thread
+from app.data.transcript_store import reset_transcript_store
+from app.data.usage_store import reset_usage_store
+from app.decorators.log_decorator import logger
+from app.interfaces.interface_openai import RunTimeoutError, cancel_run, generate_response, reset_client, stream_response
+from app.services.assistant_config import reset_assistant_config
+from app.services.chat_dispatcher import ChatDispatcher, ServerBusyError
+from app.services.job_worker import JobWorker
+from app.services.message_routing_manager import check_if_thread_exists, get_or_create_thread
+from app.services.run_recovery import RunRecoverySweeper
+from app.services.thread_expiry import ThreadExpirySweeper
+from app.services.usage_accounting import BudgetExceededError, reset_usage_accounting
+from app.utils.metrics import TIMED_OUT_CHATS
+from app.utils.openia_config import JobConfig, ResilienceConfig, ServerConfig, ThreadStoreConfig, format_effective_config
+from app.utils.resilience import CircuitOpenError, reset_resilience
+
+"""
+Serviço HTTP de chat.
+
+Rotas:
+
+- `POST /chat`: recebe {"user_name": ..., "message": ...} e responde {"thread_id": ..., "reply": ...}.
+- `POST /chat/stream`: o mesmo pedido, com a resposta transmitida por Server-Sent Events: um evento "token" por
+  parte da resposta, e um evento final "done" (com a resposta completa) ou "error".
+- `WebSocket /chat/ws`: sessão persistente. A primeira mensagem, {"user_name": ...}, associa a sessão ao thread
+  do usuário (respondida com o evento "thread"); cada mensagem seguinte, {"message": ...}, é respondida com os
+  mesmos eventos do streaming ("token", "done" ou "error"), em JSON com a chave "event". Se o cliente desconecta
+  durante uma resposta, o run é cancelado em até `WS_DISCONNECT_POLL_SECONDS`, sem esperar a parte seguinte.
+  Sessões sem mensagens por `ServerConfig.WS_IDLE_TIMEOUT_SECONDS` são encerradas.
+- `POST /chat/cancel`: recebe {"user_name": ...} e cancela o run em andamento no thread do usuário; responde
+  {"thread_id": ..., "run_id": ..., "cancelled": true/false} (false se não havia run ativo).
+- `POST /jobs`: modo assíncrono. Recebe {"user_name": ..., "message": ..., "callback_url": ... (opcional)} e
+  responde 202 com {"job_id": ...} imediatamente; o run é executado por `JobWorker` em segundo plano.
+- `GET /jobs/<job_id>`: estado do job ("queued", "running", "succeeded" ou "failed"), resposta ou erro. Se houver
+  `callback_url`, o job concluído é enviado a ela por POST.
+- `GET /health` e `GET /metrics` (formato Prometheus).
+
+Em produção o serviço é servido pelo gunicorn com vários processos workers "gthread" (ver `gunicorn.conf.py`):
+
+    gunicorn --config gunicorn.conf.py run:app
+
+O processo mestre importa a aplicação e o SDK da OpenAI uma única vez (`preload_app` e `warm_up`) e cada worker,
+após o fork, recria o seu próprio estado (`reset_process_state`): clientes da OpenAI, armazenamentos e pools de
+threads.
+
+Cada processo executa no máximo `ServerConfig.MAX_CONCURRENT_CHATS` turnos simultâneos; acima disso responde 503
+com "Retry-After". Respostas que demoram mais que `ServerConfig.REQUEST_TIMEOUT_SECONDS` recebem 504, e runs que
+excedem `OpenAIAssistantConfig.RUN_TIMEOUT_SECONDS` são cancelados na API. Usuários que atingiram o orçamento de
+tokens (`app/services/usage_accounting.py`) recebem 429, com "Retry-After".
+Com o disjuntor das chamadas à API aberto (`app/utils/resilience.py`), os pedidos recebem 503 na hora, com
+"Retry-After".
+"""
+
 app = Flask(__name__)
+sock = Sock(app)
+
+dispatcher = ChatDispatcher(ServerConfig.MAX_CONCURRENT_CHATS)
+
+job_worker = None
+
+run_sweeper = None
+
+expiry_sweeper = None
+
+
+def warm_up():
+    """
+    Importa antecipadamente o SDK da OpenAI, que os módulos da aplicação só carregam no primeiro uso.
+
+    Chamada pelo gunicorn no processo mestre antes do fork (ver `gunicorn.conf.py`): os workers herdam o SDK já
+    importado, e a primeira conversa de cada worker não paga a importação. Nenhum cliente é criado aqui.
+    """
+    importlib.import_module("openai")
+
+
+def reset_process_state():
+    """
+    Recria, no processo atual, tudo o que não deve ser herdado do processo mestre após o fork: os clientes da
+    OpenAI (conexões HTTP), os armazenamentos (descritores de arquivo, bloqueios, conexões Redis e SQLite), o
+    consumo de tokens acumulado em memória, os disjuntores e o pool de cópias das leituras, a configuração
+    recarregável do assistente (relida pelo worker, que passa a publicar a sua própria versão) e o pool de turnos
+    de conversa.
+
+    Chamada pelo gunicorn em cada worker logo após o fork (ver `gunicorn.conf.py`).
+    """
+    global dispatcher, job_worker, run_sweeper, expiry_sweeper
+    reset_client()
+    reset_store()
+    reset_transcript_store()
+    reset_job_store()
+    reset_usage_store()
+    reset_usage_accounting()
+    reset_resilience()
+    reset_assistant_config()
+    dispatcher = ChatDispatcher(ServerConfig.MAX_CONCURRENT_CHATS)
+    job_worker = None
+    run_sweeper = None
+    expiry_sweeper = None
+
+
+def start_background_workers():
+    """
+    Inicia, no processo atual, o pool de threads que executa os jobs assíncronos (`JobConfig.WORKERS`), a
+    varredura de runs presos (`app/services/run_recovery.py`), cuja primeira passada libera os threads deixados com
+    runs ativos por um processo anterior, e a expiração de threads ociosos (`app/services/thread_expiry.py`), se
+    `ThreadStoreConfig.IDLE_TTL_SECONDS` > 0 (a cada intervalo, só um worker da implantação executa a varredura).
+
+    Chamada pelo gunicorn em cada worker já iniciado (ver `gunicorn.conf.py`) e pelo servidor de desenvolvimento.
+    """
+    global job_worker, run_sweeper, expiry_sweeper
+    if job_worker is None and JobConfig.WORKERS > 0:
+        job_worker = JobWorker().start()
+    if run_sweeper is None:
+        run_sweeper = RunRecoverySweeper().start()
+    if expiry_sweeper is None and ThreadStoreConfig.IDLE_TTL_SECONDS > 0:
+        expiry_sweeper = ThreadExpirySweeper().start()
+    return job_worker
+
+
+def stop_background_workers(timeout=None):
+    """
+    Para o pool de jobs assíncronos, aguardando os jobs em execução terminarem (até `timeout` segundos), e as
+    varreduras de runs presos e de threads ociosos.
+    """
+    if expiry_sweeper is not None:
+        expiry_sweeper.stop(timeout)
+    if run_sweeper is not None:
+        run_sweeper.stop(timeout)
+    if job_worker is not None:
+        job_worker.stop(timeout)
+
+
+def _chat_request():
+    payload = request.get_json(silent=True) or {}
+    user_name = str(payload.get("user_name") or "").strip()
+    message = str(payload.get("message") or "").strip()
+    if not user_name or not message:
+        return None, None, (jsonify(error="Informe 'user_name' e 'message'."), 400)
+    return user_name, message, None
+
+
+def _busy():
+    return jsonify(error="Servidor ocupado, tente novamente em instantes."), 503, {"Retry-After": "1"}
+
+
+def _over_budget(error):
+    return jsonify(error="Limite de uso atingido, tente novamente mais tarde."), 429, \
+        {"Retry-After": str(int(error.retry_after) + 1)}
+
+
+def _unavailable():
+    return jsonify(error="Serviço da OpenAI indisponível, tente novamente em instantes."), 503, \
+        {"Retry-After": str(int(ResilienceConfig.BREAKER_OPEN_SECONDS))}
+
+
+def _answer(user_name, message):
+    thread_id = get_or_create_thread(user_name)
+    return thread_id, generate_response(question_prompt=message, thread_id=thread_id, user_name=user_name)
+
+
+def _stream(user_name, message):
+    thread_id = get_or_create_thread(user_name)
+    yield {"thread_id": thread_id}
+    yield from stream_response(question_prompt=message, thread_id=thread_id, user_name=user_name)
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _ws_send(ws, event, **data):
+    ws.send(json.dumps({"event": event, **data}, ensure_ascii=False))
+
+
+def _ws_receive(ws, timeout):
+    # Retorna None se o tempo expirar; mensagens que não são objetos JSON viram um dicionário vazio.
+    data = ws.receive(timeout)
+    if data is None:
+        return None
+    try:
+        payload = json.loads(data)
+    except ValueError:
+        return {}
+    return payload if isinstance(payload, dict) else {}
+
+
+# Intervalo com que a conexão é verificada enquanto uma resposta é transmitida pelo WebSocket.
+WS_DISCONNECT_POLL_SECONDS = 0.2
+
+
+@contextmanager
+def _cancel_on_disconnect(ws, thread_id, user_name):
+    """
+    Vigia a conexão enquanto uma resposta é transmitida e, se o cliente desconectar, cancela o run remoto na hora.
+
+    Sem a vigia, a desconexão só seria percebida no envio da parte seguinte, que pode demorar até o fim do run. Se o
+    run ainda não foi criado, o cancelamento não encontra nada e o streaming é fechado no envio seguinte.
+    """
+    done = threading.Event()
+
+    def watch():
+        while not done.wait(WS_DISCONNECT_POLL_SECONDS):
+            if ws.connected:
+                continue
+            logger.info(f"{user_name} desconectou durante a resposta; cancelando o run.")
+            try:
+                cancel_run(thread_id)
+            except Exception as e:
+                logger.warning(f"Falha ao cancelar o run de {user_name} após a desconexão: {e}")
+            return
+
+    threading.Thread(target=watch, name="ws-disconnect-watch", daemon=True).start()
+    try:
+        yield
+    finally:
+        done.set()
+
 
 @app.route('/')
 def hello_world():
     return 'Hello, World!'
 
+
+@app.route('/health')
+def health():
+    return jsonify(status="ok")
+
+
+@app.route('/metrics')
+def metrics():
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        # Vários workers: agrega as métricas gravadas por todos os processos (ver gunicorn.conf.py).
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+    return Response(generate_latest(), mimetype=CONTENT_TYPE_LATEST)
+
+
+@app.route('/chat', methods=['POST'])
+def chat():
+    user_name, message, error = _chat_request()
+    if error:
+        return error
+    try:
+        future = dispatcher.submit(_answer, user_name, message)
+    except ServerBusyError:
+        return _busy()
+
+    try:
+        thread_id, reply = future.result(timeout=ServerConfig.REQUEST_TIMEOUT_SECONDS)
+    except (FutureTimeoutError, RunTimeoutError):
+        TIMED_OUT_CHATS.inc()
+        return jsonify(error="A resposta demorou demais; tente novamente."), 504
+    except BudgetExceededError as e:
+        return _over_budget(e)
+    except CircuitOpenError:
+        return _unavailable()
+    except Exception as e:
+        logger.error(f"Erro no chat de {user_name}: {e}")
+        return jsonify(error="Erro ao gerar a resposta."), 502
+    return jsonify(thread_id=thread_id, reply=reply)
+
+
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    user_name, message, error = _chat_request()
+    if error:
+        return error
+    try:
+        parts = dispatcher.stream(lambda: _stream(user_name, message), ServerConfig.REQUEST_TIMEOUT_SECONDS)
+    except ServerBusyError:
+        return _busy()
+
+    def events():
+        reply = []
+        try:
+            for part in parts:
+                if isinstance(part, dict):
+                    yield _sse("thread", part)
+                else:
+                    reply.append(part)
+                    yield _sse("token", {"text": part})
+            yield _sse("done", {"reply": "".join(reply)})
+        except TimeoutError:
+            TIMED_OUT_CHATS.inc()
+            yield _sse("error", {"error": "A resposta demorou demais; tente novamente."})
+        except BudgetExceededError:
+            yield _sse("error", {"error": "Limite de uso atingido, tente novamente mais tarde."})
+        except CircuitOpenError:
+            yield _sse("error", {"error": "Serviço da OpenAI indisponível, tente novamente em instantes."})
+        except Exception as e:
+            logger.error(f"Erro no chat de {user_name}: {e}")
+            yield _sse("error", {"error": "Erro ao gerar a resposta."})
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return Response(stream_with_context(events()), mimetype='text/event-stream', headers=headers)
+
+
+@app.route('/chat/cancel', methods=['POST'])
+def chat_cancel():
+    user_name = str((request.get_json(silent=True) or {}).get("user_name") or "").strip()
+    if not user_name:
+        return jsonify(error="Informe 'user_name'."), 400
+    thread_id = check_if_thread_exists(user_name)
+    if thread_id is None:
+        return jsonify(error="Usuário sem conversa."), 404
+    try:
+        run_id = cancel_run(thread_id)
+    except Exception as e:
+        logger.error(f"Erro ao cancelar o run de {user_name}: {e}")
+        return jsonify(error="Erro ao cancelar a resposta."), 502
+    return jsonify(thread_id=thread_id, run_id=run_id, cancelled=run_id is not None)
+
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    user_name, message, error = _chat_request()
+    if error:
+        return error
+    callback_url = (request.get_json(silent=True) or {}).get("callback_url")
+    if callback_url is not None and not str(callback_url).startswith(("http://", "https://")):
+        return jsonify(error="'callback_url' deve ser uma URL http(s)."), 400
+    job_id = get_job_store().submit(user_name, message, callback_url)
+    return jsonify(job_id=job_id, status="queued"), 202, {"Location": f"/jobs/{job_id}"}
+
+
+@app.route('/jobs/<job_id>')
+def get_job(job_id):
+    job = get_job_store().get(job_id)
+    if job is None:
+        return jsonify(error="Job não encontrado."), 404
+    return jsonify(job)
+
+
+@sock.route('/chat/ws')
+def chat_ws(ws):
+    hello = _ws_receive(ws, ServerConfig.WS_IDLE_TIMEOUT_SECONDS) or {}
+    user_name = str(hello.get("user_name") or "").strip()
+    if not user_name:
+        _ws_send(ws, "error", error="Informe 'user_name' na primeira mensagem.")
+        return
+
+    # A sessão é associada ao thread do usuário uma única vez.
+    thread_id = get_or_create_thread(user_name)
+    _ws_send(ws, "thread", thread_id=thread_id)
+
+    while True:
+        payload = _ws_receive(ws, ServerConfig.WS_IDLE_TIMEOUT_SECONDS)
+        if payload is None:
+            logger.info(f"Sessão de {user_name} encerrada por inatividade.")
+            return
+        message = str(payload.get("message") or "").strip()
+        if not message:
+            _ws_send(ws, "error", error="Informe 'message'.")
+            continue
+
+        touch_thread(user_name)
+        try:
+            parts = dispatcher.stream(
+                lambda message=message: stream_response(question_prompt=message, thread_id=thread_id, user_name=user_name),
+                ServerConfig.REQUEST_TIMEOUT_SECONDS,
+            )
+        except ServerBusyError:
+            _ws_send(ws, "error", error="Servidor ocupado, tente novamente em instantes.")
+            continue
+
+        reply = []
+        try:
+            with _cancel_on_disconnect(ws, thread_id, user_name):
+                for part in parts:
+                    reply.append(part)
+                    _ws_send(ws, "token", text=part)
+            _ws_send(ws, "done", reply="".join(reply))
+        except TimeoutError:
+            TIMED_OUT_CHATS.inc()
+            _ws_send(ws, "error", error="A resposta demorou demais; tente novamente.")
+        except BudgetExceededError:
+            _ws_send(ws, "error", error="Limite de uso atingido, tente novamente mais tarde.")
+        except CircuitOpenError:
+            _ws_send(ws, "error", error="Serviço da OpenAI indisponível, tente novamente em instantes.")
+        except ConnectionClosed:
+            raise
+        except Exception as e:
+            logger.error(f"Erro no chat de {user_name}: {e}")
+            _ws_send(ws, "error", error="Erro ao gerar a resposta.")
+        finally:
+            # Desconexão no meio da resposta: fecha o streaming, o que cancela o run remoto.
+            parts.close()
+
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000)
+    # Servidor de desenvolvimento; em produção use o gunicorn (ver gunicorn.conf.py).
+    logger.info(format_effective_config())
+    start_background_workers()
+    app.run(host='0.0.0.0', port=5000, threaded=True)
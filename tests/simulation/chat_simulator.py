@@ -1,8 +1,10 @@
+import argparse
 import sys
 sys.path.append('/workplace/')
 from cli.cli_layout import draw_chat_frame, prompt_user_name, prompt_message, display_response
 from app.services.message_routing_manager import get_or_create_thread
 from app.interfaces.interface_openai import generate_response
+from tests.simulation.load_driver import format_report, local_stand_in, parse_script, run_load
 
 # Variáveis globais
 THREAD_ID = None
@@ -25,5 +27,33 @@ def chat():
 
         display_response(response)
 
+def load(args):
+    # Modo de carga: conversas roteirizadas com muitos usuários simultâneos (ver tests/simulation/load_driver.py).
+    with open(args.roteiro, encoding="utf-8") as script:
+        conversations = parse_script(script)
+
+    if args.local is not None:
+        get_thread, respond = local_stand_in(latency_seconds=args.local, error_rate=args.erros_local)
+    else:
+        get_thread, respond = get_or_create_thread, generate_response
+
+    recorder = run_load(conversations, get_thread, respond, repeat=args.usuarios, concurrency=args.concorrencia,
+                        ramp_seconds=args.rampa, think_scale=args.pausas)
+    print(format_report(recorder.summary()))
+
 if __name__ == '__main__':
-    chat()
+    parser = argparse.ArgumentParser(description="Simulador de chat interativo ou, com --roteiro, gerador de carga.")
+    parser.add_argument("--roteiro", help="Arquivo JSONL com as conversas a executar (modo de carga).")
+    parser.add_argument("--usuarios", type=int, default=1, help="Usuários por conversa do roteiro (padrão: 1).")
+    parser.add_argument("--concorrencia", type=int, help="Máximo de usuários simultâneos (padrão: todos).")
+    parser.add_argument("--rampa", type=float, default=0.0, help="Segundos para iniciar todos os usuários.")
+    parser.add_argument("--pausas", type=float, default=1.0, help="Multiplicador das pausas do roteiro.")
+    parser.add_argument("--local", type=float, metavar="SEGUNDOS",
+                        help="Usa substitutos locais da API com esta latência média, em vez da API.")
+    parser.add_argument("--erros-local", type=float, default=0.0, help="Fração de falhas dos substitutos locais.")
+    args = parser.parse_args()
+
+    if args.roteiro:
+        load(args)
+    else:
+        chat()
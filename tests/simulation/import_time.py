@@ -0,0 +1,92 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# Define explicitamente o diretório raiz do projeto
+sys.path.append('/workplace/')
+
+"""
+Relatório de tempo de importação (partida a frio) de cada ponto de entrada do projeto.
+
+Cada módulo é importado em um processo Python novo com `-X importtime`, várias vezes; o relatório mostra a mediana
+e o mínimo do tempo acumulado da importação, se o SDK da OpenAI foi carregado e as dependências mais pesadas.
+Serve para verificar que ferramentas que não conversam com a API (threads, CLI) não pagam a importação do SDK,
+e para acompanhar regressões no tempo de partida dos workers.
+
+Uso:
+
+    python tests/simulation/import_time.py
+    python tests/simulation/import_time.py --repeat 10 --top 5 app.data.threads_manager run
+"""
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+ENTRY_POINTS = [
+    "app.utils.openia_config",
+    "app.data.threads_manager",
+    "app.interfaces.interface_openai",
+    "app.services.message_routing_manager",
+    "tests.simulation.chat_simulator",
+    "run",
+]
+
+
+def parse_importtime(stderr: str) -> dict:
+    """
+    Lê a saída de `-X importtime` e retorna o tempo acumulado (em segundos) de cada módulo.
+
+    Parâmetros:
+        stderr (str): A saída de erro do processo.
+
+    Retorna:
+        dict: {nome do módulo: tempo acumulado em segundos}.
+    """
+    cumulative = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        cumulative[name.strip()] = int(cumulative_us) / 1e6
+    return cumulative
+
+
+def measure(module: str) -> dict:
+    """
+    Importa `module` em um processo novo e retorna os tempos acumulados de todas as importações.
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=ROOT, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Falha ao importar {module}:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+def report(modules, repeat=5, top=3):
+    """
+    Mede cada módulo `repeat` vezes e imprime o relatório.
+    """
+    baseline = set(measure("sys"))  # Importações da inicialização do interpretador (site, encodings...).
+    print(f"{'ponto de entrada':40} {'mediana':>9} {'mínimo':>9}  openai  mais pesados")
+    for module in modules:
+        runs = [measure(module) for _ in range(repeat)]
+        totals = [run[module] for run in runs]
+        last = runs[-1]
+        # Pacotes de nível superior importados pelo módulo, fora os do próprio projeto.
+        packages = [name for name in last
+                    if "." not in name and name not in baseline and name not in (module, "app", "cli", "tests")]
+        heaviest = sorted(packages, key=last.get, reverse=True)[:top]
+        details = ", ".join(f"{name} {last[name] * 1000:.0f}ms" for name in heaviest)
+        print(f"{module:40} {statistics.median(totals) * 1000:>7.0f}ms {min(totals) * 1000:>7.0f}ms"
+              f"  {'sim' if 'openai' in last else 'não':6}  {details}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Tempo de importação dos pontos de entrada do projeto.")
+    parser.add_argument("modules", nargs="*", default=ENTRY_POINTS, help="Módulos a medir (padrão: todos).")
+    parser.add_argument("--repeat", type=int, default=5, help="Processos por módulo (padrão: 5).")
+    parser.add_argument("--top", type=int, default=3, help="Dependências mais pesadas listadas (padrão: 3).")
+    args = parser.parse_args()
+    report(args.modules, repeat=args.repeat, top=args.top)
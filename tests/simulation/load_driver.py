@@ -0,0 +1,253 @@
+import json
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Define explicitamente o diretório raiz do projeto
+sys.path.append('/workplace/')
+
+"""
+Gerador de carga com conversas roteirizadas.
+
+Modo de carga do simulador de chat (`chat_simulator.py --roteiro`): em vez de uma pessoa ao teclado, executa
+conversas descritas em um arquivo JSONL com muitos usuários simulados ao mesmo tempo, pelo mesmo caminho do
+simulador (`get_or_create_thread` e `generate_response`), e relata vazão, latência (p50/p95/p99) e taxa de erros.
+
+Cada linha do roteiro é uma conversa:
+
+    {"user": "Alice", "messages": ["Oi", {"text": "Qual é o horário?", "think_time": 5}], "think_time": 2, "phase": "pico"}
+
+- **user:** o nome do usuário; com `repeat` > 1 cada cópia recebe um sufixo ("Alice#1", "Alice#2"...), um usuário
+  (e um thread) por cópia.
+- **messages:** as mensagens, em ordem; cada uma é um texto ou um objeto com "text" e, opcionalmente, "think_time".
+- **think_time:** a pausa, em segundos, entre receber uma resposta e enviar a mensagem seguinte (padrão: 0).
+- **phase:** o nome da fase da carga ("aquecimento", "pico"...), usado para agrupar o relatório (padrão: "carga").
+
+O relatório é agrupado por fase e por etapa: "thread" (`get_or_create_thread`) e "resposta" (`generate_response`).
+
+Sem a API, `local_stand_in` fornece substitutos locais das duas funções, com latência simulada, para exercitar o
+próprio gerador e a concorrência local.
+"""
+
+DEFAULT_PHASE = "carga"
+OPERATIONS = ("thread", "resposta")
+
+
+class Conversation:
+    """
+    Uma conversa roteirizada.
+
+    Atributos:
+        user (str): O nome do usuário.
+        messages (list[tuple[str, float]]): As mensagens e a pausa antes de cada uma.
+        phase (str): A fase da carga.
+    """
+
+    __slots__ = ("user", "messages", "phase")
+
+    def __init__(self, user, messages, phase=DEFAULT_PHASE):
+        self.user = user
+        self.messages = messages
+        self.phase = phase
+
+
+def parse_script(lines) -> list:
+    """
+    Lê as conversas de um roteiro JSONL.
+
+    Parâmetros:
+        lines (Iterable[str]): As linhas do roteiro; linhas vazias são ignoradas.
+
+    Retorna:
+        list[Conversation]: As conversas, na ordem.
+
+    Exceções:
+        ValueError: Se uma linha não for uma conversa válida (o número da linha é informado).
+    """
+    conversations = []
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            entry = json.loads(line)
+            user = str(entry["user"]).strip()
+            think_time = float(entry.get("think_time", 0))
+            messages = []
+            for message in entry["messages"]:
+                if isinstance(message, str):
+                    message = {"text": message}
+                messages.append((str(message["text"]), float(message.get("think_time", think_time))))
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            raise ValueError(f"Linha {number} do roteiro inválida: {e!r}") from None
+        if not user or not messages:
+            raise ValueError(f"Linha {number} do roteiro inválida: informe 'user' e ao menos uma mensagem.")
+        conversations.append(Conversation(user, messages, str(entry.get("phase") or DEFAULT_PHASE)))
+    return conversations
+
+
+def percentile(values, p) -> float:
+    """
+    Retorna o percentil `p` (0-100) de `values` pelo método do posto mais próximo.
+    """
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(1, -(-len(ordered) * p // 100))  # Teto de len * p / 100.
+    return ordered[int(rank) - 1]
+
+
+class LoadRecorder:
+    """
+    Registra, de várias threads, a duração e o resultado de cada operação.
+    """
+
+    def __init__(self):
+        self._guard = threading.Lock()
+        self.samples = []  # (fase, etapa, início, fim, ok)
+
+    def record(self, phase, operation, started_at, finished_at, ok):
+        with self._guard:
+            self.samples.append((phase, operation, started_at, finished_at, ok))
+
+    def summary(self) -> list:
+        """
+        Retorna uma linha de relatório por fase e etapa, na ordem em que as fases começaram.
+
+        Retorna:
+            list[dict]: phase, operation, count, errors, error_rate, throughput (operações concluídas por segundo
+                        na janela da fase), p50_ms, p95_ms, p99_ms (das operações bem-sucedidas).
+        """
+        with self._guard:
+            samples = list(self.samples)
+        phases = {}
+        for phase, _, started_at, finished_at, _ in samples:
+            window = phases.setdefault(phase, [started_at, finished_at])
+            window[0], window[1] = min(window[0], started_at), max(window[1], finished_at)
+
+        rows = []
+        for phase, (start, end) in sorted(phases.items(), key=lambda item: item[1][0]):
+            for operation in OPERATIONS:
+                selected = [s for s in samples if s[0] == phase and s[1] == operation]
+                if not selected:
+                    continue
+                latencies = [(s[3] - s[2]) * 1000 for s in selected if s[4]]
+                errors = sum(1 for s in selected if not s[4])
+                rows.append({
+                    "phase": phase,
+                    "operation": operation,
+                    "count": len(selected),
+                    "errors": errors,
+                    "error_rate": errors / len(selected),
+                    "throughput": len(latencies) / max(end - start, 1e-9),
+                    "p50_ms": percentile(latencies, 50),
+                    "p95_ms": percentile(latencies, 95),
+                    "p99_ms": percentile(latencies, 99),
+                })
+        return rows
+
+
+def _simulate_user(conversation, user, get_thread, respond, recorder, think_scale, start_delay):
+    time.sleep(start_delay)
+    started_at = time.monotonic()
+    try:
+        thread_id = get_thread(user)
+    except Exception:
+        recorder.record(conversation.phase, "thread", started_at, time.monotonic(), False)
+        return
+    recorder.record(conversation.phase, "thread", started_at, time.monotonic(), True)
+
+    for index, (text, think_time) in enumerate(conversation.messages):
+        if index:
+            time.sleep(think_time * think_scale)
+        started_at = time.monotonic()
+        try:
+            respond(question_prompt=text, thread_id=thread_id, user_name=user)
+            ok = True
+        except Exception:
+            ok = False
+        recorder.record(conversation.phase, "resposta", started_at, time.monotonic(), ok)
+
+
+def run_load(conversations, get_thread, respond, repeat=1, concurrency=None, ramp_seconds=0.0, think_scale=1.0):
+    """
+    Executa as conversas com usuários simulados em paralelo e retorna o registro das operações.
+
+    Parâmetros:
+        conversations (list[Conversation]): O roteiro.
+        get_thread (Callable[[str], str]): Obtém o thread do usuário (`get_or_create_thread`).
+        respond (Callable[..., str]): Gera a resposta (`generate_response`), chamada com question_prompt,
+                                      thread_id e user_name.
+        repeat (int): Quantos usuários executam cada conversa.
+        concurrency (int, optional): O número máximo de usuários simultâneos. Padrão: todos.
+        ramp_seconds (float): Os usuários começam distribuídos uniformemente neste intervalo (com `concurrency`,
+                              a espera ocupa a vaga do usuário).
+        think_scale (float): Multiplica as pausas do roteiro (0 as elimina).
+
+    Retorna:
+        LoadRecorder: As operações registradas; ver `LoadRecorder.summary`.
+
+    Exemplo de Uso:
+        with open("roteiro.jsonl") as f:
+            recorder = run_load(parse_script(f), get_or_create_thread, generate_response, repeat=100)
+        print(format_report(recorder.summary()))
+    """
+    users = [(conversation, f"{conversation.user}#{copy}" if repeat > 1 else conversation.user)
+             for conversation in conversations for copy in range(1, repeat + 1)]
+    recorder = LoadRecorder()
+    if not users:
+        return recorder
+    step = ramp_seconds / len(users)
+    with ThreadPoolExecutor(max_workers=concurrency or len(users), thread_name_prefix="usuario") as executor:
+        futures = [
+            executor.submit(_simulate_user, conversation, user, get_thread, respond, recorder, think_scale,
+                            index * step)
+            for index, (conversation, user) in enumerate(users)
+        ]
+        for future in futures:
+            future.result()
+    return recorder
+
+
+def format_report(rows) -> str:
+    """
+    Formata as linhas de `LoadRecorder.summary` como uma tabela de texto.
+    """
+    lines = [f"{'fase':16} {'etapa':9} {'total':>6} {'erros':>6} {'%erro':>6} {'ops/s':>8} "
+             f"{'p50':>9} {'p95':>9} {'p99':>9}"]
+    for row in rows:
+        lines.append(f"{row['phase']:16} {row['operation']:9} {row['count']:>6} {row['errors']:>6} "
+                     f"{row['error_rate'] * 100:>5.1f}% {row['throughput']:>8.2f} "
+                     f"{row['p50_ms']:>7.0f}ms {row['p95_ms']:>7.0f}ms {row['p99_ms']:>7.0f}ms")
+    return "\n".join(lines)
+
+
+def local_stand_in(latency_seconds=0.5, error_rate=0.0, seed=None):
+    """
+    Cria substitutos locais de `get_or_create_thread` e `generate_response`, sem chamadas à API.
+
+    Parâmetros:
+        latency_seconds (float): A latência média de cada resposta (uniforme entre 50% e 150% deste valor).
+        error_rate (float): A fração das respostas que falham.
+        seed (int, optional): A semente do gerador de números aleatórios.
+
+    Retorna:
+        tuple[Callable, Callable]: (get_thread, respond).
+    """
+    rng = random.Random(seed)
+    guard = threading.Lock()
+
+    def get_thread(user_name):
+        return f"thread_local_{user_name}"
+
+    def respond(question_prompt, thread_id, user_name):
+        with guard:
+            delay = latency_seconds * rng.uniform(0.5, 1.5)
+            fails = rng.random() < error_rate
+        time.sleep(delay)
+        if fails:
+            raise RuntimeError("falha simulada")
+        return f"Resposta para {user_name}: {question_prompt}"
+
+    return get_thread, respond
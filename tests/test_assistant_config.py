@@ -0,0 +1,107 @@
+import unittest
+import json
+import os
+import shutil
+import tempfile
+from types import SimpleNamespace
+from unittest import mock
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+from app.data import threads_manager
+from app.interfaces import interface_openai
+from app.interfaces.client_pool import ClientPool
+from app.services import assistant_config
+from app.services.assistant_config import AssistantConfigSource
+from app.utils.metrics import ASSISTANT_CONFIG_VERSION
+from app.utils.openia_config import OpenAIAssistantConfig, TranscriptConfig
+
+
+class TestAssistantConfigSource(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'assistant.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _write(self, content):
+        with open(self.path, "w") as file:
+            file.write(content if isinstance(content, str) else json.dumps(content))
+
+    def test_defaults_without_file(self):
+        settings = AssistantConfigSource(self.path).current()
+        self.assertEqual((settings.version, settings.assistant_id), (1, OpenAIAssistantConfig.AI_ASSISTANT_ID))
+        self.assertEqual(settings.run_overrides(), {})
+
+    def test_changed_file_is_swapped_in(self):
+        self._write({"instructions": "Seja breve."})
+        source = AssistantConfigSource(self.path, poll_seconds=0)
+        first = source.current()
+        self.assertEqual(first.run_overrides(), {"instructions": "Seja breve."})
+
+        self._write({"instructions": "Seja detalhado.", "model": "gpt-4"})
+        second = source.current()
+        self.assertEqual((second.version, second.model), (2, "gpt-4"))
+        self.assertEqual(ASSISTANT_CONFIG_VERSION._value.get(), 2)
+        # A versão anterior, ainda em uso por um turno em andamento, não muda.
+        self.assertEqual(first.instructions, "Seja breve.")
+        with self.assertRaises(AttributeError):
+            first.instructions = "outra"
+
+    def test_invalid_file_keeps_current_version(self):
+        self._write({"tools": [{"type": "retrieval"}]})
+        source = AssistantConfigSource(self.path, poll_seconds=0)
+        self._write({"tools": "retrieval", "extra": 1})
+        self.assertEqual(source.current().version, 1)
+        self._write('{"model": ')
+        self.assertEqual(source.current().tools, ({"type": "retrieval"},))
+
+
+class TestReloadDuringTurn(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'assistant.json')
+        with open(self.path, "w") as file:
+            json.dump({"instructions": "v1"}, file)
+        self.client = mock.MagicMock()
+        self.client.beta.threads.runs.create.side_effect = self._create_run
+        self.client.beta.threads.messages.list.return_value = SimpleNamespace(
+            data=[SimpleNamespace(content=[SimpleNamespace(text=SimpleNamespace(value="Resposta"))])])
+        pool = ClientPool([{"name": "a", "api_key": "sk-a"}], client_factory=lambda entry: self.client)
+        db_path = os.path.join(self.tmp_dir, 'threads')
+        self.patches = [
+            mock.patch.object(threads_manager, "DB_PATH", db_path),
+            mock.patch.object(threads_manager, "LOCK_PATH", db_path + '.lock'),
+            mock.patch.object(threads_manager, "_lock_file", None),
+            mock.patch.dict(threads_manager._slot_locks, clear=True),
+            mock.patch.object(assistant_config, "_source", AssistantConfigSource(self.path, poll_seconds=0)),
+            mock.patch.object(interface_openai, "get_client_pool", return_value=pool),
+            mock.patch.object(interface_openai, "client_key_for_thread", return_value="a"),
+            mock.patch.object(TranscriptConfig, "ENABLED", False),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in reversed(self.patches):
+            patch.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def _create_run(self, thread_id, assistant_id, **options):
+        # A configuração muda enquanto o primeiro run está em andamento.
+        with open(self.path, "w") as file:
+            json.dump({"instructions": "v2, com texto mais longo"}, file)
+        return SimpleNamespace(id="run_1", status="completed", usage=None)
+
+    def test_in_flight_turn_finishes_on_old_version(self):
+        interface_openai.generate_response("Oi", thread_id="thread_1", assistant_id="asst_a")
+        interface_openai.generate_response("Oi", thread_id="thread_1", assistant_id="asst_a")
+
+        first, second = [call.kwargs for call in self.client.beta.threads.runs.create.call_args_list]
+        self.assertEqual((first["instructions"], first["metadata"]), ("v1", {"config_version": "1"}))
+        self.assertEqual((second["instructions"], second["metadata"]), ("v2, com texto mais longo", {"config_version": "2"}))
+
+
+if __name__ == '__main__':
+    unittest.main()
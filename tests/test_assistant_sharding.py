@@ -0,0 +1,81 @@
+import unittest
+import json
+import os
+import shutil
+import tempfile
+from collections import Counter
+from types import SimpleNamespace
+from unittest import mock
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+from app.data import threads_manager
+from app.services import assistant_config, assistant_sharding, message_routing_manager
+from app.services.assistant_config import AssistantConfigSource
+from app.services.assistant_sharding import ConsistentHashRing
+
+
+class TestConsistentHashRing(unittest.TestCase):
+    def test_distribution_is_balanced(self):
+        ring = ConsistentHashRing(["asst_a", "asst_b", "asst_c"])
+        counts = Counter(ring.node_for(f"user_{i}") for i in range(3000))
+        self.assertEqual(set(counts), {"asst_a", "asst_b", "asst_c"})
+        for count in counts.values():
+            self.assertGreater(count, 700)
+
+    def test_adding_node_moves_only_its_share(self):
+        users = [f"user_{i}" for i in range(3000)]
+        before = ConsistentHashRing(["asst_a", "asst_b", "asst_c"])
+        after = ConsistentHashRing(["asst_a", "asst_b", "asst_c", "asst_d"])
+        moved = [user for user in users if before.node_for(user) != after.node_for(user)]
+        self.assertTrue(all(after.node_for(user) == "asst_d" for user in moved))
+        self.assertLess(len(moved), len(users) * 0.35)
+
+
+class TestAssistantAssignment(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        db_path = os.path.join(self.tmp_dir, 'threads')
+        self.config_path = os.path.join(self.tmp_dir, 'assistant.json')
+        self._write_config(["asst_a", "asst_b"])
+        self.patches = [
+            mock.patch.object(threads_manager, "DB_PATH", db_path),
+            mock.patch.object(threads_manager, "LOCK_PATH", db_path + '.lock'),
+            mock.patch.object(threads_manager, "_lock_file", None),
+            mock.patch.dict(threads_manager._slot_locks, clear=True),
+            mock.patch.dict(threads_manager._pending_activity, clear=True),
+            mock.patch.dict(assistant_sharding._thread_assistants, clear=True),
+            mock.patch.object(assistant_config, "_source", AssistantConfigSource(self.config_path, poll_seconds=0)),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in reversed(self.patches):
+            patch.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def _write_config(self, assistant_ids):
+        with open(self.config_path, "w") as file:
+            json.dump({"assistant_id": "asst_padrao", "assistant_ids": assistant_ids}, file)
+
+    def test_new_thread_keeps_its_assistant(self):
+        with mock.patch.object(message_routing_manager, "create_thread", return_value=SimpleNamespace(id="thread_1")):
+            thread_id = message_routing_manager.get_or_create_thread("Cícero")
+
+        assigned = assistant_sharding.assign_assistant("Cícero")
+        self.assertEqual(threads_manager.retrieve_thread_metadata(thread_id), {"assistant_id": assigned})
+
+        # Mudanças posteriores na lista não afetam o thread já atribuído.
+        self._write_config(["asst_z"])
+        self.assertEqual(assistant_sharding.assign_assistant("Cícero"), "asst_z")
+        self.assertEqual(assistant_sharding.assistant_for_thread(thread_id, "Cícero"), assigned)
+
+    def test_legacy_thread_falls_back_to_ring_or_default(self):
+        self.assertEqual(assistant_sharding.assistant_for_thread("thread_antigo", "Cícero"),
+                         assistant_sharding.assign_assistant("Cícero"))
+        self.assertEqual(assistant_sharding.assistant_for_thread("thread_antigo"), "asst_padrao")
+
+
+if __name__ == '__main__':
+    unittest.main()
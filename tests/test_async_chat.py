@@ -0,0 +1,123 @@
+import unittest
+import asyncio
+import io
+import threading
+import time
+from unittest import mock
+
+from cli.async_chat import AsyncChat
+
+
+def scripted_reader(*steps):
+    # Cada passo é uma linha digitada ou um threading.Event aguardado antes das linhas seguintes.
+    def reader(loop, inputs):
+        for step in steps:
+            if isinstance(step, threading.Event):
+                step.wait(5)
+            else:
+                loop.call_soon_threadsafe(inputs.put_nowait, step)
+        loop.call_soon_threadsafe(inputs.put_nowait, None)
+    return reader
+
+
+class TestAsyncChat(unittest.TestCase):
+    def test_streams_reply_and_queues_messages_typed_during_a_turn(self):
+        first_part_sent = threading.Event()
+
+        def stream(message, on_status):
+            on_status("queued")
+            yield f"Re: {message}"
+            if message == "Oi":
+                # A segunda mensagem é digitada enquanto a primeira resposta ainda está chegando.
+                first_part_sent.set()
+                deadline = time.monotonic() + 5
+                while not session.pending and time.monotonic() < deadline:
+                    time.sleep(0.01)
+            on_status("completed")
+            yield "!"
+
+        out = io.StringIO()
+        session = AsyncChat("Alice", "thread_1", stream=stream, out=out,
+                            reader=scripted_reader("Oi", first_part_sent, "Tudo bem?"))
+        turns = asyncio.run(session.run())
+
+        self.assertEqual([turn.message for turn in turns], ["Oi", "Tudo bem?"])
+        self.assertEqual(["".join(turn.parts) for turn in turns], ["Re: Oi!", "Re: Tudo bem?!"])
+        self.assertEqual([turn.outcome for turn in turns], ["concluída", "concluída"])
+        self.assertTrue(all(turn.status == "completed" for turn in turns))
+        self.assertTrue(all(turn.time_to_first_part() <= turn.elapsed() for turn in turns))
+        self.assertIn("Re: Oi", out.getvalue())
+        self.assertIn("primeiro trecho em", out.getvalue())
+
+    def test_cancel_command_closes_the_stream(self):
+        started = threading.Event()
+        closed = threading.Event()
+        cancelled = threading.Event()
+
+        def stream(message, on_status):
+            try:
+                started.set()
+                while True:
+                    yield "."
+                    threading.Event().wait(0.02)
+            finally:
+                closed.set()
+
+        cancel = mock.Mock(side_effect=lambda thread_id: cancelled.set())
+        turns = asyncio.run(AsyncChat("Alice", "thread_1", stream=stream, out=io.StringIO(), cancel=cancel,
+                                      reader=scripted_reader("Oi", started, "/cancelar")).run())
+
+        self.assertEqual(turns[0].outcome, "cancelada")
+        self.assertTrue(closed.wait(5))
+        self.assertTrue(cancelled.wait(5))
+        cancel.assert_called_once_with("thread_1")
+
+    def test_cancel_reaches_the_api_before_the_next_part(self):
+        started = threading.Event()
+        cancelled = threading.Event()
+
+        def stream(message, on_status):
+            started.set()
+            # Nenhum trecho até o run ser cancelado na API.
+            self.assertTrue(cancelled.wait(5))
+            yield "tarde demais"
+
+        turns = asyncio.run(AsyncChat("Alice", "thread_1", stream=stream, out=io.StringIO(),
+                                      cancel=lambda thread_id: cancelled.set(),
+                                      reader=scripted_reader("Oi", started, "/cancelar")).run())
+
+        self.assertEqual([(turn.outcome, turn.parts) for turn in turns], [("cancelada", [])])
+
+    def test_stream_error_is_reported_and_session_continues(self):
+        def stream(message, on_status):
+            if message == "falha":
+                raise RuntimeError("run terminou com status failed")
+            yield "ok"
+
+        out = io.StringIO()
+        turns = asyncio.run(AsyncChat("Alice", "thread_1", stream=stream, out=out,
+                                      reader=scripted_reader("falha", "Oi")).run())
+
+        self.assertEqual([turn.outcome for turn in turns], ["erro", "concluída"])
+        self.assertIn("run terminou com status failed", out.getvalue())
+
+    def test_exit_command_cancels_the_turn_and_ends_the_session(self):
+        started = threading.Event()
+
+        def stream(message, on_status):
+            started.set()
+            threading.Event().wait(0.5)
+            yield "tarde demais"
+
+        cancelled = threading.Event()
+        cancel = mock.Mock(side_effect=lambda thread_id: cancelled.set())
+        turns = asyncio.run(AsyncChat("Alice", "thread_1", stream=stream, out=io.StringIO(), cancel=cancel,
+                                      reader=scripted_reader("Oi", started, "/sair", "ignorada")).run())
+
+        self.assertEqual([(turn.message, turn.outcome, turn.parts) for turn in turns], [("Oi", "cancelada", [])])
+        self.assertTrue(cancelled.wait(5))
+        cancel.assert_called_once_with("thread_1")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import unittest
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from types import SimpleNamespace
+from unittest import mock
+
+import httpx
+import openai
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+from app.data import threads_manager
+from app.interfaces import client_pool, interface_openai
+from app.interfaces.client_pool import ClientPool
+
+
+def _fake_client(entry):
+    client = mock.MagicMock(name=entry["name"])
+    client.beta.threads.create.return_value = SimpleNamespace(id=f"thread_{entry['name']}")
+    return client
+
+
+def _rate_limit_error(retry_after=None):
+    headers = {"retry-after": retry_after} if retry_after else {}
+    response = httpx.Response(429, headers=headers, request=httpx.Request("POST", "https://api.openai.com/v1/threads"))
+    return openai.RateLimitError("Limite de uso atingido", response=response, body=None)
+
+
+class TestClientPool(unittest.TestCase):
+    def _pool(self, **kwargs):
+        entries = [{"name": "a", "api_key": "sk-a"}, {"name": "b", "api_key": "sk-b", "weight": 2}]
+        return ClientPool(entries, client_factory=_fake_client, **kwargs)
+
+    def test_least_loaded_respects_weight(self):
+        pool = self._pool()
+        with pool.acquire() as first, pool.acquire() as second, pool.acquire() as third:
+            self.assertEqual([first.name, second.name, third.name], ["b", "a", "b"])
+
+    def test_rate_limited_key_cools_down(self):
+        pool = self._pool()
+        with self.assertRaises(openai.RateLimitError):
+            with pool.acquire("b"):
+                raise _rate_limit_error(retry_after="120")
+
+        health = {entry["name"]: entry for entry in pool.health()}
+        self.assertGreater(health["b"]["cooldown_remaining_s"], 100)
+        with pool.acquire() as pooled:
+            self.assertEqual(pooled.name, "a")
+        # A afinidade continua valendo para a chave em pausa.
+        with pool.acquire("b") as pooled:
+            self.assertEqual(pooled.name, "b")
+
+    def test_request_errors_do_not_affect_health(self):
+        pool = self._pool()
+        with self.assertRaises(ValueError):
+            with pool.acquire("a"):
+                raise ValueError("erro da aplicação")
+        self.assertEqual(pool.health()[0]["failures"], 0)
+
+
+class TestThreadAffinity(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        db_path = os.path.join(self.tmp_dir, 'threads')
+        pool = ClientPool([{"name": "a", "api_key": "sk-a"}, {"name": "b", "api_key": "sk-b"}],
+                          client_factory=_fake_client)
+        self.patches = [
+            mock.patch.object(threads_manager, "DB_PATH", db_path),
+            mock.patch.object(threads_manager, "LOCK_PATH", db_path + '.lock'),
+            mock.patch.object(threads_manager, "_lock_file", None),
+            mock.patch.dict(threads_manager._slot_locks, clear=True),
+            mock.patch.dict(client_pool._thread_keys, clear=True),
+            mock.patch.object(client_pool, "_pool", pool),
+        ]
+        for patch in self.patches:
+            patch.start()
+        self.pool = pool
+
+    def tearDown(self):
+        for patch in reversed(self.patches):
+            patch.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_thread_operations_use_creating_key(self):
+        with self.pool.acquire("a"):
+            thread = interface_openai.create_thread()  # "a" ocupada: cria em "b"
+
+        self.assertEqual(thread.id, "thread_b")
+        self.assertEqual(threads_manager.retrieve_thread_metadata("thread_b"), {"client_key": "b"})
+        interface_openai.retrieve_thread("thread_b")
+        self.pool.get("b").client.beta.threads.retrieve.assert_called_once_with("thread_b")
+        self.pool.get("a").client.beta.threads.retrieve.assert_not_called()
+
+    def test_legacy_thread_uses_default_key(self):
+        self.assertEqual(client_pool.client_key_for_thread("thread_antigo"), "a")
+
+
+class TestLazyImports(unittest.TestCase):
+    def test_sdk_and_env_load_on_first_use(self):
+        script = (
+            "import sys\n"
+            "from app.interfaces import interface_openai\n"
+            "print('openai' in sys.modules, 'dotenv' in sys.modules)\n"
+            "interface_openai.client\n"
+            "print('openai' in sys.modules, 'dotenv' in sys.modules)\n"
+        )
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        result = subprocess.run([sys.executable, "-c", script], cwd=root, capture_output=True, text=True,
+                                env=dict(os.environ, PYTHONPATH=root), check=True)
+        self.assertEqual(result.stdout.split(), ["False", "False", "True", "True"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+from app.utils.config_profiles import build_config, describe_config
+from app.utils.openia_config import ConfigurationError
+
+
+class TestConfigProfiles(unittest.TestCase):
+    def test_profile_then_environment_override_defaults(self):
+        config = build_config("dev", {"SERVER_THREADS": "12", "TRANSCRIPTS_ENABLED": "false"})
+        self.assertEqual((config.server.WORKERS, config.server.THREADS), (1, 12))
+        self.assertFalse(config.transcripts.ENABLED)
+        self.assertEqual(build_config("prod", {}).server.THREADS, 32)
+
+        sources = {row["env"]: row["source"] for row in describe_config(config, {"SERVER_THREADS": "12"})}
+        self.assertEqual((sources["SERVER_THREADS"], sources["SERVER_WORKERS"], sources["SERVER_BIND"]),
+                         ("env", "profile", "default"))
+
+    def test_derived_defaults_and_list_parsing(self):
+        config = build_config("prod", {"OPENAI_API_KEY": "sk-chave-secreta-1234", "ASSISTANT_ID": "asst_x"})
+        self.assertEqual(config.assistant.AI_ASSISTANT_IDS, ["asst_x"])
+        self.assertEqual(config.client_pool.API_KEYS[0].api_key, "sk-chave-secreta-1234")
+
+        config = build_config("prod", {"ASSISTANT_IDS": "asst_a, asst_b",
+                                       "OPENAI_API_KEYS": '[{"name": "a", "api_key": "sk-a", "weight": 2}]'})
+        self.assertEqual(config.assistant.AI_ASSISTANT_IDS, ["asst_a", "asst_b"])
+        self.assertEqual(config.client_pool.API_KEYS[0].weight, 2)
+
+    def test_invalid_values_are_reported_together(self):
+        with self.assertRaises(ConfigurationError) as raised:
+            build_config("prod", {"SERVER_WORKERS": "0", "THREAD_STORE_BACKEND": "mongo", "JOB_LEASE_SECONDS": "x"})
+        message = str(raised.exception)
+        for variable in ("SERVER_WORKERS", "THREAD_STORE_BACKEND", "JOB_LEASE_SECONDS"):
+            self.assertIn(variable, message)
+        with self.assertRaises(ConfigurationError):
+            build_config("qa", {})
+
+    def test_incoherent_combinations_fail_at_startup(self):
+        with self.assertRaises(ConfigurationError) as raised:
+            build_config("prod", {"RUN_TIMEOUT_SECONDS": "120", "REQUEST_TIMEOUT_SECONDS": "120"})
+        self.assertIn("RUN_TIMEOUT_SECONDS (120) deve ser menor que REQUEST_TIMEOUT_SECONDS (120)",
+                      str(raised.exception))
+        with self.assertRaises(ConfigurationError) as raised:
+            build_config("dev", {"CLIENT_POOL_COOLDOWN_SECONDS": "90"})
+        self.assertIn("CLIENT_POOL_MAX_COOLDOWN_SECONDS (60) deve ser maior ou igual a "
+                      "CLIENT_POOL_COOLDOWN_SECONDS (90)", str(raised.exception))
+        build_config("prod", {"RUN_TIMEOUT_SECONDS": "300", "REQUEST_TIMEOUT_SECONDS": "320"})
+
+    def test_dump_masks_secrets(self):
+        environ = {"OPENAI_API_KEY": "sk-chave-secreta-1234", "REDIS_URL": "redis://:senha@redis:6379/0"}
+        values = {row["env"]: row["value"] for row in describe_config(build_config("prod", environ), environ)}
+        self.assertEqual(values["OPENAI_API_KEY"], "sk-...1234")
+        self.assertEqual(values["OPENAI_API_KEYS"][0]["api_key"], "sk-...1234")
+        self.assertEqual(values["REDIS_URL"], "redis://:***@redis:6379/0")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+import unittest
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from app.data.document_index import DocumentIndex, tokenize, write_index
+from app.services import document_retrieval
+from app.utils.openia_config import RetrievalConfig
+
+try:
+    import pypdf
+except ImportError:
+    pypdf = None
+
+
+class TestDocumentIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'index.bin')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_tokenize_folds_case_and_accents_and_drops_stopwords(self):
+        self.assertEqual(tokenize("Ó Senhor, a tua MISERICÓRDIA é eterna!"), ["senhor", "misericordia", "eterna"])
+
+    def test_bm25_ranks_rare_terms_and_short_chunks_first(self):
+        chunks = [
+            {"source": "a.txt", "position": 0, "text": "horário de atendimento da secretaria " + "aviso " * 40},
+            {"source": "a.txt", "position": 1, "text": "horário de atendimento"},
+            {"source": "b.txt", "position": 0, "text": "missa de domingo às dez horas"},
+        ]
+        self.assertEqual(write_index(self.path, chunks), 3)
+        index = DocumentIndex(self.path)
+        self.addCleanup(index.close)
+
+        hits = index.search("Qual o horário de atendimento?", top_k=5)
+        self.assertEqual([(hit["source"], hit["position"]) for hit in hits], [("a.txt", 1), ("a.txt", 0)])
+        self.assertEqual(hits[0]["text"], "horário de atendimento")
+        self.assertEqual(index.search("missa", top_k=1)[0]["source"], "b.txt")
+        self.assertEqual(index.search("inexistente"), [])
+        self.assertEqual(index.sources(), ["a.txt", "b.txt"])
+
+    def test_large_lexicon_stays_out_of_the_header(self):
+        chunks = [{"source": f"doc{i % 7}.txt", "position": i, "text": f"termo{i} comum"} for i in range(2000)]
+        self.assertEqual(write_index(self.path, chunks), 2000)
+        with open(self.path, 'rb') as file:
+            file.seek(8)
+            header_size = int.from_bytes(file.read(4), "big")
+        self.assertLess(header_size, 512)
+
+        index = DocumentIndex(self.path)
+        self.addCleanup(index.close)
+        self.assertEqual(len(index), 2000)
+        for i in (0, 1, 999, 1999):
+            hits = index.search(f"termo{i}", top_k=1)
+            self.assertEqual([(hit["source"], hit["position"]) for hit in hits], [(f"doc{i % 7}.txt", i)])
+        self.assertEqual(index.search("termo2000"), [])
+        self.assertEqual(len(index.search("comum", top_k=10)), 10)
+        self.assertEqual(next(iter(index.chunks())), {"source": "doc0.txt", "position": 0, "text": "termo0 comum"})
+
+
+class TestDocumentRetrieval(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.index_path = os.path.join(self.tmp_dir, 'index.bin')
+        self.patches = [
+            mock.patch.object(RetrievalConfig, "INDEX_PATH", self.index_path),
+            mock.patch.object(RetrievalConfig, "CHUNK_WORDS", 20),
+            mock.patch.object(RetrievalConfig, "CHUNK_OVERLAP_WORDS", 5),
+        ]
+        for patch in self.patches:
+            patch.start()
+        document_retrieval.reset_document_index()
+
+    def tearDown(self):
+        for patch in reversed(self.patches):
+            patch.stop()
+        document_retrieval.reset_document_index()
+        shutil.rmtree(self.tmp_dir)
+
+    def _document(self, name, text):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(text)
+        return path
+
+    def test_chunks_overlap(self):
+        self.assertEqual(document_retrieval.chunk_text("a b c d e", 3, 1), ["a b c", "c d e"])
+        self.assertEqual(document_retrieval.chunk_text("a b", 3, 1), ["a b"])
+
+    def test_reingesting_a_document_replaces_its_chunks(self):
+        faq = self._document("faq.txt", "O horário de atendimento é das oito às dezoito horas.")
+        self._document("avisos.txt", "A secretaria estará fechada no feriado.")
+        document_retrieval.ingest_documents([faq, os.path.join(self.tmp_dir, "avisos.txt")])
+        self.assertEqual(document_retrieval.search_documents("horário")[0]["source"], "faq.txt")
+
+        self._document("faq.txt", "O atendimento agora é só pela manhã.")
+        self.assertEqual(document_retrieval.ingest_documents([faq]), 2)
+        self.assertEqual(document_retrieval.search_documents("horário"), [])
+        self.assertEqual(document_retrieval.search_documents("feriado")[0]["source"], "avisos.txt")
+
+    def test_replaced_index_is_closed_after_its_last_search(self):
+        faq = self._document("faq.txt", "O horário de atendimento é das oito às dezoito horas.")
+        document_retrieval.ingest_documents([faq])
+        with document_retrieval._opened_index(self.index_path) as old:
+            # Uma busca em andamento no índice antigo enquanto o documento é reindexado.
+            document_retrieval.ingest_documents([self._document("faq.txt", "Atendimento só pela manhã.")])
+            self.assertEqual(document_retrieval.search_documents("manhã")[0]["source"], "faq.txt")
+            self.assertFalse(old._data.closed)
+            self.assertEqual(old.search("horário")[0]["source"], "faq.txt")
+        self.assertTrue(old._data.closed)
+
+        current = document_retrieval._index
+        document_retrieval.ingest_documents([faq])
+        document_retrieval.search_documents("horário")
+        self.assertTrue(current._data.closed)
+
+    @unittest.skipUnless(pypdf, "requer o pacote pypdf")
+    def test_ingests_pdf(self):
+        pdf = os.path.join(os.path.dirname(__file__), 'oracao.pdf')
+        self.assertGreater(document_retrieval.ingest_documents([pdf]), 1)
+        hits = document_retrieval.search_documents("misericórdia")
+        self.assertEqual(hits[0]["source"], "oracao.pdf")
+        self.assertIn("misericórdia", hits[0]["text"])
+
+    def test_grounding_instructions_carry_passages_within_limit(self):
+        document_retrieval.ingest_documents([self._document("faq.txt", "O horário de atendimento é das oito às dezoito.")])
+
+        instructions = document_retrieval.grounding_instructions("Qual o horário?")
+        self.assertIn("[1] faq.txt, trecho 1: O horário de atendimento", instructions)
+        self.assertIsNone(document_retrieval.grounding_instructions("Bom dia"))
+        with mock.patch.object(RetrievalConfig, "MAX_CONTEXT_CHARS", 100):
+            passages = document_retrieval.search_documents("horário") * 3
+            self.assertLessEqual(len(document_retrieval.format_passages(passages, 100)), 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+import json
+import os
+import shutil
+import tempfile
+
+import httpx
+
+from app.interfaces.http_cassette import Cassette, CassetteError
+
+
+class TestCassette(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'fita.json')
+        self.calls = []
+
+        def api(request):
+            self.calls.append((request.method, request.url.path))
+            return httpx.Response(200, json={"n": len(self.calls)}, headers={"set-cookie": "sessao=1"})
+
+        self.api = httpx.MockTransport(api)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _record(self, *requests):
+        cassette = Cassette(self.path, mode="record", transport=self.api)
+        client = httpx.Client(transport=cassette)
+        for method, url, kwargs in requests:
+            client.request(method, url, **kwargs)
+        cassette.save()
+
+    def test_replays_in_recorded_order_without_network(self):
+        self._record(("POST", "https://api.openai.com/v1/threads", {"json": {"a": 1, "b": 2}}),
+                     ("GET", "https://api.openai.com/v1/threads/t1/runs/r1", {}),
+                     ("GET", "https://api.openai.com/v1/threads/t1/runs/r1", {}))
+        self.assertEqual(len(self.calls), 3)
+        with open(self.path) as file:
+            recorded = json.load(file)["interactions"]
+        self.assertNotIn("authorization", recorded[0]["request"]["headers"])
+        self.assertNotIn("set-cookie", recorded[0]["response"]["headers"])
+
+        cassette = Cassette(self.path, mode="replay")
+        client = httpx.Client(transport=cassette, headers={"Authorization": "Bearer sk-outra"})
+        # A ordem das chaves do corpo JSON não importa; as consultas repetidas recebem as respostas em sequência.
+        self.assertEqual(client.post("https://api.openai.com/v1/threads", content=b'{"b": 2, "a": 1}',
+                                     headers={"content-type": "application/json"}).json(), {"n": 1})
+        run_polls = [client.get("https://api.openai.com/v1/threads/t1/runs/r1").json() for _ in range(2)]
+        self.assertEqual(run_polls, [{"n": 2}, {"n": 3}])
+        self.assertEqual(len(self.calls), 3)
+        self.assertEqual(cassette.unplayed(), [])
+
+    def test_multipart_boundary_is_ignored(self):
+        self._record(("POST", "https://api.openai.com/v1/files",
+                      {"files": {"file": ("oracao.pdf", b"%PDF")}, "data": {"purpose": "assistants"}}))
+        client = httpx.Client(transport=Cassette(self.path, mode="replay"))
+        response = client.post("https://api.openai.com/v1/files",
+                               files={"file": ("oracao.pdf", b"%PDF")}, data={"purpose": "assistants"})
+        self.assertEqual(response.json(), {"n": 1})
+
+    def test_strict_mode_fails_on_unrecorded_requests(self):
+        self._record(("GET", "https://api.openai.com/v1/assistants/a1", {}))
+        cassette = Cassette(self.path, mode="replay")
+        client = httpx.Client(transport=cassette)
+        with self.assertRaisesRegex(CassetteError, "assistants/a2"):
+            client.get("https://api.openai.com/v1/assistants/a2")
+        self.assertEqual(cassette.unmatched, ["GET https://api.openai.com/v1/assistants/a2"])
+        self.assertEqual(cassette.unplayed(), ["GET https://api.openai.com/v1/assistants/a1"])
+
+    def test_non_strict_mode_records_new_requests(self):
+        self._record(("GET", "https://api.openai.com/v1/assistants/a1", {}))
+        cassette = Cassette(self.path, mode="replay", strict=False, transport=self.api)
+        client = httpx.Client(transport=cassette)
+        client.get("https://api.openai.com/v1/assistants/a1")
+        client.get("https://api.openai.com/v1/assistants/a2")
+        cassette.save()
+
+        self.assertEqual(self.calls, [("GET", "/v1/assistants/a1"), ("GET", "/v1/assistants/a2")])
+        with open(self.path) as file:
+            self.assertEqual(len(json.load(file)["interactions"]), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
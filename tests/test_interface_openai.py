@@ -1,12 +1,25 @@
 import unittest
 import os
 import logging
+import shutil
+import tempfile
+from unittest import mock
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+from app.data import threads_manager, transcript_store
+from app.interfaces.http_cassette import use_cassette
+from app.utils.openia_config import TranscriptConfig, UsageConfig
 from app.interfaces.interface_openai import * 
 
 # Configura o logging
 log_file_path = os.path.join(os.path.dirname(__file__), '..', 'logs', 'test_logs.log')
 logging.basicConfig(filename=log_file_path, level=logging.INFO, format='%(asctime)s:%(levelname)s:%(message)s')
 
+# Fitas com as interações HTTP de cada teste (app/interfaces/http_cassette.py). Por padrão os testes as reproduzem,
+# sem rede; para regravá-las contra a API, rode com OPENAI_CASSETTE_MODE=record e uma chave de API válida.
+CASSETTES_DIR = os.path.join(os.path.dirname(__file__), 'cassettes', 'interface_openai')
+
 class TestInterfaceOpenAI(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
@@ -15,8 +28,28 @@ class TestInterfaceOpenAI(unittest.TestCase):
         logging.info("Configuração da classe de teste iniciada")
 
     def setUp(self):
-        file_result = upload_file_to_openai(self.test_file_path)
-        self.file_id = file_result.id if file_result else None
+        # Metadados de threads e registro de conversas em um diretório temporário, sem contabilidade de tokens.
+        self.tmp_dir = tempfile.mkdtemp()
+        db_path = os.path.join(self.tmp_dir, 'threads')
+        for patch in (
+            mock.patch.object(threads_manager, "DB_PATH", db_path),
+            mock.patch.object(threads_manager, "LOCK_PATH", db_path + '.lock'),
+            mock.patch.object(threads_manager, "_lock_file", None),
+            mock.patch.dict(threads_manager._slot_locks, clear=True),
+            mock.patch.object(TranscriptConfig, "DIR", os.path.join(self.tmp_dir, 'transcripts')),
+            mock.patch.object(UsageConfig, "ENABLED", False),
+        ):
+            patch.start()
+            self.addCleanup(patch.stop)
+        transcript_store.reset_transcript_store()
+        self.addCleanup(transcript_store.reset_transcript_store)
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+
+        # Os corpos dos pedidos dependem da configuração local (.env: nome, instruções, modelo); não são comparados.
+        cassette = use_cassette(os.path.join(CASSETTES_DIR, f"{self._testMethodName}.json"),
+                                match_on=("method", "path", "query"))
+        self.cassette = cassette.__enter__()
+        self.addCleanup(cassette.__exit__, None, None, None)
         logging.info("Setup antes de cada teste")
 
     def tearDown(self):
@@ -46,13 +79,17 @@ class TestInterfaceOpenAI(unittest.TestCase):
 
     def test_create_assistant_with_file(self):
         logging.info("Iniciando teste: test_create_assistant_with_file")
-        if not self.file_id:
+        # O upload é feito só neste teste, e não antes de cada teste.
+        file_result = upload_file_to_openai(self.test_file_path)
+        file_id = file_result.id if file_result else None
+        if not file_id:
             logging.warning("Falha no upload do arquivo; teste de criação do assistente com arquivo pulado.")
             self.skipTest("Falha no upload do arquivo; teste de criação do assistente com arquivo pulado.")
         try:
-            assistant_result = create_assistant(file_id=self.file_id)
+            assistant_result = create_assistant(file_id=file_id)
             self.assertIsNotNone(assistant_result, "Falha na criação do assistente com arquivo.")
             self.assertTrue(hasattr(assistant_result, 'id'), "O assistente criado com arquivo não possui um 'id'.")
+            self.assertEqual(assistant_result.file_ids, [file_id], "O assistente não recebeu o arquivo enviado.")
             logging.info("Sucesso: test_create_assistant_with_file")
         except AssertionError as e:
             logging.error(f"Falha: test_create_assistant_with_file - {e}")
@@ -60,7 +97,7 @@ class TestInterfaceOpenAI(unittest.TestCase):
     
     def test_retrieve_assistant(self):
         logging.info("Iniciando teste: test_retrieve_assistant")
-        assistant_id = "algum_id_existente"  # Substitua isso pelo ID de um assistente existente para o teste
+        assistant_id = "asst_cassette_interface_openai"  # O assistente gravado na fita deste teste.
         try:
             assistant = retrieve_assistant(assistant_id)
             self.assertIsNotNone(assistant, "Falha na recuperação do assistente.")
@@ -85,7 +122,7 @@ class TestInterfaceOpenAI(unittest.TestCase):
     # Teste para retrieve_thread
     def test_retrieve_thread(self):
         logging.info("Iniciando teste: test_retrieve_thread")
-        thread_id = "algum_id_de_thread_existente"  # Substitua pelo ID de um thread existente para teste
+        thread_id = "thread_cassette_interface_openai"  # O thread gravado na fita deste teste.
         try:
             thread = retrieve_thread(thread_id)
             self.assertIsNotNone(thread, "Falha na recuperação do thread.")
@@ -100,7 +137,10 @@ class TestInterfaceOpenAI(unittest.TestCase):
         logging.info("Iniciando teste: test_generate_response")
         question_prompt = "Alguma pergunta relevante"  # Insira um prompt de pergunta relevante para o teste
         try:
-            response = generate_response(question_prompt)
+            # A fita já traz o run concluído na consulta seguinte; não há por que esperar entre as consultas.
+            with mock.patch.object(OpenAIAssistantConfig, "RUN_POLL_INTERVAL_SECONDS", 0):
+                response = generate_response(question_prompt, thread_id="thread_cassette_interface_openai",
+                                             assistant_id="asst_cassette_interface_openai", coalesce=False)
             self.assertIsNotNone(response, "Falha na geração da resposta.")
             self.assertIsInstance(response, str, "A resposta gerada não é uma string.")
             logging.info("Sucesso: test_generate_response")
@@ -0,0 +1,89 @@
+import unittest
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+import run
+from app.data.job_store import JobStore
+from app.services import job_worker
+from app.services.job_worker import JobWorker
+
+
+class TestJobStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.store = JobStore(os.path.join(self.tmp_dir, 'jobs.sqlite3'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_jobs_are_claimed_once_in_order(self):
+        first = self.store.submit("Cícero", "Oi")
+        second = self.store.submit("Severino", "Olá")
+        self.assertEqual(self.store.claim("w1", lease_seconds=60)["id"], first)
+        self.assertEqual(self.store.claim("w2", lease_seconds=60)["id"], second)
+        self.assertIsNone(self.store.claim("w3", lease_seconds=60))
+
+    def test_expired_lease_is_reclaimed_after_restart(self):
+        job_id = self.store.submit("Cícero", "Oi")
+        self.store.claim("w1", lease_seconds=-1)  # worker parou sem concluir
+        reopened = JobStore(self.store.path)
+        job = reopened.claim("w2", lease_seconds=60)
+        self.assertEqual((job["id"], job["attempts"]), (job_id, 2))
+
+    def test_failures_retry_until_max_attempts(self):
+        job_id = self.store.submit("Cícero", "Oi")
+        self.store.claim("w1", lease_seconds=60)
+        self.assertTrue(self.store.fail(job_id, "erro", max_attempts=2))
+        self.store.claim("w1", lease_seconds=60)
+        self.assertFalse(self.store.fail(job_id, "erro", max_attempts=2))
+        self.assertEqual(self.store.get(job_id)["status"], "failed")
+        self.assertEqual(self.store.purge_finished(-1), 1)
+
+
+class TestJobWorker(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.store = JobStore(os.path.join(self.tmp_dir, 'jobs.sqlite3'))
+        self.patches = [
+            mock.patch.object(job_worker, "get_or_create_thread", return_value="thread_1"),
+            mock.patch.object(job_worker, "generate_response", return_value="Olá!"),
+            mock.patch.object(run, "get_job_store", return_value=self.store),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in reversed(self.patches):
+            patch.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_submit_process_and_poll(self):
+        client = run.app.test_client()
+        response = client.post('/jobs', json={"user_name": "Cícero", "message": "Oi"})
+        self.assertEqual(response.status_code, 202)
+        job_id = response.get_json()["job_id"]
+        self.assertEqual(client.get(f'/jobs/{job_id}').get_json()["status"], "queued")
+
+        worker = JobWorker(self.store, workers=0)
+        worker.process(self.store.claim("w1", lease_seconds=60))
+
+        job = client.get(f'/jobs/{job_id}').get_json()
+        self.assertEqual((job["status"], job["thread_id"], job["reply"]), ("succeeded", "thread_1", "Olá!"))
+        self.assertEqual(client.get('/jobs/inexistente').status_code, 404)
+
+    def test_result_is_pushed_to_callback(self):
+        job_id = self.store.submit("Cícero", "Oi", callback_url="https://example.com/hook")
+        with mock.patch.object(job_worker.requests, "post", return_value=mock.Mock(ok=True)) as post:
+            JobWorker(self.store, workers=0).process(self.store.claim("w1", lease_seconds=60))
+
+        post.assert_called_once()
+        self.assertEqual(post.call_args.kwargs["json"]["reply"], "Olá!")
+        self.assertEqual(self.store.get(job_id)["callback_status"], "delivered")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+import os
+from types import SimpleNamespace
+from unittest import mock
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+from app.services import knowledge_base
+from app.utils.openia_config import KnowledgeBaseConfig
+
+PDF = os.path.join(os.path.dirname(__file__), "oracao.pdf")
+
+
+def _fake_client(statuses, file_ids=(), tools=()):
+    # statuses: para cada arquivo enviado, a sequência de status retornada pelas consultas.
+    client = mock.MagicMock()
+    client.beta.assistants.retrieve.return_value = SimpleNamespace(
+        id="asst_1", file_ids=list(file_ids), tools=list(tools))
+    uploaded = iter(range(len(statuses)))
+    client.files.create.side_effect = lambda file, purpose: SimpleNamespace(
+        id=f"file_{next(uploaded)}", status="uploaded")
+    sequences = {f"file_{index}": iter(sequence) for index, sequence in enumerate(statuses)}
+
+    def retrieve(file_id):
+        status = next(sequences[file_id])
+        return SimpleNamespace(id=file_id, status=status, status_details="PDF corrompido" if status == "error" else None)
+
+    client.files.retrieve.side_effect = retrieve
+    return client
+
+
+class TestAttachFiles(unittest.TestCase):
+    def setUp(self):
+        self.patches = [
+            mock.patch.object(KnowledgeBaseConfig, "POLL_INITIAL_SECONDS", 0.001),
+            mock.patch.object(KnowledgeBaseConfig, "POLL_MAX_SECONDS", 0.004),
+            mock.patch.object(KnowledgeBaseConfig, "TIMEOUT_SECONDS", 5),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+
+    def _attach(self, client, paths, **kwargs):
+        with mock.patch.object(knowledge_base, "OpenAIClientSingleton", return_value=client):
+            return knowledge_base.attach_files("asst_1", paths, **kwargs)
+
+    def test_processed_files_are_attached_in_one_update_and_failures_reported(self):
+        client = _fake_client([["uploaded", "processed"], ["error"], ["uploaded", "uploaded", "processed"]],
+                              file_ids=["file_old"], tools=[{"type": "code_interpreter"}])
+        report = self._attach(client, [PDF, PDF, PDF])
+
+        self.assertEqual([item["status"] for item in report["files"]], ["processed", "error", "processed"])
+        self.assertEqual(report["files"][1]["error"], "PDF corrompido")
+        self.assertEqual(report["file_ids"], ["file_old", "file_0", "file_2"])
+        client.files.delete.assert_called_once_with("file_1")
+        client.beta.assistants.update.assert_called_once_with(
+            "asst_1", file_ids=["file_old", "file_0", "file_2"],
+            tools=[{"type": "code_interpreter"}, {"type": "retrieval"}])
+
+    def test_missing_file_and_timeout_are_reported_without_update(self):
+        client = _fake_client([["uploaded"] * 10_000])
+        with mock.patch.object(KnowledgeBaseConfig, "TIMEOUT_SECONDS", 0.05):
+            report = self._attach(client, [PDF, "/nao/existe.pdf"])
+
+        self.assertEqual([item["status"] for item in report["files"]], ["timeout", "failed"])
+        self.assertIsNone(report["files"][1]["file_id"])
+        client.beta.assistants.update.assert_not_called()
+        client.files.delete.assert_called_once_with("file_0")
+
+    def test_replace_keeps_current_files_when_nothing_was_processed(self):
+        client = _fake_client([["error"], ["error"]], file_ids=["file_old"])
+        report = self._attach(client, [PDF, PDF], replace=True)
+
+        self.assertEqual(report["file_ids"], ["file_old"])
+        client.beta.assistants.update.assert_not_called()
+        self.assertEqual(client.files.delete.call_count, 2)
+
+    def test_assistant_file_limit_is_checked_before_uploading(self):
+        client = _fake_client([], file_ids=[f"file_{n}" for n in range(19)])
+        with self.assertRaises(ValueError):
+            self._attach(client, [PDF, PDF])
+        client.files.create.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
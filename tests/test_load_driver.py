@@ -0,0 +1,65 @@
+import unittest
+import threading
+
+from tests.simulation.load_driver import format_report, parse_script, percentile, run_load
+
+
+class TestLoadDriver(unittest.TestCase):
+    def test_parse_script_reads_messages_think_times_and_phases(self):
+        conversations = parse_script([
+            '{"user": "Alice", "messages": ["Oi", {"text": "Tchau", "think_time": 5}], "think_time": 2}',
+            '',
+            '{"user": "Bruno", "messages": ["Olá"], "phase": "pico"}',
+        ])
+        self.assertEqual([(c.user, c.messages, c.phase) for c in conversations], [
+            ("Alice", [("Oi", 2.0), ("Tchau", 5.0)], "carga"),
+            ("Bruno", [("Olá", 0.0)], "pico"),
+        ])
+        with self.assertRaisesRegex(ValueError, "Linha 1"):
+            parse_script(['{"user": "Alice"}'])
+
+    def test_percentile_uses_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual([percentile(values, p) for p in (50, 95, 99)], [50, 95, 99])
+        self.assertEqual(percentile([7], 99), 7)
+        self.assertEqual(percentile([], 50), 0.0)
+
+    def test_runs_users_concurrently_and_reports_per_phase(self):
+        guard = threading.Lock()
+        active, peak, threads = [0], [0], {}
+
+        def get_thread(user_name):
+            threads[user_name] = f"thread_{user_name}"
+            return threads[user_name]
+
+        def respond(question_prompt, thread_id, user_name):
+            with guard:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            threading.Event().wait(0.05)
+            with guard:
+                active[0] -= 1
+            if question_prompt == "falha":
+                raise RuntimeError("falha simulada")
+            return "ok"
+
+        conversations = parse_script([
+            '{"user": "Alice", "phase": "aquecimento", "messages": ["Oi"]}',
+            '{"user": "Bruno", "phase": "pico", "messages": ["Oi", "falha"], "think_time": 10}',
+        ])
+        rows = run_load(conversations, get_thread, respond, repeat=10, think_scale=0).summary()
+
+        self.assertEqual(len(threads), 20)
+        self.assertIn("Bruno#10", threads)
+        self.assertGreater(peak[0], 1)
+        by_key = {(row["phase"], row["operation"]): row for row in rows}
+        self.assertEqual(set(by_key), {("aquecimento", "thread"), ("aquecimento", "resposta"),
+                                       ("pico", "thread"), ("pico", "resposta")})
+        self.assertEqual((by_key["pico", "resposta"]["count"], by_key["pico", "resposta"]["errors"]), (20, 10))
+        self.assertEqual(by_key["aquecimento", "resposta"]["error_rate"], 0)
+        self.assertGreaterEqual(by_key["aquecimento", "resposta"]["p50_ms"], 40)
+        self.assertIn("pico", format_report(rows))
+
+
+if __name__ == '__main__':
+    unittest.main()
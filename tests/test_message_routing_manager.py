@@ -0,0 +1,103 @@
+import unittest
+import os
+import shutil
+import tempfile
+import threading
+import time
+import multiprocessing
+from types import SimpleNamespace
+from unittest import mock
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+from app.data import threads_manager
+from app.services import message_routing_manager
+
+
+def _slow_create_thread(counter):
+    def create():
+        with counter.get_lock():
+            counter.value += 1
+            n = counter.value
+        time.sleep(0.05)
+        return SimpleNamespace(id=f"thread_{os.getpid()}_{n}")
+    return create
+
+
+def _process_worker(db_path, counter, results):
+    threads_manager.DB_PATH = db_path
+    threads_manager.LOCK_PATH = db_path + '.lock'
+    threads_manager._lock_file = None
+    threads_manager._slot_locks.clear()
+    with mock.patch.object(message_routing_manager, "create_thread", _slow_create_thread(counter)):
+        results.put(message_routing_manager.get_or_create_thread("Cícero"))
+
+
+class TestGetOrCreateThread(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmp_dir, 'threads')
+        self.patches = [
+            mock.patch.object(threads_manager, "DB_PATH", self.db_path),
+            mock.patch.object(threads_manager, "LOCK_PATH", self.db_path + '.lock'),
+            mock.patch.object(threads_manager, "_lock_file", None),
+            mock.patch.dict(threads_manager._slot_locks, clear=True),
+            mock.patch.dict(threads_manager._pending_activity, clear=True),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in reversed(self.patches):
+            patch.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_existing_thread_is_reused(self):
+        threads_manager.upsert_thread("Severino", "thread_existente")
+        with mock.patch.object(message_routing_manager, "create_thread") as create:
+            self.assertEqual(message_routing_manager.get_or_create_thread("Severino"), "thread_existente")
+            create.assert_not_called()
+
+    def test_concurrent_first_messages_create_one_thread(self):
+        counter = multiprocessing.Value('i', 0)
+        results = []
+        barrier = threading.Barrier(8)
+
+        def worker():
+            barrier.wait()
+            results.append(message_routing_manager.get_or_create_thread("Amaro"))
+
+        with mock.patch.object(message_routing_manager, "create_thread", _slow_create_thread(counter)):
+            workers = [threading.Thread(target=worker) for _ in range(8)]
+            for t in workers:
+                t.start()
+            for t in workers:
+                t.join()
+
+        self.assertEqual(counter.value, 1)
+        self.assertEqual(len(set(results)), 1)
+        self.assertEqual(threads_manager.retrieve_thread_id("Amaro"), results[0])
+
+    @unittest.skipIf(threads_manager.fcntl is None, "Bloqueio entre processos requer fcntl.")
+    def test_concurrent_processes_create_one_thread(self):
+        ctx = multiprocessing.get_context("fork")
+        counter = ctx.Value('i', 0)
+        results = ctx.Queue()
+        processes = [ctx.Process(target=_process_worker, args=(self.db_path, counter, results)) for _ in range(4)]
+        for p in processes:
+            p.start()
+        thread_ids = {results.get(timeout=10) for _ in processes}
+        for p in processes:
+            p.join()
+
+        self.assertEqual(counter.value, 1)
+        self.assertEqual(len(thread_ids), 1)
+
+    def test_insert_if_absent_never_overwrites(self):
+        self.assertEqual(threads_manager.insert_thread_if_absent("Cícero", "thread_a"), "thread_a")
+        self.assertEqual(threads_manager.insert_thread_if_absent("Cícero", "thread_b"), "thread_a")
+        self.assertEqual(threads_manager.retrieve_thread_id("Cícero"), "thread_a")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from app.utils import project_dump
+from app.utils.project_dump import dump_project, strip_source
+
+
+class TestStripSource(unittest.TestCase):
+    def test_removes_comments_and_docstrings_but_not_strings_in_code(self):
+        source = (
+            "import os  # sistema\n"
+            '"""\nDescrição do módulo.\n"""\n'
+            "class A:\n"
+            "    '''Doc.'''\n"
+            "def f():\n"
+            "    # comentário\n"
+            "    return '# não é comentário'\n"
+            "x = 1; 'fica'\n"
+        )
+        self.assertEqual(strip_source(source), (
+            "import os\n"
+            "class A:\n"
+            "    pass\n"
+            "def f():\n"
+            "\n"
+            "    return '# não é comentário'\n"
+            "x = 1; 'fica'\n"
+        ))
+
+    def test_form_feed_does_not_shift_lines(self):
+        # "\f" não separa linhas para o ast e o tokenize; antes, as linhas removidas ficavam deslocadas.
+        source = "'''Doc.'''\n\x0cdef f():\n    # comentário\n    '''Doc f.'''\n    return 1\n"
+        stripped = strip_source(source)
+        self.assertEqual(stripped, "\x0cdef f():\n\n    return 1\n")
+        compile(stripped, "<stripped>", "exec")
+
+    def test_invalid_result_falls_back_to_the_original(self):
+        source = "def f():\n    return 1\n"
+        with mock.patch.object(project_dump, "_docstring_lines", return_value=({1}, {})):
+            self.assertEqual(strip_source(source), source)
+
+    def test_invalid_source_is_kept(self):
+        self.assertEqual(strip_source("def (:\n  # x\n"), "def (:\n  # x\n")
+
+
+class TestDumpProject(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.root, "pkg", "__pycache__"))
+        self._write("pkg/a.py", "# a\nA = 1\n")
+        self._write("pkg/b.py", "def b():\n    'Doc.'\n    return 2\n")
+        self._write("pkg/__init__.py", "")
+        self._write("pkg/__pycache__/a.cpython-311.pyc", "")
+        self._write("notas.txt", "texto\n")
+        self.cache = os.path.join(self.root, "cache.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def _write(self, path, content):
+        with open(os.path.join(self.root, path), "w", encoding="utf-8") as file:
+            file.write(content)
+
+    def _dump(self):
+        out = io.StringIO()
+        return dump_project(self.root, out, self.cache, workers=1), out.getvalue()
+
+    def test_lists_tree_and_dumps_stripped_python_files(self):
+        stats, text = self._dump()
+        listing = text.split("=" * 40)[0].split()
+        self.assertEqual(listing, ["./notas.txt", "./pkg", "./pkg/a.py", "./pkg/b.py"])
+        self.assertIn("---------- Início de ./pkg/a.py ----------\nA = 1\n----------- Fim de ./pkg/a.py", text)
+        self.assertIn("def b():\n    return 2\n", text)
+        self.assertEqual(stats, {"files": 2, "processed": 2, "cached": 0})
+
+    def test_only_changed_files_are_reprocessed(self):
+        _, first = self._dump()
+        stats, second = self._dump()
+        self.assertEqual(stats["processed"], 0)
+        self.assertEqual(first, second)
+
+        # Só a data de modificação mudou: o conteúdo é conferido pelo hash e não é reprocessado.
+        os.utime(os.path.join(self.root, "pkg", "a.py"), ns=(1, 1))
+        self.assertEqual(self._dump()[0]["processed"], 0)
+
+        self._write("pkg/b.py", "def b():\n    return 3  # novo\n")
+        stats, text = self._dump()
+        self.assertEqual(stats, {"files": 2, "processed": 1, "cached": 1})
+        self.assertIn("    return 3\n", text)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+import os
+import shutil
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+from app.data import threads_manager
+from app.interfaces import interface_openai
+from app.interfaces.client_pool import ClientPool
+from app.services.question_coalescing import normalize_question
+from app.utils.metrics import COALESCED_QUESTIONS
+from app.utils.openia_config import OpenAIAssistantConfig, TranscriptConfig
+
+
+def _fake_client(entry):
+    client = mock.MagicMock()
+
+    def create_run(thread_id, assistant_id, **options):
+        time.sleep(0.1)
+        return SimpleNamespace(id=f"run_{thread_id}", status="completed", usage=None)
+
+    client.beta.threads.runs.create.side_effect = create_run
+    text = SimpleNamespace(value="Resposta")
+    client.beta.threads.messages.list.return_value = SimpleNamespace(
+        data=[SimpleNamespace(content=[SimpleNamespace(text=text)])])
+    return client
+
+
+class TestQuestionCoalescing(unittest.TestCase):
+    def setUp(self):
+        self.pool = ClientPool([{"name": "a", "api_key": "sk-a"}], client_factory=_fake_client)
+        # Os runs em andamento são gravados nos metadados dos threads, em um diretório temporário.
+        self.tmp_dir = tempfile.mkdtemp()
+        db_path = os.path.join(self.tmp_dir, 'threads')
+        self.patches = [
+            mock.patch.object(threads_manager, "DB_PATH", db_path),
+            mock.patch.object(threads_manager, "LOCK_PATH", db_path + '.lock'),
+            mock.patch.object(threads_manager, "_lock_file", None),
+            mock.patch.dict(threads_manager._slot_locks, clear=True),
+            mock.patch.object(interface_openai, "get_client_pool", return_value=self.pool),
+            mock.patch.object(interface_openai, "client_key_for_thread", return_value="a"),
+            mock.patch.object(TranscriptConfig, "ENABLED", False),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in reversed(self.patches):
+            patch.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def _ask_concurrently(self, questions, coalesce, users=None):
+        results = []
+        barrier = threading.Barrier(len(questions))
+        users = users or [f"user_{n}" for n in range(len(questions))]
+
+        def ask(n, question):
+            barrier.wait()
+            results.append(interface_openai.generate_response(
+                question, thread_id=f"thread_{n}", user_name=users[n], assistant_id="asst_a", coalesce=coalesce))
+
+        workers = [threading.Thread(target=ask, args=(n, q)) for n, q in enumerate(questions)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return results
+
+    def test_identical_questions_of_the_same_user_share_one_run(self):
+        # O run leva o nome de quem pergunta (na mensagem ou nas instruções): só o mesmo usuário recebe a resposta.
+        for mode in ("message", "run"):
+            with self.subTest(mode=mode):
+                self.pool.default.client.beta.threads.runs.create.reset_mock()
+                saved_before = COALESCED_QUESTIONS.labels(assistant_id="asst_a")._value.get()
+                with mock.patch.object(OpenAIAssistantConfig, "USER_NAMING_MODE", mode):
+                    results = self._ask_concurrently(["Qual é o horário?", "qual é o  horário? "] * 3,
+                                                     coalesce=True, users=["Alice"] * 3 + ["Bruno"] * 3)
+
+                self.assertEqual(results, ["Resposta"] * 6)
+                self.assertEqual(self.pool.default.client.beta.threads.runs.create.call_count, 2)
+                self.assertEqual(COALESCED_QUESTIONS.labels(assistant_id="asst_a")._value.get() - saved_before, 4)
+
+    def test_each_question_runs_when_disabled(self):
+        self._ask_concurrently(["Qual é o horário?"] * 3, coalesce=False)
+        self.assertEqual(self.pool.default.client.beta.threads.runs.create.call_count, 3)
+
+    def test_normalization(self):
+        self.assertEqual(normalize_question(" Olá,\tMUNDO "), "olá, mundo")
+
+
+if __name__ == '__main__':
+    unittest.main()
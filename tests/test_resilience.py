@@ -0,0 +1,121 @@
+import unittest
+import threading
+import time
+from unittest import mock
+
+from app.utils import resilience
+from app.utils.metrics import HEDGES_FIRED
+from app.utils.resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, Hedger
+
+
+class TestHedger(unittest.TestCase):
+    def setUp(self):
+        self.hedger = Hedger(percentile=95, min_delay=0.01, min_samples=5, max_ratio=1.0, window=50, max_workers=4)
+        self.addCleanup(self.hedger.shutdown)
+
+    def test_no_hedge_before_enough_samples(self):
+        calls = []
+        for _ in range(4):
+            self.assertEqual(self.hedger.call("op", lambda: calls.append(1) or "ok"), "ok")
+        self.assertEqual(len(calls), 4)
+        self.assertIsNone(self.hedger.delay("op"))
+
+    def test_slow_call_is_hedged_and_the_faster_copy_wins(self):
+        for _ in range(5):
+            self.hedger.call("op", lambda: "rápida")
+        release = threading.Event()
+        calls = []
+
+        def read():
+            calls.append(1)
+            if len(calls) == 1:
+                release.wait(5)  # A primeira chamada fica presa até o fim do teste.
+                return "lenta"
+            return "cópia"
+
+        before = HEDGES_FIRED.labels(operation="op", winner="hedge")._value.get()
+        started_at = time.monotonic()
+        self.assertEqual(self.hedger.call("op", read), "cópia")
+        release.set()
+        self.assertLess(time.monotonic() - started_at, 1)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(HEDGES_FIRED.labels(operation="op", winner="hedge")._value.get(), before + 1)
+
+    def test_hedges_are_capped_by_ratio(self):
+        hedger = Hedger(min_delay=0.01, min_samples=1, max_ratio=0.0, max_workers=2)
+        self.addCleanup(hedger.shutdown)
+        hedger.call("op", lambda: "ok")
+        calls = []
+        self.assertEqual(hedger.call("op", lambda: calls.append(1) or time.sleep(0.05) or "ok"), "ok")
+        self.assertEqual(len(calls), 1)
+
+    def _call_concurrently(self, hedger, count, fn):
+        barrier = threading.Barrier(count)
+        workers = [threading.Thread(target=lambda: (barrier.wait(), hedger.call("op", fn))) for _ in range(count)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+    def test_concurrent_slow_calls_respect_the_ratio(self):
+        hedger = Hedger(min_delay=0.01, min_samples=1, max_ratio=0.1, window=50, max_workers=8)
+        self.addCleanup(hedger.shutdown)
+        hedger.call("op", lambda: "ok")
+        calls = []
+        # Com uma chamada na janela, cabe uma única cópia, mesmo com as dez atrasadas ao mesmo tempo.
+        self._call_concurrently(hedger, 10, lambda: calls.append(1) or time.sleep(0.1) or "ok")
+        self.assertEqual(len(calls), 11)
+
+    def test_primary_calls_do_not_queue_behind_the_hedge_pool(self):
+        hedger = Hedger(min_delay=5, min_samples=1, max_ratio=1.0, max_workers=1)
+        self.addCleanup(hedger.shutdown)
+        hedger.call("op", lambda: "ok")
+        started_at = time.monotonic()
+        self._call_concurrently(hedger, 8, lambda: time.sleep(0.1) or "ok")
+        self.assertLess(time.monotonic() - started_at, 0.5)
+        self.assertLess(max(hedger._latencies["op"]), 0.5)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def _fail(self):
+        raise ConnectionError("falhou")
+
+    def test_opens_on_failure_rate_fails_fast_and_recovers(self):
+        breaker = CircuitBreaker("test", failure_rate=0.5, min_calls=4, window=4, open_seconds=30)
+        breaker.call(lambda: "ok")
+        breaker.call(lambda: "ok")
+        for _ in range(2):
+            with self.assertRaises(ConnectionError):
+                breaker.call(self._fail)
+        self.assertEqual(breaker.state, OPEN)
+
+        called = []
+        with self.assertRaises(CircuitOpenError):
+            breaker.call(lambda: called.append(1))
+        self.assertEqual(called, [])
+
+        with mock.patch.object(resilience.time, "monotonic", return_value=time.monotonic() + 31):
+            self.assertEqual(breaker.state, HALF_OPEN)
+            self.assertEqual(breaker.call(lambda: "ok"), "ok")
+        self.assertEqual(breaker.state, CLOSED)
+
+    def test_failed_probe_reopens(self):
+        breaker = CircuitBreaker("test", failure_rate=1.0, min_calls=1, window=1, open_seconds=30)
+        with self.assertRaises(ConnectionError):
+            breaker.call(self._fail)
+        with mock.patch.object(resilience.time, "monotonic", return_value=time.monotonic() + 31):
+            with self.assertRaises(ConnectionError):
+                breaker.call(self._fail)
+            self.assertEqual(breaker.state, OPEN)
+
+    def test_request_errors_do_not_count(self):
+        breaker = CircuitBreaker("test", failure_rate=0.5, min_calls=2, window=2,
+                                 is_failure=lambda error: not isinstance(error, ValueError))
+        for _ in range(3):
+            with self.assertRaises(ValueError):
+                breaker.call(lambda: int("x"))
+        self.assertEqual(breaker.state, CLOSED)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,236 @@
+import unittest
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+import simple_websocket
+from werkzeug.serving import make_server
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+import run
+from app.data import threads_manager
+from app.interfaces import interface_openai
+from app.interfaces.client_pool import ClientPool
+from app.services.chat_dispatcher import ChatDispatcher
+from app.services.usage_accounting import BudgetExceededError
+from app.utils.openia_config import ServerConfig
+from app.utils.resilience import CircuitOpenError
+
+
+class TestChatApi(unittest.TestCase):
+    def setUp(self):
+        self.client = run.app.test_client()
+        self.patches = [
+            mock.patch.object(run, "get_or_create_thread", return_value="thread_1"),
+            mock.patch.object(run, "dispatcher", ChatDispatcher(2)),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in reversed(self.patches):
+            patch.stop()
+
+    def test_chat_returns_reply(self):
+        with mock.patch.object(run, "generate_response", return_value="Olá!") as generate:
+            response = self.client.post('/chat', json={"user_name": "Cícero", "message": "Oi"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json(), {"thread_id": "thread_1", "reply": "Olá!"})
+        generate.assert_called_once_with(question_prompt="Oi", thread_id="thread_1", user_name="Cícero")
+
+    def test_chat_requires_user_and_message(self):
+        self.assertEqual(self.client.post('/chat', json={"user_name": "Cícero"}).status_code, 400)
+
+    def test_over_budget_user_answers_429(self):
+        error = BudgetExceededError("Cícero", 1200, 1000, retry_after=59.5)
+        with mock.patch.object(run, "generate_response", side_effect=error):
+            response = self.client.post('/chat', json={"user_name": "Cícero", "message": "Oi"})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers["Retry-After"], "60")
+
+    def test_cancel_stops_the_users_active_run(self):
+        with mock.patch.object(run, "check_if_thread_exists", return_value="thread_1"), \
+                mock.patch.object(run, "cancel_run", return_value="run_1") as cancel:
+            response = self.client.post('/chat/cancel', json={"user_name": "Cícero"})
+        self.assertEqual(response.get_json(), {"thread_id": "thread_1", "run_id": "run_1", "cancelled": True})
+        cancel.assert_called_once_with("thread_1")
+        with mock.patch.object(run, "check_if_thread_exists", return_value=None):
+            self.assertEqual(self.client.post('/chat/cancel', json={"user_name": "Cícero"}).status_code, 404)
+
+    def test_open_circuit_answers_503(self):
+        with mock.patch.object(run, "generate_response", side_effect=CircuitOpenError("aberto")):
+            response = self.client.post('/chat', json={"user_name": "Cícero", "message": "Oi"})
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("Retry-After", response.headers)
+
+    def test_saturated_worker_answers_503(self):
+        release = threading.Event()
+        with mock.patch.object(run, "generate_response", side_effect=lambda **_: release.wait(5) and "ok"):
+            run.dispatcher.submit(release.wait, 5)
+            run.dispatcher.submit(release.wait, 5)
+            response = self.client.post('/chat', json={"user_name": "Cícero", "message": "Oi"})
+            release.set()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers["Retry-After"], "1")
+
+    def test_slow_reply_answers_504(self):
+        release = threading.Event()
+        with mock.patch.object(run, "generate_response", side_effect=lambda **_: release.wait(5) and "ok"), \
+                mock.patch.object(ServerConfig, "REQUEST_TIMEOUT_SECONDS", 0.05):
+            response = self.client.post('/chat', json={"user_name": "Cícero", "message": "Oi"})
+            release.set()
+        self.assertEqual(response.status_code, 504)
+
+    def test_stream_sends_tokens_then_done(self):
+        with mock.patch.object(run, "stream_response", return_value=iter(["Ol", "á!"])):
+            response = self.client.post('/chat/stream', json={"user_name": "Cícero", "message": "Oi"})
+            body = response.get_data(as_text=True)
+        self.assertEqual(response.mimetype, "text/event-stream")
+        events = [block.split("\n")[0] for block in body.strip().split("\n\n")]
+        self.assertEqual(events, ["event: thread", "event: token", "event: token", "event: done"])
+        self.assertIn('"reply": "Olá!"', body)
+
+
+class TestChatWebSocket(unittest.TestCase):
+    def setUp(self):
+        self.server = make_server('127.0.0.1', 0, run.app, threaded=True)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"ws://127.0.0.1:{self.server.server_port}/chat/ws"
+        self.patches = [
+            mock.patch.object(run, "get_or_create_thread", return_value="thread_1"),
+            mock.patch.object(run, "touch_thread"),
+            mock.patch.object(run, "dispatcher", ChatDispatcher(2)),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in reversed(self.patches):
+            patch.stop()
+        self.server.shutdown()
+
+    def _receive(self, ws):
+        return json.loads(ws.receive(timeout=5))
+
+    def test_session_binds_thread_once_and_streams_replies(self):
+        with mock.patch.object(run, "stream_response", side_effect=lambda **_: iter(["Ol", "á!"])) as stream:
+            ws = simple_websocket.Client.connect(self.url)
+            ws.send(json.dumps({"user_name": "Cícero"}))
+            self.assertEqual(self._receive(ws), {"event": "thread", "thread_id": "thread_1"})
+            for message in ("Oi", "Tudo bem?"):
+                ws.send(json.dumps({"message": message}))
+                events = [self._receive(ws) for _ in range(3)]
+                self.assertEqual([event["event"] for event in events], ["token", "token", "done"])
+                self.assertEqual(events[-1]["reply"], "Olá!")
+            ws.close()
+
+        run.get_or_create_thread.assert_called_once_with("Cícero")
+        self.assertEqual(stream.call_count, 2)
+
+    def test_disconnect_closes_the_stream(self):
+        closed = threading.Event()
+        release = threading.Event()
+        exhausted = []
+
+        def slow_stream(**_):
+            try:
+                yield "Ol"
+                release.wait(5)
+                for _ in range(100):
+                    time.sleep(0.05)
+                    yield "."
+                exhausted.append(True)
+            finally:
+                closed.set()
+
+        with mock.patch.object(run, "stream_response", side_effect=slow_stream):
+            ws = simple_websocket.Client.connect(self.url)
+            ws.send(json.dumps({"user_name": "Cícero"}))
+            self._receive(ws)
+            ws.send(json.dumps({"message": "Oi"}))
+            self.assertEqual(self._receive(ws)["event"], "token")
+            ws.close()
+            release.set()
+            self.assertTrue(closed.wait(5))
+        self.assertEqual(exhausted, [])
+
+    def test_disconnect_cancels_the_run_before_the_next_part(self):
+        cancelled = threading.Event()
+
+        def waiting_stream(**_):
+            yield "Ol"
+            # A próxima parte só chegaria com o fim do run; o cancelamento é o que o encerra.
+            cancelled.wait(5)
+
+        with mock.patch.object(run, "stream_response", side_effect=waiting_stream), \
+                mock.patch.object(run, "cancel_run", side_effect=lambda thread_id: cancelled.set()) as cancel:
+            ws = simple_websocket.Client.connect(self.url)
+            ws.send(json.dumps({"user_name": "Cícero"}))
+            self._receive(ws)
+            ws.send(json.dumps({"message": "Oi"}))
+            self.assertEqual(self._receive(ws)["event"], "token")
+            ws.close()
+            self.assertTrue(cancelled.wait(2))
+        cancel.assert_called_once_with("thread_1")
+
+
+
+class TestStreamResponse(unittest.TestCase):
+    def setUp(self):
+        # Os runs em andamento são gravados nos metadados dos threads, em um diretório temporário.
+        self.tmp_dir = tempfile.mkdtemp()
+        db_path = os.path.join(self.tmp_dir, 'threads')
+        for patch in (
+            mock.patch.object(threads_manager, "DB_PATH", db_path),
+            mock.patch.object(threads_manager, "LOCK_PATH", db_path + '.lock'),
+            mock.patch.object(threads_manager, "_lock_file", None),
+            mock.patch.dict(threads_manager._slot_locks, clear=True),
+        ):
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+
+    def test_closing_the_stream_cancels_the_run(self):
+        def delta(text):
+            content = SimpleNamespace(type="text", text=SimpleNamespace(value=text))
+            return SimpleNamespace(event="thread.message.delta", data=SimpleNamespace(delta=SimpleNamespace(content=[content])))
+
+        stream = mock.MagicMock()
+        stream.__enter__.return_value = stream
+        stream.__iter__.return_value = iter([
+            SimpleNamespace(event="thread.run.created", data=SimpleNamespace(id="run_1")), delta("Ol"), delta("á!")])
+        client = mock.MagicMock()
+        client.beta.threads.runs.create_and_stream.return_value = stream
+        pool = ClientPool([{"name": "a", "api_key": "sk-a"}], client_factory=lambda entry: client)
+
+        with mock.patch.object(interface_openai, "get_client_pool", return_value=pool), \
+                mock.patch.object(interface_openai, "client_key_for_thread", return_value="a"):
+            parts = interface_openai.stream_response("Oi", thread_id="thread_1", assistant_id="asst_a")
+            self.assertEqual(next(parts), "Ol")
+            parts.close()
+
+        client.beta.threads.runs.cancel.assert_called_once_with(thread_id="thread_1", run_id="run_1")
+
+
+
+class TestProcessState(unittest.TestCase):
+    def test_reset_after_fork_recreates_clients_and_pools(self):
+        from app.interfaces import client_pool
+
+        pool, dispatcher, default_client = client_pool.get_client_pool(), run.dispatcher, interface_openai.client
+        with mock.patch.object(run, "dispatcher", dispatcher):
+            run.reset_process_state()
+            self.assertIsNot(run.dispatcher, dispatcher)
+        self.assertIsNot(client_pool.get_client_pool(), pool)
+        self.assertIsNot(interface_openai.client, default_client)
+        self.assertIs(interface_openai.client, client_pool.get_client_pool().default.client)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import unittest
+import os
+import shutil
+import tempfile
+import threading
+from types import SimpleNamespace
+from unittest import mock
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+from app.data import threads_manager
+from app.interfaces import interface_openai
+from app.interfaces.client_pool import ClientPool
+from app.interfaces.interface_openai import RunTimeoutError, cancel_run
+from app.services.run_recovery import sweep_stale_runs
+from app.utils.openia_config import OpenAIAssistantConfig, ResilienceConfig, TranscriptConfig, UsageConfig
+
+
+def _fake_client(entry):
+    client = mock.MagicMock()
+    runs = client.beta.threads.runs
+    runs.create.return_value = SimpleNamespace(id="run_1", status="in_progress", usage=None)
+    runs.retrieve.return_value = SimpleNamespace(id="run_1", status="in_progress", usage=None)
+    runs.cancel.return_value = SimpleNamespace(id="run_1", status="cancelled")
+    runs.list.return_value = SimpleNamespace(data=[SimpleNamespace(id="run_9", status="in_progress")])
+    return client
+
+
+class TestRunRecovery(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        db_path = os.path.join(self.tmp_dir, 'threads')
+        self.pool = ClientPool([{"name": "a", "api_key": "sk-a"}], client_factory=_fake_client)
+        for patch in (
+            mock.patch.object(threads_manager, "DB_PATH", db_path),
+            mock.patch.object(threads_manager, "LOCK_PATH", db_path + '.lock'),
+            mock.patch.object(threads_manager, "_lock_file", None),
+            mock.patch.dict(threads_manager._slot_locks, clear=True),
+            mock.patch.object(interface_openai, "get_client_pool", return_value=self.pool),
+            mock.patch.object(interface_openai, "client_key_for_thread", return_value="a"),
+            mock.patch.object(TranscriptConfig, "ENABLED", False),
+            mock.patch.object(UsageConfig, "ENABLED", False),
+            mock.patch.object(ResilienceConfig, "HEDGING_ENABLED", False),
+            mock.patch.object(OpenAIAssistantConfig, "RUN_POLL_INTERVAL_SECONDS", 0.01),
+            mock.patch.object(OpenAIAssistantConfig, "RUN_TIMEOUT_SECONDS", 0.05),
+        ):
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.runs = self.pool.default.client.beta.threads.runs
+
+    def test_turn_past_deadline_cancels_the_remote_run(self):
+        with self.assertRaises(RunTimeoutError):
+            interface_openai.generate_response("Oi", thread_id="thread_1", user_name="Alice", assistant_id="asst_a",
+                                               coalesce=False, grounding=False)
+        self.runs.cancel.assert_called_once_with(thread_id="thread_1", run_id="run_1")
+        self.assertIsNone(threads_manager.retrieve_active_run("thread_1"))
+
+    def _stream(self, events):
+        stream = mock.MagicMock()
+        stream.__enter__.return_value = stream
+        stream.__iter__.side_effect = lambda: events
+        self.runs.create_and_stream.return_value = stream
+        return stream
+
+    def test_stalled_stream_hits_the_deadline(self):
+        closed = threading.Event()
+
+        def events():
+            yield SimpleNamespace(event="thread.run.created", data=SimpleNamespace(id="run_1", status="queued"))
+            closed.wait(5)  # Nenhum evento até a resposta ser fechada.
+            raise ConnectionError("resposta fechada")
+
+        stream = self._stream(events())
+        stream.close.side_effect = closed.set
+        with self.assertRaises(RunTimeoutError):
+            list(interface_openai.stream_response("Oi", thread_id="thread_1", assistant_id="asst_a", grounding=False))
+        self.assertTrue(closed.is_set())
+        self.runs.cancel.assert_called_once_with(thread_id="thread_1", run_id="run_1")
+        self.assertIsNone(threads_manager.retrieve_active_run("thread_1"))
+
+    def test_failed_stream_releases_the_thread(self):
+        def events():
+            yield SimpleNamespace(event="thread.run.created", data=SimpleNamespace(id="run_1", status="queued"))
+            raise ConnectionError("conexão perdida")
+
+        self._stream(events())
+        with self.assertRaises(Exception):
+            list(interface_openai.stream_response("Oi", thread_id="thread_1", assistant_id="asst_a", grounding=False))
+        self.runs.cancel.assert_called_once_with(thread_id="thread_1", run_id="run_1")
+        self.assertIsNone(threads_manager.retrieve_active_run("thread_1"))
+
+    def test_cancel_without_run_id_uses_the_recorded_or_latest_active_run(self):
+        threads_manager.mark_active_run("thread_1", "run_1")
+        self.assertEqual(cancel_run("thread_1"), "run_1")
+        self.assertEqual(cancel_run("thread_1"), "run_9")
+        self.runs.list.return_value = SimpleNamespace(data=[SimpleNamespace(id="run_9", status="completed")])
+        self.assertIsNone(cancel_run("thread_1"))
+
+    def test_sweeper_cancels_only_stale_runs(self):
+        threads_manager.mark_active_run("thread_1", "run_1")
+        threads_manager.mark_active_run("thread_2", "run_2")
+        with mock.patch.object(threads_manager.time, "time", return_value=threads_manager.time.time() + 3600):
+            threads_manager.mark_active_run("thread_3", "run_3")
+        self.assertEqual(sweep_stale_runs(age_seconds=60), {"cancelled": 0, "finished": 0, "failed": 0})
+        self.assertEqual(sweep_stale_runs(age_seconds=-1, batch_size=1), {"cancelled": 2, "finished": 0, "failed": 0})
+        self.assertEqual(threads_manager.find_stale_runs(-3600), [("thread_3", "run_3")])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,254 @@
+import unittest
+import os
+import json
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+from app.data import threads_manager
+from app.utils.openia_config import ThreadStoreConfig
+
+
+def _local_redis_available():
+    try:
+        import redis
+        redis.Redis.from_url(ThreadStoreConfig.REDIS_URL, socket_connect_timeout=0.2).ping()
+        return True
+    except Exception:
+        return False
+
+
+class TestThreadsManagerBulk(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmp_dir, 'threads')
+        self.patches = [
+            mock.patch.object(threads_manager, "DB_PATH", self.db_path),
+            mock.patch.object(threads_manager, "LOCK_PATH", self.db_path + '.lock'),
+            mock.patch.object(threads_manager, "_lock_file", None),
+            mock.patch.dict(threads_manager._slot_locks, clear=True),
+            mock.patch.dict(threads_manager._pending_activity, clear=True),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in reversed(self.patches):
+            patch.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_upsert_and_delete_many(self):
+        count = threads_manager.upsert_threads((f"user_{i}", f"thread_{i}") for i in range(500))
+        self.assertEqual(count, 500)
+        self.assertEqual(threads_manager.retrieve_thread_id("user_42"), "thread_42")
+
+        deleted = threads_manager.delete_threads(["user_1", "user_2", "inexistente"])
+        self.assertEqual(deleted, 2)
+        self.assertIsNone(threads_manager.retrieve_thread_id("user_1"))
+
+    def test_export_import_roundtrip(self):
+        threads_manager.upsert_threads({"Cícero": "thread_1", "Severino": "thread_2"})
+        export_path = os.path.join(self.tmp_dir, 'threads.jsonl')
+        self.assertEqual(threads_manager.export_threads(export_path), 2)
+
+        with open(export_path, encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+        self.assertIn({"user_name": "Cícero", "thread_id": "thread_1"}, records)
+
+        threads_manager.clear_all_threads()
+        self.assertEqual(threads_manager.import_threads(export_path), 2)
+        self.assertEqual(threads_manager.retrieve_thread_id("Severino"), "thread_2")
+
+    def test_import_rejects_invalid_line(self):
+        path = os.path.join(self.tmp_dir, 'invalido.jsonl')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('{"user_name": "Amaro"}\n')
+        with self.assertRaises(ValueError):
+            threads_manager.import_threads(path)
+
+    def test_read_of_missing_database_is_empty(self):
+        self.assertIsNone(threads_manager.retrieve_thread_id("Amaro"))
+
+    def test_reads_run_concurrently_and_writes_wait_for_them(self):
+        threads_manager.upsert_threads({"Amaro": "thread_1"})
+        reading, release = threading.Event(), threading.Event()
+
+        def slow_reader():
+            with threads_manager._open_db('r'):
+                reading.set()
+                release.wait(5)
+
+        reader = threading.Thread(target=slow_reader)
+        reader.start()
+        self.assertTrue(reading.wait(5))
+        try:
+            # Outra leitura não espera a leitora lenta.
+            self.assertEqual(threads_manager.retrieve_thread_id("Amaro"), "thread_1")
+
+            written = threading.Event()
+            writer = threading.Thread(target=lambda: (threads_manager.upsert_threads({"Bruna": "thread_2"}),
+                                                      written.set()))
+            writer.start()
+            self.assertFalse(written.wait(0.2))
+        finally:
+            release.set()
+            reader.join(5)
+        writer.join(5)
+        self.assertTrue(written.is_set())
+        self.assertEqual(threads_manager.retrieve_thread_id("Bruna"), "thread_2")
+
+    def test_idle_threads_expire_and_store_compacts(self):
+        threads_manager.upsert_threads({"Cícero": "thread_1", "Severino": "thread_2"})
+        with mock.patch.object(threads_manager.time, "time", return_value=time.time() + 3600):
+            threads_manager.touch_thread("Severino")
+            threads_manager.flush_activity()
+            self.assertEqual(threads_manager.find_idle_threads(60), ["Cícero"])
+            self.assertEqual(threads_manager.expire_thread_if_idle("Cícero", 60), "thread_1")
+            self.assertIsNone(threads_manager.expire_thread_if_idle("Severino", 60))
+
+        threads_manager.compact_store()
+        self.assertIsNone(threads_manager.retrieve_thread_id("Cícero"))
+        self.assertEqual(threads_manager.retrieve_thread_id("Severino"), "thread_2")
+
+    def test_metadata_follows_thread_lifecycle(self):
+        threads_manager.upsert_threads({"Cícero": "thread_1", "Severino": "thread_2"})
+        threads_manager.update_thread_metadata("thread_1", assistant_id="asst_a", run_id="run_1")
+        threads_manager.update_thread_metadata("thread_1", run_id=None)
+        threads_manager.update_thread_metadata("thread_2", assistant_id="asst_b")
+        self.assertEqual(threads_manager.retrieve_thread_metadata("thread_1"), {"assistant_id": "asst_a"})
+
+        threads_manager.delete_threads(["Cícero"])
+        self.assertEqual(threads_manager.retrieve_thread_metadata("thread_1"), {})
+        self.assertEqual(threads_manager.retrieve_thread_metadata("thread_2"), {"assistant_id": "asst_b"})
+
+    def test_active_runs_are_found_when_stale_and_cleared_conditionally(self):
+        threads_manager.update_thread_metadata("thread_1", assistant_id="asst_a")
+        threads_manager.mark_active_run("thread_1", "run_1")
+        threads_manager.mark_active_run("thread_2", "run_2")
+        self.assertEqual(threads_manager.retrieve_active_run("thread_1")[0], "run_1")
+        self.assertEqual(threads_manager.find_stale_runs(60), [])
+        self.assertEqual(sorted(threads_manager.find_stale_runs(-1)), [("thread_1", "run_1"), ("thread_2", "run_2")])
+
+        self.assertFalse(threads_manager.clear_active_run("thread_1", "run_0"))
+        self.assertTrue(threads_manager.clear_active_run("thread_1", "run_1"))
+        self.assertIsNone(threads_manager.retrieve_active_run("thread_1"))
+        self.assertEqual(threads_manager.retrieve_thread_metadata("thread_1"), {"assistant_id": "asst_a"})
+        self.assertEqual(threads_manager.find_stale_runs(-1), [("thread_2", "run_2")])
+
+    def test_sweep_deletes_remote_threads(self):
+        from app.services import thread_expiry
+
+        threads_manager.upsert_threads((f"user_{i}", f"thread_{i}") for i in range(5))
+        with mock.patch.object(thread_expiry, "delete_remote_thread") as delete_remote:
+            stats = thread_expiry.sweep_idle_threads(idle_seconds=-1, batch_size=2, delete_interval=0)
+
+        self.assertEqual(stats, {"expired": 5, "remote_deleted": 5, "remote_failed": 0})
+        self.assertEqual(delete_remote.call_count, 5)
+        self.assertEqual(threads_manager._store().count(), 0)
+
+    def test_expiry_sweeper_backfills_once_then_sweeps_until_stopped(self):
+        from app.services import thread_expiry
+
+        swept = threading.Semaphore(0)
+        with mock.patch.object(thread_expiry, "backfill_activity") as backfill, \
+                mock.patch.object(thread_expiry, "claim_sweep", return_value=True), \
+                mock.patch.object(thread_expiry, "sweep_idle_threads",
+                                  side_effect=lambda idle: swept.release() or {"expired": 0}) as sweep:
+            sweeper = thread_expiry.ThreadExpirySweeper(interval=0.01, idle_seconds=60).start()
+            self.assertTrue(swept.acquire(timeout=5) and swept.acquire(timeout=5))
+            sweeper.stop(timeout=5)
+        self.assertFalse(sweeper._thread.is_alive())
+        backfill.assert_called_once_with()
+        sweep.assert_called_with(60)
+
+        # Sem a reserva (outro worker varreu neste intervalo), o processo não varre nem preenche a atividade.
+        claimed = threading.Event()
+        with mock.patch.object(thread_expiry, "backfill_activity") as backfill, \
+                mock.patch.object(thread_expiry, "claim_sweep", side_effect=lambda *args: claimed.set() or False), \
+                mock.patch.object(thread_expiry, "sweep_idle_threads") as sweep:
+            sweeper = thread_expiry.ThreadExpirySweeper(interval=0.01, idle_seconds=60).start()
+            self.assertTrue(claimed.wait(5))
+            sweeper.stop(timeout=5)
+        backfill.assert_not_called()
+        sweep.assert_not_called()
+
+        disabled = thread_expiry.ThreadExpirySweeper(idle_seconds=0).start()
+        self.assertIsNone(disabled._thread)
+
+    def test_sweep_is_claimed_once_per_interval(self):
+        self.assertTrue(threads_manager.claim_sweep("expiry", 3600))
+        self.assertFalse(threads_manager.claim_sweep("expiry", 3600))
+        self.assertTrue(threads_manager.claim_sweep("outra", 3600))
+        with mock.patch.object(threads_manager.time, "time", return_value=time.time() + 3600):
+            self.assertTrue(threads_manager.claim_sweep("expiry", 3600))
+
+
+@unittest.skipUnless(_local_redis_available(), "Servidor Redis local indisponível em REDIS_URL.")
+class TestThreadsManagerRedis(unittest.TestCase):
+    def setUp(self):
+        self.patches = [
+            mock.patch.object(ThreadStoreConfig, "BACKEND", "redis"),
+            mock.patch.object(ThreadStoreConfig, "REDIS_KEY_PREFIX", "interface_openai_test"),
+        ]
+        for patch in self.patches:
+            patch.start()
+        threads_manager.reset_store()
+        threads_manager.clear_all_threads()
+
+    def tearDown(self):
+        threads_manager.clear_all_threads()
+        threads_manager.reset_store()
+        for patch in reversed(self.patches):
+            patch.stop()
+
+    def test_same_functions_against_redis(self):
+        threads_manager.upsert_thread("Cícero", "thread_1")
+        threads_manager.upsert_thread("Cícero", "thread_2")
+        self.assertEqual(threads_manager.retrieve_thread_id("Cícero"), "thread_2")
+        self.assertEqual(threads_manager.retrieve_user_name("thread_2"), "Cícero")
+        self.assertIsNone(threads_manager.retrieve_user_name("thread_1"))
+        self.assertEqual(threads_manager.insert_thread_if_absent("Cícero", "thread_3"), "thread_2")
+
+    def test_pipelined_bulk_operations(self):
+        self.assertEqual(threads_manager.upsert_threads((f"user_{i}", f"thread_{i}") for i in range(1200)), 1200)
+        self.assertEqual(threads_manager.delete_threads(f"user_{i}" for i in range(600)), 600)
+        self.assertEqual(dict(threads_manager._store().items())["user_900"], "thread_900")
+
+    def test_idle_threads_expire(self):
+        threads_manager.upsert_threads({"Cícero": "thread_1", "Severino": "thread_2"})
+        with mock.patch.object(threads_manager.time, "time", return_value=time.time() + 3600):
+            threads_manager.touch_thread("Severino")
+            threads_manager.flush_activity()
+            self.assertEqual(threads_manager.find_idle_threads(60), ["Cícero"])
+            self.assertEqual(threads_manager.expire_thread_if_idle("Cícero", 60), "thread_1")
+            self.assertIsNone(threads_manager.expire_thread_if_idle("Severino", 60))
+        self.assertIsNone(threads_manager.retrieve_user_name("thread_1"))
+
+    def test_metadata_is_removed_with_thread(self):
+        threads_manager.upsert_thread("Cícero", "thread_1")
+        threads_manager.update_thread_metadata("thread_1", assistant_id="asst_a")
+        self.assertEqual(threads_manager.retrieve_thread_metadata("thread_1"), {"assistant_id": "asst_a"})
+        threads_manager.delete_thread("Cícero")
+        self.assertEqual(threads_manager.retrieve_thread_metadata("thread_1"), {})
+
+    def test_active_runs(self):
+        threads_manager.upsert_thread("Cícero", "thread_1")
+        threads_manager.mark_active_run("thread_1", "run_1")
+        threads_manager.mark_active_run("thread_2", "run_2")
+        self.assertEqual(threads_manager.find_stale_runs(60), [])
+        self.assertEqual(sorted(threads_manager.find_stale_runs(-1)), [("thread_1", "run_1"), ("thread_2", "run_2")])
+        self.assertFalse(threads_manager.clear_active_run("thread_1", "run_0"))
+        self.assertTrue(threads_manager.clear_active_run("thread_1", "run_1"))
+        # O thread removido leva os metadados; a entrada que sobra no índice é limpa na busca.
+        threads_manager.delete_thread("Cícero")
+        threads_manager.upsert_thread("Severino", "thread_2")
+        threads_manager.delete_thread("Severino")
+        self.assertEqual(threads_manager.find_stale_runs(-1), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import unittest
+import json
+import os
+import shutil
+import tempfile
+import zlib
+
+from app.data.transcript_store import _HEADER, TranscriptStore
+
+
+class TestTranscriptStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _turn(self, thread_id, n):
+        return {"thread_id": thread_id, "question": f"pergunta {n}", "reply": f"resposta {n}", "run_id": f"run_{n}"}
+
+    def test_history_per_thread_in_order(self):
+        store = TranscriptStore(self.tmp_dir)
+        for n in range(3):
+            store.append(self._turn("thread_a", n))
+            store.append(self._turn("thread_b", n))
+
+        history = store.history("thread_a")
+        self.assertEqual([turn["run_id"] for turn in history], ["run_0", "run_1", "run_2"])
+        self.assertEqual(store.history("thread_b", limit=1)[0]["reply"], "resposta 2")
+        self.assertEqual(store.history("inexistente"), [])
+        store.close()
+
+    def test_segments_rotate_and_are_read_back(self):
+        store = TranscriptStore(self.tmp_dir, segment_max_bytes=200)
+        for n in range(10):
+            store.append(self._turn("thread_a", n))
+
+        segments = [name for name in os.listdir(self.tmp_dir) if name.startswith('segment-')]
+        self.assertGreater(len(segments), 1)
+        self.assertEqual(len(store.history("thread_a")), 10)
+        store.close()
+
+    def test_other_instance_sees_new_turns(self):
+        reader = TranscriptStore(self.tmp_dir)
+        writer = TranscriptStore(self.tmp_dir)
+        writer.append(self._turn("thread_a", 0))
+        self.assertEqual(len(reader.history("thread_a")), 1)
+        writer.append(self._turn("thread_a", 1))
+        self.assertEqual(len(reader.history("thread_a")), 2)
+        reader.close()
+        writer.close()
+
+    def test_index_is_rebuilt_from_segments(self):
+        store = TranscriptStore(self.tmp_dir)
+        store.append(self._turn("thread_a", 0))
+        store.close()
+        os.remove(os.path.join(self.tmp_dir, 'index.log'))
+
+        # Registro truncado no fim do segmento (escrita interrompida) deve ser ignorado.
+        with open(os.path.join(self.tmp_dir, 'segment-000001.log'), 'ab') as segment_file:
+            segment_file.write(b'\x00\x00\x01')
+
+        rebuilt = TranscriptStore(self.tmp_dir)
+        self.assertEqual(rebuilt.history("thread_a")[0]["question"], "pergunta 0")
+        rebuilt.close()
+
+    def _crash_after_segment_write(self, turn, index_fragment):
+        # Simula a queda do processo depois do fsync do segmento e no meio da escrita da linha do índice.
+        body = json.dumps(turn).encode('utf-8')
+        with open(os.path.join(self.tmp_dir, 'segment-000001.log'), 'ab') as segment_file:
+            segment_file.write(_HEADER.pack(len(body), zlib.crc32(body)) + body)
+        with open(os.path.join(self.tmp_dir, 'index.log'), 'a', encoding='utf-8') as index_file:
+            index_file.write(index_fragment)
+
+    def test_interrupted_append_is_repaired(self):
+        survivor = TranscriptStore(self.tmp_dir)
+        survivor.append(self._turn("thread_a", 0))
+        self._crash_after_segment_write(self._turn("thread_a", 1), "thread_a\t1\t")
+
+        # A próxima escrita descarta a linha incompleta e indexa o registro que ficou sem linha.
+        survivor.append(self._turn("thread_a", 2))
+        self.assertEqual([turn["run_id"] for turn in survivor.history("thread_a")], ["run_0", "run_1", "run_2"])
+        reopened = TranscriptStore(self.tmp_dir)
+        self.assertEqual(len(reopened.history("thread_a")), 3)
+        with open(os.path.join(self.tmp_dir, 'index.log'), encoding='utf-8') as index_file:
+            self.assertEqual([line.split('\t')[0] for line in index_file], ["thread_a"] * 3)
+        survivor.close()
+        reopened.close()
+
+    def test_torn_record_is_discarded_on_open(self):
+        store = TranscriptStore(self.tmp_dir)
+        store.append(self._turn("thread_a", 0))
+        store.close()
+        segment_path = os.path.join(self.tmp_dir, 'segment-000001.log')
+        size = os.path.getsize(segment_path)
+        with open(segment_path, 'ab') as segment_file:
+            segment_file.write(b'\x00\x00\x01')
+
+        reopened = TranscriptStore(self.tmp_dir)
+        self.assertEqual(os.path.getsize(segment_path), size)
+        reopened.append(self._turn("thread_a", 1))
+        os.remove(os.path.join(self.tmp_dir, 'index.log'))
+        # Sem o lixo no meio do segmento, o índice recriado enxerga o registro gravado depois da queda.
+        rebuilt = TranscriptStore(self.tmp_dir)
+        self.assertEqual(len(rebuilt.history("thread_a")), 2)
+        rebuilt.close()
+        reopened.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
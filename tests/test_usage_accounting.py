@@ -0,0 +1,75 @@
+import unittest
+import os
+import shutil
+import tempfile
+from types import SimpleNamespace
+from unittest import mock
+
+from app.data import usage_store
+from app.services import usage_accounting
+from app.services.usage_accounting import BudgetExceededError, enforce_budget, flush_usage, record_usage
+from app.utils.openia_config import UsageConfig
+
+
+def _usage(prompt, completion):
+    return SimpleNamespace(model_dump=lambda: {"prompt_tokens": prompt, "completion_tokens": completion,
+                                               "total_tokens": prompt + completion})
+
+
+class TestUsageAccounting(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        for patch in (
+            mock.patch.object(UsageConfig, "ENABLED", True),
+            mock.patch.object(UsageConfig, "DB_PATH", os.path.join(self.tmp_dir, "usage.sqlite3")),
+            mock.patch.object(UsageConfig, "FLUSH_INTERVAL_SECONDS", 3600),
+            mock.patch.object(UsageConfig, "BUDGET_TOKENS", 0),
+            mock.patch.object(UsageConfig, "USER_BUDGETS", {}),
+            mock.patch.object(UsageConfig, "THROTTLE_RATIO", 0.8),
+            mock.patch.object(UsageConfig, "THROTTLE_SECONDS", 0.25),
+        ):
+            patch.start()
+            self.addCleanup(patch.stop)
+        usage_store.reset_usage_store()
+        usage_accounting.reset_usage_accounting()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.addCleanup(usage_accounting.reset_usage_accounting)
+        self.addCleanup(usage_store.reset_usage_store)
+
+    def test_usage_is_aggregated_in_memory_and_flushed_in_one_batch(self):
+        record_usage("Alice", "thread_a", "asst_1", _usage(100, 20))
+        record_usage("Alice", "thread_a", "asst_1", _usage(50, 10))
+        record_usage("Bruno", "thread_b", "asst_2", {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15})
+        record_usage("Bruno", "thread_b", "asst_2", None)
+
+        store = usage_store.get_usage_store()
+        self.assertEqual(store.used_tokens("Alice", since=0), 0)
+        self.assertEqual(usage_accounting.used_tokens("Alice"), 180)
+        self.assertEqual(flush_usage(), 2)
+
+        top = usage_accounting.top_consumers(hours=1)
+        self.assertEqual(top, [
+            {"user_name": "Alice", "runs": 2, "prompt_tokens": 150, "completion_tokens": 30, "total_tokens": 180},
+            {"user_name": "Bruno", "runs": 1, "prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+        ])
+        self.assertEqual(usage_accounting.top_consumers(hours=1, by="assistant_id", limit=1)[0]["assistant_id"],
+                         "asst_1")
+
+    def test_budget_throttles_then_rejects(self):
+        with mock.patch.object(UsageConfig, "USER_BUDGETS", {"Alice": 1000}):
+            record_usage("Alice", "thread_a", "asst_1", _usage(700, 100))
+            with mock.patch.object(usage_accounting.time, "sleep") as sleep:
+                enforce_budget("Alice")
+                enforce_budget("Bruno")
+            sleep.assert_called_once_with(0.25)
+
+            record_usage("Alice", "thread_a", "asst_1", _usage(200, 0))
+            flush_usage()
+            with self.assertRaises(BudgetExceededError) as raised:
+                enforce_budget("Alice")
+        self.assertEqual((raised.exception.used, raised.exception.budget), (1000, 1000))
+        self.assertGreater(raised.exception.retry_after, UsageConfig.BUDGET_WINDOW_SECONDS - 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+import os
+import shutil
+import tempfile
+from types import SimpleNamespace
+from unittest import mock
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+from app.data import threads_manager
+from app.interfaces import interface_openai
+from app.interfaces.client_pool import ClientPool
+from app.services.user_naming import MESSAGE_PREAMBLE, naming_savings
+from app.utils.metrics import NAMING_TOKENS_AVOIDED
+from app.utils.openia_config import OpenAIAssistantConfig, TranscriptConfig, UsageConfig
+
+
+def _fake_client(entry):
+    client = mock.MagicMock()
+    client.beta.threads.runs.create.return_value = SimpleNamespace(id="run_1", status="completed", usage=None)
+    text = SimpleNamespace(value="Resposta")
+    client.beta.threads.messages.list.return_value = SimpleNamespace(
+        data=[SimpleNamespace(content=[SimpleNamespace(text=text)])])
+    return client
+
+
+class TestUserNaming(unittest.TestCase):
+    def setUp(self):
+        self.pool = ClientPool([{"name": "a", "api_key": "sk-a"}], client_factory=_fake_client)
+        self.tmp_dir = tempfile.mkdtemp()
+        db_path = os.path.join(self.tmp_dir, 'threads')
+        for patch in (
+            mock.patch.object(threads_manager, "DB_PATH", db_path),
+            mock.patch.object(threads_manager, "LOCK_PATH", db_path + '.lock'),
+            mock.patch.object(threads_manager, "_lock_file", None),
+            mock.patch.dict(threads_manager._slot_locks, clear=True),
+            mock.patch.object(interface_openai, "get_client_pool", return_value=self.pool),
+            mock.patch.object(interface_openai, "client_key_for_thread", return_value="a"),
+            mock.patch.object(TranscriptConfig, "ENABLED", False),
+            mock.patch.object(UsageConfig, "ENABLED", False),
+        ):
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+
+    def _ask(self, mode, grounding=False):
+        with mock.patch.object(OpenAIAssistantConfig, "USER_NAMING_MODE", mode):
+            interface_openai.generate_response("Qual é o horário?", thread_id="thread_1", user_name="Alice",
+                                               assistant_id="asst_a", coalesce=False, grounding=grounding)
+        client = self.pool.default.client
+        return client.beta.threads.messages.create.call_args.kwargs, client.beta.threads.runs.create.call_args.kwargs
+
+    def test_message_mode_prefixes_every_message(self):
+        message, run = self._ask("message")
+        self.assertEqual(message["content"], MESSAGE_PREAMBLE.format(user_name="Alice") + "Qual é o horário?")
+        self.assertNotIn("metadata", message)
+        self.assertNotIn("additional_instructions", run)
+
+    def test_run_mode_sends_raw_question_and_names_the_user_in_the_run(self):
+        avoided_before = NAMING_TOKENS_AVOIDED._value.get()
+        message, run = self._ask("run")
+        self.assertEqual(message["content"], "Qual é o horário?")
+        self.assertEqual(message["metadata"], {"user_name": "Alice"})
+        self.assertIn("Alice", run["additional_instructions"])
+        self.assertGreater(NAMING_TOKENS_AVOIDED._value.get(), avoided_before)
+
+    def test_document_passages_go_to_the_run_not_the_thread(self):
+        with mock.patch.object(interface_openai, "grounding_instructions", return_value="Trechos: [1] faq.txt"):
+            message, run = self._ask("run", grounding=True)
+        self.assertEqual(message["content"], "Qual é o horário?")
+        self.assertIn("Alice", run["additional_instructions"])
+        self.assertTrue(run["additional_instructions"].endswith("\n\nTrechos: [1] faq.txt"))
+
+    def test_savings_grow_with_the_thread(self):
+        rows = naming_savings("Alice", "Qual é o horário?", turns=10)
+        self.assertEqual([row["turn"] for row in rows], list(range(1, 11)))
+        self.assertTrue(all(later["saved"] > earlier["saved"] for earlier, later in zip(rows, rows[1:])))
+        self.assertEqual(rows[-1]["message_tokens"] - rows[-1]["run_tokens"], rows[-1]["saved"])
+
+
+if __name__ == '__main__':
+    unittest.main()